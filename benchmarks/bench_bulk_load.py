@@ -0,0 +1,105 @@
+"""Benchmark loading mapped records into a triplestore, one RDF/XML POST
+per record as add_to_triplestore used to do, one N-Triples POST per
+record, and TriplestoreSink batches of N-Triples, gzip compressed and
+uploaded on a background thread while mapping continues
+
+Each record is the fixure MODS record mapped with XMLProcessor and loaded
+into a local fake SPARQL endpoint with latency seconds per request. The
+endpoint runs in its own process so parsing uploads does not compete
+with mapping for the interpreter.
+
+    python benchmarks/bench_bulk_load.py [records] [latency]
+"""
+__author__ = "Jeremy Nelson"
+
+import multiprocessing
+import os
+import sys
+import time
+
+from lxml import etree
+
+sys.path.append(os.path.abspath(
+    os.path.join(os.path.dirname(__file__), os.pardir)))
+
+from bibcat import transport
+from bibcat.ingesters.sinks import TriplestoreSink
+from bibcat.rml.processor import XMLProcessor
+from fake_sparql import FakeSPARQLServer
+
+FIXURES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                            "fixures")
+MODS_NS = {"mods": "http://www.loc.gov/mods/v3",
+           "xlink": "http://www.w3.org/1999/xlink"}
+
+
+def serve(latency, urls, done):
+    server = FakeSPARQLServer(latency=latency)
+    server.start()
+    urls.put(server.url)
+    done.wait()
+    server.stop()
+
+
+def rdf_xml_post(processor, url):
+    transport.post(url,
+                   data=processor.output.serialize(format="xml"),
+                   headers={"Content-Type": "application/rdf+xml"})
+
+
+def main(size=500, latency=0.02):
+    processor = XMLProcessor(rml_rules=["bibcat-base.ttl", "mods-to-bf.ttl"],
+                             institution_iri="http://bibcat.org/institution",
+                             namespaces=MODS_NS)
+    record = etree.parse(os.path.join(FIXURES_PATH, "mods-record.xml"))
+    modes = [("RDF/XML per record", None),
+             ("N-Triples per record", None),
+             ("sink batch=100", dict()),
+             ("sink batch=100 gzip", dict(compress=True)),
+             ("sink batch=100 bg", dict(background=True)),
+             ("sink batch=100 gzip+bg", dict(compress=True, background=True))]
+    print("{} records, {} s latency per request".format(size, latency))
+    print("{:<24} {:>9} {:>10} {:>9} {:>8}".format(
+        "mode", "requests", "MB sent", "seconds", "speedup"))
+    baseline = None
+    for name, sink_kwargs in modes:
+        urls, done = multiprocessing.Queue(), multiprocessing.Event()
+        server = multiprocessing.Process(target=serve,
+                                         args=(latency, urls, done))
+        server.start()
+        url = urls.get()
+        transport.reset_metrics()
+        sink = None
+        if sink_kwargs is not None:
+            sink = TriplestoreSink(url, batch_size=100, **sink_kwargs)
+        start = time.time()
+        for i in range(size):
+            processor.run(record,
+                          instance_iri="http://bibcat.org/instance/{}".format(i),
+                          item_iri="http://bibcat.org/item/{}".format(i),
+                          work_iri="http://bibcat.org/work/{}".format(i))
+            processor.triplestore_url = url
+            if name.startswith("RDF/XML"):
+                rdf_xml_post(processor, url)
+            else:
+                processor.add_to_triplestore(sink)
+        if sink is not None:
+            sink.close()
+        elapsed = time.time() - start
+        if baseline is None:
+            baseline = elapsed
+        stats = transport.metrics()[transport.endpoint(url)]
+        print("{:<24} {:>9} {:>10.2f} {:>9.2f} {:>7.2f}x".format(
+            name,
+            stats["requests"],
+            stats["bytes_sent"] / 2**20,
+            elapsed,
+            baseline / elapsed))
+        done.set()
+        server.join()
+
+
+if __name__ == '__main__':
+    args = [int(arg) for arg in sys.argv[1:2]]
+    args += [float(arg) for arg in sys.argv[2:3]]
+    main(*args)
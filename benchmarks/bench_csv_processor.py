@@ -0,0 +1,86 @@
+"""Benchmark of CSVProcessor streaming a generated CSV file to N-Triples
+
+A CSV file of rows is generated and mapped with fixures/csv-to-bf.ttl,
+writing each chunk's N-Triples to a counting output. The rows/s of each
+tenth of the file shows whether the rate stays steady as the file is
+read, and the peak resident memory whether memory stays flat.
+
+    python benchmarks/bench_csv_processor.py [rows] [workers] [chunk_size]
+"""
+__author__ = "Jeremy Nelson"
+
+import os
+import resource
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.abspath(
+    os.path.join(os.path.dirname(__file__), os.pardir)))
+
+from bibcat.rml.processor import CSVProcessor
+
+FIXURES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                            "fixures")
+
+
+class CountingOutput(object):
+    """Binary output that only counts the bytes and lines written"""
+
+    def __init__(self):
+        self.size, self.lines = 0, 0
+
+    def write(self, raw_nt):
+        self.size += len(raw_nt)
+        self.lines += raw_nt.count(b"\n")
+
+
+def write_csv(path, rows):
+    with open(path, "w") as csv_file:
+        csv_file.write("id,title\n")
+        for i in range(rows):
+            csv_file.write("{0},\"Title {0}, a novel\"\n".format(i))
+
+
+def main(rows=1000000, workers=1, chunk_size=1000):
+    file_desc, path = tempfile.mkstemp(suffix=".csv")
+    os.close(file_desc)
+    write_csv(path, rows)
+    processor = CSVProcessor(
+        rml_rules=os.path.join(FIXURES_PATH, "csv-to-bf.ttl"),
+        csv_file=path)
+    output = CountingOutput()
+    print("{} rows, {:.1f} MB CSV, {} workers, chunk size {}".format(
+        rows, os.path.getsize(path) / 2**20, workers, chunk_size))
+    print("{:>10} {:>10} {:>12} {:>12}".format(
+        "rows", "seconds", "rows/s", "peak RSS MB"))
+    start = last = time.time()
+    mark = max(rows // 10, chunk_size)
+    mapped = 0
+    for raw_nt in processor.chunks(
+            workers=workers,
+            chunk_size=chunk_size,
+            institution_iri="http://bibcat.org/institution"):
+        output.write(raw_nt)
+        if processor.rows_mapped - mapped >= mark:
+            now = time.time()
+            print("{:>10} {:>10.1f} {:>12.0f} {:>12.1f}".format(
+                processor.rows_mapped,
+                now - start,
+                (processor.rows_mapped - mapped) / (now - last),
+                resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 2**10))
+            mapped, last = processor.rows_mapped, now
+    elapsed = time.time() - start
+    print("total {} rows, {} triples, {:.1f} MB N-Triples, {:.1f} s, "
+          "{:.0f} rows/s, {} errors".format(
+              processor.rows_mapped,
+              output.lines,
+              output.size / 2**20,
+              elapsed,
+              processor.rows_mapped / elapsed,
+              len(processor.errors)))
+    os.remove(path)
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:4]])
@@ -0,0 +1,100 @@
+"""Benchmark triplestore requests per record for Deduplicator.run, one
+CONTAINS query per labelled entity, against Deduplicator.run_batch, one
+VALUES query per class for a batch of records, with and without a local
+AuthorityIndex
+
+Records with recurring bf:Person and bf:Topic labels are deduplicated
+against a local fake SPARQL endpoint that already holds half of the
+labels.
+
+    python benchmarks/bench_dedup_batch.py [records] [batch]
+"""
+__author__ = "Jeremy Nelson"
+
+import os
+import random
+import sys
+import time
+
+import rdflib
+
+sys.path.append(os.path.abspath(
+    os.path.join(os.path.dirname(__file__), os.pardir)))
+
+from bibcat.linkers.authority import AuthorityIndex
+from bibcat.linkers.deduplicate import Deduplicator
+from fake_sparql import FakeSPARQLServer
+
+BF = rdflib.Namespace("http://id.loc.gov/ontologies/bibframe/")
+BASE_URL = "http://bibcat.org/"
+NAMES = ["Person {}".format(i) for i in range(300)]
+TOPICS = ["Topic {}".format(i) for i in range(300)]
+
+
+def existing_store():
+    graph = rdflib.Graph()
+    for name in NAMES[::2]:
+        iri = rdflib.URIRef("{}person/existing-{}".format(
+            BASE_URL, name.split()[-1]))
+        graph.add((iri, rdflib.RDF.type, BF.Person))
+        graph.add((iri, rdflib.RDFS.label, rdflib.Literal(name)))
+    for topic in TOPICS[::2]:
+        iri = rdflib.URIRef("{}topic/existing-{}".format(
+            BASE_URL, topic.split()[-1]))
+        graph.add((iri, rdflib.RDF.type, BF.Topic))
+        graph.add((iri, rdflib.RDFS.label, rdflib.Literal(topic)))
+    return graph
+
+
+def records(size, seed=7):
+    rand = random.Random(seed)
+    output = []
+    for i in range(size):
+        graph = rdflib.Graph()
+        instance = rdflib.URIRef("{}instance/{}".format(BASE_URL, i))
+        for name in rand.sample(NAMES, 3):
+            agent = rdflib.BNode()
+            graph.add((instance, BF.contribution, agent))
+            graph.add((agent, rdflib.RDF.type, BF.Person))
+            graph.add((agent, rdflib.RDFS.label, rdflib.Literal(name)))
+        for topic in rand.sample(TOPICS, 4):
+            subject = rdflib.BNode()
+            graph.add((instance, BF.subject, subject))
+            graph.add((subject, rdflib.RDF.type, BF.Topic))
+            graph.add((subject, rdflib.RDFS.label, rdflib.Literal(topic)))
+        output.append(graph)
+    return output
+
+
+def main(size=200, batch=20):
+    server = FakeSPARQLServer(existing_store())
+    server.start()
+    print("{:<16} {:>8} {:>10} {:>14} {:>10} {:>10}".format(
+        "mode", "records", "requests", "requests/rec", "seconds",
+        "index hits"))
+    for mode in ["run", "run+index", "run_batch", "run_batch+index"]:
+        index = None
+        if mode.endswith("index"):
+            index = AuthorityIndex()
+        deduplicator = Deduplicator(triplestore_url=server.url,
+                                    base_url=BASE_URL,
+                                    classes=[BF.Person, BF.Topic],
+                                    index=index)
+        graphs = records(size)
+        start = time.time()
+        if not mode.startswith("run_batch"):
+            for graph in graphs:
+                deduplicator.run(graph)
+        else:
+            for i in range(0, size, batch):
+                deduplicator.run_batch(graphs[i:i + batch])
+        elapsed = time.time() - start
+        print("{:<16} {:>8} {:>10} {:>14.2f} {:>10.2f} {:>10}".format(
+            mode, size, deduplicator.requests,
+            deduplicator.requests / size, elapsed,
+            index.hits if index is not None else "-"))
+    server.stop()
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:3]])
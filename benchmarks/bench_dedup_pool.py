@@ -0,0 +1,68 @@
+"""Scaling benchmark of DeduplicatePool with 1, 2, 4 and 8 workers
+
+Records with bf:Person and bf:Topic labels are deduplicated against a
+local fake SPARQL endpoint with latency seconds per request. Each pool
+run is checked against the IRIs of a serial Deduplicator.run_batch.
+
+    python benchmarks/bench_dedup_pool.py [records] [latency]
+"""
+__author__ = "Jeremy Nelson"
+
+import os
+import sys
+import time
+
+sys.path.append(os.path.abspath(
+    os.path.join(os.path.dirname(__file__), os.pardir)))
+
+from bibcat.linkers.deduplicate import Deduplicator, DeduplicatePool
+from bench_dedup_batch import BASE_URL, BF, existing_store, records
+from fake_sparql import FakeSPARQLServer
+
+
+def entities(graphs):
+    return [sorted(graph.subjects(predicate=BF.contribution))
+            + sorted(graph.objects(predicate=BF.contribution))
+            + sorted(graph.objects(predicate=BF.subject))
+            for graph in graphs]
+
+
+def main(size=1000, latency=0.3):
+    server = FakeSPARQLServer(existing_store(), latency=latency)
+    server.start()
+
+    def deduplicator():
+        return Deduplicator(triplestore_url=server.url,
+                            base_url=BASE_URL,
+                            classes=[BF.Person, BF.Topic],
+                            batch_size=25)
+
+    serial = records(size)
+    start = time.time()
+    serial_dedup = deduplicator()
+    serial_dedup.run_batch(serial)
+    print("{} records, {} s latency per request".format(size, latency))
+    print("{:<12} {:>10} {:>10} {:>8} {:>14}".format(
+        "mode", "requests", "seconds", "speedup", "same as serial"))
+    baseline = time.time() - start
+    print("{:<12} {:>10} {:>10.2f} {:>8} {:>14}".format(
+        "run_batch", serial_dedup.requests, baseline, "1.00x", "-"))
+    for workers in [1, 2, 4, 8]:
+        graphs = records(size)
+        pool = DeduplicatePool(size=workers, deduplicator=deduplicator())
+        start = time.time()
+        pool.run(graphs)
+        elapsed = time.time() - start
+        print("{:<12} {:>10} {:>10.2f} {:>7.2f}x {:>14}".format(
+            "{} workers".format(workers),
+            pool.requests,
+            elapsed,
+            baseline / elapsed,
+            str(entities(graphs) == entities(serial))))
+    server.stop()
+
+
+if __name__ == '__main__':
+    args = [int(arg) for arg in sys.argv[1:2]]
+    args += [float(arg) for arg in sys.argv[2:3]]
+    main(*args)
@@ -0,0 +1,94 @@
+"""Benchmark OAI-PMH harvest throughput against a local fake repository
+
+ListRecords harvests are timed serially, with prefetching of the next
+resumption page and with prefetching plus a pool of RML mapping
+processes. Islandora datastream requests are timed with one and with
+several concurrent requests.
+
+    python benchmarks/bench_oai_pmh_harvest.py [records] [latency]
+"""
+__author__ = "Jeremy Nelson"
+
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.append(os.path.abspath(
+    os.path.join(os.path.dirname(__file__), os.pardir)))
+
+from bibcat.ingesters.oai_pmh import bounded_map, IslandoraIngester, \
+    OAIPMHIngester, NS
+from bibcat.ingesters.sinks import Sink
+from bibcat.rml.processor import XMLProcessor
+from fake_oai_pmh import FakeOAIPMHServer
+
+
+class DCIngester(OAIPMHIngester):
+    """Maps oai_dc ListRecords with bibcat's XMLProcessor"""
+
+    def __init__(self, **kwargs):
+        super(DCIngester, self).__init__(**kwargs)
+        self.processor_kwargs = dict(
+            rml_rules=["bibcat-base.ttl", "oai-pmh-dc-xml-to-bf.ttl"],
+            base_url="http://bibcat.org/",
+            namespaces=NS)
+        self.processor = XMLProcessor(**self.processor_kwargs)
+
+
+def time_records(server, **kwargs):
+    ingester = DCIngester(repository=server.url, sink=Sink(), **kwargs)
+    start = time.time()
+    count = ingester.__harvest_records__(
+        instance_iri="http://bibcat.org/instance")
+    return count, time.time() - start, ingester.sink.triples
+
+
+def time_datastreams(server, max_requests):
+    ingester = OAIPMHIngester(repository=server.url,
+                              max_requests=max_requests)
+    base_url = server.url.replace("oai2", "")
+    item_urls = ["{}islandora/object/test:{}/".format(base_url, i)
+                 for i in range(server.records)]
+    start = time.time()
+    with ThreadPoolExecutor(max_workers=max_requests) as fetcher:
+        for result in bounded_map(
+                fetcher,
+                lambda url: IslandoraIngester.__fetch_datastreams__(
+                    ingester, url),
+                item_urls,
+                max_requests * 2):
+            pass
+    return time.time() - start
+
+
+def main(records=1000, latency=0.05):
+    server = FakeOAIPMHServer(records=records, latency=latency)
+    server.start()
+    print("{} records, {} s latency per request".format(records, latency))
+    print("{:<32} {:>10} {:>12} {:>10}".format(
+        "ListRecords", "seconds", "records/s", "triples"))
+    for name, kwargs in [("serial", dict(prefetch=False)),
+                         ("prefetch", dict(prefetch=True)),
+                         ("prefetch, 4 mapping workers",
+                          dict(prefetch=True, workers=4))]:
+        count, elapsed, triples = time_records(server, **kwargs)
+        print("{:<32} {:>10.2f} {:>12.0f} {:>10}".format(
+            name, elapsed, count / elapsed, triples))
+    datastreams = min(records, 200)
+    server.records = datastreams
+    print("\n{:<32} {:>10} {:>12}".format(
+        "Datastreams", "seconds", "items/s"))
+    for max_requests in [1, 4, 8]:
+        elapsed = time_datastreams(server, max_requests)
+        print("{:<32} {:>10.2f} {:>12.0f}".format(
+            "max_requests={}".format(max_requests),
+            elapsed,
+            datastreams / elapsed))
+    server.stop()
+
+
+if __name__ == '__main__':
+    args = [int(arg) for arg in sys.argv[1:2]]
+    args += [float(arg) for arg in sys.argv[2:3]]
+    main(*args)
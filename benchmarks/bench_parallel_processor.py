@@ -0,0 +1,84 @@
+"""Scaling benchmark of ParallelProcessor with 1, 2, 4 and 8 workers on
+copies of the fixure MODS record
+
+Each run is compared to a serial XMLProcessor.run loop over the same
+records, speedup is the serial time divided by the parallel time.
+
+    python benchmarks/bench_parallel_processor.py [records] [chunk_size]
+"""
+__author__ = "Jeremy Nelson"
+
+import os
+import sys
+import time
+
+from lxml import etree
+
+sys.path.append(os.path.abspath(
+    os.path.join(os.path.dirname(__file__), os.pardir)))
+
+from bibcat.rml.parallel import ParallelProcessor
+from bibcat.rml.processor import XMLProcessor
+
+FIXURES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                            "fixures")
+PROCESSOR_KWARGS = {
+    "rml_rules": ["bibcat-base.ttl", "mods-to-bf.ttl"],
+    "namespaces": {"mods": "http://www.loc.gov/mods/v3",
+                   "xlink": "http://www.w3.org/1999/xlink"}}
+RUN_KWARGS = {"item_iri": "http://bibcat.org/item",
+              "work_iri": "http://bibcat.org/work"}
+
+
+def instance_kwargs(record):
+    return {"instance_iri": "http://bibcat.org/instance/{}".format(
+        record.get("ID"))}
+
+
+def records(size):
+    record = etree.parse(os.path.join(FIXURES_PATH, "mods-record.xml"))
+    output = []
+    for i in range(size):
+        copy = etree.XML(etree.tostring(record))
+        copy.set("ID", str(i))
+        output.append(copy)
+    return output
+
+
+def main(size=2000, chunk_size=50):
+    mods = records(size)
+    processor = XMLProcessor(**PROCESSOR_KWARGS)
+    start = time.time()
+    triples = 0
+    for record in mods:
+        processor.run(record, **dict(RUN_KWARGS, **instance_kwargs(record)))
+        triples += len(processor.output)
+    baseline = time.time() - start
+    print("{} records, {} CPUs, chunk size {}".format(
+        size, os.cpu_count(), chunk_size))
+    print("{:<12} {:>10} {:>10} {:>12} {:>8}".format(
+        "mode", "triples", "seconds", "records/s", "speedup"))
+    print("{:<12} {:>10} {:>10.2f} {:>12.0f} {:>8}".format(
+        "serial", triples, baseline, size / baseline, "1.00x"))
+    for workers in [1, 2, 4, 8]:
+        parallel = ParallelProcessor(XMLProcessor,
+                                     PROCESSOR_KWARGS,
+                                     workers=workers,
+                                     chunk_size=chunk_size)
+        start = time.time()
+        triples = sum([raw_nt.count(b"\n")
+                       for index, raw_nt in parallel.map(
+                           mods,
+                           record_kwargs=instance_kwargs,
+                           **RUN_KWARGS)])
+        elapsed = time.time() - start
+        print("{:<12} {:>10} {:>10.2f} {:>12.0f} {:>7.2f}x".format(
+            "{} workers".format(workers),
+            triples,
+            elapsed,
+            size / elapsed,
+            baseline / elapsed))
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:3]])
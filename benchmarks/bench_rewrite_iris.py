@@ -0,0 +1,87 @@
+"""Benchmark per-entity replace_iri graph surgery, one remove and add per
+triple while walking the live graph, against a bulk rewrite_iris of the
+same old to new IRI mapping, in place or into a new graph
+
+Each rewritten entity is a blank node with a type, a label and two
+incoming links, as left by an ingester before deduplication.
+
+    python benchmarks/bench_rewrite_iris.py [rewrites ...]
+"""
+__author__ = "Jeremy Nelson"
+
+import os
+import sys
+import time
+
+import rdflib
+
+sys.path.append(os.path.abspath(
+    os.path.join(os.path.dirname(__file__), os.pardir)))
+
+from bibcat import rewrite_iris
+
+BF = rdflib.Namespace("http://id.loc.gov/ontologies/bibframe/")
+BASE_URL = "http://bibcat.org/"
+
+
+def entity_graph(size):
+    graph, mapping = rdflib.Graph(), dict()
+    for i in range(size):
+        instance = rdflib.URIRef("{}instance/{}".format(BASE_URL, i // 5))
+        work = rdflib.URIRef("{}work/{}".format(BASE_URL, i // 5))
+        agent = rdflib.BNode()
+        graph.add((instance, BF.contribution, agent))
+        graph.add((work, BF.contribution, agent))
+        graph.add((agent, rdflib.RDF.type, BF.Person))
+        graph.add((agent, rdflib.RDFS.label,
+                   rdflib.Literal("Person {}".format(i))))
+        mapping[agent] = rdflib.URIRef("{}person/{}".format(BASE_URL, i))
+    return graph, mapping
+
+
+def replace_iri(graph, old_iri, new_iri):
+    """replace_iri before rewrite_iris"""
+    for pred, obj in graph.predicate_objects(subject=old_iri):
+        graph.add((new_iri, pred, obj))
+        graph.remove((old_iri, pred, obj))
+    for subj, pred in graph.subject_predicates(object=old_iri):
+        graph.add((subj, pred, new_iri))
+        graph.remove((subj, pred, old_iri))
+
+
+def per_entity(graph, mapping):
+    for old_iri, new_iri in mapping.items():
+        replace_iri(graph, old_iri, new_iri)
+    return graph
+
+
+def bulk_in_place(graph, mapping):
+    return rewrite_iris(graph, mapping, in_place=True)
+
+
+def bulk_new_graph(graph, mapping):
+    return rewrite_iris(graph, mapping)
+
+
+def main(sizes):
+    print("{:<16} {:>10} {:>10} {:>10} {:>8}".format(
+        "mode", "rewrites", "triples", "seconds", "speedup"))
+    for size in sizes:
+        expected, baseline = None, None
+        for name, func in [("replace_iri", per_entity),
+                           ("bulk in place", bulk_in_place),
+                           ("bulk new graph", bulk_new_graph)]:
+            graph, mapping = entity_graph(size)
+            start = time.time()
+            output = func(graph, mapping)
+            elapsed = time.time() - start
+            triples = set(output)
+            if expected is None:
+                expected, baseline = triples, elapsed
+            assert triples == expected, name
+            print("{:<16} {:>10} {:>10} {:>10.2f} {:>7.2f}x".format(
+                name, size, len(output), elapsed, baseline / elapsed))
+
+
+if __name__ == '__main__':
+    main([int(arg) for arg in sys.argv[1:]] or [1000, 10000, 100000])
@@ -0,0 +1,113 @@
+"""Micro-benchmark of per-record mapping time with compiled and uncompiled
+XPath and JSONPath expressions
+
+The uncompiled runs clear the compiled_iterator and compiled_reference
+attributes on the triple maps so every expression is parsed on every
+record, as the processors did before expressions were compiled.
+
+    python benchmarks/bench_rml_expressions.py [records]
+"""
+__author__ = "Jeremy Nelson"
+
+import os
+import sys
+import timeit
+import uuid
+
+import rdflib
+from lxml import etree
+
+sys.path.append(os.path.abspath(
+    os.path.join(os.path.dirname(__file__), os.pardir)))
+
+from bibcat.rml.processor import JSONProcessor, XMLProcessor
+
+FIXURES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                            "fixures")
+
+JSON_RML = """@prefix bf: <http://id.loc.gov/ontologies/bibframe/> .
+@prefix ql: <http://semweb.mmlab.be/ns/ql#> .
+@prefix rdfs: <http://www.w3.org/2000/01/rdf-schema#> .
+@prefix rml: <http://semweb.mmlab.be/ns/rml#> .
+@prefix rr: <http://www.w3.org/ns/r2rml#> .
+
+<#Instance> a rr:TriplesMap ;
+    rml:logicalSource [
+        rml:referenceFormulation ql:JSONPath ;
+        rml:iterator "$.records"
+    ] ;
+    rr:subjectMap [
+        rr:template "{instance_iri}" ;
+        rr:class bf:Instance
+    ] ;
+    rr:predicateObjectMap [
+        rr:predicate rdfs:label ;
+        rr:objectMap [ rr:reference "title" ]
+    ] ;
+    rr:predicateObjectMap [
+        rr:predicate bf:subject ;
+        rr:objectMap [ rr:reference "subjects[*]" ]
+    ] ;
+    rr:predicateObjectMap [
+        rr:predicate bf:identifiedBy ;
+        rr:objectMap [ rr:reference "url" ]
+    ] .
+"""
+
+JSON_RECORD = {"records": [
+    {"title": "Arthur J. Kew and Ida Rosalie Fursman",
+     "subjects": ["Courtship", "Colorado Springs", "Letters"],
+     "url": "http://example.edu/1234"}]}
+
+
+def uncompile(processor):
+    """Removes compiled expressions from the processor's triple maps"""
+    for triple_map in processor.triple_maps.values():
+        if triple_map.logicalSource is not None:
+            triple_map.logicalSource.compiled_iterator = None
+        for term_map in triple_map.predicateObjectMap + \
+                [triple_map.subjectMap]:
+            if term_map is not None:
+                term_map.compiled_reference = None
+
+
+def time_records(processor, run, records):
+    return min(timeit.repeat(run, number=records, repeat=3)) / records
+
+
+def main(records=200):
+    mods = etree.parse(os.path.join(FIXURES_PATH, "mods-record.xml"))
+    mods_processor = XMLProcessor(
+        rml_rules=["bibcat-base.ttl", "mods-to-bf.ttl"],
+        base_url="http://bibcat.org/",
+        institution_iri="http://bibcat.org/institution",
+        namespaces={"mods": "http://www.loc.gov/mods/v3",
+                    "xlink": "http://www.w3.org/1999/xlink"})
+
+    def run_mods():
+        mods_processor.run(mods.getroot(),
+                           instance_iri="http://bibcat.org/instance",
+                           item_iri="http://bibcat.org/item",
+                           work_iri="http://bibcat.org/work",
+                           id=uuid.uuid1)
+
+    json_processor = JSONProcessor(
+        rml_rules=rdflib.Graph().parse(data=JSON_RML, format="turtle"))
+
+    def run_json():
+        json_processor.run(JSON_RECORD,
+                           instance_iri="http://bibcat.org/instance")
+
+    print("{:<10} {:>14} {:>14} {:>8}".format(
+        "source", "compiled ms", "parsed ms", "speedup"))
+    for name, processor, run in [("MODS", mods_processor, run_mods),
+                                 ("JSON", json_processor, run_json)]:
+        compiled = time_records(processor, run, records)
+        uncompile(processor)
+        parsed = time_records(processor, run, records)
+        print("{:<10} {:>14.3f} {:>14.3f} {:>7.2f}x".format(
+            name, compiled * 1000, parsed * 1000, parsed / compiled))
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:2]])
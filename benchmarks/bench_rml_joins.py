@@ -0,0 +1,76 @@
+"""Benchmark of the parent triple map join cache with mods-to-bf.ttl
+
+Counts the execute calls and triples for the fixure MODS record and for
+the record with extra creator names, mapped with join_cache=0, which
+executes a parent triple map for every reference to it, and with the
+default join cache.
+
+    python benchmarks/bench_rml_joins.py [records] [creators]
+"""
+__author__ = "Jeremy Nelson"
+
+import os
+import sys
+import time
+
+from lxml import etree
+
+sys.path.append(os.path.abspath(
+    os.path.join(os.path.dirname(__file__), os.pardir)))
+
+from bibcat.rml.processor import XMLProcessor
+from bench_triple_buffer import FIXURES, RUN_KWARGS
+
+MODS_NS = "http://www.loc.gov/mods/v3"
+
+
+def with_creators(record, creators):
+    """Returns a copy of record with creators more personal names"""
+    record = etree.XML(etree.tostring(record))
+    for i in range(creators):
+        name = etree.SubElement(record, "{%s}name" % MODS_NS, type="personal")
+        etree.SubElement(name, "{%s}namePart" % MODS_NS).text = \
+            "Creator {}".format(i)
+        role = etree.SubElement(name, "{%s}role" % MODS_NS)
+        etree.SubElement(role, "{%s}roleTerm" % MODS_NS).text = "creator"
+    return record
+
+
+def main(size=500, creators=10):
+    name, processor_kwargs, record = FIXURES[0]
+    record = record()
+    print("{} records of each, mods-to-bf.ttl".format(size))
+    print("{:<22} {:<12} {:>14} {:>8} {:>10} {:>8}".format(
+        "record", "join cache", "executes/rec", "triples", "seconds",
+        "speedup"))
+    for label, mods in [("MODS fixure", record),
+                        ("+{} creators".format(creators),
+                         with_creators(record, creators))]:
+        baseline = None
+        for join_cache in [0, 1000]:
+            processor = XMLProcessor(triple_buffer=True,
+                                     join_cache=join_cache,
+                                     **processor_kwargs)
+            calls = []
+            execute = processor.execute
+
+            def counted_execute(triple_map, **kwargs):
+                calls.append(1)
+                return execute(triple_map, **kwargs)
+            processor.execute = counted_execute
+            start = time.time()
+            for i in range(size):
+                processor.run(mods, **RUN_KWARGS)
+            elapsed = time.time() - start
+            baseline = baseline or elapsed
+            print("{:<22} {:<12} {:>14} {:>8} {:>10.2f} {:>7.2f}x".format(
+                label,
+                "off" if join_cache < 1 else "on",
+                len(calls) // size,
+                len(processor.output),
+                elapsed,
+                baseline / elapsed))
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:3]])
@@ -0,0 +1,60 @@
+"""Benchmark cold and warm construction of RML Processors for every map
+shipped in bibcat/maps
+
+Cold construction parses the Turtle and builds the rule plan from the
+RML graph, warm construction loads the plan from the on-disk cache.
+
+    python benchmarks/bench_rml_plan_cache.py [repeat]
+"""
+__author__ = "Jeremy Nelson"
+
+import os
+import sys
+import tempfile
+import timeit
+
+sys.path.append(os.path.abspath(
+    os.path.join(os.path.dirname(__file__), os.pardir)))
+
+from bibcat.rml.cache import RulePlanCache
+from bibcat.rml.processor import Processor
+
+MAPS_PATH = os.path.abspath(
+    os.path.join(os.path.dirname(__file__), os.pardir, "bibcat", "maps"))
+
+
+def main(repeat=5):
+    cache_dir = tempfile.mkdtemp(prefix="bibcat-rml-plans-")
+    print("{:<28} {:>6} {:>10} {:>10} {:>8}".format(
+        "map", "maps", "cold ms", "warm ms", "speedup"))
+    for name in sorted(os.listdir(MAPS_PATH)):
+        if not name.endswith(".ttl"):
+            continue
+        rules = ["bibcat-base.ttl", name]
+        try:
+            processor = Processor(rules, rule_cache=False)
+        except Exception as error:
+            print("{:<28} skipped, {}".format(name, error))
+            continue
+        cold = min(timeit.repeat(
+            lambda: Processor(rules, rule_cache=False),
+            number=1,
+            repeat=repeat))
+        Processor(rules, rule_cache=RulePlanCache(cache_dir))
+        # New cache instance for each run so plans are read from disk
+        warm = min(timeit.repeat(
+            lambda: Processor(rules, rule_cache=RulePlanCache(cache_dir)),
+            number=1,
+            repeat=repeat))
+        print("{:<28} {:>6} {:>10.2f} {:>10.2f} {:>7.1f}x".format(
+            name,
+            len(processor.triple_maps),
+            cold * 1000,
+            warm * 1000,
+            cold / warm))
+    RulePlanCache(cache_dir).clear()
+    os.rmdir(cache_dir)
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:2]])
@@ -0,0 +1,57 @@
+"""Benchmark of compiled rr:template functions against formatting each
+template with all of the run's keywords and constants, mapping the
+fixure MODS record with mods-to-bf.ttl
+
+Records are run with an id keyword of uuid.uuid1, like the MODS
+ingester's run, and the number of UUIDs generated is counted.
+
+    python benchmarks/bench_rml_templates.py [records]
+"""
+__author__ = "Jeremy Nelson"
+
+import os
+import sys
+import time
+import uuid
+
+sys.path.append(os.path.abspath(
+    os.path.join(os.path.dirname(__file__), os.pardir)))
+
+from bibcat.rml.processor import XMLProcessor
+from bench_triple_buffer import FIXURES
+
+
+def main(size=1000):
+    name, processor_kwargs, record = FIXURES[0]
+    record = record()
+    print("{} MODS records".format(size))
+    print("{:<20} {:>10} {:>12} {:>8} {:>12}".format(
+        "templates", "seconds", "records/s", "speedup", "UUIDs"))
+    baseline = None
+    for label in ["format all keywords", "compiled"]:
+        processor = XMLProcessor(triple_buffer=True, **processor_kwargs)
+        if label != "compiled":
+            for triple_map in processor.triple_maps.values():
+                for term_map in triple_map.predicateObjectMap + \
+                        [triple_map.subjectMap]:
+                    term_map.compiled_template = None
+        uuids = []
+
+        def new_id():
+            uuids.append(1)
+            return uuid.uuid1()
+        start = time.time()
+        for i in range(size):
+            processor.run(record,
+                          instance_iri="http://bibcat.org/instance",
+                          item_iri="http://bibcat.org/item",
+                          work_iri="http://bibcat.org/work",
+                          id=new_id)
+        elapsed = time.time() - start
+        baseline = baseline or elapsed
+        print("{:<20} {:>10.2f} {:>12.0f} {:>7.2f}x {:>12}".format(
+            label, elapsed, size / elapsed, baseline / elapsed, len(uuids)))
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:2]])
@@ -0,0 +1,107 @@
+"""Benchmark SPARQLBatchProcessor with bf-batch-to-schema.ttl, one
+compound UNION query for every batch of Instances, against the
+SPARQLProcessor, one query for every Instance and predicate
+
+A BIBFRAME store of Instances, each with a label, a summary, two authors,
+a contributor and two publication dates, is generated in a local fake
+SPARQL endpoint that delays every request by the latency. The
+SPARQLProcessor is run on the first per_entity Instances of the store,
+its requests and time per Instance are scaled to the whole store.
+
+rdflib evaluates the contribution patterns by scanning every
+contribution in the store for each Instance, so the fake endpoint's time
+grows with the square of the store size, i.e. 100000 Instances is
+impractical here and only the requests per Instance carry over to a
+Blazegraph store of that size.
+
+    python benchmarks/bench_sparql_batch_processor.py [instances] [batch]
+        [per_entity] [latency_ms]
+"""
+__author__ = "Jeremy Nelson"
+
+import os
+import sys
+import time
+
+import rdflib
+
+sys.path.append(os.path.abspath(
+    os.path.join(os.path.dirname(__file__), os.pardir)))
+
+from bibcat.rml.processor import SPARQLBatchProcessor, SPARQLProcessor
+from fake_sparql import FakeSPARQLServer
+
+BF = rdflib.Namespace("http://id.loc.gov/ontologies/bibframe/")
+RELATORS = rdflib.Namespace("http://id.loc.gov/vocabulary/relators/")
+RULES = ["bf-batch-to-schema.ttl"]
+
+
+def bibframe_store(size):
+    graph = rdflib.Graph()
+    for i in range(size):
+        instance = rdflib.URIRef("http://bibcat.org/instance/{}".format(i))
+        work = rdflib.URIRef("http://bibcat.org/work/{}".format(i))
+        graph.add((instance, rdflib.RDF.type, BF.Instance))
+        graph.add((instance, BF.instanceOf, work))
+        graph.add((instance, rdflib.RDFS.label,
+                   rdflib.Literal("Title {}".format(i))))
+        summary = rdflib.BNode()
+        graph.add((work, BF.summary, summary))
+        graph.add((summary, rdflib.RDFS.label,
+                   rdflib.Literal("Summary {}".format(i))))
+        for j, role in enumerate([RELATORS.aut, RELATORS.aut, RELATORS.ctb]):
+            contribution, agent = rdflib.BNode(), rdflib.BNode()
+            graph.add((work, BF.contribution, contribution))
+            graph.add((contribution, BF.role, role))
+            graph.add((contribution, BF.agent, agent))
+            graph.add((agent, rdflib.RDFS.label,
+                       rdflib.Literal("Agent {}".format((i + j) % 500))))
+        for year in [1900 + i % 100, 2000 + i % 20]:
+            activity = rdflib.BNode()
+            graph.add((instance, BF.provisionActivity, activity))
+            graph.add((activity, rdflib.RDF.type, BF.Publication))
+            graph.add((activity, BF.date, rdflib.Literal(str(year))))
+    return graph
+
+
+def report(name, instances, requests, elapsed, triples, size):
+    row = "{:<22} {:>9} {:>9} {:>9.1f} {:>9.3f} {:>9} {:>9.3f} {:>9.0f}"
+    print(row.format(
+        name, instances, requests, elapsed, elapsed / instances, triples,
+        requests / instances, requests * size / instances))
+
+
+def main(size=500, batch=250, per_entity=50, latency_ms=2):
+    start = time.time()
+    server = FakeSPARQLServer(bibframe_store(size),
+                              latency=latency_ms / 1000.0)
+    server.start()
+    print("{} instances, {} triples, generated in {:.1f} s, {} ms "
+          "latency".format(size, len(server.graph), time.time() - start,
+                           latency_ms))
+    print("{:<22} {:>9} {:>9} {:>9} {:>9} {:>9} {:>9} {:>9}".format(
+        "processor", "instances", "requests", "seconds", "s/inst",
+        "triples", "req/inst", "req total"))
+
+    processor = SPARQLProcessor(rml_rules=RULES,
+                                triplestore_url=server.url)
+    server.requests = 0
+    start = time.time()
+    processor.run(limit=per_entity, offset=0)
+    report("SPARQLProcessor", per_entity, server.requests,
+           time.time() - start, len(processor.output), size)
+
+    batch_processor = SPARQLBatchProcessor(RULES,
+                                           triplestore_url=server.url,
+                                           triple_buffer=True,
+                                           batch_size=batch)
+    server.requests = 0
+    start = time.time()
+    batch_processor.run(limit=size, offset=0)
+    report("SPARQLBatchProcessor", size, server.requests,
+           time.time() - start, len(batch_processor.output), size)
+    server.stop()
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:5]])
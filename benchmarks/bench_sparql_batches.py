@@ -0,0 +1,88 @@
+"""Benchmark SPARQLProcessor round-trips per predicate object map query,
+one query for every entity against one VALUES query for a batch of
+entities
+
+BIBFRAME Instances in a local fake SPARQL endpoint are converted to
+schema.org with fixures/sparql-to-schema.ttl, every request is delayed by
+the latency to stand in for a remote Blazegraph.
+
+    python benchmarks/bench_sparql_batches.py [instances] [latency_ms]
+"""
+__author__ = "Jeremy Nelson"
+
+import os
+import sys
+import time
+
+import rdflib
+
+sys.path.append(os.path.abspath(
+    os.path.join(os.path.dirname(__file__), os.pardir)))
+
+from bibcat.rml.processor import SPARQLProcessor
+from fake_sparql import FakeSPARQLServer
+
+BF = rdflib.Namespace("http://id.loc.gov/ontologies/bibframe/")
+RELATORS = rdflib.Namespace("http://id.loc.gov/vocabulary/relators/")
+FIXURES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                            "fixures")
+
+
+def bibframe_store(size):
+    graph = rdflib.Graph()
+    for i in range(size):
+        instance = rdflib.URIRef("http://bibcat.org/instance/{}".format(i))
+        work = rdflib.URIRef("http://bibcat.org/work/{}".format(i))
+        graph.add((instance, rdflib.RDF.type, BF.Instance))
+        graph.add((instance, BF.instanceOf, work))
+        title = rdflib.BNode()
+        graph.add((instance, BF.title, title))
+        graph.add((title, BF.mainTitle, rdflib.Literal("Title {}".format(i))))
+        contribution, agent = rdflib.BNode(), rdflib.BNode()
+        graph.add((work, BF.contribution, contribution))
+        graph.add((contribution, BF.role, RELATORS.aut))
+        graph.add((contribution, BF.agent, agent))
+        graph.add((agent, rdflib.RDFS.label,
+                   rdflib.Literal("Author {}".format(i % 50))))
+        activity = rdflib.BNode()
+        graph.add((instance, BF.provisionActivity, activity))
+        graph.add((activity, rdflib.RDF.type, BF.Publication))
+        graph.add((activity, BF.date, rdflib.Literal(str(1900 + i % 100))))
+        for j in range(2):
+            subject = rdflib.BNode()
+            graph.add((work, BF.subject, subject))
+            graph.add((subject, rdflib.RDFS.label,
+                       rdflib.Literal("Topic {}".format((i + j) % 30))))
+        graph.add((instance, BF.provisionActivityStatement,
+                   rdflib.Literal("Publisher {}".format(i % 10))))
+    return graph
+
+
+def main(size=200, latency_ms=2):
+    server = FakeSPARQLServer(bibframe_store(size),
+                              latency=latency_ms / 1000.0)
+    server.start()
+    print("{} instances, {} ms latency per request".format(size, latency_ms))
+    print("{:<12} {:>10} {:>10} {:>10} {:>10}".format(
+        "batch_size", "requests", "seconds", "triples", "same"))
+    serial = None
+    for batch_size in [None, 10, 50, 200]:
+        processor = SPARQLProcessor(
+            rml_rules=os.path.join(FIXURES_PATH, "sparql-to-schema.ttl"),
+            triplestore_url=server.url,
+            batch_size=batch_size)
+        server.requests = 0
+        start = time.time()
+        processor.run()
+        elapsed = time.time() - start
+        triples = set(processor.output)
+        if serial is None:
+            serial = triples
+        print("{:<12} {:>10} {:>10.2f} {:>10} {:>10}".format(
+            str(batch_size), server.requests, elapsed, len(triples),
+            str(triples == serial)))
+    server.stop()
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:3]])
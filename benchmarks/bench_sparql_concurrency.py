@@ -0,0 +1,56 @@
+"""Benchmark SPARQLProcessor with predicate object map queries sent to the
+triplestore one at a time against max_requests queries in flight at once
+
+BIBFRAME Instances in a local fake SPARQL endpoint are converted to
+schema.org with fixures/sparql-to-schema.ttl, every request is delayed by
+the latency to stand in for a remote Blazegraph. The fake endpoint
+evaluates one query at a time, only the latency overlaps.
+
+    python benchmarks/bench_sparql_concurrency.py [instances] [latency_ms]
+"""
+__author__ = "Jeremy Nelson"
+
+import os
+import sys
+import time
+
+sys.path.append(os.path.abspath(
+    os.path.join(os.path.dirname(__file__), os.pardir)))
+
+from bibcat.rml.processor import SPARQLProcessor
+from bench_sparql_batches import bibframe_store, FIXURES_PATH
+from fake_sparql import FakeSPARQLServer
+
+
+def main(size=200, latency_ms=20):
+    server = FakeSPARQLServer(bibframe_store(size),
+                              latency=latency_ms / 1000.0)
+    server.start()
+    print("{} instances, {} ms latency per request".format(size, latency_ms))
+    print("{:<12} {:<12} {:>10} {:>10} {:>10} {:>10}".format(
+        "batch_size", "max_requests", "requests", "seconds", "triples",
+        "same"))
+    for batch_size in [None, 50]:
+        serial = None
+        for max_requests in [1, 4, 8, 16]:
+            processor = SPARQLProcessor(
+                rml_rules=os.path.join(FIXURES_PATH, "sparql-to-schema.ttl"),
+                triplestore_url=server.url,
+                batch_size=batch_size,
+                max_requests=max_requests)
+            server.requests = 0
+            start = time.time()
+            processor.run()
+            elapsed = time.time() - start
+            # Same triples in the same order as one request at a time
+            triples = list(processor.output)
+            if serial is None:
+                serial = triples
+            print("{:<12} {:<12} {:>10} {:>10.2f} {:>10} {:>10}".format(
+                str(batch_size), max_requests, server.requests, elapsed,
+                len(triples), str(triples == serial)))
+    server.stop()
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:3]])
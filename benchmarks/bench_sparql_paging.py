@@ -0,0 +1,114 @@
+"""Benchmark exporting a whole store with SPARQLProcessor, one page of
+SPARQL JSON results loaded whole against LIMIT/OFFSET pages of SPARQL
+TSV results parsed a line at a time
+
+Instances in a local fake SPARQL endpoint are mapped with
+fixures/sparql-instances.ttl, the logical source binds the label that is
+mapped to schema:name so every binding is read from the results. The
+peak traced memory, output included, shows whether the results of a
+page or of the whole store are held at once.
+
+    python benchmarks/bench_sparql_paging.py [instances] [page]
+"""
+__author__ = "Jeremy Nelson"
+
+import multiprocessing
+import os
+import sys
+import time
+import tracemalloc
+
+import rdflib
+
+sys.path.append(os.path.abspath(
+    os.path.join(os.path.dirname(__file__), os.pardir)))
+
+import bibcat.rml.processor as processor
+from bibcat.rml.processor import SPARQLProcessor
+from fake_sparql import FakeSPARQLServer
+
+BF = rdflib.Namespace("http://id.loc.gov/ontologies/bibframe/")
+FIXURES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                            "fixures")
+JSON_ACCEPT = "application/sparql-results+json"
+
+
+def bibframe_store(size):
+    graph = rdflib.Graph()
+    for i in range(size):
+        instance = rdflib.URIRef("http://bibcat.org/instance/{}".format(i))
+        graph.add((instance, rdflib.RDF.type, BF.Instance))
+        graph.add((instance, rdflib.RDFS.label, rdflib.Literal(
+            "Title {} of a long series of BIBFRAME Instances".format(i))))
+    return graph
+
+
+def export(server, size, page):
+    """Maps the whole store with and without paging"""
+    print("{:<26} {:>9} {:>9} {:>9}".format(
+        "export", "exported", "requests", "seconds"))
+    for mode, limit, paging in [("one page, default limit", None, False),
+                                ("LIMIT/OFFSET pages", page, True)]:
+        sparql = SPARQLProcessor(
+            rml_rules=os.path.join(FIXURES_PATH, "sparql-instances.ttl"),
+            triplestore_url=server.url,
+            triple_buffer=True,
+            paging=paging)
+        kwargs = {}
+        if limit is not None:
+            kwargs["limit"] = limit
+        server.requests = 0
+        start = time.time()
+        sparql.run(**kwargs)
+        print("{:<26} {:>9} {:>9} {:>9.1f}".format(
+            mode, len(sparql.output.subjects), server.requests,
+            time.time() - start))
+
+
+def parse(server, size):
+    """Reads every binding of the whole store's results without keeping
+    them, the endpoint runs in a child process so the peak traced memory
+    is what the parser holds at once"""
+    child = multiprocessing.get_context("fork").Process(
+        target=server.httpd.serve_forever,
+        daemon=True)
+    child.start()
+    print("{:<26} {:>9} {:>9} {:>9}".format(
+        "results of {} rows".format(size), "bindings", "seconds",
+        "peak MB"))
+    tsv_accept = processor.RESULTS_ACCEPT
+    sparql = SPARQLProcessor(
+        rml_rules=os.path.join(FIXURES_PATH, "sparql-instances.ttl"),
+        triplestore_url=server.url)
+    query = processor.PREFIX + """SELECT ?instance ?label
+WHERE { ?instance rdf:type bf:Instance ; rdfs:label ?label . }"""
+    for mode, accept in [("SPARQL JSON", JSON_ACCEPT),
+                         ("SPARQL TSV", tsv_accept)]:
+        processor.RESULTS_ACCEPT = accept
+        sparql.terms.clear()
+        tracemalloc.start()
+        start = time.time()
+        count = 0
+        for binding in sparql.__get_bindings__(query, "json"):
+            count += 1
+        elapsed = time.time() - start
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        print("{:<26} {:>9} {:>9.1f} {:>9.1f}".format(
+            mode, count, elapsed, peak / 2**20))
+    processor.RESULTS_ACCEPT = tsv_accept
+    child.terminate()
+
+
+def main(size=20000, page=5000):
+    graph = bibframe_store(size)
+    print("{} instances".format(size))
+    server = FakeSPARQLServer(graph)
+    server.start()
+    export(server, size, page)
+    server.stop()
+    parse(FakeSPARQLServer(graph), size)
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:3]])
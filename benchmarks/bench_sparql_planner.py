@@ -0,0 +1,135 @@
+"""Benchmark SPARQLProcessor converting LOC BIBFRAME records in a local
+rdflib Graph to lean BIBFRAME with loc-bf-to-lean-bf.ttl, every rml:query
+evaluated by rdflib's SPARQL engine against simple templates planned as
+Graph.triples() index lookups
+
+The records are generated with the Instance, Work and Item shapes of the
+LOC marc2bibframe2 conversion that the map reads. The map's _:{contribution}
+queries match every contribution in the store, so its output, and time,
+grow with the square of the records either way.
+
+    python benchmarks/bench_sparql_planner.py [records]
+"""
+__author__ = "Jeremy Nelson"
+
+import os
+import sys
+import time
+
+import rdflib
+from rdflib.compare import isomorphic
+
+sys.path.append(os.path.abspath(
+    os.path.join(os.path.dirname(__file__), os.pardir)))
+
+from bibcat.rml.processor import SPARQLProcessor
+
+BF = rdflib.Namespace("http://id.loc.gov/ontologies/bibframe/")
+LOC = rdflib.Namespace("http://id.loc.gov/vocabulary/")
+RULES = ["loc-bf-to-lean-bf.ttl"]
+
+
+def loc_bibframe_store(size):
+    graph = rdflib.Graph()
+
+    def node(subject, predicate, class_=None, label=None, object_=None):
+        object_ = object_ or rdflib.BNode()
+        graph.add((subject, predicate, object_))
+        if class_ is not None:
+            graph.add((object_, rdflib.RDF.type, class_))
+        if label is not None:
+            graph.add((object_, rdflib.RDFS.label, rdflib.Literal(label)))
+        return object_
+
+    for i in range(size):
+        instance = rdflib.URIRef(
+            "http://bibcat.org/loc/{}#Instance".format(i))
+        work = rdflib.URIRef("http://bibcat.org/loc/{}#Work".format(i))
+        item = rdflib.URIRef("http://bibcat.org/loc/{}#Item".format(i))
+        graph.add((instance, rdflib.RDF.type, BF.Instance))
+        graph.add((instance, rdflib.RDF.type, BF.Print))
+        graph.add((instance, rdflib.RDFS.label,
+                   rdflib.Literal("Record {}".format(i))))
+        graph.add((instance, BF.instanceOf, work))
+        graph.add((instance, BF.dimensions, rdflib.Literal("24 cm")))
+        graph.add((instance, BF.carrier, LOC["carriers/nc"]))
+        graph.add((instance, BF.issuance, LOC["issuance/mono"]))
+        graph.add((instance, BF.responsibilityStatement,
+                   rdflib.Literal("by Author {}".format(i % 500))))
+        graph.add((instance, BF.provisionActivityStatement,
+                   rdflib.Literal("New York : Publisher {}".format(i % 50))))
+        title = node(instance, BF.title, BF.Title, "Title {}".format(i))
+        graph.add((title, BF.mainTitle, rdflib.Literal("Title {}".format(i))))
+        if i % 3 == 0:
+            graph.add((title, BF.subtitle,
+                       rdflib.Literal("a subtitle {}".format(i))))
+        isbn = node(instance, BF.identifiedBy, BF.Isbn)
+        graph.add((isbn, rdflib.RDF.value,
+                   rdflib.Literal("97800000{:05d}".format(i))))
+        local = node(instance, BF.identifiedBy, BF.Local)
+        graph.add((local, rdflib.RDF.value,
+                   rdflib.Literal("ocm{:08d}".format(i))))
+        graph.add((local, BF.source, rdflib.URIRef("http://www.oclc.org")))
+        note = node(instance, BF.note, BF.Note, "Includes index.")
+        graph.add((note, BF.noteType, rdflib.Literal("bibliography")))
+        publication = node(instance, BF.provisionActivity, BF.Publication)
+        graph.add((publication, BF.date,
+                   rdflib.Literal(str(1900 + i % 120))))
+        node(publication, BF.place, BF.Place, "New York")
+        node(publication, BF.agent, BF.Agent,
+             "Publisher {}".format(i % 50))
+        toc = node(instance, BF.tableOfContents, BF.TableOfContents,
+                   "Chapter 1 -- Chapter 2")
+        graph.add((work, rdflib.RDF.type, BF.Work))
+        graph.add((work, rdflib.RDF.type, BF.Text))
+        contribution = node(work, BF.contribution, BF.Contribution)
+        node(contribution, BF.agent, BF.Agent, "Author {}".format(i % 500),
+             rdflib.URIRef(
+                 "http://bibcat.org/agent/{}".format(i % 500)))
+        node(contribution, BF.role, BF.Role, "author", LOC["relators/aut"])
+        summary = node(work, BF.summary, BF.Summary,
+                       "Summary of record {}".format(i))
+        node(summary, BF.source, BF.Source, "Publisher")
+        for j in range(2):
+            node(work, BF.subject, BF.Topic, "Topic {}".format((i + j) % 300),
+                 rdflib.URIRef("http://bibcat.org/topic/{}".format(
+                     (i + j) % 300)))
+        graph.add((item, rdflib.RDF.type, BF.Item))
+        graph.add((item, BF.itemOf, instance))
+        graph.add((item, BF.heldBy,
+                   rdflib.URIRef("http://bibcat.org/library")))
+        shelf_mark = node(item, BF.shelfMark, BF.ShelfMarkLcc,
+                          "PS{}.A1".format(i))
+        graph.add((shelf_mark, BF.source,
+                   rdflib.URIRef("http://id.loc.gov/vocabulary/lcc")))
+    return graph
+
+
+def main(size=50):
+    store = loc_bibframe_store(size)
+    print("{} LOC BIBFRAME records, {} triples".format(size, len(store)))
+    print("{:<14} {:>10} {:>12} {:>10} {:>10}".format(
+        "query_planner", "seconds", "records/s", "triples", "same"))
+    outputs = []
+    for query_planner in [False, True]:
+        processor = SPARQLProcessor(rml_rules=RULES,
+                                    triplestore=store,
+                                    query_planner=query_planner)
+        start = time.time()
+        processor.run(limit=size)
+        elapsed = time.time() - start
+        outputs.append(processor.output)
+        same = "-"
+        if len(outputs) > 1:
+            # Blank node ids differ between runs
+            same = str(isomorphic(outputs[0], outputs[1]))
+        print("{:<14} {:>10.2f} {:>12.1f} {:>10} {:>10}".format(
+            str(query_planner), elapsed, size / elapsed,
+            len(processor.output), same))
+    stats = processor.planner.stats()
+    print("{} rml:query templates planned, {} left to the SPARQL "
+          "engine".format(stats["planned"], stats["fallback"]))
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:2]])
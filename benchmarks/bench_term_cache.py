@@ -0,0 +1,74 @@
+"""Benchmark of the TermCache interning of URIRefs and Literals in
+XMLProcessor for the fixure MODS record and a generated oai_dc record
+
+Every record gets its own instance, item and work IRIs. The outputs of
+all records are kept, as a batch for a sink or the Deduplicator would
+be, and the number of distinct live term objects and the memory they
+retain, measured in a second pass under tracemalloc, are compared with a TermCache of size 0, which builds a new term
+for every value.
+
+    python benchmarks/bench_term_cache.py [records]
+"""
+__author__ = "Jeremy Nelson"
+
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.append(os.path.abspath(
+    os.path.join(os.path.dirname(__file__), os.pardir)))
+
+from bibcat.rml.processor import XMLProcessor
+from bibcat.rml.terms import TermCache
+from bench_triple_buffer import FIXURES
+
+
+def map_records(processor, record, size):
+    outputs = []
+    for i in range(size):
+        processor.run(record,
+                      instance_iri="http://bibcat.org/instance/{}".format(i),
+                      item_iri="http://bibcat.org/item/{}".format(i),
+                      work_iri="http://bibcat.org/work/{}".format(i),
+                      timestamp="2017-01-01T00:00:00")
+        outputs.append(processor.output)
+    return outputs
+
+
+def main(size=1000):
+    print("{} records of each fixure".format(size))
+    print("{:<6} {:<10} {:>10} {:>8} {:>12} {:>12} {:>10}".format(
+        "record", "terms", "seconds", "triples", "live terms",
+        "retained MB", "hit rate"))
+    for name, processor_kwargs, record in FIXURES:
+        record = record()
+        for label, max_size in [("uncached", 0), ("TermCache", 10000)]:
+            processor = XMLProcessor(triple_buffer=True, **processor_kwargs)
+            processor.terms = TermCache(max_size=max_size)
+            start = time.time()
+            map_records(processor, record, size)
+            elapsed = time.time() - start
+            tracemalloc.start()
+            outputs = map_records(processor, record, size)
+            retained = tracemalloc.get_traced_memory()[0]
+            tracemalloc.stop()
+            triples = sum([len(output) for output in outputs])
+            live = len(set([id(term) for output in outputs
+                            for triple in output for term in triple]))
+            stats = processor.terms.stats()
+            hits = sum([cache["hits"] for cache in stats.values()])
+            calls = hits + sum([cache["misses"] for cache in stats.values()])
+            print("{:<6} {:<10} {:>10.2f} {:>8} {:>12} {:>12.2f} {:>9.0%}".format(
+                name,
+                label,
+                elapsed,
+                triples,
+                live,
+                retained / 2**20,
+                hits / max(calls, 1)))
+            del outputs
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:2]])
@@ -0,0 +1,66 @@
+"""Benchmark SPARQL-style POSTs with bare requests.post, which opens a new
+connection per call, against the pooled keep-alive bibcat.transport
+
+A local HTTP/1.1 server answers every POST with a small SPARQL JSON
+result, standing in for Blazegraph.
+
+    python benchmarks/bench_transport.py [requests]
+"""
+__author__ = "Jeremy Nelson"
+
+import http.server
+import os
+import sys
+import threading
+import time
+
+import requests
+
+sys.path.append(os.path.abspath(
+    os.path.join(os.path.dirname(__file__), os.pardir)))
+
+from bibcat import transport
+
+RESULT = b'{"head": {"vars": ["s"]}, "results": {"bindings": []}}'
+
+
+class Handler(http.server.BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def log_message(self, *args):
+        pass
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        self.send_response(200)
+        self.send_header("Content-Type", "application/sparql-results+json")
+        self.send_header("Content-Length", str(len(RESULT)))
+        self.end_headers()
+        self.wfile.write(RESULT)
+
+
+def main(total=2000):
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = "http://127.0.0.1:{}/blazegraph/sparql".format(
+        server.server_address[1])
+    data = {"query": "SELECT ?s WHERE { ?s a <http://schema.org/Book> }"}
+    headers = {"Accept": "application/sparql-results+json"}
+    print("{:<20} {:>10} {:>12}".format("client", "seconds", "requests/s"))
+    for name, post in [("requests.post", requests.post),
+                       ("transport.post", transport.post)]:
+        start = time.time()
+        for i in range(total):
+            post(url, data=data, headers=headers)
+        elapsed = time.time() - start
+        print("{:<20} {:>10.2f} {:>12.0f}".format(
+            name, elapsed, total / elapsed))
+    print()
+    print(transport.report())
+    server.shutdown()
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:2]])
@@ -0,0 +1,85 @@
+"""Benchmark of XMLProcessor mapping into an rdflib.Graph and into a
+TripleBuffer for the fixure MODS record and a generated oai_dc record
+
+Each mode maps the records and serializes every output to N-Triples, as
+a sink or ParallelProcessor worker does, and is checked to produce the
+same triples as the rdflib.Graph output.
+
+    python benchmarks/bench_triple_buffer.py [records]
+"""
+__author__ = "Jeremy Nelson"
+
+import os
+import sys
+import time
+
+from lxml import etree
+from rdflib.compare import isomorphic
+
+sys.path.append(os.path.abspath(
+    os.path.join(os.path.dirname(__file__), os.pardir)))
+
+from bibcat.ingesters.sinks import ntriples
+from bibcat.rml.processor import XMLProcessor
+from fake_oai_pmh import OAI_PMH, HEADER, RECORD
+
+FIXURES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                            "fixures")
+RUN_KWARGS = {"instance_iri": "http://bibcat.org/instance",
+              "item_iri": "http://bibcat.org/item",
+              "work_iri": "http://bibcat.org/work",
+              "timestamp": "2017-01-01T00:00:00"}
+FIXURES = [
+    ("MODS",
+     {"rml_rules": ["bibcat-base.ttl", "mods-to-bf.ttl"],
+      "namespaces": {"mods": "http://www.loc.gov/mods/v3",
+                     "xlink": "http://www.w3.org/1999/xlink"}},
+     lambda: etree.parse(
+         os.path.join(FIXURES_PATH, "mods-record.xml")).getroot()),
+    ("DC",
+     {"rml_rules": ["bibcat-base.ttl", "oai-pmh-dc-xml-to-bf.ttl"],
+      "namespaces": {"oai_pmh": "http://www.openarchives.org/OAI/2.0/",
+                     "dc": "http://purl.org/dc/elements/1.1/",
+                     "oai_dc": "http://www.openarchives.org/OAI/2.0/oai_dc/"}},
+     lambda: etree.XML(OAI_PMH.format(
+         verb="GetRecord",
+         body=RECORD.format(1, 1, header=HEADER.format(1))).encode())[1][0])
+]
+
+
+def time_mode(processor, record, size):
+    start = time.time()
+    for i in range(size):
+        processor.run(record, **RUN_KWARGS)
+        ntriples(processor.output)
+    return time.time() - start
+
+
+def main(size=1000):
+    print("{} records of each fixure".format(size))
+    print("{:<6} {:<14} {:>8} {:>10} {:>12} {:>8} {:>6}".format(
+        "record", "output", "triples", "seconds", "records/s", "speedup",
+        "same"))
+    for name, processor_kwargs, record in FIXURES:
+        record = record()
+        graph_processor = XMLProcessor(**processor_kwargs)
+        buffer_processor = XMLProcessor(triple_buffer=True,
+                                        **processor_kwargs)
+        baseline = time_mode(graph_processor, record, size)
+        elapsed = time_mode(buffer_processor, record, size)
+        same = isomorphic(buffer_processor.output.graph(),
+                          graph_processor.output)
+        for output, seconds in [("rdflib.Graph", baseline),
+                                ("TripleBuffer", elapsed)]:
+            print("{:<6} {:<14} {:>8} {:>10.2f} {:>12.0f} {:>7.2f}x {:>6}".format(
+                name,
+                output,
+                len(graph_processor.output),
+                seconds,
+                size / seconds,
+                baseline / seconds,
+                str(same)))
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:2]])
@@ -0,0 +1,75 @@
+"""Benchmark peak memory of XMLProcessor.run_stream on generated
+modsCollection files of increasing size
+
+Peak memory is measured with tracemalloc while streaming the file and
+discarding each record's graph, it should stay flat as the number of
+records grows.
+
+    python benchmarks/bench_xml_stream.py
+"""
+__author__ = "Jeremy Nelson"
+
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from lxml import etree
+
+sys.path.append(os.path.abspath(
+    os.path.join(os.path.dirname(__file__), os.pardir)))
+
+from bibcat.rml.processor import XMLProcessor
+
+FIXURES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                            "fixures")
+MODS_NS = {"mods": "http://www.loc.gov/mods/v3",
+           "xlink": "http://www.w3.org/1999/xlink"}
+
+
+def write_collection(path, size):
+    """Writes a modsCollection of size copies of the fixure MODS record"""
+    record = etree.tostring(
+        etree.parse(os.path.join(FIXURES_PATH, "mods-record.xml")))
+    with open(path, "wb") as collection:
+        collection.write(
+            b'<modsCollection xmlns="http://www.loc.gov/mods/v3">')
+        for i in range(size):
+            collection.write(record)
+        collection.write(b'</modsCollection>')
+
+
+def main():
+    processor = XMLProcessor(rml_rules=["bibcat-base.ttl", "mods-to-bf.ttl"],
+                             institution_iri="http://bibcat.org/institution",
+                             namespaces=MODS_NS)
+    print("{:>8} {:>10} {:>12} {:>12}".format(
+        "records", "file MB", "peak MB", "records/s"))
+    for size in [250, 1000, 4000]:
+        file_desc, path = tempfile.mkstemp(suffix=".xml")
+        os.close(file_desc)
+        write_collection(path, size)
+        tracemalloc.start()
+        start = time.time()
+        triples = 0
+        for graph in processor.run_stream(
+                path,
+                "mods:mods",
+                instance_iri="http://bibcat.org/instance",
+                item_iri="http://bibcat.org/item",
+                work_iri="http://bibcat.org/work"):
+            triples += len(graph)
+        elapsed = time.time() - start
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        print("{:>8} {:>10.1f} {:>12.2f} {:>12.0f}".format(
+            size,
+            os.path.getsize(path) / 2**20,
+            peak / 2**20,
+            size / elapsed))
+        os.remove(path)
+
+
+if __name__ == '__main__':
+    main()
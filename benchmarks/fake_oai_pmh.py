@@ -0,0 +1,131 @@
+"""Local fake OAI-PMH repository for offline harvest benchmarks
+
+Serves ListMetadataFormats, ListIdentifiers and ListRecords for a number
+of generated Dublin Core records, paged with resumption tokens, and the
+Islandora MODS and RELS-EXT datastreams of each record. Every response is
+delayed by latency seconds to stand in for a remote repository.
+
+>>> server = FakeOAIPMHServer(records=1000, latency=0.05)
+>>> server.start()
+>>> server.url
+'http://127.0.0.1:49152/oai2'
+>>> server.stop()
+"""
+__author__ = "Jeremy Nelson"
+
+import http.server
+import threading
+import time
+import urllib.parse
+
+OAI_PMH = """<?xml version="1.0" encoding="UTF-8"?>
+<OAI-PMH xmlns="http://www.openarchives.org/OAI/2.0/"
+ xmlns:oai_dc="http://www.openarchives.org/OAI/2.0/oai_dc/"
+ xmlns:dc="http://purl.org/dc/elements/1.1/">
+ <responseDate>2017-01-01T00:00:00Z</responseDate>
+ <{verb}>{body}</{verb}>
+</OAI-PMH>"""
+
+METADATA_FORMATS = """
+  <metadataFormat><metadataPrefix>oai_dc</metadataPrefix></metadataFormat>
+  <metadataFormat><metadataPrefix>mods</metadataPrefix></metadataFormat>"""
+
+HEADER = """<header><identifier>oai:bibcat.org:test_{0}</identifier>
+ <datestamp>2017-01-01</datestamp></header>"""
+
+RECORD = """<record>{header}<metadata><oai_dc:dc>
+ <dc:title>Letter {0} from Arthur J. Kew to Ida Rosalie Fursman</dc:title>
+ <dc:subject>Courtship</dc:subject>
+ <dc:subject>Colorado Springs (Colo.)</dc:subject>
+ <dc:description>Handwritten letter, item {0} of the collection</dc:description>
+ <dc:date>1904-05-{1:02d}</dc:date>
+ <dc:identifier>http://bibcat.org/islandora/object/test:{0}</dc:identifier>
+</oai_dc:dc></metadata></record>"""
+
+TOKEN = """<resumptionToken completeListSize="{0}">{1}</resumptionToken>"""
+
+MODS = """<mods xmlns="http://www.loc.gov/mods/v3">
+ <titleInfo><title>Letter {0}</title></titleInfo>
+</mods>"""
+
+RELS_EXT = """<rdf:RDF xmlns:rdf="http://www.w3.org/1999/02/22-rdf-syntax-ns#"
+ xmlns:fedora="info:fedora/fedora-system:def/relations-external#">
+ <rdf:Description rdf:about="info:fedora/test:{0}">
+  <fedora:isMemberOfCollection rdf:resource="info:fedora/test:collection"/>
+ </rdf:Description>
+</rdf:RDF>"""
+
+
+class FakeOAIPMHServer(object):
+    """Threaded HTTP server with a generated OAI-PMH repository"""
+
+    def __init__(self, records=1000, page_size=100, latency=0.0):
+        self.records = records
+        self.page_size = page_size
+        self.latency = latency
+        self.requests = 0
+        server = self
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                server.requests += 1
+                time.sleep(server.latency)
+                status, body = server.respond(self.path)
+                body = body.encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "text/xml; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        self.httpd = http.server.ThreadingHTTPServer(("127.0.0.1", 0),
+                                                     Handler)
+        self.httpd.daemon_threads = True
+        self.url = "http://127.0.0.1:{}/oai2".format(
+            self.httpd.server_address[1])
+        self.thread = None
+
+    def __page__(self, verb, offset, template):
+        end = min(offset + self.page_size, self.records)
+        body = "".join([template(i) for i in range(offset, end)])
+        token = ""
+        if end < self.records:
+            token = end
+        body += TOKEN.format(self.records, token)
+        return OAI_PMH.format(verb=verb, body=body)
+
+    def respond(self, path):
+        """Returns a tuple of the HTTP status and body for a path"""
+        url = urllib.parse.urlparse(path)
+        if "/datastream/" in url.path:
+            number = url.path.split("test:")[-1].split("/")[0]
+            if url.path.endswith("RELS-EXT"):
+                return 200, RELS_EXT.format(number)
+            return 200, MODS.format(number)
+        params = dict(urllib.parse.parse_qsl(url.query))
+        verb = params.get("verb")
+        offset = int(params.get("resumptionToken", 0))
+        if verb == "ListMetadataFormats":
+            return 200, OAI_PMH.format(verb=verb, body=METADATA_FORMATS)
+        if verb == "ListIdentifiers":
+            return 200, self.__page__(verb, offset, HEADER.format)
+        if verb == "ListRecords":
+            return 200, self.__page__(
+                verb,
+                offset,
+                lambda i: RECORD.format(i, i % 28 + 1,
+                                        header=HEADER.format(i)))
+        return 400, OAI_PMH.format(verb="error", body="badVerb")
+
+    def start(self):
+        self.thread = threading.Thread(target=self.httpd.serve_forever,
+                                       daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
@@ -0,0 +1,146 @@
+"""Local stand-in for a Blazegraph SPARQL endpoint backed by an rdflib
+Graph, for offline benchmarks
+
+POSTed query parameters are evaluated with rdflib and returned as SPARQL
+JSON results, or as SPARQL TSV results if accepted, update parameters and
+SPARQL Update bodies are applied to the graph, and POSTed N-Triples,
+N-Quads or RDF/XML bodies, optionally gzip encoded, are added to it.
+Every request, and every update among them, is counted and can be
+delayed by latency seconds to stand in for a remote store.
+
+>>> server = FakeSPARQLServer(graph, latency=0.01)
+>>> server.start()
+>>> server.url
+'http://127.0.0.1:49152/blazegraph/sparql'
+>>> server.stop()
+"""
+__author__ = "Jeremy Nelson"
+
+import gzip
+import http.server
+import json
+import threading
+import time
+import urllib.parse
+
+import rdflib
+
+
+def tsv(result):
+    """Returns SELECT results as SPARQL TSV"""
+    lines = ["\t".join(["?" + str(variable) for variable in result.vars])]
+    for row in result:
+        lines.append("\t".join(
+            ["" if term is None else term.n3().replace("\t", "\\t")
+             for term in row]))
+    return ("\n".join(lines) + "\n").encode()
+
+
+class FakeSPARQLServer(object):
+    """Threaded HTTP server answering SPARQL requests from an rdflib Graph"""
+
+    def __init__(self, graph=None, latency=0.0):
+        if graph is None:
+            graph = rdflib.Graph()
+        self.graph = graph
+        self.latency = latency
+        self.requests, self.updates = 0, 0
+        self.queries = []
+        self.lock = threading.Lock()
+        server = self
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            disable_nagle_algorithm = True
+
+            def log_message(self, *args):
+                pass
+
+            def __respond__(self, status, body, content_type):
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_POST(self):
+                server.requests += 1
+                time.sleep(server.latency)
+                length = int(self.headers.get("Content-Length", 0))
+                body = self.rfile.read(length)
+                if self.headers.get("Content-Encoding") == "gzip":
+                    body = gzip.decompress(body)
+                content_type = self.headers.get("Content-Type", "")
+                try:
+                    status, output, output_type = server.respond(
+                        body, content_type, self.headers.get("Accept", ""))
+                except Exception as error:
+                    status, output, output_type = 400, str(error).encode(), \
+                        "text/plain"
+                self.__respond__(status, output, output_type)
+
+            def do_GET(self):
+                query = urllib.parse.urlsplit(self.path).query
+                server.requests += 1
+                time.sleep(server.latency)
+                status, output, output_type = server.respond(
+                    query.encode(),
+                    "application/x-www-form-urlencoded")
+                self.__respond__(status, output, output_type)
+
+        self.httpd = http.server.ThreadingHTTPServer(("127.0.0.1", 0),
+                                                     Handler)
+        self.httpd.daemon_threads = True
+        self.url = "http://127.0.0.1:{}/blazegraph/sparql".format(
+            self.httpd.server_address[1])
+        self.thread = None
+
+    def respond(self, body, content_type, accept=""):
+        """Returns a tuple of HTTP status, body and content type"""
+        if content_type.startswith("application/x-www-form-urlencoded"):
+            params = dict(urllib.parse.parse_qsl(body.decode()))
+            if "update" in params:
+                self.updates += 1
+                with self.lock:
+                    self.graph.update(params["update"])
+                return 200, b"", "text/plain"
+            self.queries.append(params.get("query"))
+            with self.lock:
+                result = self.graph.query(params.get("query"))
+                if result.type == "CONSTRUCT" or result.type == "DESCRIBE":
+                    return 200, result.serialize(format="nt"), "text/plain"
+                if "text/tab-separated-values" in accept:
+                    return 200, tsv(result), "text/tab-separated-values"
+                return (200,
+                        result.serialize(format="json"),
+                        "application/sparql-results+json")
+        self.updates += 1
+        if content_type.startswith("application/sparql-update"):
+            with self.lock:
+                self.graph.update(body.decode())
+            return 200, b"", "text/plain"
+        if "nquads" in content_type:
+            dataset = rdflib.ConjunctiveGraph()
+            dataset.parse(data=body.decode(), format="nquads")
+            with self.lock:
+                for triple in dataset.triples((None, None, None)):
+                    self.graph.add(triple)
+            return 200, json.dumps({"status": "ok"}).encode(), \
+                "application/json"
+        rdf_format = "nt"
+        if "rdf+xml" in content_type:
+            rdf_format = "xml"
+        elif "turtle" in content_type:
+            rdf_format = "turtle"
+        with self.lock:
+            self.graph.parse(data=body.decode(), format=rdf_format)
+        return 200, json.dumps({"status": "ok"}).encode(), "application/json"
+
+    def start(self):
+        self.thread = threading.Thread(target=self.httpd.serve_forever,
+                                       daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
@@ -79,21 +79,22 @@ def clean_uris(graph):
                    urllib.parse.quote(url_sections.params),
                    urllib.parse.quote(url_sections.query),
                    urllib.parse.quote(url_sections.fragment))
-        new_uri = rdflib.URIRef(
+        return rdflib.URIRef(
             str(urllib.parse.urlunparse(new_url)))
-        replace_iri(graph, uri, new_uri)
     all_uri_sparql = """SELECT DISTINCT ?uri
         WHERE {
             ?uri ?p ?o .
             ?s ?p1 ?uri .
         FILTER(isIRI(?uri))
     }"""
+    mapping = dict()
     for iri in graph.query(all_uri_sparql):
         try:
             if _is_valid_uri(str(iri[0])) is False:
-                fix_uri(iri[0])
+                mapping[iri[0]] = fix_uri(iri[0])
         except rdflib.exceptions.SubjectTypeError:
-            fix_uri(iri)
+            mapping[iri] = fix_uri(iri)
+    rewrite_iris(graph, mapping, in_place=True)
 
 def create_rdf_list(graph, nodes):
     """Creates a RDF List with the ordering based on the nodes.
@@ -192,12 +193,68 @@ def replace_iri(graph, old_iri, new_iri):
         # Otherwise deletes all occurrences of the iri in the
         # graph
         return
-    for pred, obj in graph.predicate_objects(subject=old_iri):
-        graph.add((new_iri, pred, obj))
-        graph.remove((old_iri, pred, obj))
-    for subj, pred in graph.subject_predicates(object=old_iri):
-        graph.add((subj, pred, new_iri))
-        graph.remove((subj, pred, old_iri))
+    rewrite_iris(graph, {old_iri: new_iri}, in_place=True)
+
+def rewrite_iris(graph, mapping, in_place=False):
+    """Replaces every subject or object IRI (or BNode) in the mapping with
+    its new IRI. By default the triples are copied in a single pass into
+    a new graph, with the same namespace bindings and named graphs, that is
+    returned. With in_place the triples of each old IRI are looked up
+    through the graph's indexes and swapped in the graph, for callers
+    holding a reference to it. Either way each IRI is rewritten once, new
+    IRIs that are also old IRIs in the mapping are not followed.
+
+    Args:
+
+    ----
+        graph: rdflib.Graph
+        mapping: dict of old rdflib.URIRef or BNode to new rdflib.URIRef
+        in_place: boolean, rewrite graph instead of a new graph
+    """
+    mapping = {old_iri: new_iri for old_iri, new_iri in mapping.items()
+               if old_iri != new_iri}
+    get = mapping.get
+    conjunctive = isinstance(graph, rdflib.ConjunctiveGraph)
+    if conjunctive:
+        # Keep each triple in its named graph
+        quads = graph.quads
+    else:
+        def quads(pattern):
+            for subj, pred, obj in graph.triples(pattern):
+                yield subj, pred, obj, graph
+    if in_place is False:
+        if conjunctive:
+            output = graph.__class__()
+            contexts = {graph.default_context.identifier:
+                        output.default_context}
+
+            def context_of(context):
+                if context.identifier not in contexts:
+                    contexts[context.identifier] = output.get_context(
+                        context.identifier)
+                return contexts[context.identifier]
+        else:
+            output = rdflib.Graph()
+
+            def context_of(context):
+                return output
+        for prefix, namespace in graph.namespaces():
+            output.bind(prefix, namespace)
+        output.addN((get(subj, subj), pred, get(obj, obj), context_of(context))
+                    for subj, pred, obj, context in quads((None, None, None)))
+        return output
+    # Collects the triples of every old IRI before changing the graph so
+    # that each IRI is rewritten once, i.e. {a: b, b: c} gives b for a
+    # whatever the order of the mapping
+    changed = set()
+    for old_iri in mapping:
+        changed.update(quads((old_iri, None, None)))
+        changed.update(quads((None, None, old_iri)))
+    for subj, pred, obj, context in changed:
+        context.remove((subj, pred, obj))
+    graph.addN((get(subj, subj), pred, get(obj, obj), context)
+               for subj, pred, obj, context in changed)
+    return graph
 
 
 def slugify(value):
@@ -0,0 +1,256 @@
+"""Bulk mode of the WorkGenerator, reads the titles and creators of all
+existing Works and of the Instances with blank node Works in paged
+queries, clusters the Instances into Works in memory and writes the Works
+back batch_size Instances at a time.
+
+>>> works = BulkWorks(triplestore_url, updates, templates,
+...                   generator.__generate_uri__)
+>>> works.run()
+"""
+__author__ = "Jeremy Nelson"
+
+import collections
+import datetime
+
+import rdflib
+
+from bibcat import transport
+from bibcat.generators.cluster import WorkClusters
+
+BF = rdflib.Namespace("http://id.loc.gov/ontologies/bibframe/")
+RELATORS = rdflib.Namespace("http://id.loc.gov/vocabulary/relators/")
+
+
+def add_creators(work_graph, work_uri, processed, creator_codes):
+    """Adds an Instance's creators to the Work graph under their relators
+
+    Args:
+        work_graph(rdflib.Graph): RDF Graph of the BF Work
+        work_uri(rdflib.URIRef): URI of the BF Work
+        processed(dict): Titles and creator URIs by relator code of the
+                         Instance
+        creator_codes(list): Relator codes of creators
+    """
+    for code in creator_codes:
+        for agent_uri in processed.get(code, []):
+            work_graph.add((work_uri, RELATORS[code], agent_uri))
+
+
+def add_work_title(work_graph, work_uri, processed):
+    """Adds a bf:WorkTitle of an Instance's titles to the Work graph
+
+    Args:
+        work_graph(rdflib.Graph): RDF Graph of the BF Work
+        work_uri(rdflib.URIRef): URI of the BF Work
+        processed(dict): Titles and creator URIs by relator code of the
+                         Instance
+    """
+    if "title" not in processed:
+        return
+    work_title_bnode = rdflib.BNode()
+    work_graph.add((work_uri, BF.title, work_title_bnode))
+    work_graph.add((work_title_bnode, rdflib.RDF.type, BF.WorkTitle))
+    for row in processed["title"]:
+        main_title, subtitle = row["mainTitle"], row["subtitle"]
+        work_graph.add((work_title_bnode,
+                        BF.mainTitle,
+                        rdflib.Literal(main_title)))
+        if subtitle:
+            work_graph.add((work_title_bnode,
+                            BF.subtitle,
+                            rdflib.Literal(subtitle)))
+
+
+class BulkWorks(object):
+    """Clusters all Instances with blank node Works into existing or new
+    Works, with a few paged reads and one update request per batch
+    instead of several queries for each Instance"""
+
+    def __init__(self, triplestore_url, updates, templates, mint, **kwargs):
+        """
+        Args:
+            triplestore_url(str): SPARQL endpoint
+            updates(bibcat.updates.UpdateBuffer): Buffer of the writes
+            templates(dict): SPARQL templates of the work_keys,
+                             instance_keys, bnode_props and delete_bnodes
+            mint(callable): Returns a new Work URI
+
+        Keyword args:
+            creator_codes(list): Relator codes of creators
+            page_size(int): Instances or Works per paged query
+            batch_size(int): Instances per write
+            processed(dict): Titles and creators by Instance, filled while
+                             reading the Instances
+        """
+        self.triplestore_url = triplestore_url
+        self.updates = updates
+        self.templates = templates
+        self.mint = mint
+        self.creator_codes = kwargs.get(
+            'creator_codes',
+            ['aus', 'aut', 'cre'])
+        self.page_size = kwargs.get('page_size', 10000)
+        self.batch_size = kwargs.get('batch_size', 1000)
+        self.processed = kwargs.get('processed', {})
+
+    def __query__(self, sparql):
+        """Runs a SELECT query on the triplestore and returns the bindings
+
+        Args:
+            sparql(str): SPARQL SELECT query
+        """
+        result = transport.post(
+            self.triplestore_url,
+            data={"query": sparql,
+                  "format": "json"})
+        if result.status_code > 399:
+            raise ValueError("Failed to query {}".format(
+                self.triplestore_url))
+        return result.json().get('results').get('bindings')
+
+    def __pages__(self, template, key):
+        """Generator pages through a query template with LIMIT and OFFSET
+        of page_size distinct key values, yields each page's bindings
+
+        Args:
+            template(str): SPARQL template taking limit, offset and the
+                           relator values
+            key(str): Variable paged by the template's subquery
+        """
+        relators = " ".join(["relators:{}".format(code)
+                             for code in self.creator_codes])
+        offset = 0
+        while True:
+            bindings = self.__query__(
+                template.format(self.page_size, offset, relators))
+            yield bindings
+            keys = set([row.get(key).get('value') for row in bindings])
+            if len(keys) < self.page_size:
+                break
+            offset += self.page_size
+
+    def __cluster_keys__(self):
+        """Reads the titles and creators of all existing Works and of the
+        Instances with blank node Works in paged queries, fills processed
+        with each Instance's titles and creators, and returns the
+        WorkClusters of the Instances"""
+        clusters = WorkClusters()
+        works = collections.OrderedDict()
+        for bindings in self.__pages__(self.templates["work_keys"], 'work'):
+            for row in bindings:
+                work = works.setdefault(
+                    row.get('work').get('value'),
+                    {"titles": set(), "creators": set()})
+                if 'mainTitle' in row:
+                    work["titles"].add(row.get('mainTitle').get('value'))
+                for var in ['creator', 'name']:
+                    if var in row:
+                        work["creators"].add(row.get(var).get('value'))
+        for work_url, work in works.items():
+            for title in work["titles"]:
+                clusters.add_work(rdflib.URIRef(work_url),
+                                  title,
+                                  work["creators"])
+        instances = collections.OrderedDict()
+        for bindings in self.__pages__(self.templates["instance_keys"],
+                                       'instance'):
+            for row in bindings:
+                instance_key = row.get('instance').get('value')
+                instance = instances.setdefault(
+                    instance_key,
+                    {"title": None, "creators": set()})
+                processed = self.processed.setdefault(instance_key, {})
+                main_title = row.get('mainTitle', {}).get('value')
+                if main_title is not None:
+                    title = {"mainTitle": main_title,
+                             "subtitle": row.get(
+                                 'subtitle', {}).get('value')}
+                    if title not in processed.setdefault("title", []):
+                        processed["title"].append(title)
+                    if instance["title"] is None:
+                        instance["title"] = main_title
+                if 'creator' in row:
+                    code = row.get('relator').get('value').split("/")[-1]
+                    creator_uri = rdflib.URIRef(
+                        row.get('creator').get('value'))
+                    if creator_uri not in processed.setdefault(code, []):
+                        processed[code].append(creator_uri)
+                    instance["creators"].add(str(creator_uri))
+                    if 'name' in row:
+                        instance["creators"].add(
+                            row.get('name').get('value'))
+        for instance_key, instance in instances.items():
+            clusters.add_instance(rdflib.URIRef(instance_key),
+                                  instance["title"],
+                                  instance["creators"])
+        return clusters
+
+    def __write_works__(self, batch, new_works):
+        """Copies the blank node Work properties of a batch of Instances to
+        their Works with one query, then inserts the Works and deletes the
+        blank node Works in one SPARQL update request
+
+        Args:
+            batch(list): List of (instance_uri, work_uri) tuples
+            new_works(set): Work URIs minted in this run, gets a title
+                            the first time a minted Work is written
+        """
+        values = " ".join([instance_uri.n3()
+                           for instance_uri, work_uri in batch])
+        works = dict(batch)
+        work_graph = rdflib.Graph()
+        for row in self.__query__(
+                self.templates["bnode_props"].format(values)):
+            if 'pred' not in row or 'obj' not in row:
+                continue
+            work_uri = works[rdflib.URIRef(row.get('instance').get('value'))]
+            predicate = rdflib.URIRef(row.get("pred").get("value"))
+            obj_type = row.get("obj").get("type")
+            obj_raw_val = row.get("obj").get("value")
+            if obj_type.startswith("literal"):
+                if predicate == rdflib.RDF.type:
+                    # Skip all literals
+                    continue
+                obj_ = rdflib.Literal(obj_raw_val)
+            else:
+                obj_ = rdflib.URIRef(obj_raw_val)
+            work_graph.add((work_uri, predicate, obj_))
+        for instance_uri, work_uri in batch:
+            processed = self.processed.get(str(instance_uri), {})
+            work_graph.add((instance_uri, BF.instanceOf, work_uri))
+            if work_uri in new_works:
+                work_graph.add((work_uri, rdflib.RDF.type, BF.Work))
+                add_work_title(work_graph, work_uri, processed)
+                new_works.remove(work_uri)
+            add_creators(work_graph, work_uri, processed, self.creator_codes)
+        self.updates.insert_data(work_graph)
+        self.updates.add(self.templates["delete_bnodes"].format(values))
+        self.updates.flush()
+
+    def run(self):
+        """Clusters the Instances into existing or new Works in memory and
+        writes the Works back batch_size Instances at a time"""
+        start = datetime.datetime.utcnow()
+        clusters = self.__cluster_keys__()
+        batch, new_works = [], set()
+        print("Started Processing at {} for {} Instances in {} Works".format(
+            start,
+            len(self.processed),
+            len(clusters)))
+        for cluster in clusters:
+            if cluster.work is None:
+                cluster.work = self.mint()
+                new_works.add(cluster.work)
+            for instance_uri in cluster.instances:
+                batch.append((instance_uri, cluster.work))
+                if len(batch) >= self.batch_size:
+                    self.__write_works__(batch, new_works)
+                    batch = []
+                    print(".", end="")
+        if len(batch) > 0:
+            self.__write_works__(batch, new_works)
+        self.updates.report()
+        end = datetime.datetime.utcnow()
+        print("Finished Processing at {}, total time={} mins".format(
+            end,
+            (end-start).seconds / 60.0))
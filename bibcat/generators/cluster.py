@@ -0,0 +1,109 @@
+"""Clusters BIBFRAME Instances into Works in memory, candidates are blocked
+by normalized main title and matched on shared creators within a block.
+Used by the bulk mode of the WorkGenerator.
+
+>>> clusters = WorkClusters()
+>>> clusters.add_work(work_uri, "Pride and Prejudice", ["Austen, Jane"])
+>>> cluster = clusters.add_instance(instance_uri,
+...                                 "Pride and prejudice.",
+...                                 ["austen, jane"])
+>>> cluster.work == work_uri
+True
+"""
+__author__ = "Jeremy Nelson"
+
+import collections
+
+from bibcat.linkers.authority import normalize
+
+
+def title_key(title):
+    """Returns the blocking key of a title, None for a missing title
+
+    Args:
+        title(str|rdflib.Literal): Main title
+    """
+    if title is None:
+        return None
+    return normalize(title)
+
+
+class Cluster(object):
+    """Instances of one Work, work is None for a Work that has not been
+    minted yet"""
+
+    def __init__(self, work=None, creators=None):
+        self.work = work
+        self.creators = set(creators or [])
+        self.instances = []
+
+    def matches(self, creators):
+        """Returns True if a candidate with the creator keys belongs in
+        the cluster, either side without creators matches on title alone
+
+        Args:
+            creators(set): Normalized creator names or IRIs
+        """
+        if len(self.creators) < 1 or len(creators) < 1:
+            return True
+        return not self.creators.isdisjoint(creators)
+
+
+class WorkClusters(object):
+    """Blocks existing Works and Instances by title key, an Instance joins
+    the first cluster in its block with a shared creator or starts a new
+    cluster"""
+
+    def __init__(self):
+        self.blocks = collections.defaultdict(list)
+        self.clusters = []
+
+    def __creators__(self, creators):
+        return set([normalize(creator) for creator in creators])
+
+    def add_work(self, work, title, creators=[]):
+        """Adds an existing Work as a cluster that Instances can join
+
+        Args:
+            work(rdflib.URIRef): Work IRI
+            title(str): Main title of the Work
+            creators(list): Creator names or IRIs
+        """
+        key = title_key(title)
+        if key is None:
+            return
+        cluster = Cluster(work, self.__creators__(creators))
+        self.blocks[key].append(cluster)
+        self.clusters.append(cluster)
+
+    def add_instance(self, instance, title=None, creators=[]):
+        """Adds an Instance to its cluster and returns the cluster, an
+        Instance without a title always starts a new cluster
+
+        Args:
+            instance(rdflib.URIRef): Instance IRI
+            title(str): Main title of the Instance
+            creators(list): Creator names or IRIs
+        """
+        creators = self.__creators__(creators)
+        key = title_key(title)
+        block = self.blocks[key] if key is not None else []
+        for cluster in block:
+            if cluster.matches(creators):
+                break
+        else:
+            cluster = Cluster()
+            block.append(cluster)
+            self.clusters.append(cluster)
+        cluster.creators.update(creators)
+        cluster.instances.append(instance)
+        return cluster
+
+    def __iter__(self):
+        """Iterates over the clusters with Instances"""
+        for cluster in self.clusters:
+            if len(cluster.instances) > 0:
+                yield cluster
+
+    def __len__(self):
+        return len([cluster for cluster in self])
@@ -4,6 +4,8 @@ import os
 import rdflib
 import sys
 import uuid
+from bibcat.generators.keyset import Checkpoint, checkpointed, keyset_pages
+from bibcat.updates import UpdateBuffer
 __author__ = "Jeremy Nelson, Mike Stabile"
 
 BIBCAT_BASE = os.path.abspath(
@@ -48,6 +50,31 @@ class Generator(object):
                 self.base_url = config.BASE_URL
             else:
                 self.base_url = "http://bibcat.org/"
+        # Maximum number of entities per paged query
+        self.page_size = kwargs.get("page_size", 10000)
+        # Optional path of a file holding the last processed key
+        self.checkpoint = Checkpoint(kwargs.get("checkpoint"))
+        # Write-combining buffer of SPARQL updates, the default of two
+        # operations sends an entity's insert and delete in one request
+        self.updates = UpdateBuffer(
+            self.triplestore_url,
+            max_operations=kwargs.get("update_batch", 2))
+
+    def __keyset_rows__(self, template, key):
+        """Generator pages through a query template ordered by key, resuming
+        after the checkpoint if there is one, yields each row and
+        checkpoints the keys whose updates have been sent
+
+        Args:
+            template(str): SPARQL template taking the key filter and limit
+            key(str): Variable the template orders by
+        """
+        pages = keyset_pages(self.triplestore_url,
+                             template,
+                             key,
+                             self.page_size,
+                             self.checkpoint.read())
+        return checkpointed(pages, key, self.checkpoint, self.updates)
 
     def __generate_uri__(self):
         """Method generates an URI based on the base_url"""
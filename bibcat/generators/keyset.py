@@ -0,0 +1,116 @@
+"""Keyset paging of SPARQL SELECT templates ordered by a key with a
+checkpoint file of the last processed key, so an interrupted generator run
+resumes after that key instead of starting over. Used by the
+CollectionGenerator and the WorkGenerator.
+
+>>> checkpoint = Checkpoint("/tmp/works.checkpoint")
+>>> pages = keyset_pages(triplestore_url, GET_AVAILABLE_INSTANCES_PAGE,
+...                      "instance", 10000, checkpoint.read())
+>>> for row in checkpointed(pages, "instance", checkpoint, updates):
+...     process(row)
+"""
+__author__ = "Jeremy Nelson"
+
+import os
+
+import rdflib
+
+from bibcat import transport
+
+
+class Checkpoint(object):
+    """File holding the last processed key, a Checkpoint without a path
+    reads nothing and writes nothing"""
+
+    def __init__(self, path=None):
+        self.path = path
+
+    def read(self):
+        """Returns the last processed key, None if there is no checkpoint"""
+        if self.path is None or not os.path.exists(self.path):
+            return None
+        with open(self.path) as checkpoint:
+            return checkpoint.read().strip() or None
+
+    def write(self, key):
+        """Replaces the checkpoint file with the last processed key
+
+        Args:
+            key(str): Last processed key, i.e. an Instance IRI
+        """
+        if self.path is None:
+            return
+        tmp_path = "{}.tmp".format(self.path)
+        with open(tmp_path, "w+") as checkpoint:
+            checkpoint.write(str(key))
+        os.replace(tmp_path, self.path)
+
+    def clear(self):
+        """Removes the checkpoint file after a completed run"""
+        if self.path is not None and os.path.exists(self.path):
+            os.remove(self.path)
+
+
+def keyset_pages(triplestore_url, template, key, page_size, last=None):
+    """Generator pages through a query template ordered by key, each page
+    starts after the last key of the previous page, yields each page's
+    bindings
+
+    Args:
+        triplestore_url(str): SPARQL endpoint
+        template(str): SPARQL template taking the key filter and limit
+        key(str): Variable the template orders by
+        page_size(int): Distinct keys per page
+        last(str): Key to start after, i.e. read from a Checkpoint
+    """
+    while True:
+        key_filter = ""
+        if last is not None:
+            key_filter = "FILTER(STR(?{0}) > {1})".format(
+                key,
+                rdflib.Literal(last).n3())
+        result = transport.post(
+            triplestore_url,
+            data={"query": template.format(key_filter, page_size),
+                  "format": "json"})
+        if result.status_code > 399:
+            raise ValueError("Failed to query {} after {}".format(
+                triplestore_url,
+                last))
+        bindings = result.json().get('results').get('bindings')
+        keys = set([row.get(key).get('value') for row in bindings])
+        if len(keys) > 0:
+            yield bindings
+            last = max(keys)
+        if len(keys) < page_size:
+            break
+
+
+def checkpointed(pages, key, checkpoint, updates):
+    """Generator yields each row of the pages, a key is checkpointed after
+    its last row once the updates buffer is empty, i.e. every update of
+    the key and of the keys before it has been sent. The updates are
+    flushed and the checkpoint cleared when all pages are done. After a
+    failed update request the checkpoint is left where it was, so a
+    resumed run goes over the keys of the failed request again.
+
+    Args:
+        pages(iter): Bindings of each page, rows ordered by key
+        key(str): Variable the rows are ordered by
+        checkpoint(Checkpoint): Last processed key
+        updates(bibcat.updates.UpdateBuffer): Buffer the rows' updates go to
+    """
+    errors = updates.errors
+    for bindings in pages:
+        for i, row in enumerate(bindings):
+            yield row
+            value = row.get(key).get('value')
+            if i + 1 < len(bindings) and \
+                    bindings[i + 1].get(key).get('value') == value:
+                # More rows of the key to process
+                continue
+            if len(updates) < 1 and updates.errors == errors:
+                checkpoint.write(value)
+    updates.flush()
+    if updates.errors == errors:
+        checkpoint.clear()
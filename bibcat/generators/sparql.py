@@ -45,6 +45,30 @@ WHERE {
     filter(isblank(?collection))
 }"""
 
+GET_AVAILABLE_COLLECTIONS_PAGE = PREFIX + """
+SELECT ?instance ?org ?item ?label
+WHERE {{
+    {{
+        SELECT DISTINCT ?instance
+        WHERE {{
+            ?instance rdf:type bf:Instance .
+            ?instance bf:partOf ?collection .
+            ?collection rdf:type pcdm:Collection .
+            ?collection rdfs:label ?label .
+            ?item bf:itemOf ?instance .
+            ?item bf:heldBy ?org
+            filter(isblank(?collection))
+            {0}
+        }} ORDER BY ?instance LIMIT {1}
+    }}
+    ?instance bf:partOf ?collection .
+    ?collection rdf:type pcdm:Collection .
+    ?collection rdfs:label ?label .
+    ?item bf:itemOf ?instance .
+    ?item bf:heldBy ?org
+    filter(isblank(?collection))
+}} ORDER BY ?instance"""
+
 GET_AVAILABLE_INSTANCES = PREFIX + """
 SELECT ?instance 
 WHERE {
@@ -53,7 +77,14 @@ WHERE {
     filter(isblank(?work))
 }"""
 
-
+GET_AVAILABLE_INSTANCES_PAGE = PREFIX + """
+SELECT DISTINCT ?instance
+WHERE {{
+    ?instance rdf:type bf:Instance .
+    ?instance bf:instanceOf ?work .
+    filter(isblank(?work))
+    {0}
+}} ORDER BY ?instance LIMIT {1}"""
 
 GET_INSTANCE_CREATOR = PREFIX + """
 SELECT ?name ?creator
@@ -113,3 +144,72 @@ WHERE {{
     ?title ?mainTitle """ + '"""{0}""" .' + """
     FILTER(isuri(?work)) 
 }}"""
+
+GET_INSTANCE_CLUSTER_KEYS = PREFIX + """
+SELECT ?instance ?mainTitle ?subtitle ?relator ?creator ?name
+WHERE {{
+    {{
+        SELECT DISTINCT ?instance
+        WHERE {{
+            ?instance rdf:type bf:Instance .
+            ?instance bf:instanceOf ?work .
+            filter(isblank(?work))
+        }} ORDER BY ?instance LIMIT {0} OFFSET {1}
+    }}
+    OPTIONAL {{
+        ?instance bf:title ?title .
+        ?title a bf:InstanceTitle .
+        ?title bf:mainTitle ?mainTitle .
+        OPTIONAL {{ ?title bf:subtitle ?subtitle }}
+    }}
+    OPTIONAL {{
+        VALUES ?relator {{ {2} }}
+        ?instance ?relator ?creator .
+        OPTIONAL {{ ?creator rdfs:label ?name }}
+        OPTIONAL {{ ?creator schema:name ?name }}
+    }}
+}}"""
+
+GET_WORK_CLUSTER_KEYS = PREFIX + """
+SELECT ?work ?mainTitle ?creator ?name
+WHERE {{
+    {{
+        SELECT DISTINCT ?work
+        WHERE {{
+            ?work rdf:type bf:Work .
+            FILTER(isuri(?work))
+        }} ORDER BY ?work LIMIT {0} OFFSET {1}
+    }}
+    OPTIONAL {{
+        ?work bf:title ?title .
+        ?title bf:mainTitle ?mainTitle .
+    }}
+    OPTIONAL {{
+        VALUES ?relator {{ {2} }}
+        ?work ?relator ?creator .
+        OPTIONAL {{ ?creator schema:name ?name }}
+        OPTIONAL {{ ?creator schema:alternativeName ?name }}
+    }}
+}}"""
+
+GET_INSTANCES_WORK_BNODE_PROPS = PREFIX + """
+SELECT ?instance ?pred ?obj
+WHERE {{
+    VALUES ?instance {{ {0} }}
+    ?instance bf:instanceOf ?work .
+    ?work ?pred ?obj .
+    filter(isblank(?work))
+}}"""
+
+DELETE_WORK_BNODES = PREFIX + """
+DELETE {{
+    ?work ?p ?o .
+    ?instance bf:instanceOf ?work
+}}
+INSERT {{ }}
+WHERE {{
+    VALUES ?instance {{ {0} }}
+    ?instance bf:instanceOf ?work .
+    ?work ?p ?o
+    filter isBlank(?work)
+}}"""
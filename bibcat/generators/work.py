@@ -4,8 +4,9 @@
 """
 import datetime
 import rdflib
-import requests
+from bibcat import transport
 try:
+    from .bulk import BulkWorks, add_creators, add_work_title
     from .generator import Generator, new_graph, NS_MGR
     from .sparql import DELETE_WORK_BNODE 
     from .sparql import FILTER_WORK_CREATOR, FILTER_WORK_TITLE 
@@ -13,8 +14,13 @@ try:
     from .sparql import GET_INSTANCE_TITLE, GET_INSTANCE_WORK_BNODE_PROPS
     from .sparql import DELETE_COLLECTION_BNODE, FILTER_COLLECTION
     from .sparql import GET_AVAILABLE_COLLECTIONS
+    from .sparql import DELETE_WORK_BNODES, GET_INSTANCE_CLUSTER_KEYS
+    from .sparql import GET_INSTANCES_WORK_BNODE_PROPS, GET_WORK_CLUSTER_KEYS
+    from .sparql import GET_AVAILABLE_COLLECTIONS_PAGE
+    from .sparql import GET_AVAILABLE_INSTANCES_PAGE
 except SystemError:
     try:
+        from bulk import BulkWorks, add_creators, add_work_title
         from generator import Generator, new_graph, NS_MGR
         from sparql import DELETE_WORK_BNODE 
         from sparql import FILTER_WORK_CREATOR, FILTER_WORK_TITLE  
@@ -22,6 +28,11 @@ except SystemError:
         from sparql import GET_INSTANCE_TITLE, GET_INSTANCE_WORK_BNODE_PROPS
         from sparql import DELETE_COLLECTION_BNODE, FILTER_COLLECTION 
         from sparql import GET_AVAILABLE_COLLECTIONS
+        from sparql import DELETE_WORK_BNODES, GET_INSTANCE_CLUSTER_KEYS
+        from sparql import GET_INSTANCES_WORK_BNODE_PROPS
+        from sparql import GET_WORK_CLUSTER_KEYS
+        from sparql import GET_AVAILABLE_COLLECTIONS_PAGE
+        from sparql import GET_AVAILABLE_INSTANCES_PAGE
     except ImportError:
         pass
 
@@ -69,13 +80,7 @@ class CollectionGenerator(Generator):
         collection_graph.add((collection_uri,
             NS_MGR.bf.hasPart,
             instance))
-        result = requests.post(
-            self.triplestore_url,
-            data=collection_graph.serialize(format='turtle'),
-            headers={"Content-Type": "text/turtle"})
-        if result.status_code > 399:
-            raise WorkError("Failed to add {} to triplestore".format(
-                collection_uri))
+        self.updates.insert_data(collection_graph)
         return collection_uri
 
 
@@ -99,7 +104,7 @@ class CollectionGenerator(Generator):
         item = kwargs.get('item')
         label = kwargs.get('rdfs_label')
         query = FILTER_COLLECTION.format(item, org, label)
-        result = requests.post(self.triplestore_url,
+        result = transport.post(self.triplestore_url,
                 data={"query": query,
                       "format": "json"})
         if result.status_code > 399:
@@ -120,25 +125,19 @@ class CollectionGenerator(Generator):
                     continue
                 collections.append(collection_uri)
                 update_graph = new_graph()
-                new_graph.add((collection_uri,
+                update_graph.add((collection_uri,
                     NS_MGR.bf.hasPart,
                     instance))
-                result = requsts.post(
-                    self.triplestore_url,
-                    data=new_graph.serialize(format='turtle'),
-                    headers={"Content-Type": "text/turtle"})
+                self.updates.insert_data(update_graph)
             return collections
 
     def run(self):
-        """Runs Collection Generator"""
-        result = requests.post(self.triplestore_url,
-                data={"query": GET_AVAILABLE_COLLECTIONS,
-                      "format": "json"})
-        if result.status_code > 399:
-            raise WorkError("Failed to run sparql query")
-
-        bindings = result.json().get('results').get('bindings')
-        for row in bindings:
+        """Runs Collection Generator, Instances are paged page_size at a
+        time and a checkpoint file, if set, resumes an interrupted run.
+        Updates are sent update_batch operations at a time and an Instance
+        is checkpointed once its updates are sent."""
+        for row in self.__keyset_rows__(GET_AVAILABLE_COLLECTIONS_PAGE,
+                                        'instance'):
             instance_uri = rdflib.URIRef(row.get('instance').get('value'))
             org_uri = rdflib.URIRef(row.get('org').get('value'))
             item_uri = rdflib.URIRef(row.get('item').get('value'))
@@ -150,13 +149,8 @@ class CollectionGenerator(Generator):
                 organization=org_uri, 
                 rdfs_label=label)
             # Now remove existing BNode's properties from the BF Instance
-            delete_result = requests.post(
-                self.triplestore_url,
-                data=DELETE_COLLECTION_BNODE.format(instance_uri),
-                headers={"Content-Type": "application/sparql-update"})
-            if delete_result.status_code > 399:
-                raise WorkError("Cannot Delete Collection blank nodes for {}\n{}".format(
-                    instance_uri, delete_result.text))
+            self.updates.add(DELETE_COLLECTION_BNODE.format(instance_uri))
+        self.updates.report()
 
 
 
@@ -175,6 +169,13 @@ class WorkGenerator(Generator):
         Keyword args:
             url (str):  URL for the triplestore, defaults to localhost
                         Blazegraph instance
+            bulk (bool): Cluster all Instances in memory instead of
+                         querying the triplestore for each Instance,
+                         defaults to False
+            page_size (int): Instances or Works per paged query
+            batch_size (int): Instances per write in bulk mode
+            checkpoint (str): Path of a file recording the last processed
+                              Instance
         """
         self.rules = rdflib.Graph()
         self.matched_works = []
@@ -182,6 +183,8 @@ class WorkGenerator(Generator):
         self.creator_codes = kwargs.get(
             'creator_codes', 
             ['aus', 'aut', 'cre'])
+        self.bulk = kwargs.get('bulk', False)
+        self.batch_size = kwargs.get('batch_size', 1000)
         super(WorkGenerator, self).__init__(**kwargs)
 
     def __add_creators__(self, work_graph, work_uri, instance_uri):
@@ -192,17 +195,10 @@ class WorkGenerator(Generator):
             work_graph(rdflib.Graph): RDF Graph of new BF Work
             instance_uri(rdflib.URIRef): URI of BF Instance
         """
-        instance_key = str(instance_uri)
-        if instance_key in self.processed: 
-            for code in self.creator_codes:
-                if not code in self.processed[instance_key]:
-                    continue
-                relator = getattr(NS_MGR.relators, code)
-                for agent_uri in self.processed[instance_key][code]:
-                    work_graph.add((work_uri, 
-                                    relator, 
-                                    agent_uri))
-
+        add_creators(work_graph,
+                     work_uri,
+                     self.processed.get(str(instance_uri), {}),
+                     self.creator_codes)
 
     def __add_work_title__(self, work_graph, work_uri, instance_uri):
         """Method takes a new work graph and instance uri, queries for
@@ -212,25 +208,9 @@ class WorkGenerator(Generator):
             work_graph(rdflib.Graph): RDF Graph of new BF Work
             instance_uri(rdflib.URIRef): URI of BF Instance
         """
-        instance_key = str(instance_uri)
-        if instance_key in self.processed and\
-        "title" in self.processed[instance_key]:
-            work_title_bnode = rdflib.BNode()
-            work_graph.add((work_uri,  NS_MGR.bf.title, work_title_bnode))
-            work_graph.add((work_title_bnode, 
-                            NS_MGR.rdf.type, 
-                            NS_MGR.bf.WorkTitle))
-            for row in self.processed[instance_key]["title"]:
-                main_title, subtitle = row["mainTitle"], row["subtitle"]
-                work_graph.add((work_title_bnode,
-                                NS_MGR.bf.mainTitle,
-                                rdflib.Literal(main_title)))
-                if subtitle:
-                    work_graph.add((work_title_bnode,
-                                    NS_MGR.bf.subtitle,
-                                    rdflib.Literal(subtitle)))
-                
-       
+        add_work_title(work_graph,
+                       work_uri,
+                       self.processed.get(str(instance_uri), {}))
 
     def __copy_instance_to_work__(self, instance_uri, work_uri):
         """Method takes an instance_uri and work_uri, copies all of the 
@@ -246,7 +226,7 @@ class WorkGenerator(Generator):
             raise ValueError(
                 "Instance and Work URIs cannot match uri={}".format(
                     instance_uri))
-        work_properties_result = requests.post(
+        work_properties_result = transport.post(
             self.triplestore_url,
             data={"query": GET_INSTANCE_WORK_BNODE_PROPS.format(instance_uri),
                   "format": "json"})
@@ -270,18 +250,9 @@ class WorkGenerator(Generator):
             work_graph.add((work_uri, predicate, obj_))
         self.__add_work_title__(work_graph, work_uri, instance_uri)
         self.__add_creators__(work_graph, work_uri, instance_uri)
-        update_result = requests.post(
-            self.triplestore_url,
-            data=work_graph.serialize(format='turtle'),
-            headers={"Content-Type": "text/turtle"})
+        self.updates.insert_data(work_graph)
         # Now remove existing BNode's properties from the BF Instance
-        delete_result = requests.post(
-            self.triplestore_url,
-            data=DELETE_WORK_BNODE.format(instance_uri),
-            headers={"Content-Type": "application/sparql-update"})
-        if delete_result.status_code > 399:
-            raise ValueError("Cannot Delete Work blank nodes for {}\n{}".format(
-                instance_uri, delete_result.text))
+        self.updates.add(DELETE_WORK_BNODE.format(instance_uri))
       
 
 
@@ -321,7 +292,7 @@ class WorkGenerator(Generator):
             sparql = GET_INSTANCE_CREATOR.format(
                         uri,
                         getattr(NS_MGR.relators, code))
-            instance_creator_result = requests.post(
+            instance_creator_result = transport.post(
                 self.triplestore_url,
                 data={"query": sparql,
                       "format": "json"})
@@ -345,7 +316,7 @@ class WorkGenerator(Generator):
                     self.processed[instance_key] = {code: [
                             creator_uri,]}
                      
-                work_creator_result = requests.post(
+                work_creator_result = transport.post(
                     self.triplestore_url,
                     data={"query": FILTER_WORK_CREATOR.format(creator_name),
                           "format": "json"})
@@ -366,7 +337,7 @@ class WorkGenerator(Generator):
         Args:
             uri(str): URI of BIBFRAME Instance
         """
-        instance_title_result = requests.post(
+        instance_title_result = transport.post(
             self.triplestore_url,
             data={"query": GET_INSTANCE_TITLE.format(uri),
                   "format": "json"})
@@ -387,7 +358,7 @@ class WorkGenerator(Generator):
                                                   "subtitle": subtitle}]}
             escaped_title = main_title.replace('"', '\"')
             query = FILTER_WORK_TITLE.format(escaped_title)
-            work_title_result = requests.post(
+            work_title_result = transport.post(
                 self.triplestore_url,
                 #! Need to add subtitle to SPARQL query
                 data={"query": query,
@@ -405,43 +376,58 @@ class WorkGenerator(Generator):
     def harvest_instances(self):
         """
         Harvests all BIBFRAME Instances that have an Blank Node for the
-        isInstanceOf property.
-        
-        #! for performance considerations may need to run sparql query that
-        limits the batch size
+        isInstanceOf property, page_size Instances at a time. Each Instance
+        is recorded in the checkpoint file, if set, so an interrupted run
+        resumes after the last processed Instance.
         """
-        result = requests.post(
-            self.triplestore_url,
-            data={"query": GET_AVAILABLE_INSTANCES,
-                  "format": "json"})
-        if result.status_code > 399:
-            raise WorkError("WorkGenerator failed to query {}".format(
-                self.triplestore_url))
-        bindings = result.json().get('results').get('bindings')
         start = datetime.datetime.utcnow()
-        print("Started Processing at {} for {} Instances".format(
-            start,
-            len(bindings)))
-        for i, row in enumerate(bindings):
+        print("Started Processing at {}".format(start))
+        i = 0
+        for row in self.__keyset_rows__(GET_AVAILABLE_INSTANCES_PAGE,
+                                        'instance'):
             instance_url =  row.get('instance').get('value')
             work_uri = self.__generate_work__(instance_url)
             self.__copy_instance_to_work__(
                 rdflib.URIRef(instance_url), 
                 work_uri)
+            # Titles and creators are only needed for this Instance
+            self.processed.pop(instance_url, None)
             if not i%10 and i > 0:
                 print(".", end="")
             if not i%100:
                 print(i, end="")
+            i += 1
+        self.updates.report()
         end = datetime.datetime.utcnow()
-        print("Finished Processing at {}, total time={} mins".format(
+        print("Finished Processing at {} for {} Instances, total time={} mins".format(
             end,
+            i,
             (end-start).seconds / 60.0))
-            
 
+    def cluster_instances(self):
+        """Bulk alternative to harvest_instances, reads the titles and
+        creators of all Works and Instances in paged queries, clusters the
+        Instances into existing or new Works in memory, and writes the
+        Works back batch_size Instances at a time"""
+        works = BulkWorks(
+            self.triplestore_url,
+            self.updates,
+            {"work_keys": GET_WORK_CLUSTER_KEYS,
+             "instance_keys": GET_INSTANCE_CLUSTER_KEYS,
+             "bnode_props": GET_INSTANCES_WORK_BNODE_PROPS,
+             "delete_bnodes": DELETE_WORK_BNODES},
+            self.__generate_uri__,
+            creator_codes=self.creator_codes,
+            page_size=self.page_size,
+            batch_size=self.batch_size,
+            processed=self.processed)
+        works.run()
 
     def run(self):
         """Runs work generator on triplestore"""
-
-        self.harvest_instances()
+        if self.bulk:
+            self.cluster_instances()
+        else:
+            self.harvest_instances()
 
 
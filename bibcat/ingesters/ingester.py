@@ -8,11 +8,12 @@ import os
 import sys
 import uuid
 import rdflib
-import requests
 
 from types import SimpleNamespace
 
+from .. import rewrite_iris, transport
 from ..maps import get_map
+from .sinks import ntriples
 
 # get the current file name for logs and set logging levels
 try:
@@ -106,6 +107,8 @@ class Ingester(object):
         self.triplestore_url = kwargs.get(
             "triplestore_url",
             "http://localhost:9999/blazegraph/sparql")
+        # Optional sink for add_to_triplestore
+        self.sink = kwargs.get("sink")
         self.__queries__ = dict()
         #self.__additional_entities__()
 
@@ -165,7 +168,7 @@ class Ingester(object):
                     subject=subject):
                 if object_ != NS_MGR.kds.AddEntity:
                     constants.add((subject, predicate, object_))
-        result = requests.post(self.triplestore_url,
+        result = transport.post(self.triplestore_url,
                                data=constants.serialize(format='turtle'),
                                headers={"Content-Type": "text/turtle"})
         if result.status_code > 399:
@@ -173,12 +176,22 @@ class Ingester(object):
 
 
 
-    def add_to_triplestore(self):
-        "Sends RDF graph via POST to add to triplestore"
-        add_result = requests.post(
+    def add_to_triplestore(self, sink=None):
+        """Sends RDF graph via POST to add to triplestore, or writes it to
+        a sink, i.e. a bibcat.ingesters.sinks.TriplestoreSink that loads
+        many records per POST
+
+        Args:
+            sink(Sink): Output sink, defaults to the ingester's sink
+        """
+        sink = sink or self.sink
+        if sink is not None:
+            sink.write(self.graph)
+            return
+        add_result = transport.post(
             self.triplestore_url,
-            data=self.graph.serialize(format='xml'),
-            headers={"Content-Type": "application/rdf+xml"})
+            data=ntriples(self.graph),
+            headers={"Content-Type": "text/plain"})
         if add_result.status_code > 399:
             logging.error("Could not add graph to {}, status={}".format(
                 self.triplestore_url,
@@ -210,12 +223,13 @@ class Ingester(object):
             sparql = GET_AGENTS.format(agent_class, filter_class)
             results = [r for r in self.graph.query(sparql)]
             self.__queries__[query_key] = results 
+        rewrites = dict()
         for row in results:
             agent_uri, value = row
             sparql = DEDUP_AGENTS.format(
                 filter_class,
                 value)
-            result = requests.post(
+            result = transport.post(
                 self.triplestore_url,
                 data={"query": sparql,
                       "format": "json"})
@@ -235,12 +249,8 @@ class Ingester(object):
                     new_agent_uri = self.__generate_uri__()
             else:
                 new_agent_uri = rdflib.URIRef(bindings[0].get("agent").get("value"))
-            for subject, pred in self.graph.subject_predicates(object=agent_uri):
-                self.graph.remove((subject, pred, agent_uri))
-                self.graph.add((subject, pred, new_agent_uri))
-            for pred, obj in self.graph.predicate_objects(subject=agent_uri):
-                self.graph.remove((agent_uri, pred, obj))
-                self.graph.add((new_agent_uri, pred, obj))
+            rewrites[agent_uri] = new_agent_uri
+        rewrite_iris(self.graph, rewrites, in_place=True)
 
 
     def new_existing_bnode(self, bf_property, rule):
@@ -523,9 +533,11 @@ class BlazegraphRulesIngester(object):
             if os.path.exists(default_filepath):
                 #self.rules_graph.parse(default_filepath, format='turtle')
                 #NS_MGR.load(default_filepath)
-                result = requests.post(self.rules_url,
-                    data=open(default_filepath),
-                    headers={"Content-type": "text/turtle"})
+                # Read as bytes so a retried POST resends the whole file
+                with open(default_filepath, 'rb') as turtle:
+                    result = transport.post(self.rules_url,
+                        data=turtle.read(),
+                        headers={"Content-type": "text/turtle"})
             custom_file = None    
             # Checks to see if name is an existing absolute file
             if os.path.exists(name):
@@ -541,14 +553,17 @@ class BlazegraphRulesIngester(object):
             if custom_file is not None:
                 #self.rules_graph.parse(custom_filepath, format='turtle')
                 #NS_MGR.load(custom_filepath)
-                result = requests.post(self.rules_url,
-                    data=custom_file,
-                    headers={"Content-type": "text/turtle"})
+                with custom_file:
+                    result = transport.post(self.rules_url,
+                        data=custom_file.read(),
+                        headers={"Content-type": "text/turtle"})
                     
         self.source = kwargs.get("source")
         self.triplestore_url = kwargs.get(
             "triplestore_url",
             "http://localhost:9999/blazegraph/sparql")
+        # Optional sink for add_to_triplestore
+        self.sink = kwargs.get("sink")
         self.__queries__ = dict()
         #self.__additional_entities__()
 
@@ -608,7 +623,7 @@ class BlazegraphRulesIngester(object):
                     subject=subject):
                 if object_ != NS_MGR.kds.AddEntity:
                     constants.add((subject, predicate, object_))
-        result = requests.post(self.triplestore_url,
+        result = transport.post(self.triplestore_url,
                                data=constants.serialize(format='turtle'),
                                headers={"Content-Type": "text/turtle"})
         if result.status_code > 399:
@@ -616,12 +631,22 @@ class BlazegraphRulesIngester(object):
 
 
 
-    def add_to_triplestore(self):
-        "Sends RDF graph via POST to add to triplestore"
-        add_result = requests.post(
+    def add_to_triplestore(self, sink=None):
+        """Sends RDF graph via POST to add to triplestore, or writes it to
+        a sink, i.e. a bibcat.ingesters.sinks.TriplestoreSink that loads
+        many records per POST
+
+        Args:
+            sink(Sink): Output sink, defaults to the ingester's sink
+        """
+        sink = sink or self.sink
+        if sink is not None:
+            sink.write(self.graph)
+            return
+        add_result = transport.post(
             self.triplestore_url,
-            data=self.graph.serialize(format='xml'),
-            headers={"Content-Type": "application/rdf+xml"})
+            data=ntriples(self.graph),
+            headers={"Content-Type": "text/plain"})
         if add_result.status_code > 399:
             logging.error("Could not add graph to {}, status={}".format(
                 self.triplestore_url,
@@ -651,7 +676,7 @@ class BlazegraphRulesIngester(object):
             results = self.__queries__[query_key]
         else:
             sparql = GET_AGENTS.format(agent_class, filter_class)
-            result = requests.post(self.rules_url,
+            result = transport.post(self.rules_url,
                 data={"query": sparql,
                       "format": "json"})
             results = []
@@ -659,12 +684,13 @@ class BlazegraphRulesIngester(object):
                 results.append(row)
             # results = [r for r in self.graph.query(sparql)]
             self.__queries__[query_key] = results 
+        rewrites = dict()
         for row in results:
             agent_uri, value = row
             sparql = DEDUP_AGENTS.format(
                 filter_class,
                 value)
-            result = requests.post(
+            result = transport.post(
                 self.triplestore_url,
                 data={"query": sparql,
                       "format": "json"})
@@ -684,12 +710,8 @@ class BlazegraphRulesIngester(object):
                     new_agent_uri = self.__generate_uri__()
             else:
                 new_agent_uri = rdflib.URIRef(bindings[0].get("agent").get("value"))
-            for subject, pred in self.graph.subject_predicates(object=agent_uri):
-                self.graph.remove((subject, pred, agent_uri))
-                self.graph.add((subject, pred, new_agent_uri))
-            for pred, obj in self.graph.predicate_objects(subject=agent_uri):
-                self.graph.remove((agent_uri, pred, obj))
-                self.graph.add((new_agent_uri, pred, obj))
+            rewrites[agent_uri] = new_agent_uri
+        rewrite_iris(self.graph, rewrites, in_place=True)
 
 
     def new_existing_bnode(self, bf_property, rule):
@@ -801,7 +823,7 @@ class BlazegraphRulesIngester(object):
            entity (rdflib.URIRef): RDFlib Entity
         """
         sparql = GET_DIRECT_PROPS.format(entity_class)
-        result = requests.post(self.rules_url,
+        result = transport.post(self.rules_url,
             data={"query": sparql,
                   "format": "json"})
         bindings = result.json().get('results').get('bindings')
@@ -828,7 +850,7 @@ class BlazegraphRulesIngester(object):
             results = self.__queries__[query_key]
         else:
             sparql = GET_LINKED_CLASSES.format(entity_class)
-            result = requests.post(self.rules_url,
+            result = transport.post(self.rules_url,
                 data={"query": sparql,
                       "format": "json"})
             results = []
@@ -865,7 +887,7 @@ class BlazegraphRulesIngester(object):
                     entity_class,
                     prop,
                     NS_MGR.kds.PropertyLinker)
-                result = requests.post(self.rules_url,
+                result = transport.post(self.rules_url,
                     data={"query": sparql_prop,
                           "format": "json"})
                 bindings = result.json().get('results').get('bindings')
@@ -15,7 +15,7 @@ import inspect
 import logging
 import os
 import rdflib
-import requests
+from bibcat import transport
 import sys
 import uuid
 import pdb
@@ -175,13 +175,13 @@ class LocSubjectConverter(object):
             # drop the locsubject graph
             lg.info("dropping loc subject graph")
             stmt = "DROP GRAPH %s;" % config.RDF_LOC_SUBJECT_GRAPH
-            drop_extensions = requests.post(
+            drop_extensions = transport.post(
                 url=config.TRIPLESTORE_URL,
                 params={"update": stmt})
             lg.info("loading Loc Subjects graph to the triplestore")
             # load the subjects graph to the db
             data = "file:///local_data/%s" % self.local_file_name
-            result = requests.post(
+            result = transport.post(
                     url=config.TRIPLESTORE_URL,
                     params={"context-uri": config.RDF_LOC_SUBJECT_GRAPH,
                             "uri": data})   
@@ -199,7 +199,7 @@ class LocSubjectConverter(object):
         lg.setLevel(self.log_level)
         for query in LOC_SUBJ_QUERIES:
             lg.info("*** Running:\n%s", query)
-            result = requests.post(config.TRIPLESTORE_URL,
+            result = transport.post(config.TRIPLESTORE_URL,
                                    data={"update":NSM.prefix() + query}) 
         lg.info("*** Finished converting subjects")
 
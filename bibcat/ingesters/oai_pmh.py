@@ -2,6 +2,7 @@
 __author__ = "Jeremy Nelson, Mike Stabile"
 
 import click
+import collections
 import datetime
 import io
 import logging
@@ -12,13 +13,16 @@ try:
 except ImportError:
     import xml.etree.ElementTree as etree
 import rdflib
-import requests
 import sys
+import threading
 import urllib.parse
 import uuid
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 
+from .. import transport
 from .ingester import new_graph, NS_MGR, BIBCAT_BASE
 from .rels_ext import RELSEXTIngester
+from .sinks import GraphSink, ntriples
 from rdfframework.connections import ConnManager
 from rdfframework.rml.processor import XMLProcessor
 
@@ -32,111 +36,260 @@ except AttributeError:
     setattr(NS_MGR, 'fedora', 'info:fedora/fedora-system:def/relations-external#')
     setattr(NS_MGR, 'fedora-model', 'info:fedora/fedora-system:def/model#')
 
+def bounded_map(executor, func, iterable, limit):
+    """Generator like executor.map that submits at most limit calls ahead
+    of the consumer, results are yielded in the order of iterable
+
+    Args:
+        executor(concurrent.futures.Executor): Thread or process pool
+        func(function): Function called with each item
+        iterable: Items
+        limit(int): Maximum number of pending calls
+    """
+    pending = collections.deque()
+    for item in iterable:
+        pending.append(executor.submit(func, item))
+        if len(pending) >= limit:
+            yield pending.popleft().result()
+    while len(pending) > 0:
+        yield pending.popleft().result()
+
+
+MAPPER = None
+
+def __init_mapper__(processor_class, processor_kwargs):
+    """Builds the RML processor once in each mapping worker process"""
+    global MAPPER
+    MAPPER = processor_class(**processor_kwargs)
+
+def __map_record__(args):
+    """Maps a serialized OAI-PMH record in a worker process and returns
+    the record's graph as N-Triples"""
+    raw_record, run_kwargs = args
+    MAPPER.run(etree.XML(raw_record), **run_kwargs)
+    return ntriples(MAPPER.output)
+
+
 class OAIPMHIngester(object):
     IDENT_XPATH = "oai_pmh:ListIdentifiers/oai_pmh:header/oai_pmh:identifier"
     TOKEN_XPATH = "oai_pmh:ListIdentifiers/oai_pmh:resumptionToken"
+    RECORD_XPATH = "oai_pmh:ListRecords/oai_pmh:record"
+    RECORD_TOKEN_XPATH = "oai_pmh:ListRecords/oai_pmh:resumptionToken"
 
     def __init__(self, **kwargs):
+        """
+        Keyword args:
+            repository(str): OAI-PMH endpoint
+            sink(bibcat.ingesters.sinks.Sink): Output sink, defaults to an
+                                               in-memory GraphSink
+            prefetch(bool): Request the next page while mapping the
+                            current one, default is True
+            max_requests(int): Number of concurrent datastream requests,
+                               default is 4
+            delay(float): Minimum seconds between requests to the
+                          repository, default is 0
+            workers(int): Number of RML mapping processes, default 1
+                          maps records in this process
+        """
         self.oai_pmh_url = kwargs.get("repository")
         if self.oai_pmh_url is None:
             raise ValueError("repository must have a value")
         self.identifiers = dict()
         self.metadataPrefix = "oai_dc"
+        self.prefetch = kwargs.get("prefetch", True)
+        self.max_requests = kwargs.get("max_requests", 4)
+        self.delay = kwargs.get("delay", 0)
+        self.workers = kwargs.get("workers", 1)
+        self.__request_lock__ = threading.Lock()
+        self.__last_request__ = 0
         metadata_url = "{}?verb=ListMetadataFormats".format(self.oai_pmh_url)
-        metadata_result = requests.get(metadata_url)
+        metadata_result = self.__request__(metadata_url)
         metadata_formats = metadata_result.text
         if isinstance(metadata_result.text, str):
             metadata_formats = metadata_result.text.encode()
         self.metadata_formats_doc = etree.XML(metadata_formats)
         self.processor = None
-        self.repo_graph = None
+        self.processor_kwargs = None
+        self.sink = kwargs.get("sink")
+        if self.sink is None:
+            self.sink = GraphSink()
+
+    @property
+    def repo_graph(self):
+        """In-memory graph of the harvested records, None if the ingester
+        writes to a file or triplestore sink"""
+        return getattr(self.sink, "graph", None)
+
+    def __request__(self, url):
+        """GETs url, waiting until at least delay seconds have passed since
+        the last request to the repository from any thread
+
+        Args:
+            url(str): URL
+        """
+        with self.__request_lock__:
+            wait = self.__last_request__ + self.delay - time.time()
+            if wait > 0:
+                time.sleep(wait)
+            self.__last_request__ = time.time()
+        return transport.get(url)
+
+    def __get_doc__(self, url):
+        """Requests and parses an OAI-PMH response
+
+        Args:
+            url(str): OAI-PMH request URL
+        """
+        result = self.__request__(url)
+        if result.status_code > 399:
+            raise ValueError("Cannot Harvest {}, result {}".format(
+                self.oai_pmh_url,
+                result.text))
+        raw_doc = result.text
+        if isinstance(raw_doc, str):
+            raw_doc = raw_doc.encode()
+        return etree.XML(raw_doc)
+
+    def __pages__(self, params, token_xpath):
+        """Generator of the OAI-PMH response documents for a list request,
+        following resumption tokens until the list is complete. If prefetch
+        is True, the next page is requested in a background thread while
+        the current page is processed.
+
+        Args:
+            params(dict): Initial request parameters
+            token_xpath(str): XPath of the resumptionToken
+        """
+        url = "{0}?{1}".format(self.oai_pmh_url,
+                               urllib.parse.urlencode(params))
+        with ThreadPoolExecutor(max_workers=1) as prefetcher:
+            page = prefetcher.submit(self.__get_doc__, url)
+            while page is not None:
+                doc = page.result()
+                page, url = None, None
+                token = doc.find(token_xpath, NS)
+                if token is not None and token.text:
+                    url = "{0}?{1}".format(
+                        self.oai_pmh_url,
+                        urllib.parse.urlencode(
+                            {"verb": params.get("verb"),
+                             "resumptionToken": token.text}))
+                    if self.prefetch:
+                        page = prefetcher.submit(self.__get_doc__, url)
+                yield doc
+                if url is not None and page is None:
+                    page = prefetcher.submit(self.__get_doc__, url)
+
+    def __map_records__(self, records, mapping_pool=None, **kwargs):
+        """Generator of the mapped graph for each OAI-PMH record, in the
+        order of records
+
+        Args:
+            records(list): OAI-PMH record elements
+            mapping_pool(ProcessPoolExecutor): Optional pool of mapping
+                                               workers
+        """
+        if mapping_pool is None:
+            for rec in records:
+                self.processor.run(rec, **kwargs)
+                yield self.processor.output
+            return
+        jobs = [(etree.tostring(rec), kwargs) for rec in records]
+        chunksize = max(1, len(jobs) // (self.workers * 4))
+        for raw_nt in mapping_pool.map(__map_record__,
+                                       jobs,
+                                       chunksize=chunksize):
+            yield rdflib.Graph().parse(data=raw_nt.decode(), format='nt')
+
+    def __harvest_records__(self, **kwargs):
+        """Harvests all records with ListRecords, mapping and writing each
+        record to the sink. Returns the number of records.
 
-    def __init_doc__(self, **kwargs):
+        Keyword args:
+            setSpec(str): Optional OAI-PMH set
+            dedup(Deduplicator): Optional deduplicator run on each record
+            dedup_batch(bool): Deduplicate each page of records with one
+                               batch of label lookups
+        """
         params = {"verb": "ListRecords",
                   "metadataPrefix": self.metadataPrefix}
         if "setSpec" in kwargs:
             params["set"] = kwargs.get("setSpec")
-        initial_result = requests.get("{0}?{1}".format(
-                self.oai_pmh_url,
-                urllib.parse.urlencode(params)))
-        initial_doc = etree.XML(initial_result.text.encode())
-        token = initial_doc.find("oai_pmh:ListRecords/oai_pmh:resumptionToken", NS)
-        records = initial_doc.findall("oai_pmh:ListRecords/oai_pmh:record", NS)
-        count = 0
         deduplicator = kwargs.get("dedup")
-        for i,rec in enumerate(records):
-            count += 1
-            self.processor.run(rec, **kwargs)
-            if deduplicator is not None:
-                deduplicator.run(self.processor.output)
-            if self.repo_graph is None:
-                self.repo_graph = self.processor.output
-            else:
-                self.repo_graph += self.processor.output
-            if not i%10 and i > 0:
-                try:
-                    click.echo(".", nl=False)
-                except io.UnsupportedOperation:
-                     print(".", end="")
-            if not i%100:
-                try:
-                    click.echo(i, nl=False)
-                except io.UnsupportedOperation:
-                     print(i, end="")
-        return count, token
- 
-    
+        dedup_batch = kwargs.get("dedup_batch", False)
+        run_kwargs = dict([(key, value) for key, value in kwargs.items()
+                           if key != "dedup"])
+        mapping_pool = None
+        if self.workers > 1:
+            mapping_pool = ProcessPoolExecutor(
+                max_workers=self.workers,
+                initializer=__init_mapper__,
+                initargs=(type(self.processor), self.processor_kwargs))
+        count = 0
+        try:
+            for doc in self.__pages__(params,
+                                      OAIPMHIngester.RECORD_TOKEN_XPATH):
+                records = doc.findall(OAIPMHIngester.RECORD_XPATH, NS)
+                graphs = self.__map_records__(records,
+                                              mapping_pool,
+                                              **run_kwargs)
+                if deduplicator is not None and dedup_batch:
+                    graphs = list(graphs)
+                    deduplicator.run_batch(graphs)
+                for graph in graphs:
+                    if deduplicator is not None and not dedup_batch:
+                        deduplicator.run(graph)
+                    self.sink.write(graph)
+                    if not count%10 and count > 0:
+                        try:
+                            click.echo(".", nl=False)
+                        except io.UnsupportedOperation:
+                            print(".", end="")
+                    if not count%100:
+                        try:
+                            click.echo(count, nl=False)
+                        except io.UnsupportedOperation:
+                            print(count, end="")
+                    count += 1
+        finally:
+            if mapping_pool is not None:
+                mapping_pool.shutdown()
+        self.sink.flush()
+        return count
+
     def harvest(self, **kwargs):
         """Method harvests all identifiers using ListIdentifiers"""
         params = {"verb": "ListIdentifiers",
                   "metadataPrefix": self.metadataPrefix}
         if "setSpec" in kwargs:
             params["set"] = kwargs.get("setSpec")
-        initial_url = "{0}?{1}".format(
-            self.oai_pmh_url,
-            urllib.parse.urlencode(params))
-        initial_result = requests.get(initial_url)
-        if initial_result.status_code > 399:
-            raise ValueError("Cannot Harvest {}, result {}".format(
-                self.oai_pmh_url,
-                initial_result.text))
-        raw_initial = initial_result.text
-        if isinstance(raw_initial, str):
-            raw_initial = raw_initial.encode()
-        initial_doc = etree.XML(raw_initial)
-        resume_token = initial_doc.find(OAIPMHIngester.TOKEN_XPATH, NS)
-        for r in initial_doc.findall(OAIPMHIngester.IDENT_XPATH, NS):
-            ident = r.text
-            if not ident in self.identifiers:
-                self.identifiers[ident] = 1
-        if resume_token is not None:
-            total_size = int(resume_token.attrib.get("completeListSize", 0))
-        else:
-            total_size = 0
         sample_size = kwargs.get('sample_size')
         start = datetime.datetime.utcnow()
-        msg = "Started Retrieval of {} Identifiers {}".format(total_size, start)
-        try:
-            click.echo(msg)
-        except io.UnsupportedOperation:
-            print(msg)
-        while len(self.identifiers) < total_size:
-            continue_url = "{0}?verb=ListIdentifiers&resumptionToken={1}".format(
-                self.oai_pmh_url,
-                resume_token.text)
-            result = requests.get(continue_url)
-            shard_raw = result.text
-            if isinstance(shard_raw, str):
-                shard_raw = shard_raw.encode()
-            shard_doc = etree.XML(shard_raw)
-            resume_token = shard_doc.find(OAIPMHIngester.TOKEN_XPATH, NS)
+        total_size = None
+        for i, shard_doc in enumerate(
+                self.__pages__(params, OAIPMHIngester.TOKEN_XPATH)):
             for r in shard_doc.findall(OAIPMHIngester.IDENT_XPATH, NS):
                 if not r.text in self.identifiers:
                     self.identifiers[r.text] = 1
-            try:
-                click.echo(".", nl=False)
-            except io.UnsupportedOperation:
-                print(".", end="")
+            if total_size is None:
+                resume_token = shard_doc.find(OAIPMHIngester.TOKEN_XPATH, NS)
+                if resume_token is not None:
+                    total_size = int(
+                        resume_token.attrib.get("completeListSize", 0))
+                else:
+                    total_size = 0
+                msg = "Started Retrieval of {} Identifiers {}".format(
+                    total_size,
+                    start)
+                try:
+                    click.echo(msg)
+                except io.UnsupportedOperation:
+                    print(msg)
+            elif i > 0:
+                try:
+                    click.echo(".", nl=False)
+                except io.UnsupportedOperation:
+                    print(".", end="")
         # Creates a random sample of identifiers of sample_size length
         if sample_size is not None:
             import random
@@ -175,11 +328,12 @@ class ContentDMIngester(OAIPMHIngester):
         for rulefile in ["bibcat-oai-pmh-dc-xml-to-bf.ttl",
                          "bibcat-base.ttl"]:
             rml_rules.append(rulefile)
-        self.processor = XMLProcessor(
+        self.processor_kwargs = dict(
             institution_iri=kwargs.get("institution_iri"),
             instance_iri = kwargs.get('instance_iri'),
             rml_rules=rml_rules,
             namespaces=NS)
+        self.processor = XMLProcessor(**self.processor_kwargs)
 
     def __process_dc__(self, **kwargs):
         """Method processes Dublin Core RDF"""
@@ -194,45 +348,15 @@ class ContentDMIngester(OAIPMHIngester):
             click.echo(msg)
         except io.UnsupportedOperation:
             print(msg)
-        count, token = self.__init_doc__(**kwargs)
-        while token is not None:
-            params = { "resumptionToken": token.text,
-                       "verb": "ListRecords"}
-            continue_url = "{0}?{1}".format(
-                self.oai_pmh_url,
-                urllib.parse.urlencode(params))
-            shard_result = requests.get(continue_url)
-            shard_doc = etree.XML(shard_result.text.encode())
-            token = shard_doc.find("oai_pmh:ListRecords/oai_pmh:resumptionToken", NS)
-            records = shard_doc.findall("oai_pmh:ListRecords/oai_pmh:record", NS)
-            for rec in records:
-                self.processor.run(rec, **kwargs)
-                self.repo_graph += self.processor.output
-                if not count%10 and count > 0:
-                    try:
-                        click.echo(".", nl=False)
-                    except io.UnsupportedOperation:
-                         print(".", end="")
-                if not count%100:
-                    try:
-                        click.echo(count, nl=False)
-                    except io.UnsupportedOperation:
-                         print(count, end="")
-                count += 1
-                end = datetime.datetime.utcnow()
-            if count > 8000:
-                print(token.text, count)
+        self.__harvest_records__(**kwargs)
+        end = datetime.datetime.utcnow()
         msg = "\nContentDM OAI-PMH harvested at {}, total time {} mins".format(
             end,
             (end-start).seconds / 60.0)
         try:
             click.echo(msg)
         except io.UnsupportedOperation:
-            print(msg)       
-        if 'out_file' in kwargs:
-            self.repo_graph += self.processor.output
-        else:
-            self.add_to_triplestore()
+            print(msg)
 
 
 
@@ -248,9 +372,11 @@ class IslandoraIngester(OAIPMHIngester):
                 "oai2")
         self.repository = kwargs.get('repository')
         super(IslandoraIngester, self).__init__(**kwargs)
-        self.repo_graph = rdflib.Graph()
-        self.repo_graph.namespace_manager.bind("bf", "http://id.loc.gov/ontologies/bibframe/")
-        self.repo_graph.namespace_manager.bind("relators", "http://id.loc.gov/vocabulary/relators/")
+        if kwargs.get("sink") is None:
+            repo_graph = rdflib.Graph()
+            repo_graph.namespace_manager.bind("bf", "http://id.loc.gov/ontologies/bibframe/")
+            repo_graph.namespace_manager.bind("relators", "http://id.loc.gov/vocabulary/relators/")
+            self.sink = GraphSink(repo_graph)
         self.base_url = kwargs.get('base_url')
         rules_ttl = kwargs.get("rules_ttl", [])
         if self.metadata_formats_doc.find(
@@ -262,7 +388,7 @@ class IslandoraIngester(OAIPMHIngester):
             for rule_name in ["bibcat-base.ttl", 
                               "mods-to-bf.ttl"]:
                 rules_ttl.append(rule_name)
-            self.processor = XMLProcessor(
+            self.processor_kwargs = dict(
                 rml_rules=rules_ttl,
                 base_url=self.base_url,
                 triplestore_url=kwargs.get("triplestore_url"),
@@ -272,8 +398,8 @@ class IslandoraIngester(OAIPMHIngester):
             rules_ttl.append(
                 os.path.join(BIBCAT_BASE,
                     os.path.join("rdfw-definitions", "bibcat-base.ttl")))
-            self.processor = XMLProcessor(
-                rml_rules=rules_ttl)
+            self.processor_kwargs = dict(rml_rules=rules_ttl)
+        self.processor = XMLProcessor(**self.processor_kwargs)
 
 
     def __process_mods__(self, **kwargs):
@@ -281,11 +407,14 @@ class IslandoraIngester(OAIPMHIngester):
 
         keyword args:
             item_url(str): URL For Fedora URL
+            mods_result(requests.Response): Optional prefetched MODS
         """
         item_url = kwargs.get('item_url')
-        mods_url = urllib.parse.urljoin(item_url,
-            "datastream/MODS")
-        mods_result = requests.get(mods_url)
+        mods_result = kwargs.get('mods_result')
+        if mods_result is None:
+            mods_url = urllib.parse.urljoin(item_url,
+                "datastream/MODS")
+            mods_result = self.__request__(mods_url)
         base_url = kwargs.get("base_url")
         if base_url is None and "base_url" in self.processor.constants:
             base_url = self.processor.constants.get("base_url")
@@ -319,11 +448,18 @@ class IslandoraIngester(OAIPMHIngester):
                 item_url))
 
     def __process_rels_ext__(self, **kwargs):
-        """Extracts RELS-EXT and returns RELS-EXT ingester"""
+        """Extracts RELS-EXT and returns RELS-EXT ingester
+
+        keyword args:
+            item_url(str): URL For Fedora URL
+            rels_ext_result(requests.Response): Optional prefetched RELS-EXT
+        """
         item_url = kwargs.get('item_url')
-        rels_ext_url = urllib.parse.urljoin(item_url,
-            "datastream/RELS-EXT")
-        rels_ext_result = requests.get(rels_ext_url)
+        rels_ext_result = kwargs.get('rels_ext_result')
+        if rels_ext_result is None:
+            rels_ext_url = urllib.parse.urljoin(item_url,
+                "datastream/RELS-EXT")
+            rels_ext_result = self.__request__(rels_ext_url)
         if rels_ext_result.status_code > 399:
             error = "{} RELS-EXT not found".format(item_url)
             try:
@@ -344,6 +480,20 @@ class IslandoraIngester(OAIPMHIngester):
             return None, None
         return rels_ext, rels_ext_doc
 
+    def __fetch_datastreams__(self, item_url):
+        """Requests the RELS-EXT and, if found, the MODS datastreams of an
+        item, returns a tuple of the item_url and both responses
+
+        Args:
+            item_url(str): URL For Fedora URL
+        """
+        rels_ext_result = self.__request__(
+            urllib.parse.urljoin(item_url, "datastream/RELS-EXT"))
+        mods_result = None
+        if rels_ext_result.status_code < 400:
+            mods_result = self.__request__(
+                urllib.parse.urljoin(item_url, "datastream/MODS"))
+        return item_url, rels_ext_result, mods_result
 
     def harvest(self, **kwargs):
         """Overloaded harvest method takes optional RELS-EXT ttl file"""
@@ -359,44 +509,56 @@ class IslandoraIngester(OAIPMHIngester):
             sample_size=sample_size,
             setSpec=kwargs.get('setSpec'))
         deduplicator = kwargs.get('dedup')
-        for i,row in enumerate(self.identifiers.keys()):
-            if not i%10 and i > 0:
-                try:
-                    click.echo(".", nl=False)
-                except io.UnsupportedOperation:
-                    print(".", end="")
-            if not i%100:
-                try:
-                    click.echo(i, nl=False)
-                except io.UnsupportedOperation:
-                    print(i, end="")
+        item_urls = []
+        for row in self.identifiers.keys():
             pid = row.split(":")[-1].replace("_", ":")
-            item_url = urllib.parse.urljoin(self.repository,
-                "islandora/object/{0}/".format(pid))
-            item_uri = rdflib.URIRef(item_url)
-            rels_ext, rels_ext_doc = self.__process_rels_ext__(
-                item_url=item_url)
-            if rels_ext is None:
-                continue
-            self.__process_mods__(item_url=item_url)
-            instance_uri = self.processor.output.value(
-                subject=item_uri,
-                predicate=NS_MGR.bf.itemOf)
-            work_uri = self.processor.output.value(
-                subject=instance_uri,
-                predicate=NS_MGR.bf.instanceOf)
-            rels_ext.run(rels_ext_doc,
-                instance_iri=instance_uri,
-                work_iri=work_uri)
-            self.processor.output += rels_ext.output
-            if deduplicator:
-                deduplicator.run(self.processor.output,
-                    kwargs.get("dedup_classes"))
-            logging.info(" processed {}, triples count {:,}".format(
-                item_url, 
-                len(self.processor.output)))
-            self.repo_graph += self.processor.output
-        if 'out_file' in kwargs:
+            item_urls.append(urllib.parse.urljoin(self.repository,
+                "islandora/object/{0}/".format(pid)))
+        # Datastreams are requested by a bounded thread pool ahead of the
+        # mapping of each item
+        with ThreadPoolExecutor(max_workers=self.max_requests) as fetcher:
+            for i, (item_url, rels_ext_result, mods_result) in enumerate(
+                    bounded_map(fetcher,
+                                self.__fetch_datastreams__,
+                                item_urls,
+                                self.max_requests * 2)):
+                if not i%10 and i > 0:
+                    try:
+                        click.echo(".", nl=False)
+                    except io.UnsupportedOperation:
+                        print(".", end="")
+                if not i%100:
+                    try:
+                        click.echo(i, nl=False)
+                    except io.UnsupportedOperation:
+                        print(i, end="")
+                item_uri = rdflib.URIRef(item_url)
+                rels_ext, rels_ext_doc = self.__process_rels_ext__(
+                    item_url=item_url,
+                    rels_ext_result=rels_ext_result)
+                if rels_ext is None:
+                    continue
+                self.__process_mods__(item_url=item_url,
+                                      mods_result=mods_result)
+                instance_uri = self.processor.output.value(
+                    subject=item_uri,
+                    predicate=NS_MGR.bf.itemOf)
+                work_uri = self.processor.output.value(
+                    subject=instance_uri,
+                    predicate=NS_MGR.bf.instanceOf)
+                rels_ext.run(rels_ext_doc,
+                    instance_iri=instance_uri,
+                    work_iri=work_uri)
+                self.processor.output += rels_ext.output
+                if deduplicator:
+                    deduplicator.run(self.processor.output,
+                        kwargs.get("dedup_classes"))
+                logging.info(" processed {}, triples count {:,}".format(
+                    item_url, 
+                    len(self.processor.output)))
+                self.sink.write(self.processor.output)
+        self.sink.flush()
+        if 'out_file' in kwargs and self.repo_graph is not None:
             with open(kwargs.get('out_file'), 'wb+') as fo:
                 fo.write(self.repo_graph.serialize(format='turtle'))
         end = datetime.datetime.utcnow()
@@ -413,15 +575,15 @@ class LunaIngester(OAIPMHIngester):
     
     def __init__(self, **kwargs):
         super(LunaIngester, self).__init__(**kwargs)
-        self.processor = XMLProcessor(
+        self.processor_kwargs = dict(
             triplestore_url=kwargs.get("triplestore_url"),
             base_url=kwargs.get("base_url"),
             rml_rules=["bibcat-base.ttl", 
                        "oai-pmh-dc-xml-to-bf.ttl"],
             namespaces=NS)
+        self.processor = XMLProcessor(**self.processor_kwargs)
 
     def harvest(self, **kwargs):
-        deduplicator = kwargs.get('dedup')
         start = datetime.datetime.utcnow()
         msg = "Starting OAI-PMH harvest of PIDS from Luna at {}".format(
             start)
@@ -429,34 +591,4 @@ class LunaIngester(OAIPMHIngester):
             click.echo(msg)
         except io.UnsupportedOperation:
             print(msg)
-        count, token = self.__init_doc__(**kwargs)
-        while token is not None:
-            params = { "resumptionToken": token.text,
-                       "verb": "ListRecords"}
-            continue_url = "{0}?{1}".format(
-                self.oai_pmh_url,
-                urllib.parse.urlencode(params))
-            shard_result = requests.get(continue_url)
-            shard_doc = etree.XML(shard_result.text.encode())
-            token = shard_doc.find("oai_pmh:ListRecords/oai_pmh:resumptionToken", NS)
-            records = shard_doc.findall("oai_pmh:ListRecords/oai_pmh:record", NS)
-            for rec in records:
-                self.processor.run(rec, **kwargs)
-                if deduplicator is not None:
-                    deduplicator.run(self.processor.output)
-                self.repo_graph += self.processor.output
-                if not count%10 and count > 0:
-                    try:
-                        click.echo(".", nl=False)
-                    except io.UnsupportedOperation:
-                         print(".", end="")
-                if not count%100:
-                    try:
-                        click.echo(count, nl=False)
-                    except io.UnsupportedOperation:
-                         print(count, end="")
-                count += 1
-                end = datetime.datetime.utcnow()
-            if count > 8000:
-                print(token.text, count)
-
+        self.__harvest_records__(**kwargs)
@@ -0,0 +1,218 @@
+"""Output sinks for ingesters, records are written to a sink as they are
+mapped instead of being merged into one repository graph
+
+>>> from bibcat.ingesters.sinks import NTriplesSink
+>>> with NTriplesSink("/tmp/harvest.nt.gz") as sink:
+...     sink.write(record_graph)
+
+"""
+__author__ = "Jeremy Nelson, Mike Stabile"
+
+import gzip
+import logging
+import queue
+import threading
+
+import rdflib
+import requests
+
+from .. import transport
+from ..rml.buffer import nquads, ntriples
+
+
+class Sink(object):
+    """Base class for ingester output sinks, child classes must override
+    write"""
+
+    def __init__(self):
+        self.records, self.triples = 0, 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def write(self, graph):
+        """Writes a record's graph to the sink
+
+        Args:
+            graph(rdflib.Graph): RDF Graph of one record
+        """
+        self.records += 1
+        self.triples += len(graph)
+
+    def flush(self):
+        """Flushes any buffered records"""
+        pass
+
+    def close(self):
+        """Flushes and closes the sink"""
+        self.flush()
+
+
+class GraphSink(Sink):
+    """Merges every record into a single in-memory rdflib.Graph"""
+
+    def __init__(self, graph=None):
+        super(GraphSink, self).__init__()
+        if graph is None:
+            graph = rdflib.Graph()
+        self.graph = graph
+
+    def write(self, graph):
+        super(GraphSink, self).write(graph)
+        self.graph += graph
+
+
+class NTriplesSink(Sink):
+    """Appends each record as N-Triples, or as N-Quads if graph_iri is
+    set, to a file. Files ending in .gz are gzip compressed."""
+
+    def __init__(self, path, graph_iri=None, compress=None):
+        """
+        Args:
+            path(str): Output file path
+            graph_iri(str): Named graph IRI, writes N-Quads if not None
+            compress(bool): gzip output, defaults to True if path ends
+                            with .gz
+        """
+        super(NTriplesSink, self).__init__()
+        self.path = path
+        self.graph_iri = graph_iri
+        if compress is None:
+            compress = path.endswith(".gz")
+        if compress:
+            self.output = gzip.open(path, "ab")
+        else:
+            self.output = open(path, "ab")
+
+    def write(self, graph):
+        super(NTriplesSink, self).write(graph)
+        if self.graph_iri is None:
+            self.output.write(ntriples(graph))
+        else:
+            self.output.write(nquads(graph, self.graph_iri))
+
+    def flush(self):
+        self.output.flush()
+
+    def close(self):
+        if not self.output.closed:
+            self.output.close()
+
+
+class TriplestoreSink(Sink):
+    """Buffers records as N-Triples, or as N-Quads if graph_iri is set, and
+    POSTs them to a triplestore every batch_size records. Batches can be
+    gzip compressed and uploaded on a background thread so mapping
+    continues while a batch is sent."""
+
+    def __init__(self, triplestore_url, batch_size=500, **kwargs):
+        """
+        Args:
+            triplestore_url(str): SPARQL endpoint that accepts POSTed
+                                  N-Triples, i.e. Blazegraph
+            batch_size(int): Number of records per POST
+
+        Keyword args:
+            graph_iri(str): Named graph IRI, POSTs N-Quads if not None
+            compress(bool): gzip request bodies, for endpoints accepting
+                            Content-Encoding gzip, defaults to False
+            background(bool): Upload batches on a background thread,
+                              defaults to False
+            max_pending(int): Batches waiting for the background thread
+                              before write blocks, defaults to 2
+        """
+        super(TriplestoreSink, self).__init__()
+        self.triplestore_url = triplestore_url
+        self.batch_size = batch_size
+        self.graph_iri = kwargs.get("graph_iri")
+        self.compress = kwargs.get("compress", False)
+        self.requests, self.errors = 0, 0
+        self.__buffer__, self.__buffered__ = [], 0
+        self.__uploads__, self.__uploader__ = None, None
+        if kwargs.get("background", False):
+            self.__uploads__ = queue.Queue(
+                maxsize=kwargs.get("max_pending", 2))
+            self.__uploader__ = threading.Thread(target=self.__upload_loop__,
+                                                 daemon=True)
+            self.__uploader__.start()
+
+    def write(self, graph):
+        super(TriplestoreSink, self).write(graph)
+        if self.graph_iri is None:
+            self.__buffer__.append(ntriples(graph))
+        else:
+            self.__buffer__.append(nquads(graph, self.graph_iri))
+        self.__buffered__ += 1
+        if self.__buffered__ >= self.batch_size:
+            self.__send__()
+
+    def __upload__(self, data):
+        """POSTs one batch of N-Triples or N-Quads"""
+        headers = {"Content-Type": "text/plain"}
+        if self.graph_iri is not None:
+            headers["Content-Type"] = "text/x-nquads"
+        if self.compress:
+            data = gzip.compress(data)
+            headers["Content-Encoding"] = "gzip"
+        self.requests += 1
+        try:
+            result = transport.post(
+                self.triplestore_url,
+                data=data,
+                headers=headers)
+        except requests.RequestException as error:
+            self.errors += 1
+            logging.error("Could not add batch to {}, {}".format(
+                self.triplestore_url,
+                error))
+            return
+        if result.status_code > 399:
+            self.errors += 1
+            logging.error("Could not add batch to {}, status={}".format(
+                self.triplestore_url,
+                result.status_code))
+
+    def __upload_loop__(self):
+        """Background thread uploading queued batches until None"""
+        while True:
+            data = self.__uploads__.get()
+            try:
+                if data is None:
+                    return
+                self.__upload__(data)
+            except Exception:
+                # Keeps consuming batches, write and flush would block on
+                # the queue of a stopped thread
+                self.errors += 1
+                logging.exception("Could not add batch to {}".format(
+                    self.triplestore_url))
+            finally:
+                self.__uploads__.task_done()
+
+    def __send__(self):
+        """Uploads the buffered records or queues them for the background
+        thread"""
+        if self.__buffered__ < 1:
+            return
+        data = b"".join(self.__buffer__)
+        self.__buffer__, self.__buffered__ = [], 0
+        if self.__uploads__ is None:
+            self.__upload__(data)
+        else:
+            self.__uploads__.put(data)
+
+    def flush(self):
+        """Sends the buffered records and waits for any queued batches"""
+        self.__send__()
+        if self.__uploads__ is not None:
+            self.__uploads__.join()
+
+    def close(self):
+        self.flush()
+        if self.__uploader__ is not None:
+            self.__uploads__.put(None)
+            self.__uploader__.join()
+            self.__uploader__ = None
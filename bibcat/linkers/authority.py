@@ -0,0 +1,213 @@
+"""Local authority index of normalized labels to entity IRIs by RDF class,
+used by the Deduplicator to resolve recurring agents, topics and other
+entities without asking the triplestore again
+
+>>> from bibcat.linkers.authority import AuthorityIndex
+>>> index = AuthorityIndex(path="authorities.sqlite")
+>>> index.warm("http://localhost:9999/blazegraph/sparql", [BF.Person])
+>>> index.get(BF.Person, rdflib.Literal("Smith, John."))
+rdflib.term.URIRef('https://bibcat.org/person/smith-john')
+"""
+__author__ = "Jeremy Nelson"
+
+import collections
+import re
+import sqlite3
+import threading
+
+import rdflib
+
+from bibcat import transport
+
+WARM_QUERY = """prefix rdf: <http://www.w3.org/1999/02/22-rdf-syntax-ns#>
+prefix rdfs: <http://www.w3.org/2000/01/rdf-schema#>
+
+SELECT DISTINCT ?entity ?label
+WHERE {{
+    ?entity rdf:type <{0}> .
+    {{ ?entity rdfs:label ?label . }}
+    UNION
+    {{ ?entity rdf:value ?label . }}
+    FILTER(isIRI(?entity))
+}} ORDER BY ?entity LIMIT {1}"""
+
+
+def normalize(label):
+    """Returns the normalized form of a label, case folded with runs of
+    whitespace collapsed and trailing punctuation removed
+
+    Args:
+        label(str|rdflib.Literal): Label
+    """
+    label = re.sub(r"\s+", " ", str(label)).strip().casefold()
+    return label.rstrip(" .,;:/")
+
+
+class AuthorityIndex(object):
+    """LRU index of normalized label to IRI for each RDF class, optionally
+    persisted to a SQLite file between runs"""
+
+    def __init__(self, max_size=100000, path=None):
+        """
+        Args:
+            max_size(int): Maximum labels kept in memory for each class
+            path(str): Optional SQLite file persisting the index
+        """
+        self.max_size = max_size
+        self.path = path
+        self.hits, self.misses = 0, 0
+        self.__classes__ = dict()
+        self.__lock__ = threading.Lock()
+        # IRIs added since the last flush by class and label
+        self.__pending__ = collections.OrderedDict()
+        self.db = None
+        if path is not None:
+            self.db = sqlite3.connect(path, check_same_thread=False)
+            self.db.execute("""CREATE TABLE IF NOT EXISTS authority (
+                class TEXT, label TEXT, iri TEXT,
+                PRIMARY KEY (class, label))""")
+            self.db.commit()
+
+    def __lru__(self, iri_class):
+        lru = self.__classes__.get(str(iri_class))
+        if lru is None:
+            lru = collections.OrderedDict()
+            self.__classes__[str(iri_class)] = lru
+        return lru
+
+    def __remember__(self, iri_class, key, iri):
+        lru = self.__lru__(iri_class)
+        lru[key] = iri
+        lru.move_to_end(key)
+        if len(lru) > self.max_size:
+            lru.popitem(last=False)
+
+    def __stored__(self, iri_class, key):
+        """Returns the IRI of the key waiting to be flushed or in the
+        SQLite file, None if the key was never added or was evicted from
+        an index without a file"""
+        iri = self.__pending__.get((str(iri_class), key))
+        if iri is None and self.db is not None:
+            row = self.db.execute(
+                "SELECT iri FROM authority WHERE class=? AND label=?",
+                (str(iri_class), key)).fetchone()
+            if row is not None:
+                iri = row[0]
+        if iri is not None:
+            return rdflib.URIRef(iri)
+        return None
+
+    def get(self, iri_class, label):
+        """Returns the IRI of an entity of iri_class with the label or None
+
+        Args:
+            iri_class(rdflib.URIRef): RDF class
+            label(str|rdflib.Literal): Label
+        """
+        key = normalize(label)
+        with self.__lock__:
+            lru = self.__lru__(iri_class)
+            iri = lru.get(key)
+            if iri is not None:
+                lru.move_to_end(key)
+                self.hits += 1
+                return iri
+            iri = self.__stored__(iri_class, key)
+            if iri is not None:
+                self.__remember__(iri_class, key, iri)
+                self.hits += 1
+                return iri
+            self.misses += 1
+        return None
+
+    def add(self, iri_class, label, iri):
+        """Adds a label's IRI to the index, the first IRI for a label wins,
+        including an IRI evicted from memory but kept in the SQLite file
+
+        Args:
+            iri_class(rdflib.URIRef): RDF class
+            label(str|rdflib.Literal): Label
+            iri(rdflib.URIRef): Entity IRI
+        """
+        key = normalize(label)
+        with self.__lock__:
+            if key in self.__lru__(iri_class):
+                return
+            stored = self.__stored__(iri_class, key)
+            if stored is not None:
+                self.__remember__(iri_class, key, stored)
+                return
+            self.__remember__(iri_class, key, rdflib.URIRef(iri))
+            if self.db is not None:
+                self.__pending__[(str(iri_class), key)] = str(iri)
+
+    def warm(self, triplestore_url, rdf_classes):
+        """Loads up to max_size existing labels of each class from the
+        triplestore
+
+        Args:
+            triplestore_url(str): SPARQL endpoint
+            rdf_classes(list): RDF classes
+        """
+        for iri_class in rdf_classes:
+            result = transport.post(triplestore_url,
+                data={"query": WARM_QUERY.format(iri_class, self.max_size),
+                      "format": "json"})
+            if result.status_code > 399:
+                continue
+            for binding in result.json().get('results').get('bindings'):
+                self.add(iri_class,
+                         binding.get('label').get('value'),
+                         binding.get('entity').get('value'))
+        self.flush()
+
+    def invalidate(self, iri_class=None, label=None):
+        """Removes a label of a class, all labels of a class, or with no
+        arguments the whole index, from memory and the SQLite file
+
+        Args:
+            iri_class(rdflib.URIRef): Optional RDF class
+            label(str|rdflib.Literal): Optional label
+        """
+        with self.__lock__:
+            if iri_class is None:
+                self.__classes__.clear()
+                self.__pending__.clear()
+                sql, params = "DELETE FROM authority", ()
+            elif label is None:
+                self.__classes__.pop(str(iri_class), None)
+                for pending in list(self.__pending__):
+                    if pending[0] == str(iri_class):
+                        del self.__pending__[pending]
+                sql, params = "DELETE FROM authority WHERE class=?", \
+                    (str(iri_class),)
+            else:
+                key = normalize(label)
+                self.__lru__(iri_class).pop(key, None)
+                self.__pending__.pop((str(iri_class), key), None)
+                sql = "DELETE FROM authority WHERE class=? AND label=?"
+                params = (str(iri_class), key)
+            if self.db is not None:
+                self.db.execute(sql, params)
+                self.db.commit()
+
+    def flush(self):
+        """Writes labels added since the last flush to the SQLite file"""
+        with self.__lock__:
+            if self.db is None or len(self.__pending__) < 1:
+                return
+            self.db.executemany(
+                "INSERT OR IGNORE INTO authority VALUES (?, ?, ?)",
+                [(iri_class, key, iri) for (iri_class, key), iri
+                 in self.__pending__.items()])
+            self.db.commit()
+            self.__pending__.clear()
+
+    def close(self):
+        self.flush()
+        if self.db is not None:
+            self.db.close()
+            self.db = None
+
+    def __len__(self):
+        return sum([len(lru) for lru in self.__classes__.values()])
@@ -2,6 +2,7 @@
 __author__ = "Jeremy Nelson, Mike Stabile"
 
 import os
+from bibcat import transport
 from linker import Linker, LinkerError, PROJECT_BASE, new_graph 
 
 CARRIERS = new_graph()
@@ -21,7 +22,7 @@ class CarrierLinker(Linker):
 
     def run(self):
         """Method runs the linker on existing triplestore"""
-        result = requests.post(self.triplestore_url,
+        result = transport.post(self.triplestore_url,
             data={"query": CARRIER_SPARQL,
                   "format": "json"})
         if result.status_code > 399:
@@ -2,9 +2,9 @@
 __author__ = "Jeremy Nelson, Mike Stabile"
 
 import rdflib
-import requests
 import urllib.parse
 
+from bibcat import transport
 from .linker import Linker, NS_MGR
 
 class DBPediaLinker(Linker):
@@ -70,7 +70,7 @@ class DBPediaLinker(Linker):
         output = []
         for type_ in types:
             query = sparql.format(type_, label)
-            result = requests.post(self.SPARQL_ENDPOINT,
+            result = transport.post(self.SPARQL_ENDPOINT,
                                    data={"query": query,
                                          "format": "json"})
             if result.status_code < 399:
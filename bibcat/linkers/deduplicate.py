@@ -2,11 +2,15 @@
 target RDF classes on the input RDF graph, generates new IRIs in the triplestore
 """
 
+import collections
+import os
+import zlib
+from concurrent.futures import ProcessPoolExecutor
 from types import SimpleNamespace
 import rdflib
-import requests
 
-from bibcat import replace_iri, slugify
+from bibcat import rewrite_iris, slugify, transport
+from bibcat.linkers.authority import AuthorityIndex, normalize
 try:
     import instance.config as config
 except ImportError:
@@ -18,6 +22,30 @@ __author__ = "Jeremy Nelson"
 
 SKOS = rdflib.Namespace("http://www.w3.org/2004/02/skos/core#")
 
+LABEL_QUERY = """prefix rdf: <http://www.w3.org/1999/02/22-rdf-syntax-ns#>
+prefix rdfs: <http://www.w3.org/2000/01/rdf-schema#>
+
+SELECT DISTINCT ?entity ?label
+WHERE {{
+    VALUES ?label {{ {1} }}
+    {{ ?entity rdfs:label ?label . }}
+    UNION
+    {{ ?entity rdf:value ?label . }}
+    ?entity rdf:type <{0}> .
+    FILTER(isIRI(?entity))
+}} ORDER BY ?entity"""
+
+
+def label_key(label):
+    """Returns the lookup key of a label, the literal's string value and
+    language so that plain and xsd:string literals match
+
+    Args:
+        label(rdflib.Literal): Label
+    """
+    return str(label), getattr(label, "language", None)
+
+
 class Deduplicator(object):
     """Class de-duplicates and generates IRIs"""
 
@@ -29,6 +57,62 @@ class Deduplicator(object):
         self.subject_pattern = kwargs.get("subject_pattern",
             "{base_url}{class_name}/{label}")
         self.base_url = kwargs.get("base_url")
+        # Maximum number of labels bound in one VALUES query
+        self.batch_size = kwargs.get("batch_size", 500)
+        # Optional bibcat.linkers.authority.AuthorityIndex
+        self.index = kwargs.get("index")
+        self.requests = 0
+        # Pending IRI rewrites of each graph, applied by __flush__
+        self.rewrites = collections.OrderedDict()
+
+    def __mint__(self, iri_class, label):
+        """Mints a new IRI based on class and slugged label
+
+        Args:
+
+        -----
+            iri_class: rdflib.URIRef class IRI
+            label: rdflib.Literal label
+        """
+        class_name = str(iri_class).split("/")[-1].lower()
+        new_url = self.subject_pattern.format(
+            base_url=self.base_url,
+            class_name=class_name,
+            label=slugify(label))
+        return rdflib.URIRef(new_url)
+
+    def __replace__(self, graph, old_iri, entity_iri):
+        """Queues the replacement of old_iri with entity_iri in the graph,
+        the first replacement of an IRI wins
+
+        Args:
+
+        -----
+            graph: rdflib.Graph
+            old_iri: rdflib.URIRef or rdflib.BNode
+            entity_iri: rdflib.URIRef
+        """
+        graph_rewrites = self.rewrites.setdefault(id(graph), (graph, dict()))
+        graph_rewrites[1].setdefault(old_iri, entity_iri)
+
+    def __queued__(self, graph, old_iri):
+        """Returns True if a replacement of old_iri in the graph is
+        queued"""
+        return old_iri in self.rewrites.get(id(graph), (graph, dict()))[1]
+
+    def __flush__(self):
+        """Applies the queued replacements to each graph in one bulk
+        rewrite and adds old IRIs as owl:sameAs of their entities, then
+        writes the labels added to the index to its SQLite file"""
+        for graph, mapping in self.rewrites.values():
+            rewrite_iris(graph, mapping, in_place=True)
+            for old_iri, entity_iri in mapping.items():
+                if isinstance(old_iri, rdflib.URIRef) and \
+                        entity_iri != old_iri:
+                    graph.add((entity_iri, rdflib.OWL.sameAs, old_iri))
+        self.rewrites.clear()
+        if self.index is not None:
+            self.index.flush()
 
     def __get_or_mint__(self, old_iri, iri_class, label):
         """Attempts to retrieve any existing IRIs that match the label
@@ -42,6 +126,11 @@ class Deduplicator(object):
             iri_class: rdflib.URIRef predicate IRI
             label: string of rdflib.Literal for the RDFS label
         """
+        if self.index is not None:
+            entity_iri = self.index.get(iri_class, label)
+            if entity_iri is not None:
+                self.__replace__(self.output, old_iri, entity_iri)
+                return entity_iri
         sparql = """prefix bf: <http://id.loc.gov/ontologies/bibframe/>
         prefix rdf: <http://www.w3.org/1999/02/22-rdf-syntax-ns#>
         prefix rdfs: <http://www.w3.org/2000/01/rdf-schema#>
@@ -54,10 +143,10 @@ class Deduplicator(object):
             FILTER(CONTAINS(?label, \"""{1}\"""))
             FILTER(isIRI(?entity))
         }}""".format(iri_class, label)
-        result = requests.post(self.triplestore_url,
+        self.requests += 1
+        result = transport.post(self.triplestore_url,
             data={"query": sparql,
                   "format": "json"})
-        #import pdb; pdb.set_trace()
         if result.status_code > 399:
             return
         bindings = result.json().get('results').get('bindings')
@@ -72,22 +161,74 @@ class Deduplicator(object):
                                  SKOS.altLabel, 
                                  label))
         else:
-            class_name = str(iri_class).split("/")[-1].lower()
-            # Mint new IRI based on class and slugged label
-            new_url = self.subject_pattern.format(
-                base_url=self.base_url,
-                class_name=class_name,
-                label=slugify(label))
-            entity_iri = rdflib.URIRef(new_url)
-            #self.output.add((entity_iri, rdflib.RDFS.label, label))
-        replace_iri(self.output, old_iri, entity_iri)
-        # Add old iri as owl:sameAs to entity_iri
-        if isinstance(old_iri, rdflib.URIRef) and  entity_iri != old_iri:
-            self.output.add((entity_iri, 
-                             rdflib.OWL.sameAs,
-                             old_iri))
+            entity_iri = self.__mint__(iri_class, label)
+        if self.index is not None:
+            self.index.add(iri_class, label, entity_iri)
+        self.__replace__(self.output, old_iri, entity_iri)
         return entity_iri
 
+    def __resolve_labels__(self, iri_class, labels):
+        """Looks up existing entities of iri_class with exactly matching
+        labels, batch_size labels per VALUES query. Returns a dict of
+        label_key to the first matching IRI or None if not found, labels
+        of a failed query are left out.
+
+        Args:
+
+        -----
+            iri_class: rdflib.URIRef class IRI
+            labels: list of rdflib.Literal labels
+        """
+        resolved = dict()
+        for start in range(0, len(labels), self.batch_size):
+            chunk = labels[start:start + self.batch_size]
+            sparql = LABEL_QUERY.format(
+                iri_class,
+                " ".join([label.n3() for label in chunk]))
+            self.requests += 1
+            result = transport.post(self.triplestore_url,
+                data={"query": sparql,
+                      "format": "json"})
+            if result.status_code > 399:
+                continue
+            for label in chunk:
+                resolved[label_key(label)] = None
+            for binding in result.json().get('results').get('bindings'):
+                key = (binding.get('label').get('value'),
+                       binding.get('label').get('xml:lang'))
+                if resolved.get(key) is None:
+                    resolved[key] = rdflib.URIRef(
+                        binding.get('entity').get('value'))
+        return resolved
+
+    def __candidates__(self, graphs, iri_class, seen=None):
+        """Returns a list of (graph, entity, label) tuples for the labelled
+        entities of iri_class in the graphs, with the rdfs:label, or else
+        the rdf:value, of each entity not in seen
+
+        Args:
+
+        -----
+            graphs: list of rdflib.Graph
+            iri_class: rdflib.URIRef class IRI
+            seen: set of graph id and entity tuples of the candidates of
+                  earlier classes, updated with these candidates
+        """
+        if seen is None:
+            seen = set()
+        candidates = []
+        for graph in graphs:
+            for entity in list(graph.subjects(predicate=rdflib.RDF.type,
+                                              object=iri_class)):
+                if (id(graph), entity) in seen:
+                    continue
+                for predicate in [rdflib.RDFS.label, rdflib.RDF.value]:
+                    label = graph.value(subject=entity, predicate=predicate)
+                    if label is not None:
+                        candidates.append((graph, entity, label))
+                        seen.add((id(graph), entity))
+                        break
+        return candidates
 
     def run(self, input_graph, rdf_classes=[]):
         """Takes a graph and deduplicates various RDF classes
@@ -104,32 +245,201 @@ class Deduplicator(object):
             rdf_classes = []
         all_classes = self.default_classes + rdf_classes
         for class_ in all_classes:
-            for entity in self.output.subjects(
+            for entity in list(self.output.subjects(
                     predicate=rdflib.RDF.type,
-                    object=class_):
-                label = self.output.value(subject=entity,
-                                          predicate=rdflib.RDFS.label)
-                if label is not None:
-                    self.__get_or_mint__(entity, class_, label)
-                value = self.output.value(subject=entity,
-                                          predicate=rdflib.RDF.value)
-                if value is not None:
-                    self.__get_or_mint__(entity, class_, value)
+                    object=class_)):
+                for predicate in [rdflib.RDFS.label, rdflib.RDF.value]:
+                    if self.__queued__(self.output, entity):
+                        # Replaced by its label or an earlier class, only
+                        # the first replacement is applied
+                        break
+                    label = self.output.value(subject=entity,
+                                              predicate=predicate)
+                    if label is not None:
+                        self.__get_or_mint__(entity, class_, label)
+        self.__flush__()
+
+    def __resolve__(self, iri_class, labels):
+        """Resolves labels of iri_class to the IRIs of existing entities,
+        from the index or the triplestore, or mints new IRIs. Returns a
+        dict of label_key to IRI, labels of a failed lookup are left out.
+
+        Args:
+
+        -----
+            iri_class: rdflib.URIRef class IRI
+            labels: list of rdflib.Literal labels in record order
+        """
+        pending, resolved = collections.OrderedDict(), dict()
+        for label in labels:
+            key = label_key(label)
+            if key in pending or key in resolved:
+                continue
+            if self.index is not None:
+                entity_iri = self.index.get(iri_class, label)
+                if entity_iri is not None:
+                    resolved[key] = entity_iri
+                    continue
+            pending[key] = label
+        found = self.__resolve_labels__(iri_class, list(pending.values()))
+        for key, label in pending.items():
+            if key not in found:
+                # Lookup failed, leave entity as is
+                continue
+            entity_iri = found.get(key)
+            if entity_iri is None and self.index is not None:
+                # Another spelling of the label may have been minted
+                # earlier in this batch
+                entity_iri = self.index.get(iri_class, label)
+            if entity_iri is None:
+                entity_iri = self.__mint__(iri_class, label)
+            if self.index is not None:
+                self.index.add(iri_class, label, entity_iri)
+            resolved[key] = entity_iri
+        return resolved
+
+    def run_batch(self, graphs, rdf_classes=[]):
+        """Deduplicates a batch of graphs, the labels of each class are
+        collected across all of the graphs and resolved with exact-match
+        VALUES queries, then IRIs are minted or replaced locally
+
+        Args:
+
+        -----
+            graphs: list of rdflib.Graph, i.e. one per record
+            rdf_classes: list of RDF Classes to use in filtering
+                         IRIs
+        """
+        if rdf_classes is None:
+            rdf_classes = []
+        all_classes = self.default_classes + rdf_classes
+        seen = set()
+        for class_ in all_classes:
+            candidates = self.__candidates__(graphs, class_, seen)
+            if len(candidates) < 1:
+                continue
+            resolved = self.__resolve__(
+                class_,
+                [label for graph, entity, label in candidates])
+            for graph, entity, label in candidates:
+                entity_iri = resolved.get(label_key(label))
+                if entity_iri is not None:
+                    self.__replace__(graph, entity, entity_iri)
+        self.__flush__()
+
 
+DEDUPLICATOR = None
+
+def __init_worker__(deduplicator_kwargs):
+    """Builds the Deduplicator once in each pool worker process"""
+    global DEDUPLICATOR
+    DEDUPLICATOR = Deduplicator(**deduplicator_kwargs)
+
+def __resolve_shard__(args):
+    """Resolves a shard of labels of one class in a pool worker, returns
+    the class, a dict of label_key to IRI and the number of requests"""
+    iri_class, labels = args
+    DEDUPLICATOR.requests = 0
+    if DEDUPLICATOR.index is not None:
+        DEDUPLICATOR.index.invalidate()
+    resolved = DEDUPLICATOR.__resolve__(iri_class, labels)
+    return iri_class, resolved, DEDUPLICATOR.requests
+
+def shard(iri_class, label, size):
+    """Returns the shard of a label, a stable hash of the class and
+    normalized label so every spelling of a label shares a shard
+
+    Args:
+
+    -----
+        iri_class: rdflib.URIRef class IRI
+        label: rdflib.Literal label
+        size: number of shards
+    """
+    key = "{}|{}".format(iri_class, normalize(label))
+    return zlib.crc32(key.encode()) % size
 
 class DeduplicatePool(object):
     """Class constructs a mutliprocessing Pool for running deduplicate
-    runs in parallel."""
+    runs in parallel. Labels are partitioned by class and normalized
+    label hash across the workers, which resolve or mint IRIs, and the
+    resulting IRI rewrites are applied to the graphs in bulk. The
+    IRIs are the same as those of Deduplicator.run_batch."""
 
     def __init__(self, **kwargs):
-        self.pool_size = kwargs.get('size')
-        self.dedupicator = kwargs.get('deduplicator')
+        self.pool_size = kwargs.get('size') or os.cpu_count()
+        self.deduplicator = kwargs.get('deduplicator')
+        self.requests = 0
 
+    def __worker_kwargs__(self):
+        deduplicator = self.deduplicator
+        kwargs = {"triplestore_url": deduplicator.triplestore_url,
+                  "subject_pattern": deduplicator.subject_pattern,
+                  "base_url": deduplicator.base_url,
+                  "batch_size": deduplicator.batch_size}
+        if deduplicator.index is not None:
+            # Workers merge spellings of labels minted within a shard
+            kwargs["index"] = AuthorityIndex()
+        return kwargs
 
-    def main(self, **kwargs):
-        graph = kwargs.get('graph')
-        with Pool(self.pool_size) as p:
-            p.run(self.dedupicator.run, graph)
+    def run(self, graphs, rdf_classes=[]):
+        """Deduplicates graphs in parallel
 
+        Args:
 
+        -----
+            graphs: list of rdflib.Graph, i.e. one per record
+            rdf_classes: list of RDF Classes to use in filtering
+                         IRIs
+        """
+        if rdf_classes is None:
+            rdf_classes = []
+        index = self.deduplicator.index
+        all_classes = self.deduplicator.default_classes + rdf_classes
+        candidates, resolved, jobs, seen = dict(), dict(), [], set()
+        for class_ in all_classes:
+            candidates[class_] = self.deduplicator.__candidates__(
+                graphs,
+                class_,
+                seen)
+            resolved[class_] = dict()
+            shards = [collections.OrderedDict()
+                      for i in range(self.pool_size)]
+            for graph, entity, label in candidates[class_]:
+                key = label_key(label)
+                if key in resolved[class_]:
+                    continue
+                if index is not None:
+                    entity_iri = index.get(class_, label)
+                    if entity_iri is not None:
+                        resolved[class_][key] = entity_iri
+                        continue
+                shards[shard(class_, label, self.pool_size)][key] = label
+            for labels in shards:
+                if len(labels) > 0:
+                    jobs.append((class_, list(labels.values())))
+        with ProcessPoolExecutor(
+                max_workers=self.pool_size,
+                initializer=__init_worker__,
+                initargs=(self.__worker_kwargs__(),)) as pool:
+            for class_, shard_resolved, requests in pool.map(
+                    __resolve_shard__, jobs):
+                self.requests += requests
+                for key, entity_iri in shard_resolved.items():
+                    resolved[class_].setdefault(key, entity_iri)
+        for class_ in all_classes:
+            for graph, entity, label in candidates[class_]:
+                key = label_key(label)
+                entity_iri = resolved[class_].get(key)
+                if entity_iri is None:
+                    continue
+                if index is not None:
+                    index.add(class_, label, entity_iri)
+                self.deduplicator.__replace__(graph, entity, entity_iri)
+        self.deduplicator.__flush__()
 
+    def main(self, **kwargs):
+        graphs = kwargs.get('graphs')
+        if graphs is None:
+            graphs = [kwargs.get('graph')]
+        self.run(graphs, kwargs.get('rdf_classes'))
@@ -6,7 +6,8 @@ __author__ = "Jeremy Nelson"
 import urllib.parse
 
 import rdflib
-import requests
+
+from bibcat import transport
 
 API_BASE = "http://api.geonames.org/"
 IRI_BASE = "http://www.geonames.org/"
@@ -65,7 +66,7 @@ def link_iri(term, username, type_=None, format_="json", class_=None):
         API_BASE,
         search_action,
         urllib.parse.urlencode(DEFAULT_PARAMS))
-    result = requests.get(geo_url)
+    result = transport.get(geo_url)
     if result.status_code < 400:
         if format_ and format_.startswith('json'):
             return __top_result__(result.json(), type_=type_, class_=class_)
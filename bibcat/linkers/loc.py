@@ -7,11 +7,11 @@ import sys
 import unicodedata
 import urllib.parse
 
-import requests
 import rdflib
 
 from fuzzywuzzy import fuzz
 import bibcat
+from bibcat import transport
 from bibcat.linkers.linker import Linker
 
 #! PREFIX should be generated from RDF Framework in the future
@@ -39,7 +39,7 @@ def link_term(term, number=1):
     loc_url = "{}?{}".format(
         ID_LOC_URL, 
         urllib.parse.urlencode(params))
-    result = requests.get(loc_url)
+    result = transport.get(loc_url)
     results = result.json()
     for row in results:
         if isinstance(row, dict) or not row[0].startswith('atom:entry'):
@@ -94,7 +94,7 @@ class LibraryOfCongressLinker(Linker):
             {"q": label,
              "format": "json"})
         #lc_search_url += "&q=scheme:{}".format(schema_iri)
-        loc_result = requests.get(lc_search_url)
+        loc_result = transport.get(lc_search_url)
         if loc_result.status_code > 399:
             raise ValueError(
                 "Cannot run, HTTP error {}\n{}".format(
@@ -114,7 +114,7 @@ class LibraryOfCongressLinker(Linker):
             LibraryOfCongressLinker.ID_LOC_URL,
             urllib.parse.urlencode({"q": label,
                                     "format": "json"}))
-        result = requests.get(loc_url)
+        result = transport.get(loc_url)
         loc_iri, label = self.__process_loc_results__(
             result.json(),
             label)
@@ -320,7 +320,7 @@ Total subjects checked {:,}""".format(
             result = self.graph.query(self.subject_sparql)
             bindings = result.bindings
         elif self.triplestore_url is not None:
-            result = requests.post(self.triplestore_url,
+            result = transport.post(self.triplestore_url,
                 data={"query": self.subject_sparql,
                       "format": "json"})
             if result.status_code < 400:
@@ -375,7 +375,7 @@ class LibraryOfCongressSRULinker(Linker):
                                            "personalName": label,
                                            "maximumRecords": 10,
                                            "recordSchema": "dc"})
-        result = requests.get(sru_url)
+        result = transport.get(sru_url)
 
 
     def link_lc_subjects(self, entity, label):
@@ -392,7 +392,7 @@ class LibraryOfCongressSRULinker(Linker):
                                            "recordSchema": "dc"})
         sru_url += "&query=" + urllib.parse.urlencode(
             {"bath.topicalSubject": label})
-        result = requests.get(sru_url)
+        result = transport.get(sru_url)
 
     def run(self, graph=None):
         """Runs LOC Linker Service using SRU
@@ -0,0 +1,166 @@
+"""Lightweight output of RML processors
+
+A TripleBuffer keeps the triples mapped from one record as an insertion
+ordered set of tuples instead of adding each one to the indexes of an
+rdflib Memory store. It is converted to an rdflib.Graph only when asked
+or serialized straight to N-Triples. ntriples and nquads serialize a
+TripleBuffer or an rdflib.Graph to the bytes sent to a triplestore or
+written to a file.
+
+>>> from bibcat.rml.processor import XMLProcessor
+>>> processor = XMLProcessor(rml_rules=["bibcat-base.ttl", "mods-to-bf.ttl"],
+...                          triple_buffer=True)
+>>> processor.run(mods_record, instance_iri=instance_iri)
+>>> raw_nt = processor.output.serialize(format="nt")
+>>> graph = processor.output.graph()
+
+"""
+__author__ = "Jeremy Nelson"
+
+import collections
+
+import rdflib
+from rdflib.term import Node
+
+try:
+    from rdflib.plugins.serializers.nt import _nt_row
+except ImportError:
+    _nt_row = None
+
+
+def ntriples(graph):
+    """Returns the graph serialized as N-Triples bytes
+
+    Args:
+
+    -----
+        graph: rdflib.Graph or TripleBuffer
+    """
+    raw_nt = graph.serialize(format='nt')
+    if isinstance(raw_nt, str):
+        raw_nt = raw_nt.encode()
+    return raw_nt
+
+
+def nquads(graph, graph_iri):
+    """Returns the graph serialized as N-Quads bytes with every triple in
+    the named graph graph_iri
+
+    Args:
+
+    -----
+        graph: rdflib.Graph or TripleBuffer
+        graph_iri: str, IRI of the named graph
+    """
+    context = " <{}> .\n".format(graph_iri).encode()
+    lines = []
+    for line in ntriples(graph).splitlines():
+        line = line.rstrip()
+        if len(line) < 1:
+            continue
+        # Drops the terminating " ." of the N-Triples statement
+        lines.append(line[:-1].rstrip() + context)
+    return b"".join(lines)
+
+
+class TripleBuffer(object):
+    """Insertion ordered set of triples with a count of the triples of
+    each subject, supports the parts of the rdflib.Graph API used while
+    mapping a record"""
+
+    def __init__(self, namespaces=None):
+        """
+        Args:
+
+        -----
+            namespaces: list of prefix and namespace tuples bound in the
+                        graph returned by graph()
+        """
+        self.namespaces = list(namespaces or [])
+        self.__triples__ = dict()
+        self.subjects = collections.Counter()
+
+    def __len__(self):
+        return len(self.__triples__)
+
+    def __iter__(self):
+        return iter(self.__triples__)
+
+    def __contains__(self, triple):
+        return triple in self.__triples__
+
+    def add(self, triple):
+        """Adds a triple, like rdflib.Graph.add every term must be an
+        rdflib term
+
+        Args:
+
+        -----
+            triple: tuple of subject, predicate and object
+        """
+        subject, predicate, object_ = triple
+        assert isinstance(subject, Node), \
+            "Subject %s must be an rdflib term" % (subject,)
+        assert isinstance(predicate, Node), \
+            "Predicate %s must be an rdflib term" % (predicate,)
+        assert isinstance(object_, Node), \
+            "Object %s must be an rdflib term" % (object_,)
+        if triple not in self.__triples__:
+            self.__triples__[triple] = None
+            self.subjects[subject] += 1
+        return self
+
+    def count(self, subject):
+        """Returns the number of triples with subject
+
+        Args:
+
+        -----
+            subject: rdflib.URIRef or rdflib.BNode
+        """
+        return self.subjects.get(subject, 0)
+
+    def triples(self, pattern):
+        """Generator of the triples matching a subject, predicate and
+        object pattern, None matches any term
+
+        Args:
+
+        -----
+            pattern: tuple of subject, predicate and object
+        """
+        subject, predicate, object_ = pattern
+        if subject is not None and subject not in self.subjects:
+            return
+        for triple in list(self.__triples__):
+            if (subject is None or triple[0] == subject) and \
+               (predicate is None or triple[1] == predicate) and \
+               (object_ is None or triple[2] == object_):
+                yield triple
+
+    def subject_predicates(self, object=None):
+        """Generator of the subject and predicate of triples with object"""
+        for subject, predicate, object_ in self.triples((None, None, object)):
+            yield subject, predicate
+
+    def graph(self):
+        """Returns a new rdflib.Graph of the buffered triples"""
+        graph = rdflib.Graph()
+        for prefix, namespace in self.namespaces:
+            graph.namespace_manager.bind(prefix, namespace)
+        graph.addN((subject, predicate, object_, graph)
+                   for subject, predicate, object_ in self.__triples__)
+        return graph
+
+    def serialize(self, format="nt", **kwargs):
+        """Returns the triples serialized as a str, N-Triples are written
+        directly from the buffer, other formats from graph()
+
+        Args:
+
+        -----
+            format: str, rdflib serialization format, default is nt
+        """
+        if format in ("nt", "nt11", "ntriples") and _nt_row is not None:
+            return "".join([_nt_row(triple) for triple in self.__triples__])
+        return self.graph().serialize(format=format, **kwargs)
@@ -0,0 +1,132 @@
+"""Persistent cache of compiled RML rule plans
+
+A rule plan is the plain, picklable structure a
+:class:`bibcat.rml.processor.Processor` builds from its RML graph, the
+triple maps, the set of parent triple maps, and the namespaces of the
+rules. Plans are kept in memory keyed by a SHA-256 hash of the raw
+bytes of the map files so a later Processor can skip parsing the Turtle
+and querying the RML graph. Plans are also stored on disk, for later
+runs, only in a cache_dir given explicitly or by the BIBCAT_RML_CACHE
+environment variable, as pickles are loaded from it.
+
+>>> from bibcat.rml.cache import RulePlanCache
+>>> cache = RulePlanCache("/tmp/bibcat-rml-cache")
+
+"""
+__author__ = "Jeremy Nelson"
+
+import hashlib
+import logging
+import os
+import pickle
+import tempfile
+
+import rdflib
+
+import bibcat
+
+# Bump when the structure of the triple maps built by the Processor changes
+PLAN_FORMAT = 2
+
+
+class RulePlanCache(object):
+    """Content-hashed, in-process memo of the pickled bytes of compiled
+    RML rule plans, optionally stored on disk"""
+
+    def __init__(self, cache_dir=None):
+        """
+        Args:
+
+        -----
+            cache_dir: str, Directory of the stored plans, defaults to the
+                       BIBCAT_RML_CACHE environment variable, None keeps
+                       plans in memory only
+        """
+        self.cache_dir = cache_dir or os.environ.get("BIBCAT_RML_CACHE")
+        self.__plans__ = dict()
+        self.hits, self.misses = 0, 0
+
+    def __path__(self, key):
+        return os.path.join(self.cache_dir, "{}.pickle".format(key))
+
+    def key(self, raw_rules):
+        """Returns the cache key for a list of raw RML rules
+
+        Args:
+
+        -----
+            raw_rules: list of str or bytes, Turtle source of each rule
+        """
+        digest = hashlib.sha256()
+        for part in (PLAN_FORMAT, bibcat.__version__, rdflib.__version__):
+            digest.update(str(part).encode())
+            digest.update(b"\0")
+        for raw_rule in raw_rules:
+            if isinstance(raw_rule, str):
+                raw_rule = raw_rule.encode()
+            digest.update(hashlib.sha256(raw_rule).digest())
+        return digest.hexdigest()
+
+    def get(self, key):
+        """Returns a new copy of the plan stored under key or None
+
+        Args:
+
+        -----
+            key: str, Cache key from the key method
+        """
+        raw_plan = self.__plans__.get(key)
+        if raw_plan is None and self.cache_dir is None:
+            self.misses += 1
+            return
+        if raw_plan is None:
+            try:
+                with open(self.__path__(key), "rb") as plan_file:
+                    raw_plan = plan_file.read()
+            except OSError:
+                self.misses += 1
+                return
+        try:
+            plan = pickle.loads(raw_plan)
+        except Exception:
+            logging.warning("Discarding unreadable RML plan %s", key)
+            self.__plans__.pop(key, None)
+            self.misses += 1
+            return
+        self.__plans__[key] = raw_plan
+        self.hits += 1
+        return plan
+
+    def set(self, key, plan):
+        """Stores plan under key, and in the cache directory if there is
+        one, failures to write to it are logged and otherwise ignored
+
+        Args:
+
+        -----
+            key: str, Cache key from the key method
+            plan: dict, Rule plan
+        """
+        raw_plan = pickle.dumps(plan, protocol=pickle.HIGHEST_PROTOCOL)
+        self.__plans__[key] = raw_plan
+        if self.cache_dir is None:
+            return
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            file_desc, tmp_path = tempfile.mkstemp(dir=self.cache_dir)
+            with os.fdopen(file_desc, "wb") as plan_file:
+                plan_file.write(raw_plan)
+            os.replace(tmp_path, self.__path__(key))
+        except OSError as error:
+            logging.warning("Cannot write RML plan to %s: %s",
+                            self.cache_dir,
+                            error)
+
+    def clear(self):
+        """Removes all plans from memory and the cache directory"""
+        self.__plans__.clear()
+        if self.cache_dir is None or not os.path.isdir(self.cache_dir):
+            return
+        for name in os.listdir(self.cache_dir):
+            if name.endswith(".pickle"):
+                os.remove(os.path.join(self.cache_dir, name))
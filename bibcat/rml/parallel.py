@@ -0,0 +1,236 @@
+"""Maps records with an RML processor in a pool of worker processes
+
+Records, CSV rows for a CSVRowProcessor, XML elements for an XMLProcessor
+or dicts for a JSONProcessor, are sent to the workers in chunks. Each
+worker builds its processor once from the compiled rule plan in the
+RulePlanCache and returns every record of a chunk as N-Triples, a record
+that fails to map is logged and skipped without losing the rest of its
+chunk.
+
+>>> from bibcat.rml.parallel import ParallelProcessor
+>>> from bibcat.rml.processor import XMLProcessor
+>>> parallel = ParallelProcessor(
+...     XMLProcessor,
+...     {"rml_rules": ["bibcat-base.ttl", "mods-to-bf.ttl"],
+...      "namespaces": {"mods": "http://www.loc.gov/mods/v3"}},
+...     workers=8)
+>>> graph = parallel.run(mods_records, instance_iri=instance_iri)
+"""
+__author__ = "Jeremy Nelson"
+
+import collections
+import itertools
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+import rdflib
+
+try:
+    from lxml import etree
+except ImportError:
+    import xml.etree.ElementTree as etree
+
+from bibcat.rml.buffer import ntriples
+
+WORKER = None
+
+
+def __init_worker__(processor_class, processor_kwargs):
+    """Builds the RML processor once in each worker process"""
+    global WORKER
+    WORKER = processor_class(**dict(processor_kwargs))
+
+
+def __map_chunk__(args):
+    """Maps a chunk of records in a worker process, returns a list of
+    index, N-Triples and error message for each record
+
+    Args:
+        args(tuple): List of index, record and record keyword arguments,
+                     and the keyword arguments for every record
+    """
+    jobs, run_kwargs = args
+    results = []
+    for index, record, record_kwargs in jobs:
+        try:
+            if isinstance(record, bytes):
+                record = etree.XML(record)
+            kwargs = dict(run_kwargs)
+            kwargs.update(record_kwargs)
+            WORKER.run(record, **kwargs)
+            results.append((index, ntriples(WORKER.output), None))
+        except Exception as error:
+            results.append((index,
+                            None,
+                            "{}: {}".format(type(error).__name__, error)))
+        finally:
+            WORKER.source, WORKER.output = None, None
+    return results
+
+
+class ParallelProcessor(object):
+    """Runs an RML processor on an iterable of records with a pool of
+    worker processes"""
+
+    def __init__(self, processor_class, processor_kwargs, **kwargs):
+        """
+        Args:
+            processor_class(class): CSVRowProcessor, JSONProcessor or
+                                    XMLProcessor
+            processor_kwargs(dict): Picklable keyword arguments for the
+                                    processor, i.e. rml_rules and
+                                    namespaces, workers map into a
+                                    TripleBuffer unless triple_buffer is
+                                    False
+
+        Keyword args:
+            workers(int): Number of worker processes, default is the
+                          number of CPUs, 1 maps records in this process
+            chunk_size(int): Records sent to a worker at a time, default
+                             is 50
+            ordered(bool): Return records in the order of the iterable,
+                           default is True, False returns each chunk as
+                           soon as it is mapped
+            max_pending(int): Maximum chunks submitted ahead of the
+                              consumer, default is 2 per worker
+        """
+        self.processor_class = processor_class
+        self.processor_kwargs = dict(processor_kwargs)
+        self.processor_kwargs.setdefault("triple_buffer", True)
+        self.workers = kwargs.get("workers") or os.cpu_count() or 1
+        self.chunk_size = kwargs.get("chunk_size", 50)
+        self.ordered = kwargs.get("ordered", True)
+        self.max_pending = kwargs.get("max_pending", self.workers * 2)
+        # Compiles the rules, and stores the plan in the RulePlanCache,
+        # once before any worker is started
+        self.processor = processor_class(**dict(self.processor_kwargs))
+        self.errors = []
+        self.output = None
+
+    def __jobs__(self, records, record_kwargs):
+        """Generator of the chunks of index, picklable record and record
+        keyword arguments
+
+        Args:
+            records(iterable): Records
+            record_kwargs(function): Takes a record and returns a dict of
+                                     keyword arguments for that record
+        """
+        numbered = enumerate(records)
+        while True:
+            chunk = []
+            for index, record in itertools.islice(numbered, self.chunk_size):
+                kwargs = {}
+                if record_kwargs is not None:
+                    kwargs = record_kwargs(record)
+                if etree.iselement(record):
+                    record = etree.tostring(record)
+                chunk.append((index, record, kwargs))
+            if len(chunk) < 1:
+                return
+            yield chunk
+
+    def __local_chunks__(self, jobs, run_kwargs):
+        """Generator of mapped chunks using the processor in this process"""
+        global WORKER
+        WORKER = self.processor
+        for chunk in jobs:
+            yield __map_chunk__((chunk, run_kwargs))
+
+    def __pool_chunks__(self, jobs, run_kwargs):
+        """Generator of mapped chunks from the worker pool, submitting at
+        most max_pending chunks ahead of the consumer"""
+        with ProcessPoolExecutor(
+                max_workers=self.workers,
+                initializer=__init_worker__,
+                initargs=(self.processor_class,
+                          self.processor_kwargs)) as pool:
+            pending = collections.OrderedDict()
+            jobs = iter(jobs)
+            while True:
+                for chunk in itertools.islice(
+                        jobs, max(0, self.max_pending - len(pending))):
+                    future = pool.submit(__map_chunk__, (chunk, run_kwargs))
+                    pending[future] = chunk
+                if len(pending) < 1:
+                    return
+                if self.ordered:
+                    done = [next(iter(pending))]
+                else:
+                    done = wait(pending, return_when=FIRST_COMPLETED)[0]
+                for future in done:
+                    chunk = pending.pop(future)
+                    try:
+                        results = future.result()
+                    except Exception as error:
+                        # Failed worker, every record in the chunk failed
+                        message = "{}: {}".format(type(error).__name__,
+                                                  error)
+                        results = [(index, None, message)
+                                   for index, record, kwargs in chunk]
+                    yield results
+
+    def chunks(self, records, record_kwargs=None, **kwargs):
+        """Generator of a list of index and N-Triples for each mapped
+        record in a chunk, failed records are left out of the list and
+        added to errors
+
+        Args:
+            records(iterable): Records
+            record_kwargs(function): Optional, takes a record and returns a
+                                     dict of keyword arguments for that
+                                     record, i.e. instance_iri
+        """
+        jobs = self.__jobs__(records, record_kwargs)
+        if self.workers > 1:
+            mapped_chunks = self.__pool_chunks__(jobs, kwargs)
+        else:
+            mapped_chunks = self.__local_chunks__(jobs, kwargs)
+        for results in mapped_chunks:
+            mapped = []
+            for index, raw_nt, error in results:
+                if error is not None:
+                    logging.error("Failed to map record {}, {}".format(
+                        index, error))
+                    self.errors.append((index, error))
+                    continue
+                mapped.append((index, raw_nt))
+            yield mapped
+
+    def map(self, records, record_kwargs=None, **kwargs):
+        """Generator of the index and N-Triples of each mapped record, in
+        the order of records if ordered is True
+
+        Args:
+            records(iterable): Records
+            record_kwargs(function): Optional, takes a record and returns a
+                                     dict of keyword arguments for that
+                                     record
+        """
+        for mapped in self.chunks(records, record_kwargs, **kwargs):
+            for index, raw_nt in mapped:
+                yield index, raw_nt
+
+    def run(self, records, sink=None, record_kwargs=None, **kwargs):
+        """Maps records and merges the triples of each chunk into output,
+        or writes each chunk's graph to sink, returns output
+
+        Args:
+            records(iterable): Records
+            sink(bibcat.ingesters.sinks.Sink): Optional output sink
+            record_kwargs(function): Optional, takes a record and returns a
+                                     dict of keyword arguments for that
+                                     record
+        """
+        self.output = rdflib.Graph()
+        for mapped in self.chunks(records, record_kwargs, **kwargs):
+            if len(mapped) < 1:
+                continue
+            raw_nt = b"".join([raw for index, raw in mapped])
+            if sink is None:
+                self.output.parse(data=raw_nt.decode(), format="nt")
+                continue
+            sink.write(rdflib.Graph().parse(data=raw_nt.decode(),
+                                            format="nt"))
+        return self.output
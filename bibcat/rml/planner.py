@@ -0,0 +1,462 @@
+"""Evaluates the simple SPARQL queries of RML rules on an rdflib Graph
+
+Most rml:query templates in the BIBCAT maps are a SELECT of one to a few
+triple patterns, like
+
+    SELECT DISTINCT ?value
+    WHERE {{ <{instance}> bf:dimensions ?value . }}
+
+rdflib parses, translates and evaluates every formatted query with its
+SPARQL engine. A QueryPlanner parses each template once into a BGPQuery
+that matches the basic graph pattern with Graph.triples() index lookups,
+joining the most bound pattern first, and left joins the triples of each
+OPTIONAL. Templates with anything else, i.e. UNION, BIND, property paths,
+blank node labels, FILTERs inside an OPTIONAL or FILTERs other than isIRI,
+isBlank, isLiteral and IRI (in)equality, are not planned and are left to
+the SPARQL engine.
+
+>>> from bibcat.rml.planner import QueryPlanner
+>>> planner = QueryPlanner(NS_MGR)
+>>> plan = planner.plan(pred_obj_map.query)
+>>> if plan is not None:
+...     bindings = plan.bindings(graph, instance=instance_iri)
+
+"""
+__author__ = "Jeremy Nelson"
+
+import collections
+import re
+
+import rdflib
+from rdflib.plugins.sparql.evalutils import _val
+
+TOKENS = re.compile(r"""
+    (?P<space>\s+)
+  | (?P<param><\{(?P<param_name>\w+)\}>)
+  | (?P<iri><[^<>"{}|^`\\\s]*>)
+  | (?P<var>[?$]\w+)
+  | (?P<literal>"(?P<value>[^"\\{}\n]*)"
+        (?:@(?P<lang>[A-Za-z]+(?:-[A-Za-z0-9]+)*)
+          |\^\^(?P<datatype><[^<>"{}|^`\\\s]*>
+                |[A-Za-z][\w-]*:(?:[\w-]+(?:\.[\w-]+)*)?))?)
+  | (?P<open>\{\{)
+  | (?P<close>\}\})
+  | (?P<slot>\{\w+\})
+  | (?P<number>\d+)
+  | (?P<pname>[A-Za-z][\w-]*:(?:[\w-]+(?:\.[\w-]+)*)?)
+  | (?P<op>!=|[.;,()=!*])
+  | (?P<word>[A-Za-z]+)
+""", re.VERBOSE)
+
+TERM_TESTS = {"isiri": lambda term: isinstance(term, rdflib.URIRef),
+              "isuri": lambda term: isinstance(term, rdflib.URIRef),
+              "isblank": lambda term: isinstance(term, rdflib.BNode),
+              "isliteral": lambda term: isinstance(term, rdflib.Literal)}
+
+
+class Param(str):
+    """Name of a <{name}> placeholder in a query template"""
+
+
+class Unplannable(Exception):
+    """Raised while parsing a template the planner does not evaluate"""
+
+
+class BGPQuery(object):
+    """A planned SELECT of a basic graph pattern with simple FILTERs and
+    OPTIONALs, ORDER BY, LIMIT and OFFSET"""
+
+    def __init__(self, projection, patterns, filters, **kwargs):
+        """
+        Args:
+
+        -----
+            projection: list of rdflib.Variable
+            patterns: list of subject, predicate and object tuples of
+                      rdflib terms, rdflib.Variable and Param
+            filters: list of rdflib.Variable tuples and a function that
+                     takes their terms and returns a bool
+
+        Keyword args:
+
+        -----
+            optionals: list of the patterns of each OPTIONAL, left
+                       joined in order after patterns
+            distinct: bool, default is False
+            order_by: list of rdflib.Variable and descending bool tuples
+            limit: int or Param, default is None
+            offset: int or Param, default is None
+        """
+        self.projection = projection
+        self.patterns = patterns
+        self.filters = filters
+        self.optionals = kwargs.get("optionals", [])
+        self.distinct = kwargs.get("distinct", False)
+        self.order_by = kwargs.get("order_by", [])
+        self.limit = kwargs.get("limit")
+        self.offset = kwargs.get("offset")
+
+    def __solutions__(self, graph, patterns, solution):
+        """Generator of the solutions of patterns extending solution,
+        the pattern with the most bound terms is matched first"""
+        if len(patterns) < 1:
+            yield solution
+            return
+        bound = [sum([1 for term in pattern
+                      if not isinstance(term, rdflib.Variable)
+                      or term in solution])
+                 for pattern in patterns]
+        position = bound.index(max(bound))
+        pattern = [solution.get(term, term)
+                   if isinstance(term, rdflib.Variable) else term
+                   for term in patterns[position]]
+        rest = patterns[:position] + patterns[position + 1:]
+        lookup = tuple([None if isinstance(term, rdflib.Variable) else term
+                        for term in pattern])
+        for triple in graph.triples(lookup):
+            extended = solution
+            for term, value in zip(pattern, triple):
+                if not isinstance(term, rdflib.Variable):
+                    continue
+                if term in extended:
+                    # Same variable twice in one pattern
+                    if extended[term] != value:
+                        break
+                    continue
+                if extended is solution:
+                    extended = dict(solution)
+                extended[term] = value
+            else:
+                if self.__passes__(extended, solution):
+                    yield from self.__solutions__(graph, rest, extended)
+
+    def __left_join__(self, graph, solutions, patterns):
+        """Generator of each solution extended by the solutions of an
+        OPTIONAL's patterns, or unchanged if they have none"""
+        for solution in solutions:
+            matched = False
+            for extended in self.__solutions__(graph, patterns, solution):
+                matched = True
+                yield extended
+            if not matched:
+                yield solution
+
+    def __passes__(self, extended, solution):
+        """Tests the filters whose variables were bound by the last
+        pattern"""
+        for variables, test in self.filters:
+            if all([variable in solution for variable in variables]) or \
+               not all([variable in extended for variable in variables]):
+                continue
+            if not test(*[extended[variable] for variable in variables]):
+                return False
+        return True
+
+    def bindings(self, graph, **kwargs):
+        """Returns a list of dicts of variable name and term, looked up
+        like the bindings of rdflib's SPARQL results
+
+        Args:
+
+        -----
+            graph: rdflib.Graph
+            kwargs: values of the template's placeholders
+        """
+        def bind(patterns):
+            return [tuple([rdflib.URIRef(str(kwargs[term]))
+                           if isinstance(term, Param) else term
+                           for term in pattern])
+                    for pattern in patterns]
+
+        solutions = self.__solutions__(graph, bind(self.patterns), dict())
+        for optional in self.optionals:
+            solutions = self.__left_join__(graph, solutions, bind(optional))
+        if len(self.order_by) > 0:
+            solutions = list(solutions)
+            for variable, descending in reversed(self.order_by):
+                # Like rdflib, an unbound variable sorts as itself, before
+                # any term
+                solutions.sort(
+                    key=lambda row: _val(row.get(variable, variable)),
+                    reverse=descending)
+        rows, seen = [], set()
+        for solution in solutions:
+            row = dict([(str(variable), solution[variable])
+                        for variable in self.projection
+                        if variable in solution])
+            if self.distinct:
+                key = tuple(row.items())
+                if key in seen:
+                    continue
+                seen.add(key)
+            rows.append(row)
+        offset = self.offset
+        if isinstance(offset, Param):
+            offset = int(kwargs[offset])
+        limit = self.limit
+        if isinstance(limit, Param):
+            limit = int(kwargs[limit])
+        offset = offset or 0
+        if limit is not None:
+            return rows[offset:offset + limit]
+        return rows[offset:]
+
+
+class QueryPlanner(object):
+    """Parses rml:query templates into BGPQuery plans, keeping the plan,
+    or None if the template is left to the SPARQL engine, of each
+    template"""
+
+    def __init__(self, namespaces):
+        """
+        Args:
+
+        -----
+            namespaces: object with an rdflib.Namespace attribute for
+                        each prefix, i.e. processor.NS_MGR
+        """
+        self.namespaces = namespaces
+        self.__plans__ = dict()
+
+    def plan(self, query):
+        """Returns the BGPQuery of a template or None
+
+        Args:
+
+        -----
+            query: str, rml:query template
+        """
+        query = str(query)
+        if query not in self.__plans__:
+            try:
+                plan = self.__parse__(self.__tokenize__(query))
+            except Unplannable:
+                plan = None
+            self.__plans__[query] = plan
+        return self.__plans__[query]
+
+    def stats(self):
+        """Returns a dict of the number of templates planned and left to
+        the SPARQL engine"""
+        planned = len([plan for plan in self.__plans__.values()
+                       if plan is not None])
+        return {"planned": planned,
+                "fallback": len(self.__plans__) - planned}
+
+    def __tokenize__(self, query):
+        tokens, position = [], 0
+        while position < len(query):
+            match = TOKENS.match(query, position)
+            if match is None:
+                raise Unplannable(query[position:position + 20])
+            position = match.end()
+            if match.lastgroup != "space":
+                tokens.append((match.lastgroup, match))
+        return tokens
+
+    def __term__(self, token, predicate=False):
+        """Returns the rdflib term, rdflib.Variable or Param of a token"""
+        kind, match = token
+        if kind == "var":
+            return rdflib.Variable(match.group()[1:])
+        if kind == "param":
+            return Param(match.group("param_name"))
+        if kind in ("iri", "pname"):
+            return self.__iri__(match.group())
+        if kind == "word" and predicate and match.group() == "a":
+            return rdflib.RDF.type
+        if kind == "literal" and not predicate:
+            datatype = match.group("datatype")
+            if datatype is not None:
+                datatype = self.__iri__(datatype)
+            return rdflib.Literal(match.group("value"),
+                                  lang=match.group("lang"),
+                                  datatype=datatype)
+        raise Unplannable(match.group())
+
+    def __iri__(self, raw):
+        if raw.startswith("<"):
+            return rdflib.URIRef(raw[1:-1])
+        prefix, local = raw.split(":", 1)
+        namespace = getattr(self.namespaces, prefix, None)
+        if namespace is None:
+            raise Unplannable(raw)
+        return rdflib.URIRef(str(namespace) + local)
+
+    def __parse__(self, tokens):
+        tokens = list(tokens)
+
+        def peek(*values):
+            if len(tokens) < 1:
+                return False
+            kind, match = tokens[0]
+            if len(values) < 1:
+                return True
+            # Braces of a str.format template are doubled
+            value = {"open": "{", "close": "}"}.get(kind,
+                                                    match.group().upper())
+            return value in values and \
+                kind in ("word", "op", "open", "close")
+
+        def take(*values):
+            if len(values) > 0 and not peek(*values):
+                raise Unplannable(values)
+            if len(tokens) < 1:
+                raise Unplannable("end of query")
+            return tokens.pop(0)
+
+        take("SELECT")
+        distinct = False
+        if peek("DISTINCT", "REDUCED"):
+            distinct = take()[1].group().upper() == "DISTINCT"
+        projection = []
+        if peek("*"):
+            take()
+            projection = None
+        else:
+            while len(tokens) > 0 and tokens[0][0] == "var":
+                projection.append(self.__term__(take()))
+            if len(projection) < 1:
+                raise Unplannable("projection")
+        if peek("WHERE"):
+            take()
+        take("{")
+        patterns, filters, optionals = [], [], []
+        while not peek("}"):
+            if peek("OPTIONAL"):
+                take()
+                take("{")
+                optional = []
+                while not peek("}"):
+                    self.__triples__(take, peek, optional)
+                take("}")
+                if len(optional) < 1:
+                    raise Unplannable("empty OPTIONAL")
+                optionals.append(optional)
+                if peek("."):
+                    take()
+                continue
+            if len(optionals) > 0:
+                # Patterns after an OPTIONAL are joined to its result
+                raise Unplannable("after OPTIONAL")
+            if peek("FILTER"):
+                take()
+                filters.append(self.__filter__(take, peek))
+                if peek("."):
+                    take()
+                continue
+            self.__triples__(take, peek, patterns)
+        take("}")
+        if len(patterns) + len(optionals) < 1:
+            raise Unplannable("empty pattern")
+        variables = []
+        for pattern in patterns:
+            for term in pattern:
+                if isinstance(term, rdflib.Variable) and \
+                   term not in variables:
+                    variables.append(term)
+        for filter_variables, test in filters:
+            if any([variable not in variables
+                    for variable in filter_variables]):
+                # An unbound variable is an error, left to the engine
+                raise Unplannable(filter_variables)
+        if projection is None:
+            projection = variables + [
+                term for optional in optionals for pattern in optional
+                for term in pattern if isinstance(term, rdflib.Variable)]
+            projection = list(collections.OrderedDict.fromkeys(projection))
+        order_by = []
+        if peek("ORDER"):
+            take()
+            take("BY")
+            while peek("ASC", "DESC") or \
+                    (len(tokens) > 0 and tokens[0][0] == "var"):
+                descending = False
+                if peek("ASC", "DESC"):
+                    descending = take()[1].group().upper() == "DESC"
+                    take("(")
+                    variable = self.__term__(take())
+                    take(")")
+                else:
+                    variable = self.__term__(take())
+                if not isinstance(variable, rdflib.Variable):
+                    raise Unplannable(variable)
+                order_by.append((variable, descending))
+            if len(order_by) < 1:
+                raise Unplannable("ORDER BY")
+        slices = dict()
+        while peek("LIMIT", "OFFSET"):
+            name = take()[1].group().lower()
+            kind, match = take()
+            if kind == "number":
+                slices[name] = int(match.group())
+            elif kind == "slot":
+                slices[name] = Param(match.group()[1:-1])
+            else:
+                raise Unplannable(match.group())
+        if len(tokens) > 0:
+            raise Unplannable(tokens[0][1].group())
+        return BGPQuery(projection,
+                        patterns,
+                        filters,
+                        optionals=optionals,
+                        distinct=distinct,
+                        order_by=order_by,
+                        **slices)
+
+    def __triples__(self, take, peek, patterns):
+        """Adds the subject, predicate and object tuples of the next
+        triples, with ; and , lists, to patterns"""
+        subject = self.__term__(take())
+        if isinstance(subject, rdflib.Literal):
+            raise Unplannable(subject)
+        while True:
+            predicate = self.__term__(take(), predicate=True)
+            while True:
+                patterns.append((subject, predicate, self.__term__(take())))
+                if not peek(","):
+                    break
+                take()
+            if not peek(";"):
+                break
+            take()
+            if peek(".", "}"):
+                break
+        if peek("."):
+            take()
+
+    def __filter__(self, take, peek):
+        """Returns the variables and test of FILTER(isIRI(?v)),
+        isBlank, isLiteral, negated with !, or of ?v = IRI and ?v != IRI"""
+        take("(")
+        negate = False
+        if peek("!"):
+            take()
+            negate = True
+        kind, match = take()
+        name = match.group().lower()
+        if kind == "word" and name in TERM_TESTS:
+            take("(")
+            variable = self.__term__(take())
+            take(")")
+            take(")")
+            if not isinstance(variable, rdflib.Variable):
+                raise Unplannable(variable)
+            term_test = TERM_TESTS[name]
+            return ((variable,),
+                    lambda term: term_test(term) is not negate)
+        if negate:
+            raise Unplannable("!")
+        left = self.__term__((kind, match))
+        operator = take("=", "!=")[1].group()
+        right = self.__term__(take())
+        take(")")
+        if isinstance(left, rdflib.Variable):
+            left, right = right, left
+        if not isinstance(right, rdflib.Variable) or \
+           not isinstance(left, rdflib.URIRef):
+            # Literals compare by value in SPARQL, left to the engine
+            raise Unplannable(left)
+        if operator == "=":
+            return ((right,), lambda term: term == left)
+        return ((right,), lambda term: term != left)
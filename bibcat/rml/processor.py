@@ -10,17 +10,28 @@ __author__ = "Jeremy Nelson"
 import collections
 import csv
 import datetime
+import logging
 import os
+import re
+import string
 import sys
+import urllib.parse
+from concurrent.futures import ThreadPoolExecutor
 from types import SimpleNamespace
 
 # 3rd party modules
 import rdflib
-import requests
+from rdflib.util import from_n3
 
 import jsonpath_ng
 import bibcat
+from bibcat import transport
 from bibcat.maps import get_map
+from bibcat.rml.buffer import TripleBuffer, ntriples
+from bibcat.rml.cache import RulePlanCache
+from bibcat.rml.parallel import ParallelProcessor
+from bibcat.rml.planner import QueryPlanner
+from bibcat.rml.terms import TermCache
 
 BIBCAT_BASE = os.path.abspath(
     os.path.split(
@@ -28,6 +39,17 @@ BIBCAT_BASE = os.path.abspath(
 NS_MGR = SimpleNamespace()
 PREFIX = None
 __version__ = bibcat.__version__
+RULE_CACHE = RulePlanCache()
+# Maximum parent triple map results kept for a record
+JOIN_CACHE_SIZE = 1000
+# Rewrites the projection and WHERE clause of a batched rml:query
+SELECT_CLAUSE = re.compile(r"^\s*SELECT\s+(DISTINCT\s+|REDUCED\s+)?(?!\*)",
+                           re.IGNORECASE)
+WHERE_CLAUSE = re.compile(r"WHERE\s*\{", re.IGNORECASE)
+# SPARQL SELECT results read a line at a time, JSON if the endpoint
+# does not support TSV
+RESULTS_ACCEPT = "text/tab-separated-values, " \
+                 "application/sparql-results+json;q=0.9"
 
 try:
     from lxml import etree
@@ -41,51 +63,213 @@ class Processor(object):
 
     """
 
-    def __init__(self, rml_rules):
-        self.rml = rdflib.Graph()
-        if isinstance(rml_rules, list):
-            for rule in rml_rules:
-                # First check if rule exists on the filesystem
-                if os.path.exists(rule):
-                    with open(rule) as file_obj:
-                        raw_rule = file_obj.read()
-                else:
-                    raw_rule = get_map(rule).decode()
-                self.rml.parse(data=raw_rule,
-                               format='turtle')
-        elif isinstance(rml_rules, (rdflib.Graph, rdflib.ConjunctiveGraph)):
-            self.rml = rml_rules
-        elif os.path.exists(rml_rules):
-            self.rml.parse(rml_rules, format='turtle')
+    def __init__(self, rml_rules, rule_cache=None, triple_buffer=False,
+                 join_cache=JOIN_CACHE_SIZE):
+        """
+        Args:
+
+        -----
+            rml_rules: list, str, or rdflib.Graph of RML rules
+            rule_cache: RulePlanCache, defaults to RULE_CACHE, False
+                        disables caching of the compiled rule plan
+            triple_buffer: bool, map into a TripleBuffer instead of an
+                           rdflib.Graph, default is False
+            join_cache: int, maximum parent triple map results reused
+                        within a record, 0 executes a parent triple map
+                        for every reference to it, i.e. a new blank node
+                        for each reference to a rr:BlankNode parent
+        """
+        if rule_cache is None:
+            rule_cache = RULE_CACHE
+        self.__rml__, self.__raw_rules__ = None, []
+        if isinstance(rml_rules, (rdflib.Graph, rdflib.ConjunctiveGraph)):
+            self.__rml__ = rml_rules
+            plan = self.__compile_plan__()
         else:
-            self.rml.parse(data=get_map(rml_rules).decode(), format='turtle')
+            self.__raw_rules__ = self.__read_rules__(rml_rules)
+            plan, plan_key = None, None
+            if rule_cache:
+                plan_key = rule_cache.key(self.__raw_rules__)
+                plan = rule_cache.get(plan_key)
+            if plan is None:
+                plan = self.__compile_plan__()
+                if rule_cache:
+                    rule_cache.set(plan_key, plan)
+        self.namespaces = plan["namespaces"]
         # Populate Namespaces Manager
-        for prefix, namespace in self.rml.namespaces():
+        for prefix, namespace in self.namespaces:
             setattr(NS_MGR, prefix, rdflib.Namespace(namespace))
         self.output, self.source, self.triplestore_url = None, None, None
-        self.parents = set()
+        self.triple_buffer = triple_buffer
+        self.join_cache = join_cache
+        self.__joins__, self.__contexts__ = dict(), dict()
+        # Interned terms shared by every run of the processor
+        self.terms = TermCache()
+        self.parents = plan["parents"]
         self.constants = dict(version=__version__)
-        self.triple_maps = dict()
+        self.triple_maps = plan["triple_maps"]
+        self.__compile_templates__()
+
+    @property
+    def rml(self):
+        """RML rules graph, parsed on first use when the processor was
+        built from a cached rule plan"""
+        if self.__rml__ is None:
+            self.__rml__ = rdflib.Graph()
+            for raw_rule in self.__raw_rules__:
+                self.__rml__.parse(data=raw_rule, format='turtle')
+        return self.__rml__
+
+    @staticmethod
+    def __read_rules__(rml_rules):
+        """Returns a list of the raw Turtle for each rule, a rule is either
+        a path on the filesystem or the name of a map in bibcat.maps
+
+        Args:
+
+        -----
+            rml_rules: list or str
+        """
+        if not isinstance(rml_rules, list):
+            rml_rules = [rml_rules,]
+        raw_rules = []
+        for rule in rml_rules:
+            # First check if rule exists on the filesystem
+            if os.path.exists(rule):
+                with open(rule) as file_obj:
+                    raw_rules.append(file_obj.read())
+            else:
+                raw_rules.append(get_map(rule).decode())
+        return raw_rules
+
+    def __compile_plan__(self):
+        """Builds the rule plan, the triple maps, parent triple maps, and
+        namespaces, from the RML graph"""
+        self.parents = set()
+        triple_maps = dict()
+        for prefix, namespace in self.rml.namespaces():
+            setattr(NS_MGR, prefix, rdflib.Namespace(namespace))
         for row in self.rml.query(GET_TRIPLE_MAPS):
             triple_map_iri = row[0]
             map_key = str(triple_map_iri)
-            self.triple_maps[map_key] = SimpleNamespace()
-            self.triple_maps[map_key].logicalSource = \
+            triple_maps[map_key] = SimpleNamespace()
+            triple_maps[map_key].logicalSource = \
                 self.__logical_source__(triple_map_iri)
-            self.triple_maps[map_key].subjectMap = \
+            triple_maps[map_key].subjectMap = \
                 self.__subject_map__(triple_map_iri)
-            self.triple_maps[map_key].predicateObjectMap = \
+            triple_maps[map_key].predicateObjectMap = \
                 self.__predicate_object_map__(triple_map_iri)
+        return {"namespaces": [(str(prefix), str(namespace))
+                               for prefix, namespace in self.rml.namespaces()],
+                "parents": self.parents,
+                "triple_maps": triple_maps}
+
+    def __compile_expression__(self, expression):
+        """Placeholder method, child classes return a compiled form of an
+        rml:iterator or rr:reference expression or None if the expression
+        should be evaluated on every call
+
+        Args:
+
+        -----
+            expression: rdflib.Literal or None
+        """
+        return None
+
+    def __compile_expressions__(self):
+        """Compiles each logical source's iterator and each subject and
+        object map's reference once, storing the result on the triple
+        maps as compiled_iterator and compiled_reference, and each
+        rr:child and rr:parent reference of a join condition in
+        __join_expressions__"""
+        self.__join_expressions__ = dict()
+        for triple_map in self.triple_maps.values():
+            if triple_map.logicalSource is not None:
+                triple_map.logicalSource.compiled_iterator = \
+                    self.__compile_expression__(
+                        triple_map.logicalSource.iterator)
+            term_maps = list(triple_map.predicateObjectMap)
+            if triple_map.subjectMap is not None:
+                term_maps.append(triple_map.subjectMap)
+            for term_map in term_maps:
+                term_map.compiled_reference = self.__compile_expression__(
+                    term_map.reference)
+                for condition in getattr(term_map, "joinConditions", []):
+                    for reference in condition:
+                        if str(reference) not in self.__join_expressions__:
+                            self.__join_expressions__[str(reference)] = \
+                                self.__compile_expression__(reference)
+
+    @staticmethod
+    def __compile_template__(template):
+        """Returns a function that takes the keyword arguments of a run and
+        the processor's constants and formats the rr:template, resolving
+        and calling only the variables the template uses, or None if the
+        template has positional fields
+
+        Args:
+
+        -----
+            template: rdflib.Literal or None
+        """
+        if template is None:
+            return
+        template = str(template)
+        names = []
+        try:
+            for text, field, spec, conversion in \
+                    string.Formatter().parse(template):
+                if field is None:
+                    continue
+                name = re.split(r"[.\[]", field, 1)[0]
+                if len(name) < 1 or name.isdigit():
+                    return
+                if name not in names:
+                    names.append(name)
+        except ValueError:
+            return
+
+        def format_template(variables, constants):
+            values = dict()
+            for name in names:
+                # Constants take precedence over the run's keywords
+                if name in constants:
+                    value = constants[name]
+                else:
+                    value = variables[name]
+                if hasattr(value, "__call__"):
+                    value = value()
+                values[name] = value
+            return template.format(**values)
+        return format_template
+
+    def __compile_templates__(self):
+        """Compiles each subject and object map's rr:template once,
+        storing the function on the term map as compiled_template"""
+        for triple_map in self.triple_maps.values():
+            term_maps = list(triple_map.predicateObjectMap)
+            if triple_map.subjectMap is not None:
+                term_maps.append(triple_map.subjectMap)
+            for term_map in term_maps:
+                term_map.compiled_template = self.__compile_template__(
+                    getattr(term_map, "template", None))
 
     def __graph__(self):
         """Method returns a new graph with all of the namespaces in
         RML graph"""
         #graph = rdflib.Graph(namespace_manager=self.rml.namespace_manager)
         graph = rdflib.Graph()
-        for prefix, name in self.rml.namespaces():
+        for prefix, name in self.namespaces:
             graph.namespace_manager.bind(prefix, name)
         return graph
 
+    def __output__(self):
+        """Method returns a new, empty output for a run, a TripleBuffer
+        if the processor was created with triple_buffer otherwise a
+        graph from __graph__"""
+        if self.triple_buffer:
+            return TripleBuffer(self.namespaces)
+        return self.__graph__()
 
 
     def __generate_delimited_objects__(self, **kwargs):
@@ -114,9 +298,9 @@ class Processor(object):
             values = element.text.split(delimiter)
             for row in values:
                 if datatype is not None:
-                    obj_ = rdflib.Literal(row.strip(), datatype=datatype)
+                    obj_ = self.terms.literal(row.strip(), datatype=datatype)
                 else:
-                    obj_ = rdflib.Literal(row.strip())
+                    obj_ = self.terms.literal(row.strip())
                 if isinstance(subject, rdflib.BNode):
                     new_subject = rdflib.BNode()
                     class_ = triple_map.subjectMap.class_
@@ -155,15 +339,97 @@ class Processor(object):
             value: Varys depending on ingester
         """
         if datatype == NS_MGR.xsd.anyURI:
-            term = rdflib.URIRef(value)
+            term = self.terms.uri(value)
         elif datatype:
-            term = rdflib.Literal(value, datatype=datatype)
+            term = self.terms.literal(value, datatype=datatype)
         else:
-            term = rdflib.Literal(value)
+            term = self.terms.literal(value)
         return term
 
+    def __join_context__(self, **kwargs):
+        """Returns the hashable context a parent triple map is executed
+        in, the parent's subjects are reused for the same parent map and
+        context within a record, None always executes the parent map.
+        The base processor's parent maps only depend on the record.
+
+        Keyword args:
+
+        -------------
+            Keyword arguments passed to the parent's execute
+        """
+        return ()
+
+    def __join_value__(self, context, reference):
+        """Placeholder method, child classes return the value of a
+        rr:child or rr:parent reference in a child or parent context
+
+        Args:
+
+        -----
+            context: Element, row or object a subject was generated from
+            reference: rdflib.Literal
+        """
+        return None
+
+    def __parent_subjects__(self, parent_map, **kwargs):
+        """Internal method returns the subjects of a parent triple map,
+        executing it once for each context in a record. The subjects of a
+        parent map with a rr:BlankNode subject map are shared by every
+        reference to it in the context, one blank node for each of the
+        parent's rows rather than one for each reference, unless
+        join_cache is 0
+
+        Args:
+
+        -----
+            parent_map: rdflib.URIRef of the parent triple map
+        """
+        context = self.__join_context__(**kwargs)
+        if context is None or self.join_cache < 1:
+            return self.execute(self.triple_maps[str(parent_map)], **kwargs)
+        key = (str(parent_map), context)
+        if key in self.__joins__:
+            return self.__joins__[key]
+        subjects = self.execute(self.triple_maps[str(parent_map)], **kwargs)
+        if len(self.__joins__) < self.join_cache:
+            self.__joins__[key] = subjects
+        return subjects
+
+    def __join__(self, parent_map, join_conditions, child_context, **kwargs):
+        """Internal method returns the subjects of a parent triple map
+        whose rr:parent values equal the rr:child values of the child's
+        context, a hash index of the parent's subjects is built once for
+        each parent map and join in a record
+
+        Args:
+
+        -----
+            parent_map: rdflib.URIRef of the parent triple map
+            join_conditions: list of rr:child and rr:parent tuples
+            child_context: Element, row or object of the child subject
+        """
+        key = (str(parent_map), tuple(join_conditions))
+        index = self.__joins__.get(key)
+        if index is None:
+            index = collections.defaultdict(list)
+            for parent_subject in self.__parent_subjects__(parent_map,
+                                                           **kwargs):
+                parent_context = self.__contexts__.get(parent_subject)
+                values = tuple([self.__join_value__(parent_context, parent)
+                                for child, parent in join_conditions])
+                index[values].append(parent_subject)
+            if len(self.__joins__) < self.join_cache:
+                self.__joins__[key] = index
+        values = tuple([self.__join_value__(child_context, child)
+                        for child, parent in join_conditions])
+        if None in values:
+            return []
+        return index.get(values, [])
+
     def __handle_parents__(self, **kwargs):
-        """Internal method handles parentTriplesMaps
+        """Internal method handles parentTriplesMaps, the parent's
+        subjects are joined on the pred_obj_map's rr:joinCondition if it
+        has one
 
         Keyword args:
 
@@ -172,13 +438,22 @@ class Processor(object):
             parent_map: SimpleNamespace of ParentTriplesMap
             subject: rdflib.URIRef or rdflib.BNode
             predicate: rdflib.URIRef
+            pred_obj_map: SimpleNamespace, optional
+            context: Element, row or object of the subject, optional
         """
         parent_map = kwargs.pop("parent_map")
         subject = kwargs.pop('subject')
         predicate = kwargs.pop('predicate')
-        parent_objects = self.execute(
-            self.triple_maps[str(parent_map)],
-            **kwargs)
+        pred_obj_map = kwargs.pop("pred_obj_map", None)
+        context = kwargs.pop("context", None)
+        join_conditions = getattr(pred_obj_map, "joinConditions", [])
+        if len(join_conditions) > 0:
+            parent_objects = self.__join__(parent_map,
+                                           join_conditions,
+                                           context,
+                                           **kwargs)
+        else:
+            parent_objects = self.__parent_subjects__(parent_map, **kwargs)
         for parent_obj in parent_objects:
             if parent_obj == subject:
                 continue
@@ -294,6 +569,15 @@ class Processor(object):
                 predicate=NS_MGR.rr.parentTriplesMap)
             if pred_obj_map.parentTriplesMap is not None:
                 self.parents.add(str(pred_obj_map.parentTriplesMap))
+            pred_obj_map.joinConditions = []
+            for join_bnode in self.rml.objects(
+                    subject=obj_map_bnode,
+                    predicate=NS_MGR.rr.joinCondition):
+                pred_obj_map.joinConditions.append(
+                    (self.rml.value(subject=join_bnode,
+                                    predicate=NS_MGR.rr.child),
+                     self.rml.value(subject=join_bnode,
+                                    predicate=NS_MGR.rr.parent)))
             pred_obj_map.reference = self.rml.value(
                 subject=obj_map_bnode,
                 predicate=NS_MGR.rr.reference)
@@ -311,13 +595,31 @@ class Processor(object):
             pred_obj_maps.append(pred_obj_map)
         return pred_obj_maps
 
-    def add_to_triplestore(self):
-        """Method attempts to add output to Blazegraph RDF Triplestore"""
-        if len(self.output) > 0:
-            result = requests.post(
+    def add_to_triplestore(self, sink=None):
+        """Method attempts to add output to Blazegraph RDF Triplestore, as
+        N-Triples in one POST or written to a sink, i.e. a
+        bibcat.ingesters.sinks.TriplestoreSink batching many outputs per
+        POST
+
+        Args:
+
+        -----
+            sink: bibcat.ingesters.sinks.Sink, optional
+        """
+        if len(self.output) < 1:
+            return
+        if sink is not None:
+            sink.write(self.output)
+            return
+        result = transport.post(
+            self.triplestore_url,
+            data=ntriples(self.output),
+            headers={"Content-Type": "text/plain"})
+        if result.status_code > 399:
+            logging.error("Could not add {} triples to {}, status={}".format(
+                len(self.output),
                 self.triplestore_url,
-                data=self.output.serialize(),
-                headers={"Content-Type": "application/rdf+xml"})
+                result.status_code))
 
     def generate_term(self, **kwargs):
         """Method generates a rdflib.Term based on kwargs"""
@@ -328,17 +630,21 @@ class Processor(object):
         if not hasattr(term_map, 'datatype'):
             term_map.datatype = NS_MGR.xsd.anyURI
         if hasattr(term_map, "template") and term_map.template is not None:
-            template_vars = kwargs
-            template_vars.update(self.constants)
-            # Call any functions to generate values
-            for key, value in template_vars.items():
-                if hasattr(value, "__call__"):
-                    template_vars[key] = value()
-            raw_value = term_map.template.format(**template_vars)
+            compiled_template = getattr(term_map, "compiled_template", None)
+            if compiled_template is not None:
+                raw_value = compiled_template(kwargs, self.constants)
+            else:
+                template_vars = kwargs
+                template_vars.update(self.constants)
+                # Call any functions to generate values
+                for key, value in template_vars.items():
+                    if hasattr(value, "__call__"):
+                        template_vars[key] = value()
+                raw_value = term_map.template.format(**template_vars)
             if term_map.datatype == NS_MGR.xsd.anyURI:
-                return rdflib.URIRef(raw_value)
-            return rdflib.Literal(raw_value,
-                                  datatype=term_map.datatype)
+                return self.terms.uri(raw_value)
+            return self.terms.literal(raw_value,
+                                      datatype=term_map.datatype)
         if term_map.reference is not None:
             # Each child will have different mechanisms for referencing the
             # source based
@@ -355,42 +661,11 @@ class Processor(object):
             kwargs['timestamp'] = datetime.datetime.utcnow().isoformat()
         if 'version' not in kwargs:
             kwargs['version'] = bibcat.__version__
+        self.__joins__, self.__contexts__ = dict(), dict()
         for map_key, triple_map in self.triple_maps.items():
             if map_key not in self.parents:
                 self.execute(triple_map, **kwargs)
 
-class CSVProcessor(Processor):
-    """CSV RDF Mapping Processor"""
-
-    def __init__(self, **kwargs):
-        if "fields" in kwargs:
-            self.fields = kwargs.pop("fields")
-        if "rml_rules" in kwargs:
-            rml_rules = kwargs.pop("rml_rules")
-        csv_file = kwargs.pop("csv_file")
-        self.reader = csv.DictReader(open(csv_file, 'rb'))
-        super(CSVProcessor, self).__init__(rml_rules)
-
-    def __generate_reference__(self, triple_map, **kwargs):
-        """Extracts the value of either column by key or by position """
-        pass
-
-    def execute(self, triple_map, **kwargs):
-        """Method executes mapping between CSV source and
-        output RDF
-
-        args:
-            triple_map(SimpleNamespace): Triple Map
-        """
-        pass
-
-    def run(self, **kwargs):
-        """Method runs through CSV Reader and applies rules to each
-        row.
-
-        """
-        pass
-
 class CSVRowProcessor(Processor):
     """RML Processor for CSV/TSV or other delimited file supported by the
     python standard library module csv"""
@@ -400,7 +675,24 @@ class CSVRowProcessor(Processor):
             rml_rules = kwargs.pop("rml_rules")
         else:
             rml_rules = []
-        super(CSVRowProcessor, self).__init__(rml_rules)
+        super(CSVRowProcessor, self).__init__(
+            rml_rules,
+            rule_cache=kwargs.pop("rule_cache", None),
+            triple_buffer=kwargs.pop("triple_buffer", False),
+            join_cache=kwargs.pop("join_cache", JOIN_CACHE_SIZE))
+
+    def __join_value__(self, context, reference):
+        """Returns the value of a column in a row
+
+        Args:
+
+        -----
+            context: dict, Row
+            reference: rdflib.Literal, Column name
+        """
+        if context is None:
+            return None
+        return context.get(str(reference))
 
     def __generate_reference__(self, triple_map, **kwargs):
         """Generates a RDF entity based on triple map
@@ -413,15 +705,40 @@ class CSVRowProcessor(Processor):
             return
         if hasattr(triple_map, "datatype"):
             if triple_map.datatype == NS_MGR.xsd.anyURI:
-                output = rdflib.URIRef(raw_value)
+                output = self.terms.uri(raw_value)
             else:
-                output = rdflib.Literal(
+                output = self.terms.literal(
                     raw_value,
                     datatype=triple_map.datatype)
         else:
-            output = rdflib.Literal(raw_value)
+            output = self.terms.literal(raw_value)
         return output
 
+    def __template_vars__(self, term_map, kwargs):
+        """Returns the rr:template variables of a term map, the row's
+        columns and the keywords, that take precedence. Column values in
+        an IRI template are percent-encoded.
+
+        Args:
+
+        -----
+            term_map: SimpleNamespace, Term Map
+            kwargs: dict, keyword template variables
+        """
+        if not isinstance(self.source, dict):
+            return kwargs
+        iri = getattr(term_map, "datatype", NS_MGR.xsd.anyURI) == \
+            NS_MGR.xsd.anyURI
+        template_vars = dict()
+        for key, value in self.source.items():
+            if not isinstance(key, str) or key == "term_map":
+                continue
+            if iri and isinstance(value, str):
+                value = urllib.parse.quote(value, safe="")
+            template_vars[key] = value
+        template_vars.update(kwargs)
+        return template_vars
+
     def execute(self, triple_map, **kwargs):
         """Method executes mapping between CSV source and
         output RDF
@@ -429,15 +746,18 @@ class CSVRowProcessor(Processor):
         args:
             triple_map(SimpleNamespace): Triple Map
         """
-        subject = self.generate_term(term_map=triple_map.subjectMap,
-                                     **kwargs)
+        subject = self.generate_term(
+            term_map=triple_map.subjectMap,
+            **self.__template_vars__(triple_map.subjectMap, kwargs))
         start_size = len(self.output)
         all_subjects = []
         for pred_obj_map in triple_map.predicateObjectMap:
             predicate = pred_obj_map.predicate
             if pred_obj_map.template is not None:
-                object_ = self.generate_term(term_map=pred_obj_map, **kwargs)
-                if len(str(object)) > 0:
+                object_ = self.generate_term(
+                    term_map=pred_obj_map,
+                    **self.__template_vars__(pred_obj_map, kwargs))
+                if object_ and len(str(object_)) > 0:
                     self.output.add((
                         subject,
                         predicate,
@@ -448,6 +768,8 @@ class CSVRowProcessor(Processor):
                     parent_map=pred_obj_map.parentTriplesMap,
                     subject=subject,
                     predicate=predicate,
+                    pred_obj_map=pred_obj_map,
+                    context=self.source,
                     **kwargs)
             if pred_obj_map.reference is not None:
                 object_ = self.generate_term(term_map=pred_obj_map,
@@ -462,6 +784,7 @@ class CSVRowProcessor(Processor):
                              NS_MGR.rdf.type,
                              triple_map.subjectMap.class_))
             all_subjects.append(subject)
+            self.__contexts__[subject] = self.source
         return all_subjects
 
 
@@ -475,10 +798,118 @@ class CSVRowProcessor(Processor):
             row(Dict, List): Row from CSV Reader
         """
         self.source = row
-        self.output = self.__graph__()
+        self.output = self.__output__()
         super(CSVRowProcessor, self).run(**kwargs)
 
 
+class CSVProcessor(CSVRowProcessor):
+    """RML Processor for a whole CSV/TSV file, rows are read lazily and
+    mapped in chunks by CSVRowProcessors in this process or in a pool of
+    worker processes, so files larger than memory are mapped at a steady
+    rate"""
+
+    def __init__(self, **kwargs):
+        """
+        Keyword Args:
+
+        -------------
+            rml_rules: list or str of RML rules
+            csv_file: str or file object, default CSV file for run
+            fields: list, column names for a file without a header row
+            delimiter: str, default is ","
+            encoding: str, default is utf-8
+        """
+        self.csv_file = kwargs.pop("csv_file", None)
+        self.fields = kwargs.pop("fields", None)
+        self.delimiter = kwargs.pop("delimiter", ",")
+        self.encoding = kwargs.pop("encoding", "utf-8")
+        # Picklable keyword arguments of each worker's CSVRowProcessor
+        self.processor_kwargs = dict(kwargs)
+        super(CSVProcessor, self).__init__(**kwargs)
+        self.errors, self.rows_mapped = [], 0
+
+    def rows(self, csv_file=None):
+        """Generator of each row of the CSV file as a dict, the file is
+        read one row at a time
+
+        Args:
+
+        -----
+            csv_file: str path or text file object, defaults to csv_file
+        """
+        csv_file = csv_file or self.csv_file
+        if hasattr(csv_file, "read"):
+            yield from csv.DictReader(csv_file,
+                                      fieldnames=self.fields,
+                                      delimiter=self.delimiter)
+            return
+        with open(csv_file, newline="", encoding=self.encoding) as csv_obj:
+            yield from csv.DictReader(csv_obj,
+                                      fieldnames=self.fields,
+                                      delimiter=self.delimiter)
+
+    def chunks(self, csv_file=None, row_kwargs=None, **kwargs):
+        """Generator of the N-Triples of each chunk of mapped rows, in the
+        order of the file, rows that fail to map are added to errors
+
+        Args:
+
+        -----
+            csv_file: str path or text file object, defaults to csv_file
+            row_kwargs: function, optional, takes a row and returns a dict
+                        of keyword arguments for that row
+
+        Keyword Args:
+
+        -------------
+            workers: int, number of mapping processes, default 1 maps the
+                     rows in this process
+            chunk_size: int, rows in a chunk, default is 1000
+        """
+        workers = kwargs.pop("workers", 1)
+        chunk_size = kwargs.pop("chunk_size", 1000)
+        if 'timestamp' not in kwargs:
+            kwargs['timestamp'] = datetime.datetime.utcnow().isoformat()
+        parallel = ParallelProcessor(CSVRowProcessor,
+                                     self.processor_kwargs,
+                                     workers=workers,
+                                     chunk_size=chunk_size)
+        self.errors, self.rows_mapped = parallel.errors, 0
+        for mapped in parallel.chunks(self.rows(csv_file),
+                                      row_kwargs,
+                                      **kwargs):
+            self.rows_mapped += len(mapped)
+            yield b"".join([raw_nt for index, raw_nt in mapped])
+
+    def run(self, csv_file=None, output=None, row_kwargs=None, **kwargs):
+        """Maps every row of the CSV file, writing the N-Triples of each
+        chunk to output as it is mapped or, without output, merging the
+        rows into the output graph. Returns the number of mapped rows.
+
+        Args:
+
+        -----
+            csv_file: str path or text file object, defaults to csv_file
+            output: binary file object, optional
+            row_kwargs: function, optional, takes a row and returns a dict
+                        of keyword arguments for that row
+
+        Keyword Args:
+
+        -------------
+            workers: int, number of mapping processes, default is 1
+            chunk_size: int, rows in a chunk, default is 1000
+        """
+        if output is None:
+            self.output = self.__graph__()
+        for raw_nt in self.chunks(csv_file, row_kwargs, **kwargs):
+            if output is None:
+                self.output.parse(data=raw_nt.decode(), format="nt")
+            else:
+                output.write(raw_nt)
+        return self.rows_mapped
+
+
 class JSONProcessor(Processor):
     """JSON RDF Mapping Processor"""
 
@@ -487,15 +918,79 @@ class JSONProcessor(Processor):
             rml_rules = kwargs.pop("rml_rules")
         except KeyError:
             rml_rules = []
-        super(JSONProcessor, self).__init__(rml_rules)
+        super(JSONProcessor, self).__init__(
+            rml_rules,
+            rule_cache=kwargs.pop("rule_cache", None),
+            triple_buffer=kwargs.pop("triple_buffer", False),
+            join_cache=kwargs.pop("join_cache", JOIN_CACHE_SIZE))
+        self.__compile_expressions__()
+
+    def __compile_expression__(self, expression):
+        """Returns the parsed jsonpath_ng expression or None
+
+        Args:
+
+        -----
+            expression: rdflib.Literal or None
+        """
+        if expression is None or str(expression) == ".":
+            return
+        try:
+            return jsonpath_ng.parse(str(expression))
+        except Exception:
+            # Invalid expressions raise when the triple map is executed
+            return
+
+    def __json_path__(self, expression, compiled=None):
+        """Returns the compiled JSONPath expression, parsing expression
+        only if the triple map has not been compiled
+
+        Args:
+
+        -----
+            expression: rdflib.Literal or str
+            compiled: jsonpath_ng expression or None
+        """
+        if compiled is not None:
+            return compiled
+        return jsonpath_ng.parse(str(expression))
+
+    def __join_context__(self, **kwargs):
+        """Returns the identity of the JSON object a parent triple map
+        is executed on"""
+        obj = kwargs.get("obj")
+        if obj is None:
+            return ()
+        return id(obj)
+
+    def __join_value__(self, context, reference):
+        """Returns the first value of a JSONPath reference in a JSON
+        object as a str
+
+        Args:
+
+        -----
+            context: dict, JSON object
+            reference: rdflib.Literal, JSONPath expression
+        """
+        if context is None:
+            return None
+        path_expr = self.__json_path__(
+            reference,
+            self.__join_expressions__.get(str(reference)))
+        for result in path_expr.find(context):
+            return str(result.value)
+        return None
 
     def __generate_reference__(self, triple_map, **kwargs):
         json_obj = kwargs.get("obj")
-        path_expr = jsonpath_ng.parse(triple_map.reference)
+        path_expr = self.__json_path__(
+            triple_map.reference,
+            getattr(triple_map, "compiled_reference", None))
         results = [r.value.strip() for r in path_expr.find(json_obj)]
         for row in results:
-            if rdflib.term._is_valid_uri(row):
-                return rdflib.URIRef(row)
+            if self.terms.is_valid_uri(row):
+                return self.terms.uri(row)
 
     def __reference_handler__(self, **kwargs):
         """Internal method for handling rr:reference in triples map
@@ -514,8 +1009,10 @@ class JSONProcessor(Processor):
         if pred_obj_map.reference is None:
             return subjects
         predicate = pred_obj_map.predicate
-        ref_exp = jsonpath_ng.parse(str(pred_obj_map.refernce))
-        found_objects = [r.value for r in ref_exp(obj)]
+        ref_exp = self.__json_path__(
+            pred_obj_map.reference,
+            getattr(pred_obj_map, "compiled_reference", None))
+        found_objects = [r.value for r in ref_exp.find(obj)]
         for row in found_objects:
             self.output.add((subject, predicate, rdflib.Literal(row)))
 
@@ -536,7 +1033,9 @@ class JSONProcessor(Processor):
         if logical_src_iterator == ".":
             results = [None,]
         else:
-            json_path_exp = jsonpath_ng.parse(logical_src_iterator)
+            json_path_exp = self.__json_path__(
+                logical_src_iterator,
+                getattr(triple_map.logicalSource, "compiled_iterator", None))
             results = [r.value for r in json_path_exp.find(json_object)][0]
         for row in results:
             subject = self.generate_term(term_map=triple_map.subjectMap,
@@ -554,22 +1053,28 @@ class JSONProcessor(Processor):
                         parent_map=pred_obj_map.parentTriplesMap,
                         subject=subject,
                         predicate=predicate,
+                        pred_obj_map=pred_obj_map,
+                        context=row,
                         obj=row,
                         **kwargs)
                 if pred_obj_map.reference is not None:
-                    ref_exp = jsonpath_ng.parse(str(pred_obj_map.reference))
+                    ref_exp = self.__json_path__(
+                        pred_obj_map.reference,
+                        getattr(pred_obj_map, "compiled_reference", None))
                     found_objects = [r.value for r in ref_exp.find(row)]
                     for obj in found_objects:
-                        if rdflib.term._is_valid_uri(obj):
-                            rdf_obj = rdflib.URIRef(str(obj))
+                        obj = str(obj)
+                        if self.terms.is_valid_uri(obj):
+                            rdf_obj = self.terms.uri(obj)
                         else:
-                            rdf_obj = rdflib.Literal(str(obj))
+                            rdf_obj = self.terms.literal(obj)
                         self.output.add((subject, predicate, rdf_obj))
                 if pred_obj_map.constant is not None:
                     self.output.add((subject,
                                      predicate,
                                      pred_obj_map.constant))
             subjects.append(subject)
+            self.__contexts__[subject] = row
         return subjects
 
     def run(self, source, **kwargs):
@@ -581,7 +1086,7 @@ class JSONProcessor(Processor):
         ----
             source: str, dict
         """
-        self.output = self.__graph__()
+        self.output = self.__output__()
         if isinstance(source, str):
             import json
             source = json.loads(source)
@@ -595,7 +1100,11 @@ class XMLProcessor(Processor):
     def __init__(self, **kwargs):
         if "rml_rules" in kwargs:
             rml_rules = kwargs.pop("rml_rules")
-        super(XMLProcessor, self).__init__(rml_rules)
+        super(XMLProcessor, self).__init__(
+            rml_rules,
+            rule_cache=kwargs.pop("rule_cache", None),
+            triple_buffer=kwargs.pop("triple_buffer", False),
+            join_cache=kwargs.pop("join_cache", JOIN_CACHE_SIZE))
         if "namespaces" in kwargs:
             self.xml_ns = kwargs.pop("namespaces")
         else:
@@ -603,6 +1112,65 @@ class XMLProcessor(Processor):
         if "triplestore_url" in kwargs:
             self.triplestore_url = kwargs.get("triplestore_url")
         self.constants.update(kwargs)
+        self.__compile_expressions__()
+
+    def __compile_expression__(self, expression):
+        """Returns an etree.XPath bound to the processor's namespaces
+        or None
+
+        Args:
+
+        -----
+            expression: rdflib.Literal or None
+        """
+        if expression is None:
+            return
+        try:
+            return etree.XPath(str(expression), namespaces=self.xml_ns)
+        except etree.XPathSyntaxError:
+            # Invalid expressions raise when the triple map is executed
+            return
+
+    def __xpath__(self, element, expression, compiled=None):
+        """Returns the results of applying an XPath expression to the
+        element, using the compiled expression if the triple map has been
+        compiled
+
+        Args:
+
+        -----
+            element: etree.Element or etree.ElementTree
+            expression: rdflib.Literal or str
+            compiled: etree.XPath or None
+        """
+        if compiled is not None:
+            return compiled(element)
+        return element.xpath(str(expression), namespaces=self.xml_ns)
+
+    def __join_value__(self, context, reference):
+        """Returns the text of the first result of an XPath reference on
+        an element
+
+        Args:
+
+        -----
+            context: etree.Element
+            reference: rdflib.Literal, XPath expression
+        """
+        if context is None:
+            return None
+        found = self.__xpath__(context,
+                               reference,
+                               self.__join_expressions__.get(str(reference)))
+        if isinstance(found, list):
+            if len(found) < 1:
+                return None
+            found = found[0]
+        if isinstance(found, str):
+            return str(found)
+        if hasattr(found, "text"):
+            return (found.text or "").strip()
+        return str(found)
 
     def __generate_reference__(self, triple_map, **kwargs):
         """Internal method takes a triple_map and returns the result of
@@ -614,15 +1182,16 @@ class XMLProcessor(Processor):
             element: etree.Element
         """
         element = kwargs.get("element")
-        found_elements = element.xpath(
+        found_elements = self.__xpath__(
+            element,
             triple_map.reference,
-            namespaces=self.xml_ns)
+            getattr(triple_map, "compiled_reference", None))
         for elem in found_elements:
             raw_text = elem.text.strip()
             #! Quick and dirty test for valid URI
             if not raw_text.startswith("http"):
                 continue
-            return rdflib.URIRef(raw_text)
+            return self.terms.uri(raw_text)
 
 
     def __reference_handler__(self, **kwargs):
@@ -642,9 +1211,10 @@ class XMLProcessor(Processor):
         if pred_obj_map.reference is None:
             return subjects
         predicate = pred_obj_map.predicate
-        found_elements = element.xpath(
-            str(pred_obj_map.reference),
-            namespaces=self.xml_ns)
+        found_elements = self.__xpath__(
+            element,
+            pred_obj_map.reference,
+            getattr(pred_obj_map, "compiled_reference", None))
 
         for found_elem in found_elements:
             if not hasattr(pred_obj_map, "datatype") or \
@@ -653,7 +1223,10 @@ class XMLProcessor(Processor):
             else:
                 datatype = pred_obj_map.datatype
             if isinstance(found_elem, str): # Handle xpath attributes
-                object_ = self.__generate_object_term__(datatype, found_elem)
+                # Plain str so the interned term does not keep the
+                # element's document alive
+                object_ = self.__generate_object_term__(datatype,
+                                                        str(found_elem))
                 self.output.add((subject, predicate, object_))
                 continue
             if found_elem.text is None or len(found_elem.text) < 1:
@@ -688,9 +1261,10 @@ class XMLProcessor(Processor):
 
         """
         subjects = []
-        found_elements = self.source.xpath(
-            str(triple_map.logicalSource.iterator),
-            namespaces=self.xml_ns)
+        found_elements = self.__xpath__(
+            self.source,
+            triple_map.logicalSource.iterator,
+            getattr(triple_map.logicalSource, "compiled_iterator", None))
         for element in found_elements:
             subject = self.generate_term(term_map=triple_map.subjectMap,
                                          element=element,
@@ -709,6 +1283,8 @@ class XMLProcessor(Processor):
                         parent_map=row.parentTriplesMap,
                         subject=subject,
                         predicate=predicate,
+                        pred_obj_map=row,
+                        context=element,
                         **kwargs)
                 new_subjects = self.__reference_handler__(
                     predicate_obj_map=row,
@@ -725,6 +1301,7 @@ class XMLProcessor(Processor):
                                      NS_MGR.rdf.type,
                                      triple_map.subjectMap.class_))
                 subjects.append(subject)
+                self.__contexts__[subject] = element
         return subjects
 
 
@@ -736,7 +1313,7 @@ class XMLProcessor(Processor):
         Args:
             xml(etree.ElementTree or text
         """
-        self.output = self.__graph__()
+        self.output = self.__output__()
         if isinstance(xml, str):
             try:
                 self.source = etree.XML(xml)
@@ -749,6 +1326,48 @@ class XMLProcessor(Processor):
             self.source = xml
         super(XMLProcessor, self).run(**kwargs)
 
+    def run_stream(self, xml_file, record_tag, record_kwargs=None, **kwargs):
+        """Generator incrementally parses a large XML file, like a
+        modsCollection or MARC XML collection, with etree.iterparse, runs
+        the RML rules on one record element at a time, and yields a new
+        output graph for each record. Each record and its preceding
+        siblings are cleared after mapping so memory does not grow with
+        the size of the file.
+
+        Args:
+
+        -----
+            xml_file: str path or file object
+            record_tag: str, tag of the record element either as
+                        {namespace}name or as prefix:name using the
+                        processor's namespaces
+            record_kwargs: function, optional, takes the record element
+                           and returns a dict of keyword arguments for
+                           that record, i.e. instance_iri
+
+        Yields:
+
+        -------
+            rdflib.Graph
+        """
+        if ":" in record_tag and not record_tag.startswith("{"):
+            prefix, name = record_tag.split(":", 1)
+            record_tag = "{{{0}}}{1}".format(self.xml_ns[prefix], name)
+        for event, element in etree.iterparse(xml_file,
+                                              events=("end",),
+                                              tag=record_tag,
+                                              huge_tree=True):
+            run_kwargs = dict(kwargs)
+            if record_kwargs is not None:
+                run_kwargs.update(record_kwargs(element))
+            self.run(element, **run_kwargs)
+            self.source = None
+            element.clear(keep_tail=True)
+            # Remove references to the already processed records
+            while element.getprevious() is not None:
+                del element.getparent()[0]
+            yield self.output
+
 
 def __get_object__(binding):
     """Method takes a binding extracts value and returns rdflib
@@ -759,7 +1378,7 @@ def __get_object__(binding):
     """
     if isinstance(binding, rdflib.term.Node):
         return binding
-    elif isinstance(binding, collections.Iterable):
+    elif isinstance(binding, collections.abc.Iterable):
         for key, row in binding.items():
             if isinstance(row, (rdflib.URIRef, rdflib.Literal)):
                 return row
@@ -776,13 +1395,135 @@ def __get_object__(binding):
 
 
 
+def __get_entity__(entity_raw):
+    """Function takes the iterator's binding and returns the rdflib
+    entity
+
+     Args:
+         entity_raw: rdflib term or dict of a SPARQL JSON result
+    """
+    if entity_raw is None or \
+       isinstance(entity_raw, (rdflib.URIRef, rdflib.BNode)):
+        return entity_raw
+    raw_value = entity_raw.get('value')
+    if entity_raw.get('type').startswith('bnode'):
+        return rdflib.BNode(raw_value)
+    return rdflib.URIRef(raw_value)
+
+
+def __values_query__(query, iterator, **kwargs):
+    """Function rewrites a predicate object map's query for a batch of
+    entities, <{iterator}> becomes the iterator variable and is added to
+    the projection. Returns the query before and after where the VALUES
+    block goes and the projection, or None if the query can not be
+    batched
+
+     Args:
+         query: rml:query of the predicate object map
+         iterator: logical source iterator variable
+    """
+    placeholder = "<{" + iterator + "}>"
+    if placeholder not in query:
+        return None
+    kwargs.pop(iterator, None)
+    variable = "?" + iterator
+    try:
+        sparql = str(query).replace(placeholder, variable).format(**kwargs)
+    except (KeyError, IndexError):
+        # The iterator is used outside of an IRI
+        return None
+    select = SELECT_CLAUSE.search(sparql)
+    where = WHERE_CLAUSE.search(sparql)
+    if select is None or where is None:
+        return None
+    projection = sparql[select.end():where.start()].split()
+    if variable not in projection:
+        projection.insert(0, variable)
+        sparql = "{}{} {}".format(sparql[:select.end()],
+                                  variable,
+                                  sparql[select.end():])
+        where = WHERE_CLAUSE.search(sparql)
+    return sparql[:where.end()], sparql[where.end():], projection
+
+
+def __values_block__(iterator, entities):
+    """Function returns a VALUES block binding the iterator to each entity
+
+     Args:
+         iterator: logical source iterator variable
+         entities: list of rdflib.URIRef
+    """
+    # A sub-select projects the iterator, rdflib drops the unmatched
+    # OPTIONAL rows of a bare VALUES block
+    return "\n {{ SELECT ?{0} WHERE {{ VALUES ?{0} {{ {1} }} }} }}\n".format(
+        iterator,
+        " ".join([entity.n3() for entity in entities]))
+
+
+def __stream_bindings__(result, terms):
+    """Generator of the bindings of a streamed SELECT result, SPARQL TSV
+    results are parsed a line at a time as they arrive, SPARQL JSON
+    results are loaded whole
+
+     Args:
+         result: requests.Response, opened with stream=True
+         terms: TermCache of the processor
+    """
+    try:
+        content_type = result.headers.get("Content-Type", "")
+        if not content_type.startswith("text/tab-separated-values"):
+            for binding in result.json().get("results").get("bindings"):
+                yield binding
+            return
+        lines = result.iter_lines(chunk_size=2**16, delimiter=b"\n")
+        header = next(lines, None)
+        if header is None:
+            return
+        variables = [variable.strip()[1:] for variable in
+                     header.decode("utf-8").rstrip("\r").split("\t")]
+        for line in lines:
+            line = line.decode("utf-8").rstrip("\r")
+            if len(line) < 1:
+                continue
+            binding = dict()
+            for variable, raw_term in zip(variables, line.split("\t")):
+                term = __tsv_term__(raw_term, terms)
+                if term is not None:
+                    binding[variable] = term
+            yield binding
+    finally:
+        result.close()
+
+
+def __tsv_term__(raw_term, terms):
+    """Function returns the rdflib term of a SPARQL TSV result value, None
+    if the variable is unbound
+
+     Args:
+         raw_term: str, term in Turtle syntax
+         terms: TermCache of the processor
+    """
+    if len(raw_term) < 1:
+        return None
+    if raw_term.startswith("<") and raw_term.endswith(">"):
+        return terms.uri(raw_term[1:-1])
+    if raw_term.startswith('"') and raw_term.endswith('"') and \
+       "\\" not in raw_term and len(raw_term) > 1:
+        return terms.literal(raw_term[1:-1])
+    return from_n3(raw_term)
+
+
 class SPARQLProcessor(Processor):
     """SPARQLProcessor provides a RML Processor for external SPARQL endpoints"""
 
     def __init__(self, **kwargs):
         if "rml_rules" in kwargs:
             rml_rules = kwargs.pop("rml_rules")
-        super(SPARQLProcessor, self).__init__(rml_rules)
+        super(SPARQLProcessor, self).__init__(
+            rml_rules,
+            rule_cache=kwargs.pop("rule_cache", None),
+            triple_buffer=kwargs.pop("triple_buffer", False),
+            join_cache=kwargs.pop("join_cache", JOIN_CACHE_SIZE))
         __set_prefix__()
         self.triplestore_url = kwargs.get("triplestore_url")
         if self.triplestore_url is None:
@@ -791,6 +1532,26 @@ class SPARQLProcessor(Processor):
 
         # Sets defaults
         self.limit, self.offset = 5000, 0
+        # Entities bound with VALUES in each predicate object map query,
+        # None queries every entity separately
+        self.batch_size = kwargs.get("batch_size")
+        # Follows the logical source query's LIMIT and OFFSET pages until
+        # a page has fewer bindings than the limit
+        self.paging = kwargs.get("paging", True)
+        # Predicate object map queries sent to a remote triplestore at
+        # once, 1 sends them one after another
+        self.max_requests = kwargs.get("max_requests", 1)
+        self.__pool__ = None
+        # Simple rml:query templates are matched with the indexes of a
+        # local rdflib Graph instead of its SPARQL engine
+        self.planner = None
+        if kwargs.get("query_planner", True):
+            self.planner = QueryPlanner(NS_MGR)
+
+    def __join_context__(self, **kwargs):
+        """Parent triple maps are queried with the child's bindings, so
+        they are executed for every reference"""
+        return None
 
     def __get_bindings__(self, sparql, output_format):
         """Internal method queries triplestore or remote
@@ -805,27 +1566,208 @@ class SPARQLProcessor(Processor):
         if self.triplestore_url is None:
             result = self.triplestore.query(sparql)
             bindings = result.bindings
+        elif output_format == "json":
+            result = transport.post(
+                self.triplestore_url,
+                data={"query": sparql},
+                headers={"Accept": RESULTS_ACCEPT},
+                stream=True)
+            bindings = __stream_bindings__(result, self.terms)
         else:
-            result = requests.post(
+            result = transport.post(
                 self.triplestore_url,
                 data={"query": sparql,
                       "format": output_format})
-            if output_format == "json":
-                bindings = result.json().get("results").get("bindings")
-            elif output_format == "xml":
+            if output_format == "xml":
                 xml_doc = etree.XML(result.text)
                 bindings = xml_doc.findall("results/bindings")
         return bindings
 
+    def __plan__(self, query):
+        """Returns the planner's BGPQuery of a rml:query template when
+        querying a local rdflib Graph, otherwise None
+
+        Args:
+
+        -----
+            query: str, rml:query template
+        """
+        if self.planner is None or self.triplestore_url is not None:
+            return None
+        return self.planner.plan(query)
+
+    def __select__(self, query, output_format, **kwargs):
+        """Returns the bindings of a rml:query template formatted with
+        kwargs, from its BGPQuery plan if it has one
+
+        Args:
+
+        -----
+            query: str, rml:query template
+            output_format: str, json or xml
+        """
+        plan = self.__plan__(query)
+        if plan is not None:
+            return plan.bindings(self.triplestore, **kwargs)
+        return self.__get_bindings__(PREFIX + query.format(**kwargs),
+                                     output_format)
+
+    def __batch_query__(self, query, iterator, entities, **kwargs):
+        """Returns a predicate object map's query with the iterator bound
+        to every entity in a VALUES block and added to the projection,
+        or None if the query can not be batched
+
+        Args:
+
+        -----
+            query: rdflib.Literal, rml:query of the predicate object map
+            iterator: str, logical source iterator variable
+            entities: list of rdflib.URIRef
+        """
+        values_query = __values_query__(query, iterator, **kwargs)
+        if values_query is None:
+            return None
+        head, tail, projection = values_query
+        return PREFIX + head + __values_block__(iterator, entities) + tail
+
+    def __batch__(self, triple_map, iterator, entities, output_format,
+                  **kwargs):
+        """Runs each predicate object map query once for a batch of
+        entities, returns a dict of the predicate object map's position and
+        a dict of each entity's bindings
+
+        Args:
+
+        -----
+            triple_map: SimpleNamespace, Triple Map
+            iterator: str, logical source iterator variable
+            entities: list of entities from the logical source
+            output_format: str, json or xml
+        """
+        batched = dict()
+        if self.triplestore_url is not None and output_format != "json":
+            return batched
+        # Blank nodes can not be bound with VALUES
+        iris = list(collections.OrderedDict.fromkeys(
+            [entity for entity in entities
+             if isinstance(entity, rdflib.URIRef)]))
+        if len(iris) < 1:
+            return batched
+        queries = []
+        for position, pred_obj_map in enumerate(
+                triple_map.predicateObjectMap):
+            if pred_obj_map.parentTriplesMap is not None or \
+               pred_obj_map.reference is not None or \
+               pred_obj_map.constant is not None or \
+               pred_obj_map.query is None or \
+               self.__plan__(pred_obj_map.query) is not None:
+                continue
+            sparql = self.__batch_query__(pred_obj_map.query,
+                                          iterator,
+                                          iris,
+                                          **dict(kwargs))
+            if sparql is not None:
+                queries.append((position, sparql))
+        for position, rows in self.__run_queries__(queries, output_format):
+            entity_bindings = collections.OrderedDict(
+                [(iri, []) for iri in iris])
+            for row in rows:
+                row = dict(row)
+                # rdflib results are keyed by Variable, SPARQL JSON by str
+                key = next((key for key in row if str(key) == iterator),
+                           None)
+                entity = __get_entity__(row.pop(key, None))
+                if entity in entity_bindings:
+                    entity_bindings[entity].append(row)
+            batched[position] = entity_bindings
+        return batched
+
+    def __concurrent__(self):
+        """Returns True if predicate object map queries are sent to the
+        remote triplestore concurrently"""
+        return self.max_requests > 1 and self.triplestore_url is not None
+
+    def __run_queries__(self, queries, output_format):
+        """Returns a list of the key and the list of bindings of each
+        query, in the order of queries. Queries to a remote triplestore
+        are sent by a pool of max_requests threads.
+
+        Args:
+
+        -----
+            queries: list of key and SPARQL query tuples
+            output_format: str, json or xml
+        """
+        def bindings(query):
+            key, sparql = query
+            return key, list(self.__get_bindings__(sparql, output_format))
+
+        if not self.__concurrent__() or len(queries) < 2:
+            return [bindings(query) for query in queries]
+        if self.__pool__ is None:
+            self.__pool__ = ThreadPoolExecutor(max_workers=self.max_requests)
+        return list(self.__pool__.map(bindings, queries))
+
+    def __prefetch__(self, triple_map, entities, batched, output_format,
+                     **kwargs):
+        """Runs the predicate object map queries of every entity that are
+        not in batched concurrently, adding their bindings to batched
+
+        Args:
+
+        -----
+            triple_map: SimpleNamespace, Triple Map
+            entities: list of entities from the logical source
+            batched: dict of predicate object map bindings from __batch__
+            output_format: str, json or xml
+        """
+        iterator = str(triple_map.logicalSource.iterator)
+        queries = []
+        for entity in entities:
+            kwargs[iterator] = entity
+            for position, pred_obj_map in enumerate(
+                    triple_map.predicateObjectMap):
+                if pred_obj_map.parentTriplesMap is not None or \
+                   pred_obj_map.reference is not None or \
+                   pred_obj_map.constant is not None or \
+                   entity in batched.get(position, {}):
+                    continue
+                queries.append(
+                    ((position, entity),
+                     PREFIX + pred_obj_map.query.format(**kwargs)))
+        for (position, entity), rows in self.__run_queries__(queries,
+                                                             output_format):
+            batched.setdefault(position, dict())[entity] = rows
+        return batched
+
     def run(self, **kwargs):
-        self.output = self.__graph__()
+        self.output = self.__output__()
         if "limit" in kwargs:
             self.limit = kwargs.get('limit')
         if "offset" in kwargs:
             self.offset = kwargs.get('offset')
+        if "batch_size" in kwargs:
+            self.batch_size = kwargs.pop('batch_size')
         if "triplestore" in kwargs:
             self.triplestore = kwargs.get('triplestore')
-        super(SPARQLProcessor, self).run(**kwargs)
+        try:
+            super(SPARQLProcessor, self).run(**kwargs)
+        finally:
+            # Request threads are not kept between runs
+            self.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        """Shuts down the pool of request threads, a later run starts a
+        new pool"""
+        if self.__pool__ is not None:
+            self.__pool__.shutdown()
+            self.__pool__ = None
 
     def execute(self, triple_map, **kwargs):
         """Execute """
@@ -839,164 +1781,317 @@ class SPARQLProcessor(Processor):
             kwargs['limit'] = self.limit
         if 'offset' not in kwargs:
             kwargs['offset'] = self.offset
+        query = triple_map.logicalSource.query
+        while True:
+            # Only one page of bindings is held at a time
+            bindings = list(self.__select__(query, output_format, **kwargs))
+            subjects.extend(self.__execute_page__(triple_map,
+                                                  bindings,
+                                                  output_format,
+                                                  **kwargs))
+            limit = int(kwargs['limit'] or 0)
+            if not self.paging or "{offset}" not in query or \
+               limit < 1 or len(bindings) < limit:
+                break
+            kwargs['offset'] = int(kwargs['offset']) + limit
+        return subjects
+
+    def __execute_page__(self, triple_map, bindings, output_format,
+                         **kwargs):
+        """Adds the triples of a page of logical source bindings, returns
+        the page's entities
+
+        Args:
+
+        -----
+            triple_map: SimpleNamespace, Triple Map
+            bindings: list of logical source bindings
+            output_format: str, json or xml
+        """
+        subjects = []
         iterator = str(triple_map.logicalSource.iterator)
-        sparql = PREFIX + triple_map.logicalSource.query.format(
-            **kwargs)
-        bindings = self.__get_bindings__(sparql, output_format)
-        for binding in bindings:
-            entity_raw = binding.get(iterator)
-            if isinstance(entity_raw, (rdflib.URIRef, rdflib.BNode)):
-                entity = entity_raw
-            else:
-                raw_value = entity_raw.get('value')
-                if entity_raw.get('type').startswith('bnode'):
-                    entity = rdflib.BNode(raw_value)
-                else:
-                    entity = rdflib.URIRef(raw_value)
-            if triple_map.subjectMap.class_ is not None:
-                self.output.add((entity,
-                                 NS_MGR.rdf.type,
-                                 triple_map.subjectMap.class_))
-            for pred_obj_map in triple_map.predicateObjectMap:
-                predicate = pred_obj_map.predicate
-                kwargs[iterator] = entity
+        batch_size = self.batch_size
+        if not batch_size and self.__concurrent__():
+            # Entities whose queries are in flight together
+            batch_size = self.max_requests
+        batch_size = batch_size or len(bindings) or 1
+        for start in range(0, len(bindings), batch_size):
+            batch = bindings[start:start + batch_size]
+            entities = [__get_entity__(binding.get(iterator))
+                        for binding in batch]
+            batched = dict()
+            if self.batch_size:
+                batched = self.__batch__(triple_map,
+                                         iterator,
+                                         entities,
+                                         output_format,
+                                         **kwargs)
+            if self.__concurrent__():
+                batched = self.__prefetch__(triple_map,
+                                            entities,
+                                            batched,
+                                            output_format,
+                                            **kwargs)
+            for binding, entity in zip(batch, entities):
+                self.__execute_entity__(triple_map,
+                                        binding,
+                                        entity,
+                                        batched,
+                                        output_format,
+                                        **kwargs)
+                subjects.append(entity)
+        return subjects
 
-                if pred_obj_map.parentTriplesMap is not None:
-                    self.__handle_parents__(
-                        parent_map=pred_obj_map.parentTriplesMap,
-                        subject=entity,
-                        predicate=predicate,
-                        **kwargs)
-                    continue
-                if pred_obj_map.reference is not None:
-                    ref_key = str(pred_obj_map.reference)
-                    if ref_key in binding:
-                        object_ = __get_object__(
-                            binding[ref_key])
-                        self.output.add((entity, predicate, object_))
-                    continue
-                if pred_obj_map.constant is not None:
-                    self.output.add(
-                        (entity, predicate, pred_obj_map.constant))
-                    continue
-                sparql_query = PREFIX + pred_obj_map.query.format(
+    def __execute_entity__(self, triple_map, binding, entity, batched,
+                           output_format, **kwargs):
+        """Adds the triples of an entity from the logical source
+
+        Args:
+
+        -----
+            triple_map: SimpleNamespace, Triple Map
+            binding: dict, logical source binding of the entity
+            entity: rdflib.URIRef or rdflib.BNode
+            batched: dict of predicate object map bindings from __batch__
+                     and __prefetch__
+            output_format: str, json or xml
+        """
+        iterator = str(triple_map.logicalSource.iterator)
+        if triple_map.subjectMap.class_ is not None:
+            self.output.add((entity,
+                             NS_MGR.rdf.type,
+                             triple_map.subjectMap.class_))
+        for position, pred_obj_map in enumerate(
+                triple_map.predicateObjectMap):
+            predicate = pred_obj_map.predicate
+            kwargs[iterator] = entity
+
+            if pred_obj_map.parentTriplesMap is not None:
+                self.__handle_parents__(
+                    parent_map=pred_obj_map.parentTriplesMap,
+                    subject=entity,
+                    predicate=predicate,
                     **kwargs)
-                pre_obj_bindings = self.__get_bindings__(
-                    sparql_query,
-                    output_format)
-                
-                for row in pre_obj_bindings:
-                    object_ = __get_object__(row)
-                    if object_ is None:
-                        continue
+                continue
+            if pred_obj_map.reference is not None:
+                ref_key = str(pred_obj_map.reference)
+                if ref_key in binding:
+                    object_ = __get_object__(
+                        binding[ref_key])
                     self.output.add((entity, predicate, object_))
-            subjects.append(entity)
-        return subjects
+                continue
+            if pred_obj_map.constant is not None:
+                self.output.add(
+                    (entity, predicate, pred_obj_map.constant))
+                continue
+            if entity in batched.get(position, {}):
+                pre_obj_bindings = batched[position][entity]
+            else:
+                pre_obj_bindings = self.__select__(pred_obj_map.query,
+                                                   output_format,
+                                                   **kwargs)
+
+            for row in pre_obj_bindings:
+                object_ = __get_object__(row)
+                if object_ is None:
+                    continue
+                self.output.add((entity, predicate, object_))
 
 class SPARQLBatchProcessor(Processor):
     """Class batches all triple_maps queries into a single SPARQL query
     in an attempt to reduce the time spent in the triplestore/network
     bottleneck"""
 
-    def __init__(self, rml_rules, triplestore_url=None, triplestore=None):
-        super(SPARQLBatchProcessor, self).__init__(rml_rules)
+    def __init__(self, rml_rules, triplestore_url=None, triplestore=None,
+                 rule_cache=None, triple_buffer=False,
+                 join_cache=JOIN_CACHE_SIZE, batch_size=100):
+        super(SPARQLBatchProcessor, self).__init__(rml_rules,
+                                                   rule_cache,
+                                                   triple_buffer,
+                                                   join_cache)
         __set_prefix__()
         if triplestore_url is not None:
             self.triplestore_url = triplestore_url
         elif triplestore is not None:
             self.triplestore = triplestore
+        # Entities bound with VALUES in each compound query
+        self.batch_size = batch_size
 
     def __get_bindings__(self, sparql):
+        """Returns the bindings of a SELECT query, a remote triplestore's
+        results are streamed and parsed as they arrive
+
+        Args:
+
+        ----
+            sparql: String of SPARQL query
+        """
         bindings = []
         if self.triplestore_url is not None:
-            result = requests.post(
+            result = transport.post(
                 self.triplestore_url,
-                data={"query": sparql,
-                      "format": "json"})
-            bindings = result.json().get("results").get("bindings")
+                data={"query": sparql},
+                headers={"Accept": RESULTS_ACCEPT},
+                stream=True)
+            bindings = __stream_bindings__(result, self.terms)
         elif self.triplestore is not None:
             result = self.triplestore.query(sparql)
             bindings = result.bindings
-        
         return bindings
 
-    def __construct_compound_query__(self, triple_map):
-        select_clause = PREFIX + """
-SELECT"""
-        where_clause = """
-WHERE {{"""
-            
+    def __construct_compound_query__(self, triple_map, **kwargs):
+        """Builds the parts of the compound query of a triple map once,
+        each predicate object map query is a UNION branch projecting the
+        iterator and its own object variable so the objects of different
+        predicates are not multiplied together
+
+        Args:
+            triple_map(SimpleNamespace): Triple Map
+
+        Returns:
+            SimpleNamespace: branches, the query of each branch before and
+                             after its VALUES block, predicates, the
+                             predicate of each object variable, and
+                             per_entity, the predicate object maps that
+                             are queried for every entity
+        """
+        iterator = str(triple_map.logicalSource.iterator)
+        compound = SimpleNamespace(branches=[],
+                                   predicates=collections.OrderedDict(),
+                                   per_entity=[])
         for pred_map in triple_map.predicateObjectMap:
             if pred_map.constant is not None or\
-               pred_map.reference is not None:
+               pred_map.reference is not None or\
+               pred_map.query is None:
                 continue
-            #if pred_obj_map.parentTriplesMap is not None:
-            #    self.__handle_parents__(
-            #        parent_map=pred_obj_map.parentTriplesMap,
-            #        subject=entity,
-            #        predicate=predicate,
-            #        **kwargs)
-            #        continue
-            select_line = pred_map.query.splitlines()[0]
-            for term in select_line.split():
-                if term.startswith("?") and term not in select_clause:
-                    select_clause += " {}".format(term)
-            where_clause += "\nOPTIONAL{{\n\t" +\
-                        pred_map.query +\
-                        "\n}}\n"
-        sparql = select_clause + where_clause + "}}"
-        return sparql
-        
-    def run(self, **kwargs):
-        self.output = self.__graph__()
-        super(SPARQLBatchProcessor, self).run(**kwargs)
-        
-    def execute(self, triple_map, **kwargs):
-        """Method iterates through triple map's predicate object maps
-        and processes query.
+            values_query = __values_query__(pred_map.query,
+                                            iterator,
+                                            **kwargs)
+            objects = []
+            if values_query is not None:
+                head, tail, projection = values_query
+                objects = [term for term in projection
+                           if re.match(r"^\?\w+$", term) and
+                           term != "?" + iterator]
+            if len(objects) != 1:
+                # Only one object variable fits a UNION branch
+                compound.per_entity.append(pred_map)
+                continue
+            variable = "object_{}".format(len(compound.predicates))
+            compound.predicates[variable] = pred_map.predicate
+            compound.branches.append(
+                ("{{ SELECT ?{} ({} AS ?{})\nWHERE {{\n{}".format(
+                    iterator, objects[0], variable, head),
+                 tail + "\n}}"))
+        return compound
+
+    def __compound_sparql__(self, compound, iterator, entities):
+        """Returns the compound query for a batch of entities
+
+        Args:
+            compound(SimpleNamespace): from __construct_compound_query__
+            iterator(str): Logical source iterator variable
+            entities(list): List of rdflib.URIRef
+        """
+        values = __values_block__(iterator, entities)
+        select_clause = PREFIX + "SELECT ?{} {}".format(
+            iterator,
+            " ".join(["?" + variable for variable in compound.predicates]))
+        branches = "\nUNION\n".join([head + values + tail
+                                      for head, tail in compound.branches])
+        return select_clause + "\nWHERE {\n" + branches + "\n}"
+
+    def __execute_batch__(self, triple_map, compound, entities, **kwargs):
+        """Adds the triples of a batch of entities, the entities' objects
+        are added row by row from the compound query's bindings, streamed
+        from a remote triplestore
 
         Args:
             triple_map(SimpleNamespace): Triple Map
+            compound(SimpleNamespace): from __construct_compound_query__
+            entities(list): Entities from the logical source
         """
-        sparql = PREFIX + triple_map.logicalSource.query.format(
-            **kwargs)
-        bindings = self.__get_bindings__(sparql)
         iterator = str(triple_map.logicalSource.iterator)
-        for binding in bindings:
-            entity_dict = binding.get(iterator)
-            if isinstance(entity_dict, rdflib.term.Node):
-                entity = entity_dict
-            elif isinstance(entity_dict, dict):
-                raw_value = entity_dict.get('value')
-                if entity_dict.get('type').startswith('bnode'):
-                    entity = rdflib.BNode(raw_value)
-                else:
-                    entity = rdflib.URIRef(raw_value)
+        for entity in entities:
             if triple_map.subjectMap.class_ is not None:
                 self.output.add(
                     (entity,
                      rdflib.RDF.type,
                      triple_map.subjectMap.class_))
-            
-            sparql_query = self.__construct_compound_query__(
-                triple_map).format(**kwargs)
-            properties = self.__get_bindings__(sparql_query)
             for pred_obj_map in triple_map.predicateObjectMap:
-                predicate = pred_obj_map.predicate
                 if pred_obj_map.constant is not None:
+                    self.output.add((entity,
+                                     pred_obj_map.predicate,
+                                     pred_obj_map.constant))
+            # Blank nodes can not be bound with VALUES
+            pred_obj_maps = compound.per_entity
+            if not isinstance(entity, rdflib.URIRef):
+                pred_obj_maps = [pred_map
+                                 for pred_map in triple_map.predicateObjectMap
+                                 if pred_map.query is not None and
+                                 pred_map.constant is None and
+                                 pred_map.reference is None]
+            for pred_obj_map in pred_obj_maps:
+                kwargs[iterator] = entity
+                sparql = PREFIX + pred_obj_map.query.format(**kwargs)
+                for row in self.__get_bindings__(sparql):
+                    object_ = __get_object__(row)
+                    if object_ is None:
+                        continue
                     self.output.add(
-                        (entity, predicate, pred_obj_map.constant))
+                        (entity, pred_obj_map.predicate, object_))
+        iris = [entity for entity in entities
+                if isinstance(entity, rdflib.URIRef)]
+        if len(iris) < 1 or len(compound.branches) < 1:
+            return
+        sparql = self.__compound_sparql__(compound, iterator, iris)
+        for row in self.__get_bindings__(sparql):
+            entity, predicate, object_ = None, None, None
+            for key, value in dict(row).items():
+                key = str(key)
+                if value is None:
                     continue
-                if "#" in str(predicate):
-                    key = str(predicate).split("#")[-1]
-                else:
-                    key = str(predicate).split("/")[-1]
+                if key == iterator:
+                    entity = __get_entity__(value)
+                elif key in compound.predicates:
+                    predicate = compound.predicates[key]
+                    object_ = __get_object__({key: value})
+            if entity is None or object_ is None:
+                continue
+            self.output.add((entity, predicate, object_))
+
+    def run(self, **kwargs):
+        self.output = self.__output__()
+        super(SPARQLBatchProcessor, self).run(**kwargs)
 
-                for property_ in properties:
-                    if key in property_.keys():
-                        info = {"about": property_.get(key)}
-                        object_ = __get_object__(info)
-                        self.output.add((entity, predicate, object_))
+    def execute(self, triple_map, **kwargs):
+        """Method builds the compound query of the triple map's predicate
+        object maps once and runs it for each batch of entities from the
+        logical source
+
+        Args:
+            triple_map(SimpleNamespace): Triple Map
+        """
+        sparql = PREFIX + triple_map.logicalSource.query.format(
+            **kwargs)
+        # Entities are batched as the logical source's bindings arrive
+        bindings = self.__get_bindings__(sparql)
+        iterator = str(triple_map.logicalSource.iterator)
+        compound = self.__construct_compound_query__(triple_map, **kwargs)
+        entities = []
+        for binding in bindings:
+            entity = __get_entity__(binding.get(iterator))
+            if entity is None:
+                continue
+            entities.append(entity)
+            if len(entities) >= self.batch_size:
+                self.__execute_batch__(triple_map,
+                                       compound,
+                                       entities,
+                                       **kwargs)
+                entities = []
+        if len(entities) > 0:
+            self.__execute_batch__(triple_map, compound, entities, **kwargs)
 
 
 def __set_prefix__():
@@ -0,0 +1,60 @@
+"""Interning of the RDF terms built by the RML processors
+
+Values like relator codes, classes, language tags and institution IRIs
+repeat in nearly every record. A TermCache keeps bounded LRU caches of
+the rdflib.URIRef and rdflib.Literal built for each value, and of the
+result of rdflib's IRI validation, for the lifetime of a processor so a
+repeated value returns the same term object.
+
+>>> from bibcat.rml.terms import TermCache
+>>> terms = TermCache(max_size=1000)
+>>> terms.uri("http://id.loc.gov/vocabulary/relators/aut") is \\
+...     terms.uri("http://id.loc.gov/vocabulary/relators/aut")
+True
+>>> terms.stats()["uri"]["hits"]
+1
+
+"""
+__author__ = "Jeremy Nelson"
+
+import functools
+
+import rdflib
+from rdflib.term import _is_valid_uri
+
+
+class TermCache(object):
+    """Bounded LRU caches of URIRefs, Literals and IRI validation results
+    with hit and miss counts"""
+
+    def __init__(self, max_size=10000):
+        """
+        Args:
+
+        -----
+            max_size: int, Maximum entries kept in each cache, None is
+                      unbounded
+        """
+        self.max_size = max_size
+        # typed keeps 1, 1.0 and True from sharing a Literal
+        lru = functools.lru_cache(maxsize=max_size, typed=True)
+        self.uri = lru(rdflib.URIRef)
+        self.literal = lru(rdflib.Literal)
+        self.is_valid_uri = lru(_is_valid_uri)
+
+    def clear(self):
+        """Empties the caches and resets their counts"""
+        for cache in (self.uri, self.literal, self.is_valid_uri):
+            cache.cache_clear()
+
+    def stats(self):
+        """Returns a dict of hits, misses and size for each cache"""
+        output = dict()
+        for name, cache in [("uri", self.uri),
+                            ("literal", self.literal),
+                            ("is_valid_uri", self.is_valid_uri)]:
+            info = cache.cache_info()
+            output[name] = {"hits": info.hits,
+                            "misses": info.misses,
+                            "size": info.currsize}
+        return output
@@ -0,0 +1,178 @@
+"""Tests the bulk mode of the WorkGenerator against a mocked triplestore"""
+__author__ = "Jeremy Nelson"
+
+import unittest
+from unittest import mock
+
+import rdflib
+
+from bibcat.generators.bulk import BF, RELATORS, BulkWorks
+from bibcat.updates import UpdateBuffer
+
+URL = "http://localhost:9999/blazegraph/sparql"
+TEMPLATES = {
+    "work_keys": "# work keys\nLIMIT {0} OFFSET {1} VALUES {{ {2} }}",
+    "instance_keys": "# instance keys\nLIMIT {0} OFFSET {1} VALUES {{ {2} }}",
+    "bnode_props": "# bnode props\nVALUES ?instance {{ {0} }}",
+    "delete_bnodes": "DELETE {{ ?work ?p ?o }}\nVALUES ?instance {{ {0} }}"}
+WORK = "http://bibcat.org/work/emma"
+AUSTEN = "http://bibcat.org/agent/austen"
+
+
+def instance(number):
+    return rdflib.URIRef("http://bibcat.org/instance/{}".format(number))
+
+
+def uri(value):
+    return {"type": "uri", "value": str(value)}
+
+
+def literal(value):
+    return {"type": "literal", "value": value}
+
+
+WORK_KEYS = [{"work": uri(WORK), "mainTitle": literal("Emma"),
+              "creator": uri(AUSTEN), "name": literal("Austen, Jane")}]
+INSTANCE_KEYS = [
+    {"instance": uri(instance(1)), "mainTitle": literal("Emma."),
+     "relator": uri(RELATORS.aut), "creator": uri(AUSTEN),
+     "name": literal("Austen, Jane")},
+    {"instance": uri(instance(2)), "mainTitle": literal("Persuasion"),
+     "subtitle": literal("a novel")}]
+BNODE_PROPS = [
+    {"instance": uri(instance(1)), "pred": uri(rdflib.RDF.type),
+     "obj": uri(BF.Text)},
+    {"instance": uri(instance(2)), "pred": uri(BF.language),
+     "obj": uri("http://id.loc.gov/vocabulary/languages/eng")},
+    {"instance": uri(instance(2)), "pred": uri(rdflib.RDF.type),
+     "obj": literal("Text")},
+    {"instance": uri(instance(2))}]
+
+
+class Triplestore(object):
+    """Answers the mocked transport.post by the template's comment and
+    records the queries and updates sent"""
+
+    def __init__(self):
+        self.queries, self.updates = [], []
+        self.update_status = 200
+
+    def post(self, url, data=None, headers=None):
+        if isinstance(data, bytes):
+            self.updates.append(data.decode())
+            return mock.Mock(status_code=self.update_status, text="Error")
+        query = data["query"]
+        self.queries.append(query)
+        if query.startswith("# work keys"):
+            bindings = WORK_KEYS
+        elif query.startswith("# instance keys"):
+            bindings = INSTANCE_KEYS
+        else:
+            # Rows of the Instances in the VALUES of the batch
+            bindings = [row for row in BNODE_PROPS
+                        if "<{}>".format(row["instance"]["value"]) in query]
+        result = mock.Mock(status_code=200)
+        result.json.return_value = {"results": {"bindings": bindings}}
+        return result
+
+
+class TestBulkWorks(unittest.TestCase):
+
+    def setUp(self):
+        self.triplestore = Triplestore()
+        patcher = mock.patch("bibcat.transport.post",
+                             side_effect=self.triplestore.post)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.minted = rdflib.URIRef("http://bibcat.org/work/new")
+        self.works = BulkWorks(URL,
+                               UpdateBuffer(URL, max_operations=2),
+                               TEMPLATES,
+                               lambda: self.minted,
+                               creator_codes=["aut", "cre"],
+                               page_size=10)
+
+    def __inserted__(self, update):
+        graph = rdflib.Graph()
+        start = update.index("INSERT DATA {") + len("INSERT DATA {")
+        graph.parse(data=update[start:update.index("} ;")], format="nt")
+        return graph
+
+    def test_cluster_keys(self):
+        clusters = self.works.__cluster_keys__()
+        self.assertEqual(len(clusters), 2)
+        self.assertEqual(
+            self.triplestore.queries,
+            [TEMPLATES["work_keys"].format(10, 0, "relators:aut relators:cre"),
+             TEMPLATES["instance_keys"].format(10, 0,
+                                               "relators:aut relators:cre")])
+        emma = [cluster for cluster in clusters if cluster.work is not None]
+        self.assertEqual(emma[0].work, rdflib.URIRef(WORK))
+        self.assertEqual(emma[0].instances, [instance(1)])
+        self.assertEqual(
+            self.works.processed[str(instance(1))],
+            {"title": [{"mainTitle": "Emma.", "subtitle": None}],
+             "aut": [rdflib.URIRef(AUSTEN)]})
+        self.assertEqual(
+            self.works.processed[str(instance(2))]["title"],
+            [{"mainTitle": "Persuasion", "subtitle": "a novel"}])
+
+    def test_write_works(self):
+        self.works.__cluster_keys__()
+        self.triplestore.queries = []
+        batch = [(instance(1), rdflib.URIRef(WORK)),
+                 (instance(2), self.minted)]
+        new_works = set([self.minted])
+        self.works.__write_works__(batch, new_works)
+        values = "{} {}".format(instance(1).n3(), instance(2).n3())
+        self.assertEqual(self.triplestore.queries,
+                         [TEMPLATES["bnode_props"].format(values)])
+        # One update request with the Works and the blank node deletes
+        self.assertEqual(len(self.triplestore.updates), 1)
+        update = self.triplestore.updates[0]
+        self.assertTrue(update.endswith(
+            TEMPLATES["delete_bnodes"].format(values)))
+        graph = self.__inserted__(update)
+        work = rdflib.URIRef(WORK)
+        self.assertIn((instance(1), BF.instanceOf, work), graph)
+        self.assertIn((work, rdflib.RDF.type, BF.Text), graph)
+        self.assertIn((work, RELATORS.aut, rdflib.URIRef(AUSTEN)), graph)
+        # Only the minted Work gets a type and title
+        self.assertNotIn((work, rdflib.RDF.type, BF.Work), graph)
+        self.assertIsNone(graph.value(subject=work, predicate=BF.title))
+        self.assertIn((self.minted, rdflib.RDF.type, BF.Work), graph)
+        self.assertIn((instance(2), BF.instanceOf, self.minted), graph)
+        title = graph.value(subject=self.minted, predicate=BF.title)
+        self.assertEqual(graph.value(subject=title, predicate=BF.subtitle),
+                         rdflib.Literal("a novel"))
+        self.assertEqual(
+            len(list(graph.objects(self.minted, rdflib.RDF.type))), 1)
+        self.assertEqual(new_works, set())
+
+    def test_run(self):
+        self.works.batch_size = 1
+        self.works.run()
+        self.assertEqual(len(self.triplestore.updates), 2)
+        deletes = [update[update.index("DELETE"):]
+                   for update in self.triplestore.updates]
+        self.assertEqual(
+            sorted(deletes),
+            sorted([TEMPLATES["delete_bnodes"].format(instance(1).n3()),
+                    TEMPLATES["delete_bnodes"].format(instance(2).n3())]))
+        graph = rdflib.Graph()
+        for update in self.triplestore.updates:
+            graph += self.__inserted__(update)
+        self.assertIn((instance(1), BF.instanceOf, rdflib.URIRef(WORK)),
+                      graph)
+        self.assertIn((instance(2), BF.instanceOf, self.minted), graph)
+
+    def test_run_reports_failed_updates(self):
+        self.triplestore.update_status = 500
+        with self.assertLogs(level="ERROR") as logs:
+            self.works.run()
+        self.assertEqual(self.works.updates.errors, 1)
+        self.assertIn("1 of 1 update requests", logs.output[-1])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,56 @@
+import unittest
+
+import rdflib
+
+from bibcat.generators.cluster import WorkClusters, title_key
+
+WORK = rdflib.URIRef("http://bibcat.org/work/emma")
+
+
+def instance(number):
+    return rdflib.URIRef("http://bibcat.org/instance/{}".format(number))
+
+
+class TestTitleKey(unittest.TestCase):
+
+    def test_title_key(self):
+        self.assertEqual(title_key("Emma."), title_key(" emma"))
+        self.assertIsNone(title_key(None))
+
+
+class TestWorkClusters(unittest.TestCase):
+
+    def setUp(self):
+        self.clusters = WorkClusters()
+        self.clusters.add_work(WORK, "Emma", ["Austen, Jane"])
+
+    def test_existing_work(self):
+        cluster = self.clusters.add_instance(instance(1),
+                                             "Emma.",
+                                             ["austen, jane"])
+        self.assertEqual(cluster.work, WORK)
+        # Instance without creators matches on title alone
+        cluster = self.clusters.add_instance(instance(2), "EMMA")
+        self.assertEqual(cluster.work, WORK)
+        self.assertEqual(len(self.clusters), 1)
+
+    def test_different_creator(self):
+        cluster = self.clusters.add_instance(instance(1),
+                                             "Emma",
+                                             ["Tennant, Emma"])
+        self.assertIsNone(cluster.work)
+        other = self.clusters.add_instance(instance(2),
+                                           "Emma",
+                                           ["tennant, emma"])
+        self.assertIs(other, cluster)
+        self.assertEqual(cluster.instances, [instance(1), instance(2)])
+
+    def test_no_title(self):
+        first = self.clusters.add_instance(instance(1))
+        second = self.clusters.add_instance(instance(2))
+        self.assertIsNot(first, second)
+        self.assertEqual(len(self.clusters), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,154 @@
+"""Tests keyset paging and checkpoints of the generators"""
+__author__ = "Jeremy Nelson"
+
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from bibcat.generators.keyset import Checkpoint, checkpointed, keyset_pages
+from bibcat.updates import UpdateBuffer
+
+URL = "http://localhost:9999/blazegraph/sparql"
+TEMPLATE = """SELECT DISTINCT ?instance
+WHERE {{ ?instance a bf:Instance . {0} }} ORDER BY ?instance LIMIT {1}"""
+
+
+def instance(number):
+    return "http://bibcat.org/instance/{}".format(number)
+
+
+def page(*numbers):
+    bindings = [{"instance": {"type": "uri", "value": instance(number)}}
+                for number in numbers]
+    result = mock.Mock(status_code=200)
+    result.json.return_value = {"results": {"bindings": bindings}}
+    return result
+
+
+def queries(mock_post):
+    return [call[1]["data"]["query"] for call in mock_post.call_args_list]
+
+
+class TestKeysetPages(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.checkpoint = Checkpoint(
+            os.path.join(self.tmp_dir.name, "works.checkpoint"))
+        self.updates = UpdateBuffer(URL, max_operations=2)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    @mock.patch("bibcat.generators.keyset.transport.post")
+    def test_page_sequence(self, mock_post):
+        mock_post.side_effect = [page(1, 2), page(3, 4), page(5)]
+        pages = list(keyset_pages(URL, TEMPLATE, "instance", 2))
+        self.assertEqual(len(pages), 3)
+        sent = queries(mock_post)
+        self.assertNotIn("FILTER", sent[0])
+        self.assertIn('FILTER(STR(?instance) > "{}")'.format(instance(2)),
+                      sent[1])
+        self.assertIn('FILTER(STR(?instance) > "{}")'.format(instance(4)),
+                      sent[2])
+        self.assertTrue(sent[2].endswith("LIMIT 2"))
+
+    @mock.patch("bibcat.generators.keyset.transport.post")
+    def test_empty_last_page(self, mock_post):
+        mock_post.side_effect = [page(1, 2), page()]
+        pages = list(keyset_pages(URL, TEMPLATE, "instance", 2))
+        self.assertEqual(len(pages), 1)
+        self.assertEqual(mock_post.call_count, 2)
+
+    @mock.patch("bibcat.generators.keyset.transport.post")
+    def test_failed_query(self, mock_post):
+        mock_post.return_value = mock.Mock(status_code=500)
+        with self.assertRaises(ValueError):
+            list(keyset_pages(URL, TEMPLATE, "instance", 2))
+
+    @mock.patch("bibcat.generators.keyset.transport.post")
+    def test_resume_from_checkpoint(self, mock_post):
+        with open(self.checkpoint.path, "w+") as checkpoint:
+            checkpoint.write(instance(2))
+        mock_post.side_effect = [page(3, 4), page()]
+        pages = keyset_pages(URL, TEMPLATE, "instance", 2,
+                             self.checkpoint.read())
+        rows = [row.get("instance").get("value")
+                for row in checkpointed(pages, "instance", self.checkpoint,
+                                        self.updates)]
+        self.assertEqual(rows, [instance(3), instance(4)])
+        self.assertIn('FILTER(STR(?instance) > "{}")'.format(instance(2)),
+                      queries(mock_post)[0])
+
+    @mock.patch("bibcat.updates.transport.post")
+    def test_checkpoint_after_updates_sent(self, mock_update):
+        mock_update.return_value = mock.Mock(status_code=200)
+        pages = [page(1, 2, 3).json()["results"]["bindings"]]
+        rows = checkpointed(pages, "instance", self.checkpoint, self.updates)
+        next(rows)
+        self.updates.add("DELETE WHERE {{ <{}> ?p ?o }}".format(instance(1)))
+        next(rows)
+        # Instance 1's update is still buffered
+        self.assertIsNone(self.checkpoint.read())
+        self.updates.add("DELETE WHERE {{ <{}> ?p ?o }}".format(instance(2)))
+        next(rows)
+        self.assertEqual(self.checkpoint.read(), instance(2))
+
+    def test_rows_of_a_key_not_split(self):
+        rows = [{"instance": {"value": instance(1)}, "org": {"value": org}}
+                for org in ["a", "b"]]
+        rows = checkpointed([rows], "instance", self.checkpoint,
+                            self.updates)
+        next(rows)
+        next(rows)
+        self.assertIsNone(self.checkpoint.read())
+        with self.assertRaises(StopIteration):
+            next(rows)
+
+    @mock.patch("bibcat.transport.post")
+    def test_cleared_on_completion(self, mock_post):
+        # Page queries and update requests in the order they are sent
+        sent = mock.Mock(status_code=200)
+        mock_post.side_effect = [page(1, 2), sent, page(3), sent]
+        pages = keyset_pages(URL, TEMPLATE, "instance", 2,
+                             self.checkpoint.read())
+        rows = checkpointed(pages, "instance", self.checkpoint, self.updates)
+        for row in rows:
+            self.updates.add("DELETE WHERE {{ <{}> ?p ?o }}".format(
+                row.get("instance").get("value")))
+            if row.get("instance").get("value") == instance(3):
+                self.assertEqual(self.checkpoint.read(), instance(2))
+        # The last buffered update is sent before the checkpoint is cleared
+        self.assertEqual(mock_post.call_count, 4)
+        self.assertEqual(len(self.updates), 0)
+        self.assertFalse(os.path.exists(self.checkpoint.path))
+
+    @mock.patch("bibcat.transport.post")
+    def test_failed_batch_not_checkpointed(self, mock_post):
+        sent = mock.Mock(status_code=200)
+        failed = mock.Mock(status_code=500, text="Error")
+        # Instances 3 and 4's updates are rejected
+        mock_post.side_effect = [page(1, 2), sent, page(3, 4), failed,
+                                 page(5, 6), sent, page()]
+        pages = keyset_pages(URL, TEMPLATE, "instance", 2,
+                             self.checkpoint.read())
+        with self.assertLogs(level="ERROR"):
+            for row in checkpointed(pages, "instance", self.checkpoint,
+                                    self.updates):
+                self.updates.add("DELETE WHERE {{ <{}> ?p ?o }}".format(
+                    row.get("instance").get("value")))
+        self.assertEqual(self.updates.errors, 1)
+        # A resumed run starts after the last Instance sent before the
+        # failed request
+        self.assertEqual(self.checkpoint.read(), instance(2))
+
+    def test_no_checkpoint_path(self):
+        checkpoint = Checkpoint()
+        checkpoint.write(instance(1))
+        self.assertIsNone(checkpoint.read())
+        checkpoint.clear()
+
+
+if __name__ == '__main__':
+    unittest.main()
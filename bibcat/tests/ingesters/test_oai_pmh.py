@@ -3,14 +3,19 @@ __author__ = "Jeremy Nelson"
 
 import os
 import sys
+import time
 import unittest
+from concurrent.futures import ThreadPoolExecutor
 from unittest import mock
+import rdflib
 try:
     from bibcat.ingesters.oai_pmh import OAIPMHIngester, IslandoraIngester
+    from bibcat.ingesters.oai_pmh import bounded_map
 except ImportError:
     BIBCAT_BASE = os.path.abspath(".")
     sys.path.append(BIBCAT_BASE)
     from bibcat.ingesters.oai_pmh import OAIPMHIngester, IslandoraIngester
+    from bibcat.ingesters.oai_pmh import bounded_map
 
 # Mock of OAI-PMH Fee
 def mocked_oai_pmh(*args, **kwargs):
@@ -58,7 +63,7 @@ class TestOAI_PMHIngester(unittest.TestCase):
         self.assertTrue(hasattr(OAIPMHIngester, "IDENT_XPATH"))
         self.assertTrue(hasattr(OAIPMHIngester, "TOKEN_XPATH")) 
 
-    @mock.patch("bibcat.ingesters.oai_pmh.requests.get", 
+    @mock.patch("bibcat.ingesters.oai_pmh.transport.get", 
         side_effect=mocked_oai_pmh)
     def test_init_repo(self, mock_get):
         oai_ingester = OAIPMHIngester(repository='http://bibcat.org/oai2')
@@ -70,6 +75,87 @@ class TestOAI_PMHIngester(unittest.TestCase):
     def tearDown(self):
         pass
 
+RECORDS_PAGE = """<OAI-PMH xmlns="http://www.openarchives.org/OAI/2.0/">
+<ListRecords>{0}<resumptionToken>{1}</resumptionToken></ListRecords>
+</OAI-PMH>"""
+
+RECORD = """<record><header><identifier>{0}</identifier></header></record>"""
+
+
+def mocked_list_records(*args, **kwargs):
+    class MockResponse(object):
+        status_code = 200
+
+        def __init__(self, text):
+            self.text = text
+
+    if args[0].endswith("verb=ListMetadataFormats"):
+        return mocked_oai_pmh(*args)
+    if "resumptionToken=page2" in args[0]:
+        return MockResponse(RECORDS_PAGE.format(
+            RECORD.format("oai:3") + RECORD.format("oai:4"), ""))
+    if "resumptionToken" in args[0]:
+        return MockResponse(RECORDS_PAGE.format(RECORD.format("oai:2"),
+                                                "page2"))
+    return MockResponse(RECORDS_PAGE.format(RECORD.format("oai:1"),
+                                            "page1"))
+
+
+class MockProcessor(object):
+    """Maps the OAI-PMH identifier of a record to a single triple"""
+
+    def run(self, record, **kwargs):
+        ident = record.find(
+            "{http://www.openarchives.org/OAI/2.0/}header/"
+            "{http://www.openarchives.org/OAI/2.0/}identifier")
+        self.output = rdflib.Graph()
+        self.output.add((rdflib.URIRef("http://bibcat.org/{}".format(
+                             ident.text)),
+                         rdflib.RDFS.label,
+                         rdflib.Literal(ident.text)))
+
+
+class TestOAI_PMHPipeline(unittest.TestCase):
+
+    @mock.patch("bibcat.ingesters.oai_pmh.transport.get",
+        side_effect=mocked_list_records)
+    def test_pages(self, mock_get):
+        for prefetch in [True, False]:
+            ingester = OAIPMHIngester(repository='http://bibcat.org/oai2',
+                                      prefetch=prefetch)
+            pages = list(ingester.__pages__(
+                {"verb": "ListRecords", "metadataPrefix": "oai_dc"},
+                OAIPMHIngester.RECORD_TOKEN_XPATH))
+            self.assertEqual(len(pages), 3)
+
+    @mock.patch("bibcat.ingesters.oai_pmh.transport.get",
+        side_effect=mocked_list_records)
+    def test_harvest_records(self, mock_get):
+        ingester = OAIPMHIngester(repository='http://bibcat.org/oai2')
+        ingester.processor = MockProcessor()
+        self.assertEqual(ingester.__harvest_records__(), 4)
+        self.assertEqual(len(ingester.repo_graph), 4)
+        self.assertEqual(ingester.sink.records, 4)
+
+    @mock.patch("bibcat.ingesters.oai_pmh.transport.get",
+        side_effect=mocked_oai_pmh)
+    def test_delay(self, mock_get):
+        ingester = OAIPMHIngester(repository='http://bibcat.org/oai2',
+                                  delay=0.05)
+        start = time.time()
+        ingester.__request__('http://bibcat.org/oai2?verb=ListMetadataFormats')
+        ingester.__request__('http://bibcat.org/oai2?verb=ListMetadataFormats')
+        self.assertGreaterEqual(time.time() - start, 0.1)
+
+    def test_bounded_map(self):
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            results = list(bounded_map(executor,
+                                       lambda x: x * 2,
+                                       range(50),
+                                       8))
+        self.assertEqual(results, [x * 2 for x in range(50)])
+
+
 class TestIslandoraIngester(unittest.TestCase):
 
     def setUp(self):
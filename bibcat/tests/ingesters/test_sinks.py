@@ -0,0 +1,176 @@
+"""Tests ingester output sinks"""
+__author__ = "Jeremy Nelson"
+
+import gzip
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+from unittest import mock
+
+import rdflib
+
+from bibcat.ingesters.sinks import GraphSink, NTriplesSink, TriplestoreSink
+
+BF = rdflib.Namespace("http://id.loc.gov/ontologies/bibframe/")
+
+
+def record_graph(number):
+    graph = rdflib.Graph()
+    instance = rdflib.URIRef("http://bibcat.org/instance/{}".format(number))
+    graph.add((instance, rdflib.RDF.type, BF.Instance))
+    graph.add((instance,
+               rdflib.RDFS.label,
+               rdflib.Literal("Record \"{}\"\nline two".format(number))))
+    return graph
+
+
+class TestGraphSink(unittest.TestCase):
+
+    def test_write(self):
+        sink = GraphSink()
+        for i in range(3):
+            sink.write(record_graph(i))
+        self.assertEqual(len(sink.graph), 6)
+        self.assertEqual(sink.records, 3)
+        self.assertEqual(sink.triples, 6)
+
+    def test_existing_graph(self):
+        graph = rdflib.Graph()
+        with GraphSink(graph) as sink:
+            sink.write(record_graph(1))
+        self.assertEqual(len(graph), 2)
+
+
+class TestNTriplesSink(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+
+    def test_ntriples(self):
+        path = os.path.join(self.tmp_dir, "harvest.nt")
+        with NTriplesSink(path) as sink:
+            for i in range(3):
+                sink.write(record_graph(i))
+        graph = rdflib.Graph().parse(path, format="nt")
+        self.assertEqual(len(graph), 6)
+        self.assertEqual(
+            graph.value(subject=rdflib.URIRef("http://bibcat.org/instance/2"),
+                        predicate=rdflib.RDFS.label),
+            rdflib.Literal("Record \"2\"\nline two"))
+
+    def test_append(self):
+        path = os.path.join(self.tmp_dir, "harvest.nt")
+        with NTriplesSink(path) as sink:
+            sink.write(record_graph(1))
+        with NTriplesSink(path) as sink:
+            sink.write(record_graph(2))
+        graph = rdflib.Graph().parse(path, format="nt")
+        self.assertEqual(len(graph), 4)
+
+    def test_gzip(self):
+        path = os.path.join(self.tmp_dir, "harvest.nt.gz")
+        with NTriplesSink(path) as sink:
+            sink.write(record_graph(1))
+        with gzip.open(path) as raw_nt:
+            graph = rdflib.Graph().parse(data=raw_nt.read().decode(),
+                                         format="nt")
+        self.assertEqual(len(graph), 2)
+
+    def test_nquads(self):
+        path = os.path.join(self.tmp_dir, "harvest.nq")
+        graph_iri = "http://bibcat.org/graph/harvest"
+        with NTriplesSink(path, graph_iri=graph_iri) as sink:
+            sink.write(record_graph(1))
+        dataset = rdflib.ConjunctiveGraph()
+        dataset.parse(path, format="nquads")
+        context = dataset.get_context(rdflib.URIRef(graph_iri))
+        self.assertEqual(len(context), 2)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+
+class TestTriplestoreSink(unittest.TestCase):
+
+    @mock.patch("bibcat.ingesters.sinks.transport.post")
+    def test_batches(self, mock_post):
+        mock_post.return_value = mock.Mock(status_code=200)
+        sink = TriplestoreSink("http://localhost:9999/blazegraph/sparql",
+                               batch_size=2)
+        for i in range(5):
+            sink.write(record_graph(i))
+        self.assertEqual(mock_post.call_count, 2)
+        sink.close()
+        self.assertEqual(mock_post.call_count, 3)
+        self.assertEqual(sink.requests, 3)
+        data = mock_post.call_args[1]["data"]
+        graph = rdflib.Graph().parse(data=data.decode(), format="nt")
+        self.assertEqual(len(graph), 2)
+
+    @mock.patch("bibcat.ingesters.sinks.transport.post")
+    def test_nquads_gzip(self, mock_post):
+        mock_post.return_value = mock.Mock(status_code=200)
+        graph_iri = "http://bibcat.org/graph/harvest"
+        with TriplestoreSink("http://localhost:9999/blazegraph/sparql",
+                             graph_iri=graph_iri,
+                             compress=True) as sink:
+            sink.write(record_graph(1))
+        headers = mock_post.call_args[1]["headers"]
+        self.assertEqual(headers["Content-Type"], "text/x-nquads")
+        self.assertEqual(headers["Content-Encoding"], "gzip")
+        dataset = rdflib.ConjunctiveGraph()
+        dataset.parse(
+            data=gzip.decompress(mock_post.call_args[1]["data"]).decode(),
+            format="nquads")
+        self.assertEqual(len(dataset.get_context(rdflib.URIRef(graph_iri))),
+                         2)
+
+    @mock.patch("bibcat.ingesters.sinks.transport.post")
+    def test_background(self, mock_post):
+        mock_post.return_value = mock.Mock(status_code=200)
+        sink = TriplestoreSink("http://localhost:9999/blazegraph/sparql",
+                               batch_size=2,
+                               background=True)
+        for i in range(5):
+            sink.write(record_graph(i))
+        sink.flush()
+        self.assertEqual(mock_post.call_count, 3)
+        sink.close()
+        self.assertEqual(sink.requests, 3)
+        self.assertEqual(sink.records, 5)
+
+    @mock.patch("bibcat.ingesters.sinks.transport.post")
+    def test_background_failed_upload(self, mock_post):
+        mock_post.side_effect = [ValueError("bad batch")] + \
+            [mock.Mock(status_code=200)] * 4
+        sink = TriplestoreSink("http://localhost:9999/blazegraph/sparql",
+                               batch_size=1,
+                               background=True,
+                               max_pending=1)
+
+        def write():
+            with self.assertLogs(level="ERROR"):
+                for i in range(5):
+                    sink.write(record_graph(i))
+                sink.close()
+
+        writer = threading.Thread(target=write, daemon=True)
+        writer.start()
+        writer.join(timeout=10)
+        self.assertFalse(writer.is_alive())
+        self.assertEqual(mock_post.call_count, 5)
+        self.assertEqual(sink.errors, 1)
+
+    @mock.patch("bibcat.ingesters.sinks.transport.post")
+    def test_errors(self, mock_post):
+        mock_post.return_value = mock.Mock(status_code=500)
+        with TriplestoreSink("http://localhost:9999/blazegraph/sparql") \
+                as sink:
+            sink.write(record_graph(1))
+        self.assertEqual(sink.errors, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
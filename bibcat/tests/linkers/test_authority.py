@@ -0,0 +1,155 @@
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+import rdflib
+
+from bibcat.linkers.authority import AuthorityIndex, normalize
+from bibcat.linkers.deduplicate import Deduplicator
+
+BF = rdflib.Namespace("http://id.loc.gov/ontologies/bibframe/")
+SMITH = rdflib.URIRef("http://bibcat.org/person/smith-john")
+
+
+class TestNormalize(unittest.TestCase):
+
+    def test_normalize(self):
+        self.assertEqual(normalize(rdflib.Literal("Smith,  John.")),
+                         "smith, john")
+        self.assertEqual(normalize(" Cats "), "cats")
+
+
+class TestAuthorityIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+
+    def test_get_add(self):
+        index = AuthorityIndex()
+        self.assertIsNone(index.get(BF.Person, "Smith, John"))
+        index.add(BF.Person, "Smith, John", SMITH)
+        self.assertEqual(index.get(BF.Person, "smith, john."), SMITH)
+        self.assertIsNone(index.get(BF.Topic, "Smith, John"))
+        self.assertEqual(index.hits, 1)
+        self.assertEqual(index.misses, 2)
+
+    def test_first_iri_wins(self):
+        index = AuthorityIndex()
+        index.add(BF.Person, "Smith, John", SMITH)
+        index.add(BF.Person, "Smith, John",
+                  rdflib.URIRef("http://bibcat.org/person/other"))
+        self.assertEqual(index.get(BF.Person, "Smith, John"), SMITH)
+
+    def test_lru(self):
+        index = AuthorityIndex(max_size=2)
+        for name in ["a", "b"]:
+            index.add(BF.Person, name, "http://bibcat.org/" + name)
+        index.get(BF.Person, "a")
+        index.add(BF.Person, "c", "http://bibcat.org/c")
+        self.assertIsNone(index.get(BF.Person, "b"))
+        self.assertEqual(len(index), 2)
+
+    def test_persistence(self):
+        path = os.path.join(self.tmp_dir, "authority.sqlite")
+        index = AuthorityIndex(path=path)
+        index.add(BF.Person, "Smith, John", SMITH)
+        index.close()
+        index = AuthorityIndex(path=path)
+        self.assertEqual(index.get(BF.Person, "Smith, John"), SMITH)
+        index.invalidate(BF.Person, "Smith, John")
+        self.assertIsNone(index.get(BF.Person, "Smith, John"))
+        index.close()
+
+    def test_first_iri_wins_after_eviction(self):
+        path = os.path.join(self.tmp_dir, "authority.sqlite")
+        index = AuthorityIndex(max_size=1, path=path)
+        index.add(BF.Person, "Smith, John", SMITH)
+        index.flush()
+        index.add(BF.Person, "Cats", "http://bibcat.org/person/cats")
+        # Smith, John is evicted from memory but kept in the file
+        index.add(BF.Person, "Smith, John", "http://bibcat.org/person/other")
+        self.assertEqual(index.get(BF.Person, "Smith, John"), SMITH)
+        index.add(BF.Person, "Dogs", "http://bibcat.org/person/dogs")
+        # Cats is evicted before being flushed
+        index.add(BF.Person, "Cats", "http://bibcat.org/person/other")
+        index.close()
+        index = AuthorityIndex(path=path)
+        self.assertEqual(index.get(BF.Person, "Smith, John"), SMITH)
+        self.assertEqual(index.get(BF.Person, "Cats"),
+                         rdflib.URIRef("http://bibcat.org/person/cats"))
+        index.close()
+
+    def test_invalidate(self):
+        index = AuthorityIndex()
+        index.add(BF.Person, "Smith, John", SMITH)
+        index.add(BF.Topic, "Cats", "http://bibcat.org/topic/cats")
+        index.invalidate(BF.Topic)
+        self.assertIsNone(index.get(BF.Topic, "Cats"))
+        self.assertEqual(index.get(BF.Person, "Smith, John"), SMITH)
+        index.invalidate()
+        self.assertEqual(len(index), 0)
+
+    @mock.patch("bibcat.linkers.authority.transport.post")
+    def test_warm(self, mock_post):
+        result = mock.Mock(status_code=200)
+        result.json.return_value = {"results": {"bindings": [
+            {"entity": {"type": "uri", "value": str(SMITH)},
+             "label": {"type": "literal", "value": "Smith, John"}}]}}
+        mock_post.return_value = result
+        index = AuthorityIndex()
+        index.warm("http://localhost:9999/blazegraph/sparql", [BF.Person])
+        self.assertEqual(index.get(BF.Person, "Smith, John"), SMITH)
+
+    @mock.patch("bibcat.linkers.deduplicate.transport.post")
+    def test_deduplicator(self, mock_post):
+        result = mock.Mock(status_code=200)
+        result.json.return_value = {"results": {"bindings": []}}
+        mock_post.return_value = result
+        index = AuthorityIndex()
+        deduplicator = Deduplicator(
+            triplestore_url="http://localhost:9999/blazegraph/sparql",
+            base_url="http://bibcat.org/",
+            classes=[BF.Person],
+            index=index)
+        for name in ["Smith, John", "Smith, John.", "smith, john"]:
+            graph = rdflib.Graph()
+            graph.add((rdflib.BNode(), rdflib.RDF.type, BF.Person))
+            graph.add((graph.value(predicate=rdflib.RDF.type,
+                                   object=BF.Person),
+                       rdflib.RDFS.label,
+                       rdflib.Literal(name)))
+            deduplicator.run_batch([graph])
+            self.assertEqual(
+                graph.value(predicate=rdflib.RDF.type, object=BF.Person),
+                SMITH)
+        self.assertEqual(mock_post.call_count, 1)
+        self.assertEqual(index.hits, 2)
+
+    @mock.patch("bibcat.linkers.deduplicate.transport.post")
+    def test_deduplicator_flushes_index(self, mock_post):
+        result = mock.Mock(status_code=200)
+        result.json.return_value = {"results": {"bindings": []}}
+        mock_post.return_value = result
+        path = os.path.join(self.tmp_dir, "authority.sqlite")
+        index = AuthorityIndex(path=path)
+        deduplicator = Deduplicator(
+            triplestore_url="http://localhost:9999/blazegraph/sparql",
+            base_url="http://bibcat.org/",
+            classes=[BF.Person],
+            index=index)
+        graph = rdflib.Graph()
+        graph.add((rdflib.BNode(), rdflib.RDF.type, BF.Person))
+        graph.add((graph.value(predicate=rdflib.RDF.type, object=BF.Person),
+                   rdflib.RDFS.label,
+                   rdflib.Literal("Smith, John")))
+        deduplicator.run(graph)
+        # Written without closing the Deduplicator's index
+        persisted = AuthorityIndex(path=path)
+        self.assertEqual(persisted.get(BF.Person, "Smith, John"), SMITH)
+        persisted.close()
+        index.close()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
@@ -1,11 +1,222 @@
+import http.server
+import json
+import threading
 import unittest
-from bibcat.linkers.deduplicate import Deduplicator
+import urllib.parse
+from unittest import mock
+
+import rdflib
+
+from bibcat.linkers.authority import AuthorityIndex
+from bibcat.linkers.deduplicate import Deduplicator, DeduplicatePool
+from bibcat.linkers.deduplicate import label_key, shard
+
+BF = rdflib.Namespace("http://id.loc.gov/ontologies/bibframe/")
+
+
+def sparql_response(bindings):
+    result = mock.Mock(status_code=200)
+    result.json.return_value = {"results": {"bindings": bindings}}
+    return result
+
+
+def record_graph(number, name, topic):
+    graph = rdflib.Graph()
+    instance = rdflib.URIRef("http://bibcat.org/instance/{}".format(number))
+    agent, subject = rdflib.BNode(), rdflib.BNode()
+    graph.add((instance, BF.contribution, agent))
+    graph.add((agent, rdflib.RDF.type, BF.Person))
+    graph.add((agent, rdflib.RDFS.label, rdflib.Literal(name)))
+    graph.add((instance, BF.subject, subject))
+    graph.add((subject, rdflib.RDF.type, BF.Topic))
+    graph.add((subject, rdflib.RDFS.label, rdflib.Literal(topic)))
+    return graph
+
 
 class TestDeduplicator(unittest.TestCase):
 
     def setUp(self):
-        pass
+        self.deduplicator = Deduplicator(
+            triplestore_url="http://localhost:9999/blazegraph/sparql",
+            base_url="http://bibcat.org/",
+            classes=[BF.Person, BF.Topic])
+        self.existing = rdflib.URIRef("http://bibcat.org/person/existing")
+
+    def test_label_key(self):
+        self.assertEqual(label_key(rdflib.Literal("Cats")),
+                         label_key(rdflib.Literal("Cats",
+                             datatype=rdflib.XSD.string)))
+        self.assertNotEqual(label_key(rdflib.Literal("Cats")),
+                            label_key(rdflib.Literal("Cats", lang="en")))
+
+    @mock.patch("bibcat.linkers.deduplicate.transport.post")
+    def test_run_batch(self, mock_post):
+        mock_post.side_effect = [
+            sparql_response([
+                {"entity": {"type": "uri", "value": str(self.existing)},
+                 "label": {"type": "literal", "value": "Smith, John"}}]),
+            sparql_response([])]
+        graphs = [record_graph(1, "Smith, John", "Cats"),
+                  record_graph(2, "Smith, John", "Dogs"),
+                  record_graph(3, "Doe, Jane", "Cats")]
+        self.deduplicator.run_batch(graphs)
+        self.assertEqual(mock_post.call_count, 2)
+        self.assertEqual(self.deduplicator.requests, 2)
+        query = mock_post.call_args_list[0][1]["data"]["query"]
+        self.assertIn("VALUES ?label", query)
+        self.assertEqual(query.count("\"Smith, John\""), 1)
+        for graph in graphs[:2]:
+            self.assertEqual(
+                graph.value(predicate=rdflib.RDF.type, object=BF.Person),
+                self.existing)
+        self.assertEqual(
+            graphs[2].value(predicate=rdflib.RDF.type, object=BF.Person),
+            rdflib.URIRef("http://bibcat.org/person/doe-jane"))
+        self.assertEqual(
+            graphs[0].value(predicate=rdflib.RDF.type, object=BF.Topic),
+            graphs[2].value(predicate=rdflib.RDF.type, object=BF.Topic))
+        self.assertEqual(
+            graphs[1].value(predicate=rdflib.RDF.type, object=BF.Topic),
+            rdflib.URIRef("http://bibcat.org/topic/dogs"))
+
+    @mock.patch("bibcat.linkers.deduplicate.transport.post")
+    def test_run_batch_chunks(self, mock_post):
+        mock_post.return_value = sparql_response([])
+        self.deduplicator.batch_size = 2
+        graphs = [record_graph(i, "Name {}".format(i), "Cats")
+                  for i in range(5)]
+        self.deduplicator.run_batch(graphs, [])
+        # Three Person queries for five labels and one Topic query
+        self.assertEqual(mock_post.call_count, 4)
 
+    @mock.patch("bibcat.linkers.deduplicate.transport.post")
+    def test_run_batch_failed_lookup(self, mock_post):
+        mock_post.return_value = mock.Mock(status_code=500)
+        graph = record_graph(1, "Smith, John", "Cats")
+        self.deduplicator.run_batch([graph])
+        self.assertIsInstance(
+            graph.value(predicate=rdflib.RDF.type, object=BF.Person),
+            rdflib.BNode)
+
+    @mock.patch("bibcat.linkers.deduplicate.transport.post")
+    def test_run_label_and_value(self, mock_post):
+        mock_post.return_value = sparql_response([])
+        index = AuthorityIndex()
+        self.deduplicator.index = index
+        graph = rdflib.Graph()
+        agent = rdflib.BNode()
+        graph.add((agent, rdflib.RDF.type, BF.Person))
+        graph.add((agent, rdflib.RDF.type, BF.Topic))
+        graph.add((agent, rdflib.RDFS.label, rdflib.Literal("Smith, John")))
+        graph.add((agent, rdflib.RDF.value, rdflib.Literal("n79021164")))
+        self.deduplicator.run(graph)
+        # Only the label of the first class is looked up and minted
+        self.assertEqual(mock_post.call_count, 1)
+        self.assertEqual(len(index), 1)
+        person = rdflib.URIRef("http://bibcat.org/person/smith-john")
+        self.assertEqual(index.get(BF.Person, "Smith, John"), person)
+        self.assertIsNone(index.get(BF.Person, "n79021164"))
+        self.assertEqual(set(graph.subjects()), {person})
+
+    @mock.patch("bibcat.linkers.deduplicate.transport.post")
+    def test_run_batch_label_and_value(self, mock_post):
+        mock_post.return_value = sparql_response([])
+        graph = record_graph(1, "Smith, John", "Cats")
+        agent = graph.value(predicate=rdflib.RDF.type, object=BF.Person)
+        graph.add((agent, rdflib.RDF.type, BF.Topic))
+        graph.add((agent, rdflib.RDF.value, rdflib.Literal("n79021164")))
+        self.deduplicator.run_batch([graph])
+        queries = [call[1]["data"]["query"]
+                   for call in mock_post.call_args_list]
+        self.assertEqual(len(queries), 2)
+        self.assertIn("\"Smith, John\"", queries[0])
+        self.assertNotIn("n79021164", queries[0] + queries[1])
+        self.assertNotIn("\"Smith, John\"", queries[1])
 
     def tearDown(self):
         pass
+
+
+class SPARQLHandler(http.server.BaseHTTPRequestHandler):
+    """Answers label queries, only "Smith, John" is an existing Person"""
+
+    def log_message(self, *args):
+        pass
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        params = urllib.parse.parse_qs(self.rfile.read(length).decode())
+        query = params.get("query")[0]
+        bindings = []
+        if "\"Smith, John\"" in query and str(BF.Person) in query:
+            bindings.append(
+                {"entity": {"type": "uri",
+                            "value": "http://bibcat.org/person/existing"},
+                 "label": {"type": "literal", "value": "Smith, John"}})
+        body = json.dumps({"results": {"bindings": bindings}}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/sparql-results+json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class TestDeduplicatePool(unittest.TestCase):
+
+    def setUp(self):
+        self.server = http.server.ThreadingHTTPServer(("127.0.0.1", 0),
+                                                      SPARQLHandler)
+        threading.Thread(target=self.server.serve_forever,
+                         daemon=True).start()
+        self.url = "http://127.0.0.1:{}/blazegraph/sparql".format(
+            self.server.server_address[1])
+
+    def __graphs__(self):
+        names = ["Smith, John", "Doe, Jane", "Smith, John", "Roe, Richard"]
+        topics = ["Cats", "Dogs", "Birds", "Cats"]
+        return [record_graph(i, names[i], topics[i]) for i in range(4)]
+
+    def __deduplicator__(self, index=None):
+        return Deduplicator(triplestore_url=self.url,
+                            base_url="http://bibcat.org/",
+                            classes=[BF.Person, BF.Topic],
+                            batch_size=2,
+                            index=index)
+
+    def __entities__(self, graphs):
+        return [sorted(graph.subjects(predicate=rdflib.RDF.type))
+                for graph in graphs]
+
+    def test_shard(self):
+        self.assertEqual(shard(BF.Person, rdflib.Literal("Smith, John"), 4),
+                         shard(BF.Person, rdflib.Literal("smith, john."), 4))
+
+    def test_same_as_run_batch(self):
+        serial = self.__graphs__()
+        self.__deduplicator__().run_batch(serial)
+        for size in [1, 2, 4]:
+            graphs = self.__graphs__()
+            pool = DeduplicatePool(size=size,
+                                   deduplicator=self.__deduplicator__())
+            pool.run(graphs)
+            self.assertEqual(self.__entities__(graphs),
+                             self.__entities__(serial))
+            self.assertGreater(pool.requests, 0)
+        self.assertEqual(
+            graphs[0].value(predicate=rdflib.RDF.type, object=BF.Person),
+            rdflib.URIRef("http://bibcat.org/person/existing"))
+
+    def test_index(self):
+        index = AuthorityIndex()
+        pool = DeduplicatePool(size=2,
+                               deduplicator=self.__deduplicator__(index))
+        pool.main(graphs=self.__graphs__())
+        self.assertEqual(index.get(BF.Topic, "cats"),
+                         rdflib.URIRef("http://bibcat.org/topic/cats"))
+        requests = pool.requests
+        pool.main(graphs=self.__graphs__())
+        self.assertEqual(pool.requests, requests)
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
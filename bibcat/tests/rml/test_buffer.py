@@ -0,0 +1,84 @@
+__author__ = "Jeremy Nelson"
+
+import unittest
+
+import rdflib
+from rdflib.compare import isomorphic
+from lxml import etree
+
+from bibcat.rml.buffer import TripleBuffer, ntriples
+from bibcat.rml.processor import XMLProcessor
+
+BF = rdflib.Namespace("http://id.loc.gov/ontologies/bibframe/")
+
+MODS = """<mods xmlns="http://www.loc.gov/mods/v3">
+  <titleInfo><title>Pride and Prejudice</title></titleInfo>
+  <name type="personal"><namePart>Austen, Jane</namePart></name>
+  <note>Line one "quoted"
+line two</note>
+</mods>"""
+
+
+class TestTripleBuffer(unittest.TestCase):
+
+    def setUp(self):
+        self.buffer = TripleBuffer([("bf", str(BF))])
+        self.instance = rdflib.URIRef("http://bibcat.org/instance/1")
+        self.title = rdflib.BNode()
+
+    def test_add(self):
+        self.buffer.add((self.instance, BF.title, self.title))
+        self.buffer.add((self.instance, BF.title, self.title))
+        self.buffer.add((self.title, BF.mainTitle, rdflib.Literal("Emma")))
+        self.assertEqual(len(self.buffer), 2)
+        self.assertEqual(self.buffer.count(self.instance), 1)
+        self.assertEqual(self.buffer.count(BF.Work), 0)
+        self.assertRaises(AssertionError,
+                          self.buffer.add,
+                          (self.instance, BF.title, None))
+
+    def test_subject_predicates(self):
+        self.buffer.add((self.instance, BF.title, self.title))
+        self.assertEqual(
+            list(self.buffer.subject_predicates(object=self.title)),
+            [(self.instance, BF.title)])
+
+    def test_graph_and_ntriples(self):
+        self.buffer.add((self.instance, BF.title, self.title))
+        self.buffer.add((self.title,
+                         BF.mainTitle,
+                         rdflib.Literal("Emma\n\"Vol. 1\"", lang="en")))
+        graph = self.buffer.graph()
+        self.assertEqual(len(graph), 2)
+        self.assertEqual(graph.namespace_manager.store.namespace("bf"),
+                         rdflib.URIRef(str(BF)))
+        parsed = rdflib.Graph().parse(data=ntriples(self.buffer).decode(),
+                                      format="nt")
+        self.assertTrue(isomorphic(parsed, graph))
+
+
+class TestXMLProcessorTripleBuffer(unittest.TestCase):
+
+    def setUp(self):
+        self.kwargs = {"rml_rules": ["bibcat-base.ttl", "mods-to-bf.ttl"],
+                       "namespaces": {"mods": "http://www.loc.gov/mods/v3",
+                                      "xlink": "http://www.w3.org/1999/xlink"}}
+        self.run_kwargs = {"instance_iri": "http://bibcat.org/instance/1",
+                           "item_iri": "http://bibcat.org/item/1",
+                           "work_iri": "http://bibcat.org/work/1",
+                           "timestamp": "2017-01-01T00:00:00"}
+
+    def test_same_as_graph(self):
+        processor = XMLProcessor(**self.kwargs)
+        processor.run(etree.XML(MODS), **self.run_kwargs)
+        buffered = XMLProcessor(triple_buffer=True, **self.kwargs)
+        buffered.run(etree.XML(MODS), **self.run_kwargs)
+        self.assertIsInstance(buffered.output, TripleBuffer)
+        self.assertNotIn("triple_buffer", buffered.constants)
+        self.assertEqual(len(buffered.output), len(processor.output))
+        self.assertTrue(isomorphic(buffered.output.graph(),
+                                   processor.output))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,81 @@
+__author__ = "Jeremy Nelson"
+
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from bibcat.rml.cache import RulePlanCache
+from bibcat.rml.processor import Processor
+
+TESTS_PATH = os.path.dirname(os.path.abspath(__file__))
+FIXURES_PATH = os.path.join(
+    TESTS_PATH,
+    "fixures")
+
+class TestRulePlanCache(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.cache_dir = self.tmp_dir.name
+        self.cache = RulePlanCache(self.cache_dir)
+        self.rules = os.path.join(FIXURES_PATH, "rml-basic.ttl")
+
+    def test_key_content_hash(self):
+        self.assertEqual(self.cache.key(["a", b"b"]),
+                         self.cache.key([b"a", "b"]))
+        self.assertNotEqual(self.cache.key(["a", "b"]),
+                            self.cache.key(["b", "a"]))
+
+    def test_miss(self):
+        self.assertIsNone(self.cache.get(self.cache.key(["missing"])))
+        self.assertEqual(self.cache.misses, 1)
+
+    def test_warm_processor_matches_cold(self):
+        cold = Processor(self.rules, rule_cache=self.cache)
+        self.assertEqual(len(os.listdir(self.cache_dir)), 1)
+        warm = Processor(self.rules, rule_cache=RulePlanCache(self.cache_dir))
+        self.assertEqual(sorted(cold.triple_maps), sorted(warm.triple_maps))
+        self.assertEqual(cold.parents, warm.parents)
+        self.assertEqual(cold.namespaces, warm.namespaces)
+
+    def test_warm_processor_rml_graph(self):
+        Processor(self.rules, rule_cache=self.cache)
+        warm = Processor(self.rules, rule_cache=RulePlanCache(self.cache_dir))
+        self.assertEqual(len(warm.rml),
+                         len(Processor(self.rules, rule_cache=False).rml))
+
+    def test_clear(self):
+        Processor(self.rules, rule_cache=self.cache)
+        self.cache.clear()
+        self.assertEqual(os.listdir(self.cache_dir), [])
+
+    def test_memory_only_by_default(self):
+        with mock.patch.dict(os.environ):
+            os.environ.pop("BIBCAT_RML_CACHE", None)
+            cache = RulePlanCache()
+            self.assertIsNone(cache.cache_dir)
+            with mock.patch("os.makedirs") as makedirs, \
+                 mock.patch("tempfile.mkstemp") as mkstemp:
+                cold = Processor(self.rules, rule_cache=cache)
+                warm = Processor(self.rules, rule_cache=cache)
+            makedirs.assert_not_called()
+            mkstemp.assert_not_called()
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+        self.assertEqual(sorted(cold.triple_maps), sorted(warm.triple_maps))
+        # Another process starts with an empty memo
+        self.assertIsNone(RulePlanCache().get(cache.key(["missing"])))
+
+    def test_environment_cache_dir(self):
+        with mock.patch.dict(os.environ,
+                             {"BIBCAT_RML_CACHE": self.cache_dir}):
+            cache = RulePlanCache()
+        self.assertEqual(cache.cache_dir, self.cache_dir)
+        Processor(self.rules, rule_cache=cache)
+        self.assertEqual(len(os.listdir(self.cache_dir)), 1)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+if __name__ == '__main__':
+    unittest.main()
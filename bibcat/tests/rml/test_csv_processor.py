@@ -0,0 +1,132 @@
+__author__ = "Jeremy Nelson"
+
+import io
+import os
+import tempfile
+import unittest
+
+import rdflib
+
+from bibcat.rml.processor import CSVProcessor, CSVRowProcessor
+
+FIXURES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                            "fixures")
+BF = rdflib.Namespace("http://id.loc.gov/ontologies/bibframe/")
+
+
+class TestCSVProcessor(unittest.TestCase):
+
+    def setUp(self):
+        self.rules = os.path.join(FIXURES_PATH, "rml-csv.ttl")
+        self.raw_csv = "id,title\n" + "".join(
+            ["{0},Title {0}\n".format(i) for i in range(7)])
+        file_desc, self.csv_path = tempfile.mkstemp(suffix=".csv")
+        with os.fdopen(file_desc, "w") as csv_file:
+            csv_file.write(self.raw_csv)
+        self.processor = CSVProcessor(rml_rules=self.rules,
+                                      csv_file=self.csv_path)
+
+    def test_rows(self):
+        rows = self.processor.rows()
+        self.assertEqual(next(rows), {"id": "0", "title": "Title 0"})
+        self.assertEqual(len(list(rows)), 6)
+
+    def test_run_graph(self):
+        count = self.processor.run(
+            institution_iri="http://bibcat.org/institution")
+        self.assertEqual(count, 7)
+        instance = rdflib.URIRef("http://bibcat.org/instance/3")
+        self.assertEqual(
+            self.processor.output.value(subject=instance,
+                                        predicate=rdflib.RDFS.label),
+            rdflib.Literal("Title 3", datatype=rdflib.XSD.string))
+        self.assertEqual(
+            self.processor.output.value(subject=instance,
+                                        predicate=BF.instanceOf),
+            rdflib.URIRef("http://bibcat.org/work/3"))
+        self.assertEqual(len(self.processor.output), 7 * 4)
+
+    def test_run_output_chunks(self):
+        output = io.BytesIO()
+        count = self.processor.run(
+            output=output,
+            chunk_size=2,
+            institution_iri="http://bibcat.org/institution")
+        self.assertEqual(count, 7)
+        graph = rdflib.Graph().parse(data=output.getvalue().decode(),
+                                     format="nt")
+        self.assertEqual(len(graph), 7 * 4)
+
+    def test_run_workers(self):
+        output = io.BytesIO()
+        self.processor.run(output=output,
+                           workers=2,
+                           chunk_size=3,
+                           institution_iri="http://bibcat.org/institution")
+        serial = io.BytesIO()
+        self.processor.run(output=serial,
+                           institution_iri="http://bibcat.org/institution")
+        self.assertEqual(output.getvalue(), serial.getvalue())
+
+    def test_tsv_file_object(self):
+        processor = CSVProcessor(rml_rules=self.rules,
+                                 fields=["id", "title"],
+                                 delimiter="\t")
+        count = processor.run(io.StringIO("1\tEmma\n2\tPersuasion\n"),
+                              institution_iri="http://bibcat.org/institution")
+        self.assertEqual(count, 2)
+        self.assertIn(
+            rdflib.Literal("Persuasion", datatype=rdflib.XSD.string),
+            list(processor.output.objects(predicate=rdflib.RDFS.label)))
+
+    def test_row_errors(self):
+        # No institution_iri for the rr:template
+        count = self.processor.run()
+        self.assertEqual(count, 0)
+        self.assertEqual(len(self.processor.errors), 7)
+
+    def tearDown(self):
+        os.remove(self.csv_path)
+
+
+class TestCSVRowProcessor(unittest.TestCase):
+
+    def test_column_template_variables(self):
+        processor = CSVRowProcessor(
+            rml_rules=os.path.join(FIXURES_PATH, "rml-csv.ttl"))
+        processor.run({"id": "9", "title": "Emma"},
+                      institution_iri="http://bibcat.org/institution")
+        self.assertIn(rdflib.URIRef("http://bibcat.org/instance/9"),
+                      set(processor.output.subjects()))
+
+    def test_iri_template_escaped(self):
+        processor = CSVRowProcessor(
+            rml_rules=os.path.join(FIXURES_PATH, "rml-csv.ttl"))
+        processor.run({"id": "Smith, John/1", "title": "Smith, John"},
+                      institution_iri="http://bibcat.org/institution")
+        instance = rdflib.URIRef(
+            "http://bibcat.org/instance/Smith%2C%20John%2F1")
+        self.assertEqual(
+            processor.output.value(subject=instance,
+                                   predicate=BF.instanceOf),
+            rdflib.URIRef("http://bibcat.org/work/Smith%2C%20John%2F1"))
+        # Keywords and references are not escaped
+        self.assertEqual(
+            processor.output.value(subject=instance, predicate=BF.heldBy),
+            rdflib.URIRef("http://bibcat.org/institution"))
+        self.assertEqual(
+            processor.output.value(subject=instance,
+                                   predicate=rdflib.RDFS.label),
+            rdflib.Literal("Smith, John", datatype=rdflib.XSD.string))
+
+    def test_empty_template_skipped(self):
+        processor = CSVRowProcessor(
+            rml_rules=os.path.join(FIXURES_PATH, "rml-csv.ttl"))
+        processor.run({"id": "9", "title": "Emma"}, institution_iri="")
+        self.assertIsNone(processor.output.value(
+            subject=rdflib.URIRef("http://bibcat.org/instance/9"),
+            predicate=BF.heldBy))
+
+
+if __name__ == '__main__':
+    unittest.main()
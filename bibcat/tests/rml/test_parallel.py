@@ -0,0 +1,100 @@
+__author__ = "Jeremy Nelson"
+
+import unittest
+
+import rdflib
+from rdflib.compare import isomorphic
+from lxml import etree
+
+from bibcat.ingesters.sinks import GraphSink
+from bibcat.rml.parallel import ParallelProcessor
+from bibcat.rml.processor import XMLProcessor
+
+MODS = """<mods xmlns="http://www.loc.gov/mods/v3">
+  <titleInfo><title>{0}</title></titleInfo>
+  <name type="personal"><namePart>Author {0}</namePart></name>
+</mods>"""
+
+PROCESSOR_KWARGS = {
+    "rml_rules": ["bibcat-base.ttl", "mods-to-bf.ttl"],
+    "namespaces": {"mods": "http://www.loc.gov/mods/v3",
+                   "xlink": "http://www.w3.org/1999/xlink"}}
+
+
+def instance_kwargs(record):
+    title = record.findtext("{http://www.loc.gov/mods/v3}titleInfo/"
+                            "{http://www.loc.gov/mods/v3}title")
+    return {"instance_iri": "http://bibcat.org/instance/{}".format(
+        title.replace(" ", "-"))}
+
+
+class TestParallelProcessor(unittest.TestCase):
+
+    def setUp(self):
+        self.records = [etree.XML(MODS.format("Title {}".format(i)))
+                        for i in range(7)]
+        self.run_kwargs = {"item_iri": "http://bibcat.org/item",
+                           "work_iri": "http://bibcat.org/work",
+                           "timestamp": "2017-01-01T00:00:00"}
+
+    def __serial__(self):
+        processor = XMLProcessor(**PROCESSOR_KWARGS)
+        graph = rdflib.Graph()
+        for record in self.records:
+            processor.run(record, **dict(self.run_kwargs,
+                                         **instance_kwargs(record)))
+            graph += processor.output
+        return graph
+
+    def test_run_same_as_serial(self):
+        serial = self.__serial__()
+        self.assertGreater(len(serial), 0)
+        for workers in [1, 2]:
+            parallel = ParallelProcessor(XMLProcessor,
+                                         PROCESSOR_KWARGS,
+                                         workers=workers,
+                                         chunk_size=2)
+            graph = parallel.run(self.records,
+                                 record_kwargs=instance_kwargs,
+                                 **self.run_kwargs)
+            self.assertTrue(isomorphic(graph, serial))
+            self.assertEqual(parallel.errors, [])
+
+    def test_map_ordered(self):
+        parallel = ParallelProcessor(XMLProcessor,
+                                     PROCESSOR_KWARGS,
+                                     workers=2,
+                                     chunk_size=1)
+        indices = [index for index, raw_nt in parallel.map(
+            self.records,
+            record_kwargs=instance_kwargs,
+            **self.run_kwargs)]
+        self.assertEqual(indices, list(range(7)))
+        parallel.ordered = False
+        indices = [index for index, raw_nt in parallel.map(
+            self.records,
+            record_kwargs=instance_kwargs,
+            **self.run_kwargs)]
+        self.assertEqual(sorted(indices), list(range(7)))
+
+    def test_error_isolation(self):
+        records = self.records[:3] + [b"<mods"] + self.records[3:]
+        parallel = ParallelProcessor(XMLProcessor,
+                                     PROCESSOR_KWARGS,
+                                     workers=2,
+                                     chunk_size=3)
+        sink = GraphSink()
+        parallel.run(records,
+                     sink=sink,
+                     instance_iri="http://bibcat.org/instance",
+                     **self.run_kwargs)
+        self.assertEqual(len(parallel.errors), 1)
+        self.assertEqual(parallel.errors[0][0], 3)
+        self.assertIn("XMLSyntaxError", parallel.errors[0][1])
+        self.assertEqual(len(set(sink.graph.objects(
+            predicate=rdflib.URIRef(
+                "http://id.loc.gov/ontologies/bibframe/mainTitle")))), 7)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,203 @@
+__author__ = "Jeremy Nelson"
+
+import os
+import unittest
+
+import rdflib
+from rdflib.compare import isomorphic
+
+from bibcat.rml import processor
+from bibcat.rml.planner import QueryPlanner
+
+FIXURES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                            "fixures")
+BF = rdflib.Namespace("http://id.loc.gov/ontologies/bibframe/")
+INSTANCE = "http://bibcat.org/instance/{}"
+
+
+def bibframe_store(count):
+    store = rdflib.Graph()
+    for i in range(count):
+        instance = rdflib.URIRef(INSTANCE.format(i))
+        work = rdflib.URIRef("http://bibcat.org/work/{}".format(i))
+        store.add((instance, rdflib.RDF.type, BF.Instance))
+        store.add((instance, BF.instanceOf, work))
+        if i % 2:
+            store.add((instance, rdflib.RDFS.label,
+                       rdflib.Literal("Label {}".format(i))))
+        title = rdflib.BNode()
+        store.add((instance, BF.title, title))
+        store.add((title, rdflib.RDF.type, BF.Title))
+        store.add((title, BF.mainTitle, rdflib.Literal("Title {}".format(i))))
+        for j in range(i % 3):
+            contribution, agent = rdflib.BNode(), rdflib.BNode()
+            store.add((work, BF.contribution, contribution))
+            store.add((contribution, BF.agent, agent))
+            store.add((agent, rdflib.RDFS.label,
+                       rdflib.Literal("Author {} {}".format(i, j))))
+        identifier = rdflib.BNode()
+        store.add((instance, BF.identifiedBy, identifier))
+        store.add((identifier, rdflib.RDF.value,
+                   rdflib.Literal("id-{}".format(i))))
+    return store
+
+
+class CountingSPARQLProcessor(processor.SPARQLProcessor):
+    """Counts the queries sent to rdflib's SPARQL engine"""
+
+    def __init__(self, **kwargs):
+        super(CountingSPARQLProcessor, self).__init__(**kwargs)
+        self.queries = []
+
+    def __get_bindings__(self, sparql, output_format):
+        self.queries.append(sparql)
+        return super(CountingSPARQLProcessor, self).__get_bindings__(
+            sparql, output_format)
+
+
+class TestQueryPlanner(unittest.TestCase):
+
+    def setUp(self):
+        self.rules = os.path.join(FIXURES_PATH, "rml-sparql.ttl")
+        # Binds the processor's namespaces
+        processor.SPARQLProcessor(rml_rules=self.rules)
+        self.planner = QueryPlanner(processor.NS_MGR)
+        self.store = bibframe_store(7)
+        self.store.add((rdflib.URIRef(INSTANCE.format(1)),
+                        rdflib.RDFS.label,
+                        rdflib.Literal("Etiqueta 1", lang="es")))
+
+    def __engine__(self, query, **kwargs):
+        sparql = processor.PREFIX + query.format(**kwargs)
+        return [dict([(str(key), value) for key, value in row.items()])
+                for row in self.store.query(sparql).bindings]
+
+    def __assert_same__(self, query, ordered=False, **kwargs):
+        plan = self.planner.plan(query)
+        self.assertIsNotNone(plan, query)
+        planned = plan.bindings(self.store, **kwargs)
+        engine = self.__engine__(query, **kwargs)
+        if ordered:
+            self.assertEqual(planned, engine)
+        else:
+            self.assertEqual(
+                sorted([sorted(row.items()) for row in planned]),
+                sorted([sorted(row.items()) for row in engine]))
+        return planned
+
+    def test_same_as_sparql_engine(self):
+        queries = [
+            """SELECT DISTINCT ?label
+               WHERE {{ <{instance}> rdfs:label ?label . }}""",
+            """SELECT ?label
+               WHERE {{ <{instance}> bf:instanceOf ?work .
+                        ?work bf:contribution ?contribution .
+                        ?contribution bf:agent ?agent .
+                        ?agent rdfs:label ?label }}""",
+            """SELECT DISTINCT ?title ?main
+               WHERE {{ <{instance}> bf:title ?title .
+                        ?title bf:mainTitle ?main ;
+                               a ?type , ?type }}""",
+            """SELECT ?s ?label
+               WHERE {{ ?s rdfs:label ?label .
+                        FILTER(isIRI(?s)) }}""",
+            """SELECT DISTINCT ?value
+               WHERE {{ ?s rdf:type ?value .
+                        FILTER (?value != bf:Instance) }}""",
+            """SELECT DISTINCT ?s
+               WHERE {{ ?s rdfs:label "Etiqueta 1"@es }}""",
+            """SELECT DISTINCT ?work ?label
+               WHERE {{ <{instance}> bf:instanceOf ?work .
+                        OPTIONAL {{ ?work bf:contribution ?c .
+                                    ?c bf:agent ?agent .
+                                    ?agent rdfs:label ?label }}
+                        OPTIONAL {{ <{instance}> rdfs:label ?label }} }}""",
+            """SELECT DISTINCT ?label
+               WHERE {{ OPTIONAL {{ <{instance}> rdfs:label ?label . }}
+                        OPTIONAL {{ <{instance}> bf:title ?title .
+                                    ?title bf:mainTitle ?label }} }}""",
+            """SELECT *
+               WHERE {{ <{instance}> bf:identifiedBy ?id .
+                        ?id rdf:value ?value }}"""]
+        for query in queries:
+            for i in range(7):
+                self.__assert_same__(query, instance=INSTANCE.format(i))
+
+    def test_order_limit_offset(self):
+        query = """SELECT DISTINCT ?instance
+                   WHERE {{ ?instance rdf:type bf:Instance .
+                            FILTER(isIRI(?instance)) }}
+                   ORDER BY DESC(?instance)
+                   LIMIT {limit}
+                   OFFSET {offset}"""
+        rows = self.__assert_same__(query, ordered=True, limit=3, offset=2)
+        self.assertEqual([row["instance"] for row in rows],
+                         [rdflib.URIRef(INSTANCE.format(i))
+                          for i in [4, 3, 2]])
+        self.__assert_same__(query, ordered=True, limit=10, offset=5)
+        # One title without a mainTitle, unbound values sort first
+        untitled = rdflib.BNode()
+        self.store.add((rdflib.URIRef(INSTANCE.format(1)), BF.title,
+                        untitled))
+        for direction in ["ASC", "DESC"]:
+            query = """SELECT ?t ?m
+                       WHERE {{{{ <{{instance}}> bf:title ?t .
+                                OPTIONAL {{{{ ?t bf:mainTitle ?m }}}} }}}}
+                       ORDER BY {}(?m)""".format(direction)
+            rows = self.__assert_same__(query, ordered=True,
+                                        instance=INSTANCE.format(1))
+            self.assertEqual(len(rows), 2)
+            self.assertEqual("m" in rows[0], direction == "DESC")
+
+    def test_left_to_sparql_engine(self):
+        for query in [
+                "SELECT ?a WHERE {{ <{x}> bf:agent/rdfs:label ?a }}",
+                "SELECT ?a WHERE {{ _:{x} rdfs:label ?a }}",
+                "SELECT ?a WHERE {{ <{x}> rdfs:label ?a . "
+                "FILTER(?a = \"{x}\") }}",
+                "SELECT ?a WHERE {{ ?s rdfs:label ?a . "
+                "FILTER(?a != \"Label 1\") }}",
+                "SELECT ?a WHERE {{ ?s rdfs:label ?b . FILTER(isIRI(?a)) }}",
+                "SELECT ?a WHERE {{ {{ ?a ?p ?o }} UNION {{ ?o ?p ?a }} }}",
+                "SELECT ?a WHERE {{ ?s rdfs:label ?a . BIND(1 AS ?b) }}",
+                "SELECT ?a WHERE {{ OPTIONAL {{ ?s rdfs:label ?a }} "
+                "?s a ?a }}",
+                "SELECT (COUNT(?a) AS ?n) WHERE {{ ?s rdfs:label ?a }}",
+                "SELECT ?a WHERE {{ ?s unknown:label ?a }}",
+                "SELECT ?a WHERE {{ ?s rdfs:label ?a }} # comment"]:
+            self.assertIsNone(self.planner.plan(query), query)
+        self.assertEqual(self.planner.stats(),
+                         {"planned": 0, "fallback": 11})
+
+
+class TestSPARQLProcessorPlanner(unittest.TestCase):
+
+    def setUp(self):
+        self.rules = os.path.join(FIXURES_PATH, "rml-sparql.ttl")
+        self.store = bibframe_store(7)
+
+    def test_same_as_sparql_engine(self):
+        engine = CountingSPARQLProcessor(rml_rules=self.rules,
+                                         triplestore=self.store,
+                                         query_planner=False)
+        engine.run()
+        planned = CountingSPARQLProcessor(rml_rules=self.rules,
+                                          triplestore=self.store)
+        planned.run()
+        self.assertTrue(isomorphic(planned.output, engine.output))
+        # identifier's FILTER uses the iterator as a literal and is left to
+        # the SPARQL engine
+        self.assertEqual(len(planned.queries), 7)
+        self.assertEqual(planned.planner.stats(),
+                         {"planned": 3, "fallback": 1})
+
+    def test_remote_not_planned(self):
+        remote = processor.SPARQLProcessor(
+            rml_rules=self.rules,
+            triplestore_url="http://localhost:9999/blazegraph/sparql")
+        self.assertIsNone(remote.__plan__(
+            "SELECT ?a WHERE {{ <{x}> rdfs:label ?a }}"))
+
+
+if __name__ == '__main__':
+    unittest.main()
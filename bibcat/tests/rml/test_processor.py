@@ -154,6 +154,39 @@ class TestRDFMappingLanguageProcessorGenerateTerms(unittest.TestCase):
             term_map=self.test_map,
             test_not_literal="1234")
 
+    def test_compiled_template(self):
+        self.test_map.template = "{base_url}/{id}"
+        self.test_map.compiled_template = \
+            processor.Processor.__compile_template__(self.test_map.template)
+        calls = []
+        def unused():
+            calls.append(1)
+        uri_term = self.processor.generate_term(
+            term_map=self.test_map,
+            base_url="http://test.io",
+            id=lambda: "1234",
+            unused=unused)
+        self.assertEqual(uri_term, rdflib.URIRef("http://test.io/1234"))
+        self.assertEqual(calls, [])
+        self.assertRaises(KeyError,
+            self.processor.generate_term,
+            term_map=self.test_map,
+            id="1234")
+
+    def test_compiled_template_constants(self):
+        self.test_map.template = "BIBCAT version {version}"
+        self.test_map.datatype = rdflib.XSD.string
+        self.test_map.compiled_template = \
+            processor.Processor.__compile_template__(self.test_map.template)
+        term = self.processor.generate_term(term_map=self.test_map,
+                                            version="0.0")
+        self.assertEqual(str(term),
+                         "BIBCAT version {}".format(bibcat.__version__))
+
+    def test_compile_template_positional(self):
+        self.assertIsNone(processor.Processor.__compile_template__("{0}"))
+        self.assertIsNone(processor.Processor.__compile_template__(None))
+
     def tearDown(self):
         pass
 
@@ -198,6 +231,29 @@ class Test__graph__Method(unittest.TestCase):
     def tearDown(self):
         pass
 
+class TestAddToTriplestore(unittest.TestCase):
+
+    def setUp(self):
+        self.processor = processor.Processor(
+            rml_rules=os.path.join(FIXURES_PATH,
+                                   "rml-basic.ttl"))
+        self.processor.triplestore_url = \
+            "http://localhost:9999/blazegraph/sparql"
+        self.processor.output = self.processor.__graph__()
+        self.processor.output.add((rdflib.URIRef("http://bibcat.org/1"),
+                                   rdflib.RDF.type,
+                                   rdflib.URIRef("http://bibcat.org/Test")))
+
+    @mock.patch("bibcat.rml.processor.transport.post")
+    def test_failed_post_logged(self, mock_post):
+        mock_post.return_value = mock.Mock(status_code=500)
+        with self.assertLogs(level="ERROR") as logs:
+            self.processor.add_to_triplestore()
+        self.assertIn("status=500", logs.output[0])
+
+    def tearDown(self):
+        pass
+
 class Test__handle_parents__Method(unittest.TestCase):
 
     def setUp(self):
@@ -0,0 +1,451 @@
+__author__ = "Jeremy Nelson"
+
+import json
+import os
+import threading
+import time
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+import rdflib
+from rdflib.compare import isomorphic
+
+from bibcat.rml.processor import SPARQLBatchProcessor, SPARQLProcessor
+
+FIXURES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                            "fixures")
+BF = rdflib.Namespace("http://id.loc.gov/ontologies/bibframe/")
+RELATORS = rdflib.Namespace("http://id.loc.gov/vocabulary/relators/")
+SCHEMA = rdflib.Namespace("http://schema.org/")
+
+
+def bibframe_store(count):
+    store = rdflib.Graph()
+    for i in range(count):
+        instance = rdflib.URIRef("http://bibcat.org/instance/{}".format(i))
+        work = rdflib.URIRef("http://bibcat.org/work/{}".format(i))
+        store.add((instance, rdflib.RDF.type, BF.Instance))
+        store.add((instance, BF.instanceOf, work))
+        if i % 2:
+            store.add((instance, rdflib.RDFS.label,
+                       rdflib.Literal("Label {}".format(i))))
+        title = rdflib.BNode()
+        store.add((instance, BF.title, title))
+        store.add((title, BF.mainTitle, rdflib.Literal("Title {}".format(i))))
+        for j in range(i % 3):
+            contribution, agent = rdflib.BNode(), rdflib.BNode()
+            store.add((work, BF.contribution, contribution))
+            store.add((contribution, BF.agent, agent))
+            store.add((agent, rdflib.RDFS.label,
+                       rdflib.Literal("Author {} {}".format(i, j))))
+        identifier = rdflib.BNode()
+        store.add((instance, BF.identifiedBy, identifier))
+        store.add((identifier, rdflib.RDF.value,
+                   rdflib.Literal("id-{}".format(i))))
+    return store
+
+
+def schema_store(count):
+    """Instances with several objects for each bf-batch-to-schema.ttl
+    predicate"""
+    store = rdflib.Graph()
+    for i in range(count):
+        instance = rdflib.URIRef("http://bibcat.org/instance/{}".format(i))
+        work = rdflib.URIRef("http://bibcat.org/work/{}".format(i))
+        store.add((instance, rdflib.RDF.type, BF.Instance))
+        store.add((instance, BF.instanceOf, work))
+        store.add((instance, rdflib.RDFS.label,
+                   rdflib.Literal("Label {}".format(i))))
+        summary = rdflib.BNode()
+        store.add((work, BF.summary, summary))
+        store.add((summary, rdflib.RDFS.label,
+                   rdflib.Literal("Summary {}".format(i))))
+        for j, role in enumerate([RELATORS.aut, RELATORS.aut, RELATORS.ctb]):
+            contribution, agent = rdflib.BNode(), rdflib.BNode()
+            store.add((work, BF.contribution, contribution))
+            store.add((contribution, BF.role, role))
+            store.add((contribution, BF.agent, agent))
+            store.add((agent, rdflib.RDFS.label,
+                       rdflib.Literal("Agent {} {}".format(i, j))))
+        for year in [1900 + i, 2000 + i]:
+            activity = rdflib.BNode()
+            store.add((instance, BF.provisionActivity, activity))
+            store.add((activity, rdflib.RDF.type, BF.Publication))
+            store.add((activity, BF.date, rdflib.Literal(str(year))))
+    return store
+
+
+class CountingSPARQLProcessor(SPARQLProcessor):
+    """Counts the queries sent to rdflib's SPARQL engine"""
+
+    def __init__(self, **kwargs):
+        kwargs.setdefault("query_planner", False)
+        super(CountingSPARQLProcessor, self).__init__(**kwargs)
+        self.queries = []
+
+    def __get_bindings__(self, sparql, output_format):
+        self.queries.append(sparql)
+        return super(CountingSPARQLProcessor, self).__get_bindings__(
+            sparql, output_format)
+
+
+class TestSPARQLProcessorBatches(unittest.TestCase):
+
+    def setUp(self):
+        self.rules = os.path.join(FIXURES_PATH, "rml-sparql.ttl")
+        self.store = bibframe_store(7)
+
+    def __run__(self, **kwargs):
+        processor = CountingSPARQLProcessor(rml_rules=self.rules,
+                                            triplestore=self.store,
+                                            **kwargs)
+        processor.run()
+        return processor
+
+    def test_batches_same_as_per_entity(self):
+        serial = self.__run__()
+        self.assertEqual(len(serial.queries), 1 + 7 * 3)
+        for batch_size in [1, 3, 100]:
+            batched = self.__run__(batch_size=batch_size)
+            self.assertTrue(isomorphic(batched.output, serial.output))
+            self.assertEqual(list(batched.output), list(serial.output))
+        instance = rdflib.URIRef("http://bibcat.org/instance/5")
+        self.assertEqual(
+            sorted(batched.output.objects(subject=instance,
+                                          predicate=SCHEMA.author)),
+            [rdflib.Literal("Author 5 0"), rdflib.Literal("Author 5 1")])
+        self.assertEqual(
+            sorted(batched.output.objects(subject=instance,
+                                          predicate=SCHEMA.name)),
+            [rdflib.Literal("Label 5")])
+
+    def test_batch_query_count(self):
+        # name and author are batched, identifier uses the iterator
+        # outside of an IRI and is queried for every entity
+        batched = self.__run__(batch_size=3)
+        self.assertEqual(len(batched.queries), 1 + 3 * 2 + 7)
+        batched = self.__run__(batch_size=100)
+        self.assertEqual(len(batched.queries), 1 + 2 + 7)
+
+    def test_batch_query(self):
+        processor = SPARQLProcessor(rml_rules=self.rules,
+                                    triplestore=self.store)
+        entities = [rdflib.URIRef("http://bibcat.org/instance/1"),
+                    rdflib.URIRef("http://bibcat.org/instance/2")]
+        sparql = processor.__batch_query__(
+            """SELECT DISTINCT ?label
+WHERE {{ <{instance}> rdfs:label ?label }}""",
+            "instance",
+            entities,
+            instance="http://bibcat.org/instance/0")
+        self.assertIn("SELECT DISTINCT ?instance ?label", sparql)
+        self.assertIn("{ SELECT ?instance WHERE { VALUES ?instance { "
+                      "<http://bibcat.org/instance/1> "
+                      "<http://bibcat.org/instance/2> } } }",
+                      sparql)
+        self.assertIn("?instance rdfs:label ?label", sparql)
+        self.assertIsNone(processor.__batch_query__(
+            "SELECT * WHERE {{ <{instance}> rdfs:label ?label }}",
+            "instance",
+            entities))
+        self.assertIsNone(processor.__batch_query__(
+            "SELECT ?label WHERE {{ ?s rdfs:label ?label }}",
+            "instance",
+            entities))
+
+
+class RemoteSPARQLProcessor(SPARQLProcessor):
+    """Answers the queries for a remote triplestore from a local store,
+    keeping count of the queries in flight and the threads sending them"""
+
+    def __init__(self, store, **kwargs):
+        self.store, self.lock = store, threading.Lock()
+        self.in_flight, self.max_in_flight = 0, 0
+        self.queries, self.threads = [], set()
+        super(RemoteSPARQLProcessor, self).__init__(
+            triplestore_url="http://localhost:9999/blazegraph/sparql",
+            **kwargs)
+
+    def __get_bindings__(self, sparql, output_format):
+        with self.lock:
+            self.queries.append(sparql)
+            self.threads.add(threading.get_ident())
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        time.sleep(0.005)
+        with self.lock:
+            bindings = self.store.query(sparql).bindings
+            self.in_flight -= 1
+        return bindings
+
+
+class TestSPARQLProcessorConcurrency(unittest.TestCase):
+
+    def setUp(self):
+        self.rules = os.path.join(FIXURES_PATH, "rml-sparql.ttl")
+        self.store = bibframe_store(7)
+        self.serial = RemoteSPARQLProcessor(self.store,
+                                            rml_rules=self.rules)
+        self.serial.run()
+
+    def test_same_as_sequential(self):
+        self.assertEqual(self.serial.max_in_flight, 1)
+        self.assertEqual(len(self.serial.threads), 1)
+        for kwargs in [{"max_requests": 4},
+                       {"max_requests": 4, "batch_size": 3},
+                       {"max_requests": 16, "batch_size": 100}]:
+            processor = RemoteSPARQLProcessor(self.store,
+                                              rml_rules=self.rules,
+                                              **kwargs)
+            processor.run()
+            self.assertEqual(list(processor.output),
+                             list(self.serial.output))
+            self.assertGreater(processor.max_in_flight, 1)
+            self.assertLessEqual(processor.max_in_flight,
+                                 kwargs["max_requests"])
+
+    def test_query_count(self):
+        processor = RemoteSPARQLProcessor(self.store,
+                                          rml_rules=self.rules,
+                                          max_requests=2)
+        processor.run()
+        self.assertEqual(sorted(processor.queries),
+                         sorted(self.serial.queries))
+        self.assertEqual(processor.max_in_flight, 2)
+
+    def test_local_store_sequential(self):
+        processor = CountingSPARQLProcessor(rml_rules=self.rules,
+                                            triplestore=self.store,
+                                            max_requests=8)
+        processor.run()
+        self.assertIsNone(processor.__pool__)
+        self.assertEqual(list(processor.output), list(self.serial.output))
+
+    def test_pool_shut_down(self):
+        threads = threading.active_count()
+        processor = RemoteSPARQLProcessor(self.store,
+                                          rml_rules=self.rules,
+                                          max_requests=4)
+        processor.run()
+        self.assertGreater(len(processor.threads), 1)
+        # Request threads are joined at the end of each run
+        self.assertIsNone(processor.__pool__)
+        self.assertEqual(threading.active_count(), threads)
+        processor.run()
+        self.assertEqual(list(processor.output), list(self.serial.output))
+
+    def test_close(self):
+        with RemoteSPARQLProcessor(self.store,
+                                   rml_rules=self.rules,
+                                   max_requests=4) as processor:
+            processor.__run_queries__(
+                [(i, "SELECT ?s WHERE { ?s a ?o } LIMIT 1")
+                 for i in range(4)],
+                "json")
+            pool = processor.__pool__
+            self.assertIsNotNone(pool)
+        self.assertIsNone(processor.__pool__)
+        self.assertRaises(RuntimeError, pool.submit, print)
+
+
+class StreamedResponse(object):
+
+    def __init__(self, body, content_type):
+        self.body = body
+        self.headers = {"Content-Type": content_type}
+        self.closed = False
+
+    def iter_lines(self, chunk_size=512, delimiter=None):
+        for line in self.body.split(delimiter):
+            yield line
+
+    def json(self):
+        return json.loads(self.body.decode())
+
+    def close(self):
+        self.closed = True
+
+
+class TestSPARQLProcessorPaging(unittest.TestCase):
+
+    def setUp(self):
+        self.rules = os.path.join(FIXURES_PATH, "rml-sparql.ttl")
+        self.store = bibframe_store(7)
+
+    def __run__(self, **kwargs):
+        processor = CountingSPARQLProcessor(rml_rules=self.rules,
+                                            triplestore=self.store,
+                                            paging=kwargs.pop("paging",
+                                                              True))
+        processor.run(**kwargs)
+        return processor
+
+    def test_pages_until_exhausted(self):
+        single = self.__run__(limit=100)
+        paged = self.__run__(limit=3)
+        pages = [query for query in paged.queries if "OFFSET" in query]
+        self.assertEqual(len(pages), 3)
+        self.assertIn("OFFSET 6", pages[-1])
+        self.assertEqual(set(paged.output), set(single.output))
+        # A full last page is followed by an empty page
+        paged = self.__run__(limit=7)
+        self.assertEqual(
+            len([query for query in paged.queries if "OFFSET" in query]), 2)
+
+    def test_paging_off(self):
+        paged = self.__run__(limit=3, paging=False)
+        self.assertEqual(
+            len(set(paged.output.subjects(rdflib.RDF.type,
+                                          SCHEMA.CreativeWork))), 3)
+
+
+class TestSPARQLProcessorStreaming(unittest.TestCase):
+
+    def setUp(self):
+        self.processor = SPARQLProcessor(
+            rml_rules=os.path.join(FIXURES_PATH, "rml-sparql.ttl"),
+            triplestore_url="http://localhost:9999/blazegraph/sparql")
+
+    @mock.patch("bibcat.rml.processor.transport.post")
+    def test_tsv_bindings(self, mock_post):
+        response = StreamedResponse(
+            b"?instance\t?label\n"
+            b"<http://bibcat.org/instance/1>\t\"Title\"\n"
+            b"<http://bibcat.org/instance/2>\t\"Titre\"@fr\r\n"
+            b"<http://bibcat.org/instance/3>\t\n"
+            b"_:b0\t\"Tab\\there\"\n"
+            b"<http://bibcat.org/instance/4>\t1999\n",
+            "text/tab-separated-values; charset=utf-8")
+        mock_post.return_value = response
+        bindings = self.processor.__get_bindings__("SELECT", "json")
+        self.assertFalse(isinstance(bindings, list))
+        bindings = list(bindings)
+        self.assertEqual(
+            mock_post.call_args[1]["headers"]["Accept"].split(",")[0],
+            "text/tab-separated-values")
+        self.assertTrue(mock_post.call_args[1]["stream"])
+        self.assertTrue(response.closed)
+        self.assertEqual(len(bindings), 5)
+        self.assertEqual(bindings[0],
+                         {"instance": rdflib.URIRef(
+                             "http://bibcat.org/instance/1"),
+                          "label": rdflib.Literal("Title")})
+        self.assertEqual(bindings[1]["label"],
+                         rdflib.Literal("Titre", lang="fr"))
+        self.assertNotIn("label", bindings[2])
+        self.assertEqual(bindings[3]["instance"], rdflib.BNode("b0"))
+        self.assertEqual(bindings[3]["label"], rdflib.Literal("Tab\there"))
+        self.assertEqual(bindings[4]["label"], rdflib.Literal(1999))
+
+    @mock.patch("bibcat.rml.processor.transport.post")
+    def test_json_fallback(self, mock_post):
+        body = {"results": {"bindings": [
+            {"instance": {"type": "uri",
+                          "value": "http://bibcat.org/instance/1"}}]}}
+        mock_post.return_value = StreamedResponse(
+            json.dumps(body).encode(),
+            "application/sparql-results+json")
+        bindings = list(self.processor.__get_bindings__("SELECT", "json"))
+        self.assertEqual(bindings, body["results"]["bindings"])
+        self.assertTrue(mock_post.return_value.closed)
+
+
+class CountingSPARQLBatchProcessor(SPARQLBatchProcessor):
+
+    def __init__(self, *args, **kwargs):
+        super(CountingSPARQLBatchProcessor, self).__init__(*args, **kwargs)
+        self.queries, self.rows = [], 0
+
+    def __get_bindings__(self, sparql):
+        self.queries.append(sparql)
+        bindings = super(CountingSPARQLBatchProcessor,
+                         self).__get_bindings__(sparql)
+        self.rows += len(bindings)
+        return bindings
+
+
+class TestSPARQLBatchProcessor(unittest.TestCase):
+
+    def setUp(self):
+        self.rules = ["bf-batch-to-schema.ttl"]
+        self.store = schema_store(7)
+        self.run_kwargs = {"limit": 100, "offset": 0}
+
+    def test_same_as_sparql_processor(self):
+        processor = SPARQLProcessor(rml_rules=self.rules,
+                                    triplestore=self.store)
+        processor.run(**self.run_kwargs)
+        for batch_size in [1, 3, 100]:
+            batch = SPARQLBatchProcessor(self.rules,
+                                         triplestore=self.store,
+                                         batch_size=batch_size)
+            batch.run(**self.run_kwargs)
+            self.assertEqual(len(batch.output), 7 * 8)
+            self.assertEqual(set(batch.output), set(processor.output))
+
+    def test_compound_query_per_batch(self):
+        batch = CountingSPARQLBatchProcessor(self.rules,
+                                             triplestore=self.store,
+                                             batch_size=3)
+        batch.run(**self.run_kwargs)
+        # Logical source and a compound query for each batch of 3
+        self.assertEqual(len(batch.queries), 1 + 3)
+        self.assertNotIn("OPTIONAL", batch.queries[-1])
+        self.assertEqual(batch.queries[-1].count("UNION"), 4)
+        # One row for each object, not a product of the predicates
+        self.assertEqual(batch.rows, 7 + 7 * 7)
+
+    @mock.patch("bibcat.rml.processor.transport.post")
+    def test_streamed_results(self, mock_post):
+        responses = []
+
+        def tsv(url, data=None, headers=None, stream=False):
+            result = self.store.query(data["query"])
+            lines = ["\t".join(["?" + str(var) for var in result.vars])]
+            for row in result:
+                lines.append("\t".join(
+                    [term.n3() if term is not None else ""
+                     for term in row]))
+            responses.append(StreamedResponse(
+                "\n".join(lines).encode(),
+                "text/tab-separated-values"))
+            return responses[-1]
+
+        mock_post.side_effect = tsv
+        local = SPARQLBatchProcessor(self.rules,
+                                     triplestore=self.store,
+                                     batch_size=3)
+        local.run(**self.run_kwargs)
+        remote = SPARQLBatchProcessor(
+            self.rules,
+            triplestore_url="http://localhost:9999/blazegraph/sparql",
+            batch_size=3)
+        remote.run(**self.run_kwargs)
+        self.assertEqual(set(remote.output), set(local.output))
+        self.assertTrue(mock_post.call_args[1]["stream"])
+        self.assertEqual(
+            mock_post.call_args[1]["headers"]["Accept"].split(",")[0],
+            "text/tab-separated-values")
+        self.assertTrue(all([response.closed for response in responses]))
+
+    def test_multiple_objects_per_entity(self):
+        batch = CountingSPARQLBatchProcessor(self.rules,
+                                             triplestore=self.store)
+        pred_obj_map = SimpleNamespace(
+            predicate=SCHEMA.name,
+            constant=None,
+            reference=None,
+            query="""SELECT ?label ?work
+                     WHERE {{ <{instance}> rdfs:label ?label ;
+                                           bf:instanceOf ?work }}""")
+        triple_map = SimpleNamespace(
+            logicalSource=SimpleNamespace(iterator="instance"),
+            predicateObjectMap=[pred_obj_map])
+        compound = batch.__construct_compound_query__(triple_map)
+        self.assertEqual(compound.branches, [])
+        self.assertEqual(compound.per_entity, [pred_obj_map])
+
+
+if __name__ == '__main__':
+    unittest.main()
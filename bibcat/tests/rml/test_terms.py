@@ -0,0 +1,73 @@
+__author__ = "Jeremy Nelson"
+
+import unittest
+
+import rdflib
+from lxml import etree
+
+from bibcat.rml.processor import XMLProcessor
+from bibcat.rml.terms import TermCache
+
+MODS = """<mods xmlns="http://www.loc.gov/mods/v3">
+  <titleInfo><title>{}</title></titleInfo>
+  <typeOfResource>text</typeOfResource>
+</mods>"""
+
+
+class TestTermCache(unittest.TestCase):
+
+    def setUp(self):
+        self.terms = TermCache(max_size=2)
+
+    def test_uri(self):
+        iri = "http://id.loc.gov/vocabulary/relators/aut"
+        self.assertIs(self.terms.uri(iri), self.terms.uri(iri))
+        self.assertEqual(self.terms.uri(iri), rdflib.URIRef(iri))
+        self.assertEqual(self.terms.stats()["uri"],
+                         {"hits": 2, "misses": 1, "size": 1})
+
+    def test_literal(self):
+        self.assertIs(self.terms.literal("eng"), self.terms.literal("eng"))
+        self.assertEqual(
+            self.terms.literal("1", datatype=rdflib.XSD.integer),
+            rdflib.Literal("1", datatype=rdflib.XSD.integer))
+        self.assertNotEqual(self.terms.literal(1), self.terms.literal(True))
+
+    def test_bounded(self):
+        for value in ["a", "b", "c", "d"]:
+            self.terms.is_valid_uri(value)
+        self.assertEqual(self.terms.stats()["is_valid_uri"]["size"], 2)
+        self.assertFalse(self.terms.is_valid_uri("not valid"))
+        self.terms.clear()
+        self.assertEqual(self.terms.stats()["is_valid_uri"],
+                         {"hits": 0, "misses": 0, "size": 0})
+
+
+class TestXMLProcessorTerms(unittest.TestCase):
+
+    def setUp(self):
+        self.processor = XMLProcessor(
+            rml_rules=["bibcat-base.ttl", "mods-to-bf.ttl"],
+            namespaces={"mods": "http://www.loc.gov/mods/v3",
+                        "xlink": "http://www.w3.org/1999/xlink"})
+        self.run_kwargs = {"instance_iri": "http://bibcat.org/instance/1",
+                           "item_iri": "http://bibcat.org/item/1",
+                           "work_iri": "http://bibcat.org/work/1"}
+
+    def __instance_ids__(self):
+        instance = rdflib.URIRef("http://bibcat.org/instance/1")
+        return set([id(subject) for subject in self.processor.output.subjects()
+                    if subject == instance])
+
+    def test_terms_shared_across_runs(self):
+        self.processor.run(etree.XML(MODS.format("Emma")), **self.run_kwargs)
+        first = self.__instance_ids__()
+        self.processor.run(etree.XML(MODS.format("Persuasion")),
+                           **self.run_kwargs)
+        self.assertEqual(len(first), 1)
+        self.assertEqual(self.__instance_ids__(), first)
+        self.assertGreater(self.processor.terms.stats()["uri"]["hits"], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,10 +1,16 @@
 __author__ = "Jeremy Nelson"
 
 
+import io
+import os
 import unittest
 import rdflib
+from lxml import etree
 from bibcat.rml.processor import XMLProcessor
 
+FIXURES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                            "fixures")
+
 class TestXMLProcessorInit(unittest.TestCase):
 
     def setUp(self):
@@ -24,5 +30,160 @@ class TestXMLProcessorInit(unittest.TestCase):
     def tearDown(self):
         pass
 
+class TestXMLProcessorCompiledExpressions(unittest.TestCase):
+
+    def setUp(self):
+        self.processor = XMLProcessor(
+            rml_rules=["bibcat-base.ttl", "mods-to-bf.ttl"],
+            namespaces={"mods": "http://www.loc.gov/mods/v3"})
+
+    def test_iterators_compiled(self):
+        for triple_map in self.processor.triple_maps.values():
+            self.assertIsInstance(
+                triple_map.logicalSource.compiled_iterator,
+                etree.XPath)
+
+    def test_references_compiled(self):
+        for triple_map in self.processor.triple_maps.values():
+            for pred_obj_map in triple_map.predicateObjectMap:
+                if pred_obj_map.reference is None:
+                    self.assertIsNone(pred_obj_map.compiled_reference)
+                else:
+                    self.assertIsInstance(pred_obj_map.compiled_reference,
+                                          etree.XPath)
+
+    def test_compiled_matches_parsed(self):
+        mods = etree.XML("""<mods xmlns="http://www.loc.gov/mods/v3">
+            <titleInfo><title>A Title</title></titleInfo></mods>""")
+        self.assertEqual(
+            self.processor.__xpath__(mods, "mods:titleInfo/mods:title"),
+            self.processor.__xpath__(
+                mods,
+                "mods:titleInfo/mods:title",
+                self.processor.__compile_expression__(
+                    "mods:titleInfo/mods:title")))
+
+    def tearDown(self):
+        pass
+
+class TestXMLProcessorRunStream(unittest.TestCase):
+
+    def setUp(self):
+        self.processor = XMLProcessor(
+            rml_rules=["bibcat-base.ttl", "mods-to-bf.ttl"],
+            namespaces={"mods": "http://www.loc.gov/mods/v3",
+                        "xlink": "http://www.w3.org/1999/xlink"})
+        records = "".join(
+            """<mods><titleInfo><title>Title {0}</title></titleInfo>
+            </mods>""".format(i) for i in range(5))
+        self.collection = """<?xml version="1.0"?>
+<modsCollection xmlns="http://www.loc.gov/mods/v3">{}</modsCollection>"""\
+            .format(records).encode()
+
+    def test_graph_per_record(self):
+        titles = []
+        for i, graph in enumerate(self.processor.run_stream(
+                io.BytesIO(self.collection),
+                "mods:mods",
+                record_kwargs=lambda element: {
+                    "instance_iri": "http://bibcat.org/{}".format(
+                        id(element))},
+                item_iri="http://bibcat.org/item",
+                work_iri="http://bibcat.org/work")):
+            titles.extend([str(title) for title in graph.objects(
+                predicate=rdflib.URIRef(
+                    "http://id.loc.gov/ontologies/bibframe/mainTitle"))])
+        self.assertEqual(i, 4)
+        self.assertEqual(titles, ["Title {}".format(i) for i in range(5)])
+
+    def test_clark_record_tag(self):
+        graphs = list(self.processor.run_stream(
+            io.BytesIO(self.collection),
+            "{http://www.loc.gov/mods/v3}mods",
+            instance_iri="http://bibcat.org/instance",
+            item_iri="http://bibcat.org/item",
+            work_iri="http://bibcat.org/work"))
+        self.assertEqual(len(graphs), 5)
+
+    def tearDown(self):
+        pass
+
+class TestXMLProcessorJoins(unittest.TestCase):
+
+    def setUp(self):
+        self.rules = ["bibcat-base.ttl",
+                      os.path.join(FIXURES_PATH, "rml-join.ttl")]
+        self.mods = etree.XML("""<mods xmlns="http://www.loc.gov/mods/v3">
+            <name><namePart>Austen, Jane</namePart></name>
+            <name><namePart>Bronte, Charlotte</namePart></name>
+            <name><namePart>Eliot, George</namePart></name></mods>""")
+        self.bf = rdflib.Namespace("http://id.loc.gov/ontologies/bibframe/")
+
+    def __run__(self, **kwargs):
+        processor = XMLProcessor(
+            rml_rules=self.rules,
+            namespaces={"mods": "http://www.loc.gov/mods/v3"},
+            **kwargs)
+        calls = []
+        execute = processor.execute
+        def counted_execute(triple_map, **kwargs):
+            calls.append(triple_map)
+            return execute(triple_map, **kwargs)
+        processor.execute = counted_execute
+        processor.run(self.mods, instance_iri="http://bibcat.org/instance")
+        return processor, len(calls)
+
+    def test_join_condition(self):
+        processor, calls = self.__run__()
+        contributions = list(processor.output.subjects(
+            predicate=rdflib.RDF.type,
+            object=self.bf.Contribution))
+        self.assertEqual(len(contributions), 3)
+        for contribution in contributions:
+            agents = list(processor.output.objects(subject=contribution,
+                                                   predicate=self.bf.agent))
+            self.assertEqual(len(agents), 1)
+        self.assertEqual(
+            len(list(processor.output.subjects(predicate=rdflib.RDF.type,
+                                               object=self.bf.Person))), 3)
+
+    def test_join_references_compiled(self):
+        processor, calls = self.__run__()
+        self.assertIsInstance(processor.__join_expressions__["mods:namePart"],
+                              etree.XPath)
+        name = self.mods[0]
+        self.assertEqual(
+            processor.__join_value__(name, rdflib.Literal("mods:namePart")),
+            "Austen, Jane")
+
+    def test_parent_executed_once(self):
+        processor, calls = self.__run__()
+        # adminMetadata, Instance, Contribution and Agent once each
+        self.assertEqual(calls, 4)
+        uncached, uncached_calls = self.__run__(join_cache=0)
+        # Agent for each Contribution's join and the Instance's subject
+        self.assertEqual(uncached_calls, 7)
+        self.assertEqual(
+            len(list(uncached.output.subjects(predicate=rdflib.RDF.type,
+                                              object=self.bf.Person))), 12)
+
+    def test_blank_node_parent_shared(self):
+        processor, calls = self.__run__()
+        subjects = set(processor.output.objects(predicate=self.bf.subject))
+        agents = set(processor.output.objects(predicate=self.bf.agent))
+        # The Instance and the Contributions reference the same blank
+        # node of each name
+        self.assertEqual(len(subjects), 3)
+        self.assertEqual(subjects, agents)
+        uncached, uncached_calls = self.__run__(join_cache=0)
+        subjects = set(uncached.output.objects(predicate=self.bf.subject))
+        agents = set(uncached.output.objects(predicate=self.bf.agent))
+        self.assertEqual(len(subjects), 3)
+        self.assertEqual(len(agents), 3)
+        self.assertEqual(subjects & agents, set())
+
+    def tearDown(self):
+        pass
+
 if __name__ == '__main__':
     unittest.main() 
@@ -2,6 +2,7 @@ import rdflib
 import unittest
 from bibcat import clean_uris, create_rdf_list, delete_bnode, delete_iri
 from bibcat import modified_bf_desc, slugify, wikify, replace_iri 
+from bibcat import rewrite_iris
 
 __author__ = "Jeremy Nelson"
 
@@ -273,6 +274,99 @@ class Test_replace_iri(unittest.TestCase):
         pass
 
 
+class Test_rewrite_iris(unittest.TestCase):
+
+    def setUp(self):
+        self.graph = rdflib.Graph()
+        self.graph.bind("bf", BF)
+        self.instance = rdflib.URIRef("https://bibcat.org/instance")
+        self.agent = rdflib.BNode()
+        self.topic = rdflib.URIRef("https://bibcat.org/old-topic")
+        self.graph.add((self.instance, BF.contribution, self.agent))
+        self.graph.add((self.agent, rdflib.RDF.type, BF.Person))
+        self.graph.add((self.instance, BF.subject, self.topic))
+        self.graph.add((self.topic, rdflib.RDFS.seeAlso, self.topic))
+        self.mapping = {
+            self.agent: rdflib.URIRef("https://bibcat.org/person"),
+            self.topic: rdflib.URIRef("https://bibcat.org/topic")}
+
+    def __check__(self, graph):
+        person = rdflib.URIRef("https://bibcat.org/person")
+        topic = rdflib.URIRef("https://bibcat.org/topic")
+        self.assertEqual(len(graph), 4)
+        self.assertEqual(graph.value(subject=self.instance,
+                                     predicate=BF.contribution),
+                         person)
+        self.assertEqual(graph.value(subject=person,
+                                     predicate=rdflib.RDF.type),
+                         BF.Person)
+        self.assertEqual(graph.value(subject=topic,
+                                     predicate=rdflib.RDFS.seeAlso),
+                         topic)
+        self.assertIsNone(graph.value(subject=self.agent,
+                                      predicate=rdflib.RDF.type))
+
+    def test_new_graph(self):
+        output = rewrite_iris(self.graph, self.mapping)
+        self.__check__(output)
+        self.assertIn(("bf", rdflib.URIRef(str(BF))),
+                      list(output.namespaces()))
+        # Input graph is left as is
+        self.assertEqual(self.graph.value(subject=self.agent,
+                                          predicate=rdflib.RDF.type),
+                         BF.Person)
+
+    def test_in_place(self):
+        output = rewrite_iris(self.graph, self.mapping, in_place=True)
+        self.assertIs(output, self.graph)
+        self.__check__(self.graph)
+
+    def test_conjunctive_graph(self):
+        graph = rdflib.ConjunctiveGraph()
+        context = graph.get_context(rdflib.URIRef("https://bibcat.org/g"))
+        context.add((self.topic, rdflib.RDF.type, BF.Topic))
+        rewrite_iris(graph, self.mapping, in_place=True)
+        self.assertEqual(context.value(predicate=rdflib.RDF.type,
+                                       object=BF.Topic),
+                         rdflib.URIRef("https://bibcat.org/topic"))
+
+    def test_conjunctive_graph_new_graph(self):
+        graph = rdflib.ConjunctiveGraph()
+        named = rdflib.URIRef("https://bibcat.org/g")
+        graph.get_context(named).add((self.topic, rdflib.RDF.type, BF.Topic))
+        graph.add((self.agent, rdflib.RDF.type, BF.Person))
+        output = rewrite_iris(graph, self.mapping)
+        self.assertIsInstance(output, rdflib.ConjunctiveGraph)
+        self.assertEqual(
+            output.get_context(named).value(predicate=rdflib.RDF.type,
+                                            object=BF.Topic),
+            rdflib.URIRef("https://bibcat.org/topic"))
+        self.assertEqual(
+            output.default_context.value(predicate=rdflib.RDF.type,
+                                         object=BF.Person),
+            rdflib.URIRef("https://bibcat.org/person"))
+        self.assertEqual(len(output), 2)
+
+    def test_chained_mapping(self):
+        first = rdflib.URIRef("https://bibcat.org/a")
+        second = rdflib.URIRef("https://bibcat.org/b")
+        third = rdflib.URIRef("https://bibcat.org/c")
+        for mapping in [[(first, second), (second, third)],
+                        [(second, third), (first, second)]]:
+            for in_place in [False, True]:
+                graph = rdflib.Graph()
+                graph.add((self.instance, BF.subject, first))
+                graph.add((self.instance, BF.genreForm, second))
+                output = rewrite_iris(graph, dict(mapping),
+                                      in_place=in_place)
+                self.assertEqual(output.value(subject=self.instance,
+                                              predicate=BF.subject),
+                                 second)
+                self.assertEqual(output.value(subject=self.instance,
+                                              predicate=BF.genreForm),
+                                 third)
+
+
 class Test_slugify(unittest.TestCase):
 
     def setUp(self):
@@ -0,0 +1,127 @@
+"""Tests the shared HTTP transport"""
+__author__ = "Jeremy Nelson"
+
+import threading
+import unittest
+from unittest import mock
+
+import requests
+from urllib3.exceptions import MaxRetryError, NewConnectionError
+
+from bibcat import transport
+
+URL = "http://localhost:9999/blazegraph/sparql"
+
+
+def response(status_code, content=b"{}", headers=None):
+    return mock.Mock(status_code=status_code,
+                     content=content,
+                     headers=headers or {})
+
+
+class TestTransport(unittest.TestCase):
+
+    def setUp(self):
+        transport.reset_metrics()
+        transport.configure(backoff=0)
+
+    def test_endpoint(self):
+        self.assertEqual(transport.endpoint(URL), "http://localhost:9999")
+        self.assertEqual(
+            transport.endpoint("http://id.loc.gov/authorities/names/n1.json"),
+            "http://id.loc.gov")
+
+    def test_session_reused(self):
+        self.assertIs(transport.session(URL),
+                      transport.session("http://localhost:9999/other"))
+        self.assertIsNot(transport.session(URL),
+                         transport.session("http://id.loc.gov/"))
+
+    def test_session_per_thread(self):
+        sessions = []
+        thread = threading.Thread(
+            target=lambda: sessions.append(transport.session(URL)))
+        thread.start()
+        thread.join()
+        self.assertIsNot(sessions[0], transport.session(URL))
+
+    @mock.patch("requests.Session.request")
+    def test_timeout_default(self, mock_request):
+        mock_request.return_value = response(200)
+        transport.post(URL, data={"query": "SELECT"})
+        self.assertEqual(mock_request.call_args[1]["timeout"],
+                         transport.TIMEOUT)
+
+    @mock.patch("requests.Session.request")
+    def test_retry(self, mock_request):
+        responses = [response(503),
+                     response(429, headers={"Retry-After": "0"}),
+                     response(200, b"done")]
+        mock_request.side_effect = list(responses)
+        result = transport.get(URL)
+        self.assertEqual(result.status_code, 200)
+        stats = transport.metrics()["http://localhost:9999"]
+        self.assertEqual(stats["requests"], 3)
+        self.assertEqual(stats["retries"], 2)
+        self.assertEqual(stats["errors"], 2)
+        # Retried responses are closed before the wait
+        for retried in responses[:2]:
+            retried.close.assert_called_once_with()
+        responses[2].close.assert_not_called()
+
+    @mock.patch("requests.Session.request")
+    def test_retry_exhausted(self, mock_request):
+        mock_request.return_value = response(503)
+        transport.configure(retries=1, backoff=0)
+        self.assertEqual(transport.get(URL).status_code, 503)
+        self.assertEqual(mock_request.call_count, 2)
+
+    @mock.patch("requests.Session.request")
+    def test_connection_error(self, mock_request):
+        mock_request.side_effect = requests.ConnectionError()
+        transport.configure(retries=2, backoff=0)
+        self.assertRaises(requests.ConnectionError, transport.get, URL)
+        self.assertEqual(mock_request.call_count, 3)
+
+    @mock.patch("requests.Session.request")
+    def test_post_not_retried_after_sent(self, mock_request):
+        mock_request.side_effect = requests.ConnectionError(
+            "Connection aborted.")
+        transport.configure(retries=2, backoff=0)
+        self.assertRaises(requests.ConnectionError,
+                          transport.post,
+                          URL,
+                          data=b"INSERT DATA { _:b1 a <urn:Work> }")
+        self.assertEqual(mock_request.call_count, 1)
+
+    @mock.patch("requests.Session.request")
+    def test_post_retried_when_not_connected(self, mock_request):
+        refused = requests.ConnectionError(MaxRetryError(
+            None, URL, NewConnectionError(None, "Connection refused")))
+        mock_request.side_effect = [requests.ConnectTimeout(),
+                                    refused,
+                                    response(200)]
+        transport.configure(retries=2, backoff=0)
+        self.assertEqual(transport.post(URL, data=b"").status_code, 200)
+        self.assertEqual(mock_request.call_count, 3)
+
+    @mock.patch("requests.Session.request")
+    def test_metrics(self, mock_request):
+        mock_request.return_value = response(200, b"0123456789")
+        transport.post(URL, data=b"abcd")
+        transport.get(URL)
+        stats = transport.metrics()["http://localhost:9999"]
+        self.assertEqual(stats["requests"], 2)
+        self.assertEqual(stats["methods"], {"GET": 1, "POST": 1})
+        self.assertEqual(stats["bytes_sent"], 4)
+        self.assertEqual(stats["bytes_received"], 20)
+        self.assertEqual(sum(stats["latency"].values()), 2)
+        self.assertIn("http://localhost:9999", transport.report())
+
+    def tearDown(self):
+        transport.configure(retries=3, backoff=0.5)
+        transport.reset_metrics()
+
+
+if __name__ == '__main__':
+    unittest.main()
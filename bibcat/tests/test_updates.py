@@ -0,0 +1,94 @@
+"""Tests the write-combining SPARQL update buffer"""
+__author__ = "Jeremy Nelson"
+
+import unittest
+from unittest import mock
+
+import rdflib
+import requests
+
+from bibcat.updates import UpdateBuffer
+
+URL = "http://localhost:9999/blazegraph/sparql"
+BF = rdflib.Namespace("http://id.loc.gov/ontologies/bibframe/")
+DELETE_WORK_BNODE = """DELETE {{ ?work ?p ?o . <{0}> bf:instanceOf ?work }}
+WHERE {{ <{0}> bf:instanceOf ?work . ?work ?p ?o filter isBlank(?work) }}"""
+
+
+def work_graph(number):
+    graph = rdflib.Graph()
+    graph.add((rdflib.URIRef("http://bibcat.org/work/{}".format(number)),
+               rdflib.RDF.type,
+               BF.Work))
+    return graph
+
+
+class TestUpdateBuffer(unittest.TestCase):
+
+    @mock.patch("bibcat.updates.transport.post")
+    def test_max_operations(self, mock_post):
+        mock_post.return_value = mock.Mock(status_code=200)
+        updates = UpdateBuffer(URL, max_operations=4)
+        for number in range(5):
+            updates.insert_data(work_graph(number))
+            updates.add(DELETE_WORK_BNODE.format(
+                "http://bibcat.org/instance/{}".format(number)))
+        self.assertEqual(mock_post.call_count, 2)
+        self.assertEqual(len(updates), 2)
+        updates.flush()
+        self.assertEqual(mock_post.call_count, 3)
+        self.assertEqual(updates.requests, 3)
+        self.assertEqual(updates.operations, 10)
+        data = mock_post.call_args_list[0][1]["data"].decode()
+        self.assertEqual(data.count("INSERT DATA"), 2)
+        self.assertEqual(data.count(" ;\n"), 3)
+        self.assertIn("<http://bibcat.org/work/0>", data)
+        self.assertEqual(
+            mock_post.call_args_list[0][1]["headers"]["Content-Type"],
+            "application/sparql-update")
+
+    @mock.patch("bibcat.updates.transport.post")
+    def test_max_seconds(self, mock_post):
+        mock_post.return_value = mock.Mock(status_code=200)
+        updates = UpdateBuffer(URL, max_operations=100, max_seconds=0)
+        self.assertTrue(updates.delete_data(work_graph(1)))
+        self.assertEqual(mock_post.call_count, 1)
+        self.assertIn("DELETE DATA",
+                      mock_post.call_args[1]["data"].decode())
+
+    @mock.patch("bibcat.updates.transport.post")
+    def test_failed_batch(self, mock_post):
+        mock_post.side_effect = [mock.Mock(status_code=500, text="Error"),
+                                 mock.Mock(status_code=200)]
+        with UpdateBuffer(URL, max_operations=2) as updates:
+            for number in range(3):
+                updates.insert_data(work_graph(number))
+        self.assertEqual(updates.requests, 2)
+        self.assertEqual(updates.errors, 1)
+        self.assertEqual(len(updates.failed), 1)
+        self.assertEqual(len(updates.failed[0]), 2)
+
+    @mock.patch("bibcat.updates.transport.post")
+    def test_connection_error(self, mock_post):
+        mock_post.side_effect = [requests.ConnectionError("reset"),
+                                 mock.Mock(status_code=200)]
+        updates = UpdateBuffer(URL, max_operations=2)
+        updates.insert_data(work_graph(1))
+        with self.assertLogs(level="ERROR"):
+            self.assertTrue(updates.insert_data(work_graph(2)))
+        self.assertEqual(updates.errors, 1)
+        self.assertEqual(len(updates.failed[0]), 2)
+        updates.insert_data(work_graph(3))
+        self.assertTrue(updates.flush())
+        with self.assertLogs(level="ERROR") as logs:
+            self.assertEqual(updates.report(), 1)
+        self.assertIn("1 of 2 update requests", logs.output[0])
+
+    @mock.patch("bibcat.updates.transport.post")
+    def test_empty_flush(self, mock_post):
+        self.assertTrue(UpdateBuffer(URL).flush())
+        self.assertFalse(mock_post.called)
+
+
+if __name__ == '__main__':
+    unittest.main()
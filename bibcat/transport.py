@@ -0,0 +1,274 @@
+"""Shared HTTP transport for triplestore and remote service requests
+
+Requests to the same endpoint, the scheme and host of the URL, reuse a
+pooled keep-alive requests.Session in each thread, have a timeout, and
+are retried with exponential backoff when the endpoint answers 429 or 503
+or the connection fails. A POST, that may not be safe to send twice, is
+only retried when the connection could not be made. Per-endpoint request
+counts, bytes and latency histograms are kept for reporting.
+
+>>> from bibcat import transport
+>>> result = transport.post("http://localhost:9999/blazegraph/sparql",
+...                         data={"query": "SELECT * WHERE {?s ?p ?o} LIMIT 1"},
+...                         headers={"Accept": "application/json"})
+>>> transport.metrics()["http://localhost:9999"]["requests"]
+1
+"""
+__author__ = "Jeremy Nelson"
+
+import collections
+import logging
+import os
+import threading
+import time
+import urllib.parse
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import NewConnectionError
+
+# Connect and read timeouts in seconds, long SPARQL updates need a
+# generous read timeout
+TIMEOUT = (10, 300)
+RETRIES = 3
+BACKOFF = 0.5
+RETRY_STATUS = (429, 503)
+# Methods retried after any connection error, others only when the
+# connection could not be made
+IDEMPOTENT = ("GET", "HEAD", "OPTIONS", "PUT", "DELETE", "TRACE")
+POOL_SIZE = 16
+LATENCY_BUCKETS = (0.01, 0.05, 0.1, 0.5, 1, 5, 30, float("inf"))
+
+SESSIONS = threading.local()
+METRICS = dict()
+METRICS_LOCK = threading.Lock()
+
+
+def __after_fork__():
+    """Forked worker processes must not share the parent's keep-alive
+    connections"""
+    global SESSIONS, METRICS_LOCK
+    SESSIONS = threading.local()
+    METRICS_LOCK = threading.Lock()
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=__after_fork__)
+
+
+def configure(**kwargs):
+    """Sets the module's timeout, retries, backoff and pool_size
+
+    Keyword args:
+        timeout(tuple|float): Connect and read timeout in seconds
+        retries(int): Retries after a 429, 503 or connection error
+        backoff(float): Seconds before the first retry, doubled for
+                        each following retry
+        pool_size(int): Connections kept alive per endpoint
+    """
+    global TIMEOUT, RETRIES, BACKOFF, POOL_SIZE
+    TIMEOUT = kwargs.get("timeout", TIMEOUT)
+    RETRIES = kwargs.get("retries", RETRIES)
+    BACKOFF = kwargs.get("backoff", BACKOFF)
+    POOL_SIZE = kwargs.get("pool_size", POOL_SIZE)
+    SESSIONS.__dict__.clear()
+
+
+def endpoint(url):
+    """Returns the endpoint, scheme and host, of a URL
+
+    Args:
+        url(str): URL
+    """
+    parts = urllib.parse.urlsplit(str(url))
+    return "{}://{}".format(parts.scheme, parts.netloc)
+
+
+def session(url):
+    """Returns this thread's pooled session for the URL's endpoint
+
+    Args:
+        url(str): URL
+    """
+    key = endpoint(url)
+    sessions = SESSIONS.__dict__
+    if key not in sessions:
+        new_session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=POOL_SIZE)
+        new_session.mount("http://", adapter)
+        new_session.mount("https://", adapter)
+        sessions[key] = new_session
+    return sessions[key]
+
+
+def __received__(result, stream):
+    """Bytes received, streamed responses are counted by Content-Length
+    so the body is left unread"""
+    if result is None:
+        return 0
+    if stream:
+        return int(result.headers.get("Content-Length") or 0)
+    return len(result.content or b"")
+
+
+def __record__(key, method, sent, received, result, latency):
+    """Adds a request to the endpoint's metrics"""
+    with METRICS_LOCK:
+        stats = METRICS.get(key)
+        if stats is None:
+            stats = {"requests": 0,
+                     "retries": 0,
+                     "errors": 0,
+                     "bytes_sent": 0,
+                     "bytes_received": 0,
+                     "seconds": 0.0,
+                     "methods": collections.Counter(),
+                     "latency": collections.OrderedDict(
+                         [(bucket, 0) for bucket in LATENCY_BUCKETS])}
+            METRICS[key] = stats
+        stats["requests"] += 1
+        stats["methods"][method] += 1
+        stats["bytes_sent"] += sent
+        stats["seconds"] += latency
+        if result is None or result.status_code > 399:
+            stats["errors"] += 1
+        stats["bytes_received"] += received
+        for bucket in LATENCY_BUCKETS:
+            if latency <= bucket:
+                stats["latency"][bucket] += 1
+                break
+
+
+def __body_size__(kwargs):
+    data = kwargs.get("data")
+    if data is None:
+        return 0
+    if isinstance(data, dict):
+        return len(urllib.parse.urlencode(data))
+    if isinstance(data, (str, bytes)):
+        return len(data)
+    return 0
+
+
+def __retry_wait__(attempt, result):
+    """Seconds to wait before a retry, honors a numeric Retry-After"""
+    if result is not None:
+        retry_after = result.headers.get("Retry-After")
+        if retry_after is not None and retry_after.isdigit():
+            return float(retry_after)
+    return BACKOFF * 2**attempt
+
+
+def __not_sent__(error):
+    """True if a connection error happened while connecting, before any
+    of the request was sent"""
+    if isinstance(error, requests.ConnectTimeout):
+        return True
+    causes, seen = [error], set()
+    while len(causes) > 0:
+        cause = causes.pop()
+        if id(cause) in seen:
+            continue
+        seen.add(id(cause))
+        if isinstance(cause, NewConnectionError):
+            return True
+        causes.extend([arg for arg in cause.args
+                       if isinstance(arg, BaseException)])
+        for parent in [getattr(cause, "reason", None),
+                       cause.__cause__,
+                       cause.__context__]:
+            if isinstance(parent, BaseException):
+                causes.append(parent)
+    return False
+
+
+def request(method, url, **kwargs):
+    """Sends a request through the endpoint's pooled session, retrying
+    with exponential backoff on 429, 503 and connection errors, for
+    methods that are not idempotent only on errors connecting. Takes the
+    same keyword arguments as requests.request.
+
+    Args:
+        method(str): HTTP method
+        url(str): URL
+    """
+    kwargs.setdefault("timeout", TIMEOUT)
+    key = endpoint(url)
+    sent = __body_size__(kwargs)
+    attempt = 0
+    while True:
+        result, start = None, time.time()
+        try:
+            result = session(url).request(method, url, **kwargs)
+        except requests.ConnectionError as error:
+            __record__(key, method, sent, 0, None, time.time() - start)
+            if attempt >= RETRIES:
+                raise
+            if method.upper() not in IDEMPOTENT and not __not_sent__(error):
+                # The body may have been received, a replay could
+                # duplicate its blank node data
+                raise
+        else:
+            __record__(key,
+                       method,
+                       sent,
+                       __received__(result, kwargs.get("stream")),
+                       result,
+                       time.time() - start)
+            if result.status_code not in RETRY_STATUS or attempt >= RETRIES:
+                return result
+        wait = __retry_wait__(attempt, result)
+        if result is not None:
+            # Returns the connection to the pool
+            result.close()
+        logging.warning("{} {} failed, retry {} in {:.2f}s".format(
+            method, url, attempt + 1, wait))
+        with METRICS_LOCK:
+            METRICS[key]["retries"] += 1
+        time.sleep(wait)
+        attempt += 1
+
+
+def get(url, **kwargs):
+    """GET request, see request"""
+    return request("GET", url, **kwargs)
+
+
+def post(url, **kwargs):
+    """POST request, see request"""
+    return request("POST", url, **kwargs)
+
+
+def metrics():
+    """Returns a copy of the per-endpoint metrics"""
+    with METRICS_LOCK:
+        output = dict()
+        for key, stats in METRICS.items():
+            output[key] = dict(stats)
+            output[key]["methods"] = dict(stats["methods"])
+            output[key]["latency"] = collections.OrderedDict(
+                stats["latency"])
+        return output
+
+
+def reset_metrics():
+    """Clears the per-endpoint metrics"""
+    with METRICS_LOCK:
+        METRICS.clear()
+
+
+def report():
+    """Returns the per-endpoint metrics as a text table"""
+    lines = ["{:<40} {:>8} {:>8} {:>7} {:>12} {:>12} {:>9}".format(
+        "endpoint", "requests", "retries", "errors", "sent", "received",
+        "mean ms")]
+    for key, stats in sorted(metrics().items()):
+        lines.append(
+            "{:<40} {:>8} {:>8} {:>7} {:>12,} {:>12,} {:>9.1f}".format(
+                key,
+                stats["requests"],
+                stats["retries"],
+                stats["errors"],
+                stats["bytes_sent"],
+                stats["bytes_received"],
+                stats["seconds"] * 1000 / max(stats["requests"], 1)))
+    return "\n".join(lines)
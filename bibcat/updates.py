@@ -0,0 +1,127 @@
+"""Write-combining buffer of SPARQL Update operations, INSERT DATA, DELETE
+DATA and templated DELETE/INSERT operations are joined into one
+multi-operation update request every max_operations operations or
+max_seconds seconds instead of one request per operation
+
+>>> from bibcat.updates import UpdateBuffer
+>>> with UpdateBuffer("http://localhost:9999/blazegraph/sparql") as updates:
+...     updates.insert_data(work_graph)
+...     updates.add(DELETE_WORK_BNODE.format(instance_uri))
+"""
+__author__ = "Jeremy Nelson"
+
+import logging
+import time
+
+import requests
+
+from bibcat import transport
+from bibcat.rml.buffer import ntriples
+
+
+class UpdateBuffer(object):
+    """Buffers SPARQL Update operations and sends them in order as a single
+    update request, a failed request is logged and its operations kept in
+    failed so one bad batch does not stop a run"""
+
+    def __init__(self, triplestore_url, max_operations=100, max_seconds=5.0):
+        """
+        Args:
+            triplestore_url(str): SPARQL endpoint
+            max_operations(int): Operations per update request
+            max_seconds(float): Maximum age of the oldest buffered
+                                operation, checked as operations are added
+        """
+        self.triplestore_url = triplestore_url
+        self.max_operations = max_operations
+        self.max_seconds = max_seconds
+        self.requests, self.operations, self.errors = 0, 0, 0
+        self.failed = []
+        self.__buffer__, self.__started__ = [], None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.flush()
+
+    def __len__(self):
+        return len(self.__buffer__)
+
+    def add(self, operation):
+        """Adds a SPARQL Update operation, returns True if the buffer was
+        flushed
+
+        Args:
+            operation(str): SPARQL Update operation with its own prefixes
+        """
+        if len(self.__buffer__) < 1:
+            self.__started__ = time.time()
+        self.__buffer__.append(operation.strip())
+        if len(self.__buffer__) >= self.max_operations or \
+                time.time() - self.__started__ >= self.max_seconds:
+            self.flush()
+            return True
+        return False
+
+    def insert_data(self, graph):
+        """Adds an INSERT DATA operation of the graph's triples, returns
+        True if the buffer was flushed
+
+        Args:
+            graph(rdflib.Graph): Triples to insert, blank nodes become new
+                                 blank nodes in the triplestore
+        """
+        return self.add("INSERT DATA {{\n{}}}".format(
+            ntriples(graph).decode()))
+
+    def delete_data(self, graph):
+        """Adds a DELETE DATA operation of the graph's triples, returns
+        True if the buffer was flushed
+
+        Args:
+            graph(rdflib.Graph): Triples to delete, without blank nodes
+        """
+        return self.add("DELETE DATA {{\n{}}}".format(
+            ntriples(graph).decode()))
+
+    def flush(self):
+        """Sends the buffered operations as one update request, returns
+        False if the request failed"""
+        if len(self.__buffer__) < 1:
+            return True
+        operations, self.__buffer__ = self.__buffer__, []
+        self.requests += 1
+        self.operations += len(operations)
+        try:
+            result = transport.post(
+                self.triplestore_url,
+                data=" ;\n".join(operations).encode(),
+                headers={"Content-Type": "application/sparql-update"})
+        except requests.RequestException as error:
+            result = None
+            message = str(error)
+        else:
+            message = result.text
+        if result is None or result.status_code > 399:
+            self.errors += 1
+            self.failed.append(operations)
+            logging.error("Failed update of {} operations on {}\n{}".format(
+                len(operations),
+                self.triplestore_url,
+                message))
+            return False
+        return True
+
+    def report(self):
+        """Logs the failed update requests, returns the number of failed
+        requests"""
+        if self.errors > 0:
+            logging.error(
+                "{} of {} update requests to {} failed, {} operations are "
+                "kept in failed".format(
+                    self.errors,
+                    self.requests,
+                    self.triplestore_url,
+                    sum([len(operations) for operations in self.failed])))
+        return self.errors